@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# Standard
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# KiSC
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+from KiSC import \
+     KISC_VERSION
+from KiSC.Cli.cluster_status import \
+     KiscCli_cluster_status
+from KiSC.Runtime import \
+     KiscRuntime
+from KiSC.Runtime.simulator import \
+     KiscRuntime_simulator
+from KiSC.Cluster import \
+     KiscCluster_config, \
+     KiscCluster_host, \
+     KiscCluster_resource
+
+# Benchmarks
+from generate import \
+     generate, \
+     populate
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Scenarios (in execution order)
+SCENARIOS = [
+    'config.load',
+    'config.resolveString',
+    'config.resolveFile',
+    'config.isHostAllowed',
+    'config.isHostResource',
+    'host.start',
+    'host.stop',
+    'host.registerResource',
+    'cli.cluster_status.hosts',
+    'cli.cluster_status.resources',
+]
+
+
+#------------------------------------------------------------------------------
+# FUNCTIONS
+#------------------------------------------------------------------------------
+
+def measure(_fFunction, _iIterations, _iCalls = 1):
+    """
+    Measure the per-call latency of the given function
+
+    @param function _fFunction    Function (performing <_iCalls> calls; called with the iteration index)
+    @param int      _iIterations  Iterations
+    @param int      _iCalls       Calls per iteration (for micro-benchmarks)
+
+    @return list  Per-call latencies (milliseconds)
+    """
+
+    lfLatencies = list()
+    for iIteration in range(0, _iIterations):
+        fStart = time.perf_counter()
+        _fFunction(iIteration)
+        lfLatencies.append(1000.0*(time.perf_counter()-fStart)/_iCalls)
+    return lfLatencies
+
+
+def statistics(_lfLatencies, _iCalls = 1):
+    """
+    Return the statistics of the given latencies
+
+    @param list _lfLatencies  Per-call latencies (milliseconds)
+    @param int  _iCalls       Calls per iteration
+
+    @return dict  Statistics (iterations, calls, min, p50, p95, max, mean; milliseconds)
+    """
+
+    lfSorted = sorted(_lfLatencies)
+    iCount = len(lfSorted)
+    return {
+        'iterations': iCount,
+        'calls': iCount*_iCalls,
+        'min': round(lfSorted[0], 6),
+        'p50': round(lfSorted[iCount//2], 6),
+        'p95': round(lfSorted[min(iCount-1, int(iCount*0.95))], 6),
+        'max': round(lfSorted[-1], 6),
+        'mean': round(sum(lfSorted)/iCount, 6),
+    }
+
+
+def check(_lsErrors, _sWhat):
+    """
+    Raise an exception if the given (KiSC) errors list is not empty
+
+    @param list _lsErrors  Errors list
+    @param str  _sWhat     Failed operation description
+
+    @exception RuntimeError  If errors are present
+    """
+
+    if _lsErrors:
+        raise RuntimeError('%s; %s' % (_sWhat, _lsErrors[-1]))
+
+
+def benchmark(_dGenerated, _iIterations, _lsScenarios, _iSeed = 0):
+    """
+    Run the benchmark scenarios against the given (generated) configuration
+
+    @param dict _dGenerated   Generated configuration summary (see generate())
+    @param int  _iIterations  Iterations (per scenario; micro-benchmarks sweep all resources per iteration)
+    @param list _lsScenarios  Scenarios to report (all others being run silently, when required)
+    @param int  _iSeed        Random generator seed
+
+    @return dict  Per-scenario statistics (see statistics())
+    """
+
+    oRandom = random.Random(_iSeed)
+    sConfigFile = _dGenerated['paths']['config_file']
+    lsHosts_ids = _dGenerated['hosts']
+    lsResources_ids = _dGenerated['resources']
+    dResults = dict()
+
+    #
+    # Configuration
+    #
+
+    def load(iIteration):
+        oClusterConfig = KiscCluster_config(sConfigFile)
+        check(oClusterConfig.load(), 'Failed to load configuration')
+        return oClusterConfig
+    dResults['config.load'] = statistics(measure(load, _iIterations))
+    oClusterConfig = load(0)
+
+    ltPairs = [(oRandom.choice(lsHosts_ids), oRandom.choice(lsResources_ids)) for iIteration in range(0, _iIterations)]
+    with open(_dGenerated['paths']['template_file'], 'r') as oFile:
+        sTemplate = oFile.read()
+    dResults['config.resolveString'] = statistics(measure(lambda iIteration: oClusterConfig.resolveString(sTemplate, *ltPairs[iIteration]), _iIterations))
+
+    sFile_to = os.path.join(_dGenerated['paths']['cache_dir'], 'service.conf')
+    dResults['config.resolveFile'] = statistics(measure(lambda iIteration: oClusterConfig.resolveFile(_dGenerated['paths']['template_file'], sFile_to, *ltPairs[iIteration]), _iIterations))
+
+    lsConfigHosts = [oClusterConfig.getResource(sResource_id).config().get('HOSTS', '@ALL') for sResource_id in lsResources_ids]
+    def isHostAllowed(iIteration):
+        sHost_id = ltPairs[iIteration][0]
+        for sConfigHosts in lsConfigHosts:
+            oClusterConfig.isHostAllowed(sConfigHosts, sHost_id)
+    dResults['config.isHostAllowed'] = statistics(measure(isHostAllowed, _iIterations, len(lsConfigHosts)), len(lsConfigHosts))
+
+    def isHostResource(iIteration):
+        sHost_id = ltPairs[iIteration][0]
+        for sResource_id in lsResources_ids:
+            oClusterConfig.isHostResource(sHost_id, sResource_id)
+    dResults['config.isHostResource'] = statistics(measure(isHostResource, _iIterations, len(lsResources_ids)), len(lsResources_ids))
+
+    #
+    # Host
+    #
+
+    # NOTE: (configuration) resources objects hold runtime state; each 'kisc host start|stop' loads its own configuration
+    sLocalhost_id = lsHosts_ids[0]
+    lfStart = list()
+    lfStop = list()
+    for iIteration in range(0, _iIterations):
+        oClusterHost = KiscCluster_host(load(iIteration), sLocalhost_id)
+        fStart = time.perf_counter()
+        check(oClusterHost.start(), 'Failed to start host')
+        lfStart.append(1000.0*(time.perf_counter()-fStart))
+        oClusterHost = KiscCluster_host(load(iIteration), sLocalhost_id)
+        fStart = time.perf_counter()
+        check(oClusterHost.stop(), 'Failed to stop host')
+        lfStop.append(1000.0*(time.perf_counter()-fStart))
+    dResults['host.start'] = statistics(lfStart)
+    dResults['host.stop'] = statistics(lfStop)
+
+    # ... (re-)start the local host and populate the remote hosts
+    oClusterConfig = load(0)
+    check(KiscCluster_host(oClusterConfig, sLocalhost_id).start(), 'Failed to start host')
+    populate(_dGenerated)
+
+    # ... register (and save) all resources, on their allowed hosts (in turn)
+    doClusterHosts = {sHost_id: KiscCluster_host(oClusterConfig, sHost_id) for sHost_id in lsHosts_ids}
+    lfRegister = list()
+    iHost = 0
+    for sResource_id in lsResources_ids:
+        for iTry in range(0, len(lsHosts_ids)):
+            sHost_id = lsHosts_ids[(iHost+iTry) % len(lsHosts_ids)]
+            if not oClusterConfig.isHostResource(sHost_id, sResource_id):
+                continue
+            oClusterResource = KiscCluster_resource(oClusterConfig, sHost_id, sResource_id)
+            fStart = time.perf_counter()
+            lsErrors = doClusterHosts[sHost_id].registerResource(oClusterResource.resource())
+            lfRegister.append(1000.0*(time.perf_counter()-fStart))
+            if lsErrors:
+                continue
+            check(oClusterResource.resource().start(), 'Failed to start resource')
+            check(oClusterResource.resource().registerHost(doClusterHosts[sHost_id].host()), 'Failed to register host')
+            oClusterResource.saveRuntime()
+            break
+        iHost += 1
+    dResults['host.registerResource'] = statistics(lfRegister)
+
+    #
+    # CLI
+    #
+
+    with open(os.devnull, 'w') as oDevNull:
+        for sWhat in ('hosts', 'resources'):
+            def status(iIteration):
+                with contextlib.redirect_stdout(oDevNull):
+                    if KiscCli_cluster_status().execute('kisc cluster status', ['-C', sConfigFile, sWhat]):
+                        raise RuntimeError('Failed to query cluster status')
+            dResults['cli.cluster_status.%s' % sWhat] = statistics(measure(status, _iIterations))
+
+    # Done
+    return {sScenario: dResults[sScenario] for sScenario in SCENARIOS if sScenario in _lsScenarios}
+
+
+def compare(_dResults, _dBaseline, _fThreshold, _sStatistic = 'p50'):
+    """
+    Compare the given results with the given baseline (results), and write
+    the comparison (to standard error)
+
+    @param dict  _dResults     Results (see benchmark())
+    @param dict  _dBaseline    Baseline results (see benchmark())
+    @param float _fThreshold   Regression threshold (ratio)
+    @param str   _sStatistic   Compared statistic
+
+    @return list  Regressed scenarios
+    """
+
+    lsRegressions = list()
+    sys.stderr.write('%-32s %12s %12s %8s\n' % ('scenario', 'baseline', 'current', 'ratio'))
+    for sScenario in SCENARIOS:
+        if sScenario not in _dResults or sScenario not in _dBaseline:
+            continue
+        fBaseline = _dBaseline[sScenario][_sStatistic]
+        fCurrent = _dResults[sScenario][_sStatistic]
+        fRatio = fCurrent/fBaseline if fBaseline > 0 else 1.0
+        bRegressed = fRatio > _fThreshold
+        if bRegressed:
+            lsRegressions.append(sScenario)
+        sys.stderr.write('%-32s %12.6f %12.6f %8.3f%s\n' % (sScenario, fBaseline, fCurrent, fRatio, ' REGRESSION' if bRegressed else ''))
+    return lsRegressions
+
+
+#------------------------------------------------------------------------------
+# MAIN
+#------------------------------------------------------------------------------
+
+# Arguments
+oArgumentParser = argparse.ArgumentParser(description='KiSC cluster benchmark suite: configuration loading, variables resolution, hosts matching, host start/stop, resources registration and \'cluster status\' over populated runtime directories, against a synthetic cluster (see generate.py); results are written as JSON (per-call latencies, in milliseconds)')
+oArgumentParser.add_argument('-H', '--hosts', type=int, default=50, help='hosts quantity [50]')
+oArgumentParser.add_argument('-G', '--hostgroups', type=int, default=8, help='hostgroups quantity [8]')
+oArgumentParser.add_argument('-R', '--resources', type=int, default=1000, help='(regular) resources quantity [1000]')
+oArgumentParser.add_argument('-B', '--bootstrap', type=int, default=4, help='bootstrap resources quantity [4]')
+oArgumentParser.add_argument('-D', '--depth', type=int, default=2, help='include directories depth [2]')
+oArgumentParser.add_argument('-F', '--fanout', type=int, default=3, help='include sub-directories (and files) per directory [3]')
+oArgumentParser.add_argument('-s', '--seed', type=int, default=0, help='random generator seed [0]')
+oArgumentParser.add_argument('-n', '--iterations', type=int, default=20, help='iterations per scenario [20]')
+oArgumentParser.add_argument('-S', '--scenario', action='append', choices=SCENARIOS, metavar='<scenario>', help='scenario to report (repeatable; default: all) {%s}' % ','.join(SCENARIOS))
+oArgumentParser.add_argument('-d', '--directory', help='synthetic cluster directory (default: temporary, deleted on exit)')
+oArgumentParser.add_argument('-o', '--output', help='results (JSON) file (default: standard output)')
+oArgumentParser.add_argument('-c', '--compare', metavar='<baseline>', help='baseline results (JSON) file to compare with (exit code 1 on regression)')
+oArgumentParser.add_argument('-t', '--threshold', type=float, default=1.2, help='regression threshold (p50 ratio) [1.2]')
+oArgumentParser.add_argument('--simulate', metavar='<settings>', help='use system resource types, their commands being simulated with the given settings (see KiscRuntime_simulator; e.g. "latency=0.01,jitter=0.005")')
+oArguments = oArgumentParser.parse_args()
+
+# Simulator
+if oArguments.simulate is not None:
+    try:
+        KiscRuntime.setBackend(KiscRuntime_simulator(oArguments.simulate))
+    except RuntimeError as e:
+        sys.stderr.write('ERROR: %s\n' % str(e))
+        sys.exit(1)
+
+# Synthetic cluster
+if oArguments.directory:
+    sDirectory = oArguments.directory
+    if os.path.exists(sDirectory):
+        sys.stderr.write('ERROR: Directory already exists (%s)\n' % sDirectory)
+        sys.exit(1)
+else:
+    sDirectory = tempfile.mkdtemp(prefix='kisc-benchmark.')
+try:
+    dGenerated = generate(
+        sDirectory,
+        oArguments.hosts, oArguments.hostgroups, oArguments.resources, oArguments.bootstrap,
+        oArguments.depth, oArguments.fanout, oArguments.seed, oArguments.simulate is not None,
+    )
+
+    # Benchmark
+    dResults = benchmark(dGenerated, oArguments.iterations, oArguments.scenario or SCENARIOS, oArguments.seed)
+finally:
+    if not oArguments.directory:
+        shutil.rmtree(sDirectory, ignore_errors=True)
+
+# Results
+dOutput = {
+    'version': KISC_VERSION,
+    'python': platform.python_version(),
+    'platform': platform.platform(),
+    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    'parameters': {
+        'hosts': oArguments.hosts,
+        'hostgroups': oArguments.hostgroups,
+        'resources': oArguments.resources,
+        'bootstrap': oArguments.bootstrap,
+        'depth': oArguments.depth,
+        'fanout': oArguments.fanout,
+        'seed': oArguments.seed,
+        'iterations': oArguments.iterations,
+        'simulate': oArguments.simulate,
+        'files': dGenerated['files'],
+    },
+    'unit': 'ms',
+    'results': dResults,
+}
+sOutput = json.dumps(dOutput, indent=2, sort_keys=True)+'\n'
+if oArguments.output:
+    with open(oArguments.output, 'w') as oFile:
+        oFile.write(sOutput)
+else:
+    sys.stdout.write(sOutput)
+
+# Comparison
+if oArguments.compare:
+    with open(oArguments.compare, 'r') as oFile:
+        dBaseline = json.load(oFile)
+    if dBaseline.get('parameters') != dOutput['parameters']:
+        sys.stderr.write('WARNING: Baseline parameters differ; comparison may not be meaningful\n')
+    if compare(dResults, dBaseline['results'], oArguments.threshold):
+        sys.exit(1)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# Standard
+import argparse
+import configparser
+import os
+import random
+import socket
+import sys
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Template (see KiscCluster_config.resolveString())
+TEMPLATE = '''\
+# %{$SELF.ID} (%{$SELF.TYPE}) on %{$HOST.ID}
+name = %{$SELF.ID|upper}
+host = %{$HOST.hostname}
+description = %{$SELF.description|strip}
+cpus = %{$SELF.CONSUMES[CPU]}
+memory = %{$SELF.CONSUMES[RAM]|int|mul(1048576)}
+memory_host = %{$HOST.CONSUMABLES[RAM]|int|div(1024)|int}
+storage = %{storage-cluster.mountpoint}/%{$SELF.ID|replace('-','/')}
+cache = %{KiSC.cache_dir|dirname}/%{$SELF.ID}.cache
+'''
+
+# System resources (types and settings, in turn; see KiscRuntime_simulator)
+SYSTEM_RESOURCES = [
+    {'TYPE': 'network_ipv4', 'address': '10.%(hi)d.%(lo)d.1', 'mask': '8', 'device': 'eth0'},
+    {'TYPE': 'storage_mount', 'fstype': 'nfs', 'device': 'storage:/export/%(id)s', 'mountpoint': '/srv/%(id)s'},
+    {'TYPE': 'service_systemctl', 'name': '%(id)s.service'},
+    {'TYPE': 'service_libvirt', 'name': '%(id)s'},
+    {'TYPE': 'service_pacemaker', 'name': '%(id)s'},
+]
+
+
+#------------------------------------------------------------------------------
+# FUNCTIONS
+#------------------------------------------------------------------------------
+
+def hostsExpression(_oRandom, _lsHosts_ids, _lsHostgroups_ids):
+    """
+    Return a (random but realistic) 'HOSTS' configuration string
+
+    @param Random _oRandom           Random generator
+    @param list   _lsHosts_ids       Host IDs
+    @param list   _lsHostgroups_ids  Hostgroup IDs
+
+    @return str  'HOSTS' configuration string, None for all hosts (no 'HOSTS' setting)
+    """
+
+    fChoice = _oRandom.random()
+    if fChoice < 0.2 or not _lsHostgroups_ids:
+        return None
+    elif fChoice < 0.5:
+        return '@%s' % _oRandom.choice(_lsHostgroups_ids)
+    elif fChoice < 0.65:
+        return '@%s,!%s' % (_oRandom.choice(_lsHostgroups_ids), _oRandom.choice(_lsHosts_ids))
+    elif fChoice < 0.8:
+        return ','.join(['@%s' % sHostgroup_id for sHostgroup_id in _oRandom.sample(_lsHostgroups_ids, min(2, len(_lsHostgroups_ids)))])
+    elif fChoice < 0.9:
+        return '@ALL,!@%s' % _oRandom.choice(_lsHostgroups_ids)
+    else:
+        return ','.join(_oRandom.sample(_lsHosts_ids, min(3, len(_lsHosts_ids))))
+
+
+def writeResources(_sDirectory, _ltResources, _iDepth, _iFanout, _sPrefix = 'services'):
+    """
+    Write the given resources configuration in the given directory, spread
+    over nested 'include' directories
+
+    @param str  _sDirectory   Directory (path)
+    @param list _ltResources  Resources (ID, configuration) tuples
+    @param int  _iDepth       Remaining include directories depth
+    @param int  _iFanout      Sub-directories (and files) per directory
+
+    @return int  Written configuration files
+    """
+
+    os.makedirs(_sDirectory, exist_ok=True)
+    iFiles = 0
+
+    # Resources kept at this level (the rest being pushed to sub-directories)
+    if _iDepth > 0:
+        iKeep = len(_ltResources)//(_iFanout+1)
+    else:
+        iKeep = len(_ltResources)
+    ltResources_here = _ltResources[:iKeep]
+    ltResources_sub = _ltResources[iKeep:]
+
+    # Configuration files
+    iChunk = max(1, -(-len(ltResources_here)//_iFanout))
+    for iFile in range(0, max(1, _iFanout)):
+        ltResources_file = ltResources_here[iFile*iChunk:(iFile+1)*iChunk]
+        lsLines = list()
+        if iFile == 0 and ltResources_sub:
+            for iSub in range(0, _iFanout):
+                lsLines.extend([
+                    '[include-%s-%d]' % (_sPrefix, iSub),
+                    'TYPE = include',
+                    'directory = %s' % os.path.join(_sDirectory, '%s-%d.d' % (_sPrefix, iSub)),
+                    'glob = *.cfg',
+                    '',
+                ])
+        for (sId, dsConfig) in ltResources_file:
+            lsLines.append('[%s]' % sId)
+            lsLines.extend(['%s = %s' % (sKey, sValue) for (sKey, sValue) in dsConfig.items()])
+            lsLines.append('')
+        if not lsLines:
+            continue
+        with open(os.path.join(_sDirectory, '%s-%d.cfg' % (_sPrefix, iFile)), 'w') as oFile:
+            oFile.write('\n'.join(lsLines))
+        iFiles += 1
+
+    # Sub-directories
+    if ltResources_sub:
+        iChunk = -(-len(ltResources_sub)//_iFanout)
+        for iSub in range(0, _iFanout):
+            ltResources_dir = ltResources_sub[iSub*iChunk:(iSub+1)*iChunk]
+            if ltResources_dir:
+                iFiles += writeResources(os.path.join(_sDirectory, '%s-%d.d' % (_sPrefix, iSub)), ltResources_dir, _iDepth-1, _iFanout, _sPrefix)
+
+    return iFiles
+
+
+def systemResource(_sId, _iIndex):
+    """
+    Return the given system resource (type and settings; see SYSTEM_RESOURCES)
+
+    @param str _sId     Resource ID
+    @param int _iIndex  Resource index
+
+    @return dict  Resource configuration
+    """
+
+    dsFormat = {'id': _sId, 'hi': (_iIndex//256) % 256, 'lo': _iIndex % 256}
+    return {sKey: sValue % dsFormat for (sKey, sValue) in SYSTEM_RESOURCES[_iIndex % len(SYSTEM_RESOURCES)].items()}
+
+
+def generate(_sDirectory, _iHosts = 50, _iHostgroups = 8, _iResources = 1000, _iBootstrap = 4, _iDepth = 2, _iFanout = 3, _iSeed = 0, _bSystem = False):
+    """
+    Generate a synthetic cluster configuration (and template) in the given directory
+
+    The first host is the local host (see KiscCluster_config.getHostByHostname()).
+    Other hosts are remote hosts (see populate()).
+
+    @param str _sDirectory   Directory (path)
+    @param int _iHosts       Hosts quantity
+    @param int _iHostgroups  Hostgroups quantity
+    @param int _iResources   (Regular) resources quantity (service_dummy)
+    @param int _iBootstrap   Bootstrap (host startup) resources quantity (service_dummy)
+    @param int _iDepth       Resources include directories depth
+    @param int _iFanout      Resources include sub-directories (and files) per directory
+    @param int _iSeed        Random generator seed
+    @param bool _bSystem     Use system resource types (see SYSTEM_RESOURCES), rather than service_dummy;
+                             to be used along the simulator (see 'kisc --simulate')
+
+    @return dict  Generated configuration summary (paths and IDs)
+    """
+
+    oRandom = random.Random(_iSeed)
+    _sDirectory = os.path.abspath(_sDirectory)
+    os.makedirs(_sDirectory, exist_ok=True)
+    dsPaths = {
+        'config_file': os.path.join(_sDirectory, 'kisc.cfg'),
+        'hosts_file': os.path.join(_sDirectory, 'hosts.cfg'),
+        'services_dir': os.path.join(_sDirectory, 'services.d'),
+        'template_file': os.path.join(_sDirectory, 'service.tpl'),
+        'cache_dir': os.path.join(_sDirectory, 'cache'),
+        'local_runtime_dir': os.path.join(_sDirectory, 'run', 'local'),
+        'global_runtime_dir': os.path.join(_sDirectory, 'run', 'global'),
+    }
+
+    # Hosts
+    ltHosts = list()
+    for iHost in range(0, _iHosts):
+        sHost_id = 'node%04d' % iHost
+        ltHosts.append((sHost_id, {
+            'TYPE': 'cluster_host',
+            'hostname': socket.getfqdn() if iHost == 0 else '%s.example.org' % sHost_id,
+            'aliases': sHost_id,
+            'CONSUMABLES': 'CPU:%d,RAM:%d' % oRandom.choice([(32, 131072), (64, 262144), (128, 524288)]),
+        }))
+    lsHosts_ids = [tHost[0] for tHost in ltHosts]
+
+    # Hostgroups (overlapping)
+    ltHostgroups = list()
+    for iHostgroup in range(0, _iHostgroups):
+        lsHostgroup_hosts = lsHosts_ids[iHostgroup::_iHostgroups]
+        lsHostgroup_hosts += oRandom.sample(lsHosts_ids, min(len(lsHosts_ids), max(1, _iHosts//(2*_iHostgroups))))
+        ltHostgroups.append(('group%02d' % iHostgroup, {
+            'TYPE': 'cluster_hostgroup',
+            'hosts': ','.join(sorted(set(lsHostgroup_hosts))),
+        }))
+    lsHostgroups_ids = [tHostgroup[0] for tHostgroup in ltHostgroups]
+
+    # Bootstrap resources
+    ltBootstrap = [('storage-cluster', {
+        'TYPE': 'service_dummy',
+        'mountpoint': '/kisc/storage',
+    })]
+    if _bSystem:
+        ltBootstrap[0][1].update({'TYPE': 'storage_mount', 'fstype': 'nfs', 'device': 'storage:/kisc'})
+    for iBootstrap in range(1, _iBootstrap):
+        dsConfig = {
+            'TYPE': 'service_dummy',
+            'description': 'bootstrap service %d' % iBootstrap,
+        }
+        if _bSystem:
+            dsConfig.update({'TYPE': 'service_systemctl', 'name': 'bootstrap%02d.service' % iBootstrap})
+        sHosts = hostsExpression(oRandom, lsHosts_ids, lsHostgroups_ids)
+        if sHosts is not None and iBootstrap % 2:
+            dsConfig['HOSTS'] = sHosts
+        ltBootstrap.append(('bootstrap%02d' % iBootstrap, dsConfig))
+
+    # Regular resources
+    ltResources = list()
+    for iResource in range(0, _iResources):
+        dsConfig = {
+            'TYPE': 'service_dummy',
+            'description': ' %s service ' % oRandom.choice(['web', 'db', 'cache', 'batch', 'vm']),
+            'CONSUMES': 'CPU:%d,RAM:%d' % (oRandom.choice([1, 1, 2, 2, 4]), oRandom.choice([512, 1024, 2048, 4096])),
+        }
+        if _bSystem:
+            dsConfig.update(systemResource('svc%05d' % iResource, iResource))
+        sHosts = hostsExpression(oRandom, lsHosts_ids, lsHostgroups_ids)
+        if sHosts is not None:
+            dsConfig['HOSTS'] = sHosts
+        ltResources.append(('svc%05d' % iResource, dsConfig))
+
+    # Write configuration
+    with open(dsPaths['config_file'], 'w') as oFile:
+        oFile.write('\n'.join([
+            '## Synthetic KiSC configuration (benchmarks/generate.py)',
+            '[KiSC]',
+            'cache_dir = %s' % dsPaths['cache_dir'],
+            'local_runtime_dir = %s' % dsPaths['local_runtime_dir'],
+            'global_runtime_dir = %s' % dsPaths['global_runtime_dir'],
+            'metrics_file =',
+            '',
+            '[include-hosts]',
+            'TYPE = include',
+            'BOOTSTRAP = yes',
+            'file = %s' % dsPaths['hosts_file'],
+            '',
+            '[include-services]',
+            'TYPE = include',
+            'directory = %s' % dsPaths['services_dir'],
+            'glob = *.cfg',
+            '',
+        ]))
+    with open(dsPaths['hosts_file'], 'w') as oFile:
+        for (sId, dsConfig) in ltHosts+ltHostgroups+ltBootstrap:
+            oFile.write('[%s]\n' % sId)
+            oFile.write(''.join(['%s = %s\n' % (sKey, sValue) for (sKey, sValue) in dsConfig.items()]))
+            oFile.write('\n')
+    iFiles = 2+writeResources(dsPaths['services_dir'], ltResources, _iDepth, _iFanout)
+    with open(dsPaths['template_file'], 'w') as oFile:
+        oFile.write(TEMPLATE)
+
+    # Done
+    return {
+        'paths': dsPaths,
+        'hosts': lsHosts_ids,
+        'hostgroups': lsHostgroups_ids,
+        'bootstrap': [tBootstrap[0] for tBootstrap in ltBootstrap],
+        'resources': [tResource[0] for tResource in ltResources],
+        'files': iFiles,
+    }
+
+
+def populate(_dGenerated):
+    """
+    Populate the global runtime directory with the (started) remote hosts
+    runtime files, as if those hosts had been started (see 'kisc host start')
+
+    @param dict _dGenerated  Generated configuration summary (see generate())
+    """
+
+    sDirectory = _dGenerated['paths']['global_runtime_dir']
+    os.makedirs(sDirectory, exist_ok=True)
+    oConfig = configparser.RawConfigParser()
+    oConfig.optionxform = lambda sOption: sOption  # do not lowercase option (key) name
+    oConfig.read(_dGenerated['paths']['hosts_file'])
+    for sHost_id in _dGenerated['hosts'][1:]:
+        with open(os.path.join(sDirectory, 'cluster_host:%s.run' % sHost_id), 'w') as oFile:
+            oFile.write('[%s]\n' % sHost_id)
+            oFile.write(''.join(['%s = %s\n' % tOption for tOption in oConfig.items(sHost_id)]))
+            oFile.write('$STATUS = Started\n')
+
+
+#------------------------------------------------------------------------------
+# MAIN
+#------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    # Arguments
+    oArgumentParser = argparse.ArgumentParser(description='KiSC synthetic cluster configuration generator: hosts, (overlapping) hostgroups, bootstrap and regular (service_dummy) resources with HOSTS expressions, CONSUMABLES/CONSUMES and nested include directories, along a cluster variables template')
+    oArgumentParser.add_argument('directory', help='output directory')
+    oArgumentParser.add_argument('-H', '--hosts', type=int, default=50, help='hosts quantity [50]')
+    oArgumentParser.add_argument('-G', '--hostgroups', type=int, default=8, help='hostgroups quantity [8]')
+    oArgumentParser.add_argument('-R', '--resources', type=int, default=1000, help='(regular) resources quantity [1000]')
+    oArgumentParser.add_argument('-B', '--bootstrap', type=int, default=4, help='bootstrap resources quantity [4]')
+    oArgumentParser.add_argument('-D', '--depth', type=int, default=2, help='include directories depth [2]')
+    oArgumentParser.add_argument('-F', '--fanout', type=int, default=3, help='include sub-directories (and files) per directory [3]')
+    oArgumentParser.add_argument('-s', '--seed', type=int, default=0, help='random generator seed [0]')
+    oArgumentParser.add_argument('-p', '--populate', action='store_true', default=False, help='populate the global runtime directory with (started) remote hosts')
+    oArgumentParser.add_argument('-Y', '--system', action='store_true', default=False, help='use system resource types (network, mounts, services, libvirt, Pacemaker), to be run along the simulator (see \'kisc --simulate\')')
+    oArguments = oArgumentParser.parse_args()
+
+    # Generate
+    dGenerated = generate(
+        oArguments.directory,
+        oArguments.hosts, oArguments.hostgroups, oArguments.resources, oArguments.bootstrap,
+        oArguments.depth, oArguments.fanout, oArguments.seed, oArguments.system,
+    )
+    if oArguments.populate:
+        populate(dGenerated)
+    sys.stdout.write('%s\n' % dGenerated['paths']['config_file'])
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# Standard
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# KiSC
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+from KiSC.Runtime import \
+     KiscRuntime, \
+     KiscRuntime_spawn, \
+     KiscRuntime_trace, \
+     KiscRuntime_virsh
+from KiSC.Resource import \
+     kiscResource
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Stub 'virsh' (domains state and lifecycle events kept in $KISC_STUB_DIR)
+#  - KISC_STUB_DELAY: delay (seconds) before a started/stopped domain changes state
+#  - KISC_STUB_EVENTS: 'no' for 'virsh event' to be unavailable (exiting immediately)
+VIRSH = '''#!/bin/bash
+D="$KISC_STUB_DIR"
+[ "$1" == "-q" ] && shift
+if [ -z "$1" ]; then
+  while printf 'virsh # '; read -r line; do
+    eval "set -- $line"
+    case "$1" in quit) exit 0;; echo) shift; echo "$*";; *) "$0" "$@" 2>&1;; esac
+  done
+  exit 0
+fi
+cmd=$1; shift
+echo "$cmd" >> "$D/calls"
+event() { echo "event 'lifecycle' for domain '$1': $2" >> "$D/events"; }
+case "$cmd" in
+  event) [ "$KISC_STUB_EVENTS" == no ] && { echo "error: events not supported" >&2; exit 1; }; touch "$D/events"; exec tail -n0 -f "$D/events" ;;
+  list) for f in "$D"/state_*; do [ -e "$f" ] && printf ' %-4s %-20s %s\\n' - "${f#$D/state_}" "$(cat "$f")"; done ;;
+  domstate) [ -e "$D/state_$1" ] || { echo "error: failed to get domain '$1'" >&2; exit 1; }; cat "$D/state_$1" ;;
+  start) (sleep $KISC_STUB_DELAY; echo running > "$D/state_$1"; event "$1" 'Started Booted') >/dev/null 2>&1 & ;;
+  shutdown) (sleep $KISC_STUB_DELAY; echo 'shut off' > "$D/state_$1"; event "$1" 'Stopped Shutdown') >/dev/null 2>&1 & ;;
+  suspend) echo paused > "$D/state_$1"; event "$1" 'Suspended Paused' ;;
+  resume) echo running > "$D/state_$1"; event "$1" 'Resumed Unpaused' ;;
+  destroy) echo 'shut off' > "$D/state_$1" ;;
+esac
+'''
+
+# Domain operations (in execution order)
+OPERATIONS = ('start', 'suspend', 'resume', 'stop')
+
+
+#------------------------------------------------------------------------------
+# FUNCTIONS
+#------------------------------------------------------------------------------
+
+def measure(_sDirectory, _iIterations, _bTrace = False):
+    """
+    Measure the latency of the (libvirt) domain operations, each operation
+    waiting for the domain to reach its target state
+
+    @param str  _sDirectory   Stub (virsh) directory
+    @param int  _iIterations  Iterations (operations cycles)
+    @param bool _bTrace       Print TRACE message to standard error
+
+    @return dict  Operations (sorted) latencies (milliseconds), state queries
+                  ('virsh domstate') and errors counts, per operation
+    """
+
+    oResource = kiscResource('service_libvirt', 'benchmark', {'name': 'benchmark', 'timeout_start': '10', 'timeout_stop': '10'})
+    oResource.VERBOSE(KiscRuntime.VERBOSE_TRACE if _bTrace else KiscRuntime.VERBOSE_NONE)
+    with open(_sDirectory+os.sep+'state_benchmark', 'w') as oFile:
+        oFile.write('shut off\n')
+    dResults = {sOperation: {'latencies': list(), 'domstate': 0, 'errors': 0} for sOperation in OPERATIONS}
+    for iIteration in range(0, _iIterations):
+        for sOperation in OPERATIONS:
+            open(_sDirectory+os.sep+'calls', 'w').close()
+            fStart = time.perf_counter()
+            lsErrors = getattr(oResource, sOperation)()
+            dResults[sOperation]['latencies'].append(1000.0*(time.perf_counter()-fStart))
+            with open(_sDirectory+os.sep+'calls', 'r') as oFile:
+                dResults[sOperation]['domstate'] += len([sLine for sLine in oFile if sLine.strip() == 'domstate'])
+            if lsErrors:
+                dResults[sOperation]['errors'] += 1
+                sys.stderr.write('ERROR: %s; %s\n' % (sOperation, lsErrors[-1]))
+    for sOperation in OPERATIONS:
+        dResults[sOperation]['latencies'].sort()
+    return dResults
+
+
+#------------------------------------------------------------------------------
+# MAIN
+#------------------------------------------------------------------------------
+
+# Arguments
+oArgumentParser = argparse.ArgumentParser(description='KiSC libvirt (service_libvirt) microbenchmark and check: domain operations latency - waiting for the domain state - with lifecycle events (\'virsh event\') vs adaptive backoff polling (events unavailable), against a stub \'virsh\' put first on PATH; exit code 1 if any operation fails or a listener is not (trace) recorded')
+oArgumentParser.add_argument('-n', '--iterations', type=int, default=5, help='operations cycles per mode [5]')
+oArgumentParser.add_argument('-d', '--delay', type=float, default=0.2, help='(stub) domain start/stop delay (seconds) [0.2]')
+oArgumentParser.add_argument('--trace', action='store_true', help='print TRACE messages to standard error')
+oArguments = oArgumentParser.parse_args()
+
+# Stub 'virsh'
+sDirectory = tempfile.mkdtemp(prefix='kisc-benchmark.')
+iErrors = 0
+try:
+    sVirsh = sDirectory+os.sep+'virsh'
+    with open(sVirsh, 'w') as oFile:
+        oFile.write(VIRSH)
+    os.chmod(sVirsh, 0o755)
+    os.environ['PATH'] = sDirectory+os.pathsep+os.environ.get('PATH', '')
+    os.environ['KISC_STUB_DIR'] = sDirectory
+    os.environ['KISC_STUB_DELAY'] = str(oArguments.delay)
+
+    # ... listeners (background 'virsh event' processes) trace spans
+    ldSpans = list()
+    def observer(dRecord):
+        if dRecord['name'] == 'virsh event':
+            ldSpans.append(dRecord)
+    KiscRuntime_trace.observe(observer)
+
+    # Benchmark
+    sys.stdout.write('%-8s %-8s %9s %9s %9s %9s\n' % ('mode', 'op', 'p50[ms]', 'max[ms]', 'domstate', 'errors'))
+    for (sMode, sEvents) in (('events', 'yes'), ('polling', 'no')):
+        os.environ['KISC_STUB_EVENTS'] = sEvents
+        KiscRuntime_spawn.environment(True)
+        KiscRuntime_virsh.closeAll()
+        del ldSpans[:]
+        dResults = measure(sDirectory, oArguments.iterations, oArguments.trace)
+        for sOperation in OPERATIONS:
+            dResult = dResults[sOperation]
+            lfLatencies = dResult['latencies']
+            sys.stdout.write('%-8s %-8s %9.3f %9.3f %9.1f %9d\n' % (
+                sMode, sOperation,
+                lfLatencies[len(lfLatencies)//2],
+                lfLatencies[-1],
+                dResult['domstate']/float(len(lfLatencies)),
+                dResult['errors'],
+            ))
+            iErrors += dResult['errors']
+        sys.stdout.flush()
+
+        # ... check listeners (spawned and reaped via KiscRuntime.spawn()/reap())
+        if len(ldSpans) != oArguments.iterations*len(OPERATIONS):
+            sys.stderr.write('ERROR: %s; %d listener spans recorded (expected: %d)\n' % (sMode, len(ldSpans), oArguments.iterations*len(OPERATIONS)))
+            iErrors += 1
+finally:
+    KiscRuntime_virsh.closeAll()
+    shutil.rmtree(sDirectory, ignore_errors=True)
+
+# Done
+sys.exit(1 if iErrors else 0)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# Standard
+import argparse
+import os
+import resource
+import sys
+import time
+
+# KiSC
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+from KiSC.Runtime import \
+     KiscRuntime, \
+     KiscRuntime_spawn
+
+
+#------------------------------------------------------------------------------
+# FUNCTIONS
+#------------------------------------------------------------------------------
+
+def inflate(_iMegabytes, _iFds):
+    """
+    Inflate the (benchmark) process resident memory and open file descriptors
+
+    @param int _iMegabytes  Resident memory to add (MiB)
+    @param int _iFds        File descriptors to open
+
+    @return (bytearray, list)  Allocated memory and file descriptors (to keep a reference to)
+    """
+
+    byMemory = bytearray(_iMegabytes*1048576)
+    for iOffset in range(0, len(byMemory), 4096):
+        byMemory[iOffset] = 1  # make the page resident
+    liFds = [os.open(os.devnull, os.O_RDONLY) for iFd in range(0, _iFds)]
+    return (byMemory, liFds)
+
+
+def measure(_lsCommand, _iIterations):
+    """
+    Measure the per-call latency of KiscRuntime.shell() for the given command
+
+    @param list _lsCommand    Command path and arguments
+    @param int  _iIterations  Iterations
+
+    @return list  Sorted latencies (milliseconds)
+    """
+
+    for iIteration in range(0, min(10, _iIterations)):  # warm-up
+        KiscRuntime.shell(_lsCommand)
+    lfLatencies = list()
+    for iIteration in range(0, _iIterations):
+        fStart = time.perf_counter()
+        KiscRuntime.shell(_lsCommand)
+        lfLatencies.append(1000.0*(time.perf_counter()-fStart))
+    return sorted(lfLatencies)
+
+
+#------------------------------------------------------------------------------
+# MAIN
+#------------------------------------------------------------------------------
+
+# Arguments
+oArgumentParser = argparse.ArgumentParser(description='KiSC spawn (KiscRuntime.shell) microbenchmark: per-call latency, subprocess.Popen vs posix_spawn (with or without closing inheritable file descriptors), at various parent process sizes')
+oArgumentParser.add_argument('-r', '--rss', default='0,256,1024', help='parent resident memory sizes to add (comma-separated; MiB) [0,256,1024]')
+oArgumentParser.add_argument('-f', '--fds', default='0,1000', help='parent open file descriptors counts (comma-separated) [0,1000]')
+oArgumentParser.add_argument('-n', '--iterations', type=int, default=200, help='calls per measurement [200]')
+oArgumentParser.add_argument('-c', '--command', default='true', help='command to spawn [true]')
+oArguments = oArgumentParser.parse_args()
+
+# Environment
+if not KiscRuntime_spawn.AVAILABLE:
+    sys.stderr.write('WARNING: posix_spawn is not available; measuring subprocess.Popen only\n')
+iFds_max = max([int(sFds) for sFds in oArguments.fds.split(',')])
+(iFds_soft, iFds_hard) = resource.getrlimit(resource.RLIMIT_NOFILE)
+if iFds_soft < iFds_max+64:
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(iFds_max+64, iFds_hard), iFds_hard))
+
+# Benchmark
+lsCommand = oArguments.command.split(' ')
+sys.stdout.write('%8s %6s %-12s %9s %9s %9s\n' % ('RSS[MiB]', 'FDs', 'backend', 'p50[ms]', 'p95[ms]', 'mean[ms]'))
+for sMegabytes in oArguments.rss.split(','):
+    for sFds in oArguments.fds.split(','):
+        tInflated = inflate(int(sMegabytes), int(sFds))
+        iRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss//1024
+        for (sBackend, bEnabled, bCloseFds) in (('popen', False, False), ('posix_spawn', True, False), ('+close_fds', True, True)):
+            if bEnabled and not KiscRuntime_spawn.AVAILABLE:
+                continue
+            KiscRuntime_spawn.enable(bEnabled, bCloseFds)
+            lfLatencies = measure(lsCommand, oArguments.iterations)
+            sys.stdout.write('%8d %6s %-12s %9.3f %9.3f %9.3f\n' % (
+                iRss, sFds, sBackend,
+                lfLatencies[len(lfLatencies)//2],
+                lfLatencies[int(len(lfLatencies)*0.95)],
+                sum(lfLatencies)/len(lfLatencies),
+            ))
+            sys.stdout.flush()
+        for iFd in tInflated[1]:
+            os.close(iFd)
+        del tInflated
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# Standard
+import argparse
+import compileall
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# KiSC
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+from KiSC import \
+     KISC_VERSION
+
+# Benchmarks
+from generate import \
+     generate
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Paths
+KISC_PYTHON = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python')
+KISC_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'kisc.py')
+
+# Commands (in execution order); '{config}', '{host}' and '{resource}' being
+# substituted with the synthetic cluster configuration file, local host and a resource
+COMMANDS = [
+    ('help', ['--help']),
+    ('host_status.help', ['host', 'status', '--help']),
+    ('config_list.hosts', ['config', 'list', 'hosts', '-C', '{config}']),
+    ('host_status', ['host', 'status', '-C', '{config}', '{host}']),
+    ('resource_status', ['resource', 'status', '-C', '{config}', '{resource}']),
+]
+
+
+#------------------------------------------------------------------------------
+# FUNCTIONS
+#------------------------------------------------------------------------------
+
+def command(_lsArguments, _dsSubstitutions, _lsOptions = None):
+    """
+    Return the (in-process; see 'kisc --no-agent') 'kisc' command line for the given arguments
+
+    @param list _lsArguments      Command arguments
+    @param dict _dsSubstitutions  Arguments substitutions
+    @param list _lsOptions        Python interpreter options
+
+    @return list  Command line
+    """
+
+    return [sys.executable]+(_lsOptions or list())+[KISC_SCRIPT, '--no-agent']+[sArgument.format(**_dsSubstitutions) for sArgument in _lsArguments]
+
+
+def measure(_lsCommand, _iIterations):
+    """
+    Measure the (cold-start) wall-clock latency of the given command
+
+    @param list _lsCommand    Command line
+    @param int  _iIterations  Iterations
+
+    @return list  Latencies (milliseconds)
+    """
+
+    lfLatencies = list()
+    for iIteration in range(0, _iIterations):
+        fStart = time.perf_counter()
+        subprocess.call(_lsCommand, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        lfLatencies.append(1000.0*(time.perf_counter()-fStart))
+    return lfLatencies
+
+
+def importtime(_lsCommand, _iTop = 10):
+    """
+    Return the modules import time of the given command (see 'python -X importtime')
+
+    @param list _lsCommand  Command line (including the '-X importtime' interpreter option)
+    @param int  _iTop       Quantity of top (self time) modules to return
+
+    @return dict  Total import time (milliseconds), modules quantity and top modules (milliseconds)
+    """
+
+    oProcess = subprocess.run(_lsCommand, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    ltModules = list()
+    for sLine in oProcess.stderr.splitlines():
+        if sLine[:12] != 'import time:':
+            continue
+        lsFields = sLine[12:].split('|')
+        try:
+            ltModules.append((lsFields[2].strip(), int(lsFields[0])/1000.0))
+        except (IndexError, ValueError):
+            continue  # header
+    return {
+        'total': round(sum([tModule[1] for tModule in ltModules]), 3),
+        'modules': len(ltModules),
+        'top': {tModule[0]: round(tModule[1], 3) for tModule in sorted(ltModules, key=lambda tModule: -tModule[1])[:_iTop]},
+    }
+
+
+def statistics(_lfLatencies):
+    """
+    Return the statistics of the given latencies
+
+    @param list _lfLatencies  Latencies (milliseconds)
+
+    @return dict  Statistics (iterations, min, p50, p95, max, mean; milliseconds)
+    """
+
+    lfSorted = sorted(_lfLatencies)
+    iCount = len(lfSorted)
+    return {
+        'iterations': iCount,
+        'min': round(lfSorted[0], 3),
+        'p50': round(lfSorted[iCount//2], 3),
+        'p95': round(lfSorted[min(iCount-1, int(iCount*0.95))], 3),
+        'max': round(lfSorted[-1], 3),
+        'mean': round(sum(lfSorted)/iCount, 3),
+    }
+
+
+def compare(_dResults, _dBaseline, _fThreshold, _sStatistic = 'p50'):
+    """
+    Compare the given results with the given baseline (results), and write
+    the comparison (to standard error)
+
+    @param dict  _dResults     Results
+    @param dict  _dBaseline    Baseline results
+    @param float _fThreshold   Regression threshold (ratio)
+    @param str   _sStatistic   Compared statistic
+
+    @return list  Regressed commands
+    """
+
+    lsRegressions = list()
+    sys.stderr.write('%-24s %12s %12s %8s\n' % ('command', 'baseline', 'current', 'ratio'))
+    for (sName, lsArguments) in COMMANDS:
+        if sName not in _dResults or sName not in _dBaseline:
+            continue
+        fBaseline = _dBaseline[sName]['latency'][_sStatistic]
+        fCurrent = _dResults[sName]['latency'][_sStatistic]
+        fRatio = fCurrent/fBaseline if fBaseline > 0 else 1.0
+        bRegressed = fRatio > _fThreshold
+        if bRegressed:
+            lsRegressions.append(sName)
+        sys.stderr.write('%-24s %12.3f %12.3f %8.3f%s\n' % (sName, fBaseline, fCurrent, fRatio, ' REGRESSION' if bRegressed else ''))
+    return lsRegressions
+
+
+#------------------------------------------------------------------------------
+# MAIN
+#------------------------------------------------------------------------------
+
+# Arguments
+oArgumentParser = argparse.ArgumentParser(description='KiSC CLI startup benchmark: cold-start (wall-clock) latency and modules import time (python -X importtime) of typical \'kisc\' commands, executed in-process against a synthetic cluster (see generate.py); results are written as JSON (in milliseconds)')
+oArgumentParser.add_argument('-H', '--hosts', type=int, default=10, help='hosts quantity [10]')
+oArgumentParser.add_argument('-R', '--resources', type=int, default=100, help='(regular) resources quantity [100]')
+oArgumentParser.add_argument('-n', '--iterations', type=int, default=20, help='iterations per command [20]')
+oArgumentParser.add_argument('-T', '--top', type=int, default=10, help='quantity of top (self time) imported modules to report [10]')
+oArgumentParser.add_argument('-o', '--output', help='results (JSON) file (default: standard output)')
+oArgumentParser.add_argument('-c', '--compare', metavar='<baseline>', help='baseline results (JSON) file to compare with (exit code 1 on regression)')
+oArgumentParser.add_argument('-t', '--threshold', type=float, default=1.2, help='regression threshold (p50 ratio) [1.2]')
+oArguments = oArgumentParser.parse_args()
+
+# Byte-compile the sources (as installed), for the bytecode compilation not to be measured
+compileall.compile_dir(KISC_PYTHON, quiet=1)
+
+# Synthetic cluster
+sDirectory = tempfile.mkdtemp(prefix='kisc-benchmark.')
+try:
+    dGenerated = generate(sDirectory, oArguments.hosts, 4, oArguments.resources, 4, 1, 3)
+    dsSubstitutions = {
+        'config': dGenerated['paths']['config_file'],
+        'host': dGenerated['hosts'][0],
+        'resource': dGenerated['resources'][0],
+    }
+
+    # Benchmark
+    os.environ['PYTHONPATH'] = KISC_PYTHON
+    dResults = dict()
+    for (sName, lsArguments) in COMMANDS:
+        measure(command(lsArguments, dsSubstitutions), 1)  # warm-up
+        dResults[sName] = {
+            'latency': statistics(measure(command(lsArguments, dsSubstitutions), oArguments.iterations)),
+            'imports': importtime(command(lsArguments, dsSubstitutions, ['-X', 'importtime']), oArguments.top),
+        }
+    dResults['python'] = {
+        'latency': statistics(measure([sys.executable, '-c', 'pass'], oArguments.iterations)),
+    }
+finally:
+    shutil.rmtree(sDirectory, ignore_errors=True)
+
+# Results
+dOutput = {
+    'version': KISC_VERSION,
+    'python': platform.python_version(),
+    'platform': platform.platform(),
+    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    'parameters': {
+        'hosts': oArguments.hosts,
+        'resources': oArguments.resources,
+        'iterations': oArguments.iterations,
+    },
+    'unit': 'ms',
+    'results': dResults,
+}
+sOutput = json.dumps(dOutput, indent=2, sort_keys=True)+'\n'
+if oArguments.output:
+    with open(oArguments.output, 'w') as oFile:
+        oFile.write(sOutput)
+else:
+    sys.stdout.write(sOutput)
+
+# Comparison
+if oArguments.compare:
+    with open(oArguments.compare, 'r') as oFile:
+        dBaseline = json.load(oFile)
+    if dBaseline.get('parameters') != dOutput['parameters']:
+        sys.stderr.write('WARNING: Baseline parameters differ; comparison may not be meaningful\n')
+    if compare(dResults, dBaseline['results'], oArguments.threshold):
+        sys.exit(1)
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# KiSC
+from KiSC.Cli import \
+     KiscCli_kisc
+from KiSC.Cluster import \
+     KiscCluster_config
+from KiSC.Runtime import \
+     KiscRuntime, \
+     KiscRuntime_pacemaker, \
+     KiscRuntime_virsh
+from KiSC.Runtime.metrics import \
+     KiscRuntime_metrics
+
+# Standard
+import errno
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import textwrap
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class _KiscCli_agent_serve_stream:
+    """
+    Standard output/error stream, relayed to the agent client (one JSON message per write)
+
+    Errors are ignored - the output being discarded - such as a vanished
+    client never interrupts the command it requested.
+    """
+
+    def __init__(self, _oConnection, _sStream):
+        self._oConnection = _oConnection
+        self._sStream = _sStream
+        self._bBroken = False
+
+    def write(self, _sString):
+        if _sString and not self._bBroken:
+            try:
+                self._oConnection.sendall((json.dumps({self._sStream: _sString})+'\n').encode('utf-8'))
+            except OSError:
+                self._bBroken = True
+        return len(_sString)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class KiscCli_agent_serve(KiscCli_kisc):
+    """
+    KiSC command-line utility - (Sub)command 'agent serve'
+
+    The agent is a long-lived process, serving the other (sub)commands over a
+    Unix socket - see KiscCli_kisc._agent() for the client side - such as
+    those no longer pay the Python startup, modules import, configuration
+    files parsing and local hostname (FQDN) resolution (see
+    KiscCluster_config.cache()), and share the system snapshots (see
+    KiscRuntime_virsh, KiscRuntime_pacemaker) and libvirt sessions.
+    Requests are executed one at a time, in the agent main thread, exactly
+    as they would be in-process; clients are greeted only once the agent is
+    ready to serve their request, and fall back to in-process execution if
+    not greeted within KiscCli_kisc.AGENT_TIMEOUT (e.g. while the agent is
+    starting or evacuating the host), rather than waiting for it.
+
+    The system snapshots are invalidated whenever the local runtime files -
+    the local bootstrap resources and the local host runtime files - are
+    changed by another process (e.g. an in-process 'kisc' command).
+    """
+
+    #--------------------------------------------------------------------------
+    # CONSTANTS
+    #--------------------------------------------------------------------------
+
+    # Client request (reading) timeout and output (writing) timeout (seconds)
+    TIMEOUT = 10.0
+
+
+    #--------------------------------------------------------------------------
+    # METHODS
+    #--------------------------------------------------------------------------
+
+    #
+    # Arguments
+    #
+
+    def _initArgumentParser(self, _sCommand=None):
+        """
+        Create the arguments parser (and help generator)
+
+        @param str _sCommand  Command name
+        """
+
+        # Parent
+        KiscCli_kisc._initArgumentParser(
+            self,
+            _sCommand,
+            textwrap.dedent('''
+                synopsis:
+                  serve the KiSC (sub)commands over the given Unix socket,
+                  keeping the configuration, runtime caches and system
+                  snapshots in memory; 'kisc' commands use the agent
+                  transparently, when listening on their KISC_AGENT socket
+                  (see 'kisc --help')
+            ''')
+        )
+
+        # Arguments
+        self._addOptionConfig(self._oArgumentParser)
+        self._addOptionVerbose(self._oArgumentParser)
+        self._oArgumentParser.add_argument(
+            '--socket', type=str, metavar='<socket-file>',
+            help='agent (Unix) socket (default: <local_runtime_dir>/kisc.sock)'
+        )
+
+
+    #
+    # Execution
+    #
+
+    def execute(self, _sCommand=None, _lArguments=None):
+        """
+        Execute the command
+
+        @param str  _sCommand    Command name
+        @param list _lArguments  Command arguments
+
+        @return int  0 on success, non-zero in case of failure
+        """
+
+        # Arguments
+        self._initArgumentParser(_sCommand)
+        self._initArguments(_lArguments)
+        self._iVerbose = self._oArguments.verbose
+
+        # Load config (caching it)
+        KiscCluster_config.cache(True)
+        oClusterConfig = KiscCluster_config(self._oArguments.config)
+        lsErrors = oClusterConfig.load()
+        KiscRuntime_metrics.close()  # (the agent itself is not measured)
+        if lsErrors:
+            if self._iVerbose >= KiscRuntime.VERBOSE_DEBUG:
+                for sError in lsErrors:
+                    sys.stderr.write('%s\n' % sError)
+            else:
+                sys.stderr.write('%s\n' % lsErrors[-1])
+            return 255
+
+        # Local runtime files (see self.__invalidate())
+        self._sDirectoryRuntimeLocal = oClusterConfig.getDirectoryRuntimeLocal()
+        try:
+            oHost = oClusterConfig.getHostByHostname()
+            self._sRuntimeFile_host = oClusterConfig.getDirectoryRuntimeGlobal()+os.sep+oHost.type()+':'+oHost.id()+'.run'
+        except RuntimeError:
+            self._sRuntimeFile_host = None
+        self._tGeneration = self.__generation()
+
+        # Serve
+        sSocket = self._oArguments.socket
+        if not sSocket:
+            sSocket = self._sDirectoryRuntimeLocal+os.sep+'kisc.sock'
+        try:
+            oSocket = self.__listen(sSocket)
+        except OSError as e:
+            sys.stderr.write('ERROR: Failed to listen on agent socket; %s\n' % str(e))
+            return e.errno
+        self._bBusy = False
+        self._bStop = False
+        signal.signal(signal.SIGTERM, self.__terminate)
+        if self._iVerbose: sys.stderr.write('INFO[A] Listening (%s)\n' % sSocket)
+        try:
+            while not self._bStop:
+                (oConnection, _) = oSocket.accept()
+                self._bBusy = True
+                try:
+                    self.__serve(oConnection)
+                finally:
+                    oConnection.close()
+                    self._bBusy = False
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            oSocket.close()
+            try:
+                os.unlink(sSocket)
+            except OSError:
+                pass
+        if self._iVerbose: sys.stderr.write('INFO[A] Terminated\n')
+
+        # Done
+        return 0
+
+
+    #
+    # Helpers
+    #
+
+    def __listen(self, _sSocket):
+        """
+        Create the agent (Unix) socket, only accessible by the agent user
+
+        @param str _sSocket  Agent (Unix) socket path
+
+        @exception OSError  On socket error (EADDRINUSE if another agent is listening)
+
+        @return socket  Listening socket
+        """
+
+        # Remove stale socket
+        if os.path.exists(_sSocket):
+            oSocket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                oSocket.connect(_sSocket)
+                raise OSError(errno.EADDRINUSE, 'Another agent is listening (%s)' % _sSocket)
+            except ConnectionRefusedError:
+                os.unlink(_sSocket)
+            finally:
+                oSocket.close()
+
+        # Listen
+        os.makedirs(os.path.dirname(_sSocket) or os.curdir, exist_ok=True)
+        oSocket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        iUmask = os.umask(0o077)
+        try:
+            oSocket.bind(_sSocket)
+        finally:
+            os.umask(iUmask)
+        oSocket.listen(socket.SOMAXCONN)
+        return oSocket
+
+
+    def __terminate(self, _iSignal, _oFrame):
+        """
+        Terminate the agent (SIGTERM handler), once the current request - if any - is served
+        """
+
+        self._bStop = True
+        if not self._bBusy:
+            raise SystemExit(0)
+
+
+    def __serve(self, _oConnection):
+        """
+        Serve the given client connection: greet it, read its request - command line,
+        working directory and KISC_* environment - execute it, relaying its
+        standard output/error, and send its exit code
+
+        @param socket _oConnection  Client connection
+        """
+
+        # Check peer credentials (same user or root)
+        if hasattr(socket, 'SO_PEERCRED'):
+            (iPid, iUid, iGid) = struct.unpack('3i', _oConnection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i')))
+            if iUid not in (0, os.getuid()):
+                if self._iVerbose: sys.stderr.write('WARNING[A] Rejected client (uid=%d)\n' % iUid)
+                return
+
+        # Greet client (ready to serve its request; see KiscCli_kisc._agent())
+        _oConnection.settimeout(KiscCli_agent_serve.TIMEOUT)
+        try:
+            _oConnection.sendall((json.dumps({'ready': True})+'\n').encode('utf-8'))
+        except OSError:
+            # (e.g. client given up waiting for us, or another agent probing the socket)
+            return
+
+        # Read request
+        try:
+            with _oConnection.makefile('rb') as oFile:
+                sRequest = oFile.readline().decode('utf-8')
+            if not sRequest:
+                # (e.g. client given up waiting for us, or another agent probing the socket)
+                return
+            dRequest = json.loads(sRequest)
+            lsArgv = [str(s) for s in dRequest['argv']]
+            sCwd = str(dRequest.get('cwd', os.sep))
+            dsEnvironment = {str(sKey): str(sValue) for (sKey, sValue) in dRequest.get('environment', dict()).items() if str(sKey)[:5] == 'KISC_'}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            if self._iVerbose: sys.stderr.write('WARNING[A] Invalid request; %s\n' % str(e))
+            return
+        if self._iVerbose >= KiscRuntime.VERBOSE_DEBUG: sys.stderr.write('DEBUG[A] Executing: %s\n' % ' '.join(lsArgv[1:]))
+
+        # Invalidate the system snapshots (if runtime files changed)
+        self.__invalidate()
+
+        # Execute request (in-process)
+        oStdOut = sys.stdout
+        oStdErr = sys.stderr
+        sCwd_agent = os.getcwd()
+        dsEnvironment_agent = {sKey: sValue for (sKey, sValue) in os.environ.items() if sKey[:5] == 'KISC_'}
+        iExit = None
+        try:
+            sys.stdout = _KiscCli_agent_serve_stream(_oConnection, 'stdout')
+            sys.stderr = _KiscCli_agent_serve_stream(_oConnection, 'stderr')
+            for sKey in dsEnvironment_agent:
+                os.environ.pop(sKey, None)
+            os.environ.update(dsEnvironment)
+            try:
+                os.chdir(sCwd)
+            except OSError as e:
+                sys.stderr.write('ERROR: Failed to change working directory; %s\n' % str(e))
+                raise e
+            iExit = KiscCli_kisc().execute(lsArgv, False)
+        except SystemExit as e:
+            # (e.g. argparse usage error or help)
+            iExit = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except OSError as e:
+            iExit = e.errno
+        except RuntimeError as e:
+            iExit = errno.EINVAL
+        except Exception as e:
+            sys.stderr.write('ERROR: %s\n' % str(e))
+            iExit = 255
+        finally:
+            sys.stdout = oStdOut
+            sys.stderr = oStdErr
+            for sKey in dsEnvironment:
+                os.environ.pop(sKey, None)
+            os.environ.update(dsEnvironment_agent)
+            os.chdir(sCwd_agent)
+            KiscRuntime_metrics.close()
+
+        # Send exit code
+        try:
+            _oConnection.sendall((json.dumps({'exit': iExit or 0})+'\n').encode('utf-8'))
+        except OSError:
+            pass
+        self._tGeneration = self.__generation()
+
+
+    def __generation(self):
+        """
+        Return the local runtime files "generation", changing whenever one of
+        those is modified
+
+        @return tuple  Runtime files (name, modification time, size) tuples
+        """
+
+        ltSignatures = list()
+        try:
+            for oEntry in os.scandir(self._sDirectoryRuntimeLocal):
+                if oEntry.name[-4:] == '.run':
+                    try:
+                        oStat = oEntry.stat()
+                        ltSignatures.append((oEntry.name, oStat.st_mtime_ns, oStat.st_size))
+                    except FileNotFoundError:
+                        pass
+        except OSError:
+            pass
+        if self._sRuntimeFile_host is not None:
+            try:
+                oStat = os.stat(self._sRuntimeFile_host)
+                ltSignatures.append((self._sRuntimeFile_host, oStat.st_mtime_ns, oStat.st_size))
+            except OSError:
+                pass
+        return tuple(sorted(ltSignatures))
+
+
+    def __invalidate(self):
+        """
+        Invalidate the system snapshots if the local runtime files changed
+        since the last request was served
+        """
+
+        tGeneration = self.__generation()
+        if tGeneration != self._tGeneration:
+            if self._iVerbose >= KiscRuntime.VERBOSE_DEBUG: sys.stderr.write('DEBUG[A] Runtime files changed; invalidating system snapshots\n')
+            KiscRuntime_virsh.invalidate()
+            KiscRuntime_pacemaker.invalidate()
+            self._tGeneration = tGeneration
@@ -69,6 +69,10 @@ class KiscCli_cluster(KiscCli_kisc):
                 sub-commands:
                   status
                     show hosts or resources status
+                  capacity
+                    show the cluster consumables capacity (in total or per host/hostgroup)
+                  rebalance
+                    plan (or apply) resources migrations balancing hosts consumables usage
             ''')
         )
 
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+
+# KiSC
+from KiSC import \
+     KISC_CONFIG_FILE
+from KiSC.Cli import \
+     KiscCli_kisc
+from KiSC.Cluster import \
+     KiscCluster_capacity, \
+     KiscCluster_config
+from KiSC.Runtime import \
+     KiscRuntime
+
+# Standard
+import textwrap
+import sys
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscCli_cluster_capacity(KiscCli_kisc):
+    """
+    KiSC command-line utility - (Sub)command 'cluster capacity'
+    """
+
+    #--------------------------------------------------------------------------
+    # METHODS
+    #--------------------------------------------------------------------------
+
+    #
+    # Arguments
+    #
+
+    def _initArgumentParser(self, _sCommand=None):
+        """
+        Create the arguments parser (and help generator)
+
+        @param str _sCommand  Command name
+        """
+
+        # Parent
+        KiscCli_kisc._initArgumentParser(
+            self,
+            _sCommand,
+            textwrap.dedent('''
+                synopsis:
+                  show the cluster consumables capacity, in total or per host(group),
+                  from the cluster capacity index; output is shown as:
+                    [<host(group)-id>] <consumable-id> <total> <used> <free>
+                  (negative total and free quantities meaning illimited consumables)
+            ''')
+        )
+
+        # Arguments
+        self._addOptionConfig(self._oArgumentParser)
+        self._addOptionVerbose(self._oArgumentParser)
+        self._oArgumentParser.add_argument(
+            '-c', '--consumable', type=str, metavar='<consumable-id>',
+            help='consumable identifier (ID)'
+        )
+        self._oArgumentParser.add_argument(
+            '-n', '--top', type=int, metavar='<quantity>',
+            help='show only the given quantity of hosts(groups), with the most free consumable (requires --consumable)'
+        )
+        self._oArgumentParser.add_argument(
+            '--rebuild', action='store_true',
+            help='rebuild the capacity index from the hosts runtime'
+        )
+        self._oArgumentParser.add_argument(
+            'what', type=str, choices=['total', 'hosts', 'hostgroups'], metavar='{total|hosts|hostgroups}', nargs='?', default='total',
+        )
+
+
+    #
+    # Execution
+    #
+
+    def execute(self, _sCommand=None, _lArguments=None):
+        """
+        Execute the command
+
+        @param str  _sCommand    Command name
+        @param list _lArguments  Command arguments
+
+        @return int  0 on success, non-zero in case of failure
+        """
+
+        # Arguments
+        self._initArgumentParser(_sCommand)
+        self._initArguments(_lArguments)
+        if self._oArguments.top is not None and self._oArguments.consumable is None:
+            self._oArgumentParser.error('--top requires --consumable')
+
+        # Show cluster capacity
+        try:
+
+            # Load config
+            oClusterConfig = KiscCluster_config(self._oArguments.config)
+            lsErrors = oClusterConfig.load()
+            if lsErrors:
+                if self._oArguments.verbose >= KiscRuntime.VERBOSE_DEBUG:
+                    for sError in lsErrors:
+                        sys.stderr.write('%s\n' % sError)
+                else:
+                    sys.stderr.write('%s\n' % lsErrors[-1])
+                return 255
+            oClusterConfig.VERBOSE(self._oArguments.verbose)
+
+            # Load (or rebuild) index
+            oClusterCapacity = KiscCluster_capacity(oClusterConfig)
+            oClusterCapacity.VERBOSE(self._oArguments.verbose)
+            if self._oArguments.rebuild:
+                lsErrors = oClusterCapacity.rebuild()
+            else:
+                lsErrors = oClusterCapacity.load()
+            if lsErrors:
+                if self._oArguments.verbose >= KiscRuntime.VERBOSE_DEBUG:
+                    for sError in lsErrors:
+                        sys.stderr.write('%s\n' % sError)
+                else:
+                    sys.stderr.write('%s\n' % lsErrors[-1])
+                return 255
+
+            # Aggregate capacity
+            if self._oArguments.what == 'total':
+                ltCapacities = [(None, oClusterCapacity.getCapacity())]
+            elif self._oArguments.what == 'hosts':
+                ltCapacities = [(sHost_id, oClusterCapacity.getCapacity([sHost_id])) for sHost_id in oClusterCapacity.getHostsIDs()]
+            elif self._oArguments.what == 'hostgroups':
+                ltCapacities = [(sHostgroup_id, oClusterCapacity.getCapacity(oClusterConfig.getHostgroup(sHostgroup_id).getHostsIDs())) for sHostgroup_id in sorted(oClusterConfig.getHostgroupsIDs())]
+
+            # ... consumable (top free)
+            sConsumable_id = self._oArguments.consumable
+            if sConsumable_id is not None:
+                ltCapacities = [tCapacity for tCapacity in ltCapacities if sConsumable_id in tCapacity[1]]
+            if self._oArguments.top is not None:
+                ltCapacities.sort(key=lambda tCapacity: -tCapacity[1][sConsumable_id][2] if tCapacity[1][sConsumable_id][2] >= 0 else -float('inf'))
+                ltCapacities = ltCapacities[:self._oArguments.top]
+
+            # Show capacity
+            for (sId, dtCapacity) in ltCapacities:
+                for sConsumable_id in sorted(dtCapacity.keys()):
+                    if self._oArguments.consumable is not None and sConsumable_id != self._oArguments.consumable:
+                        continue
+                    sys.stdout.write('%s%s %d %d %d\n' % ('%s ' % sId if sId is not None else '', sConsumable_id, dtCapacity[sConsumable_id][0], dtCapacity[sConsumable_id][1], dtCapacity[sConsumable_id][2]))
+
+        except (OSError, RuntimeError) as e:
+            sys.stderr.write('%s\n' % str(e))
+            return 255
+
+        # Done
+        return 0
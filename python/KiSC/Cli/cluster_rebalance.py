@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+
+# KiSC
+from KiSC import \
+     KISC_CONFIG_FILE
+from KiSC.Cli import \
+     KiscCli_kisc
+from KiSC.Cluster import \
+     KiscCluster_config, \
+     KiscCluster_host, \
+     KiscCluster_placement
+from KiSC.Runtime import \
+     KiscRuntime
+
+# Standard
+import textwrap
+import sys
+import time
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscCli_cluster_rebalance(KiscCli_kisc):
+    """
+    KiSC command-line utility - (Sub)command 'cluster rebalance'
+    """
+
+    #--------------------------------------------------------------------------
+    # METHODS
+    #--------------------------------------------------------------------------
+
+    #
+    # Arguments
+    #
+
+    def _initArgumentParser(self, _sCommand=None):
+        """
+        Create the arguments parser (and help generator)
+
+        @param str _sCommand  Command name
+        """
+
+        # Parent
+        KiscCli_kisc._initArgumentParser(
+            self,
+            _sCommand,
+            textwrap.dedent('''
+                synopsis:
+                  plan (or apply) the resources migrations bringing all hosts consumables
+                  usage within the given band around the cluster-wide mean usage; the
+                  plan is shown as (ordered) migrations, to be executed on the source host:
+                    <host-id> resource migrate <resource-id> <host-id>
+                  when applying the plan, only the (local) host migrations are executed
+                  and progress is shown as:
+                    <resource-id> {Migrating|Migrated|Failed} <host-id>
+            ''')
+        )
+
+        # Arguments
+        self._addOptionConfig(self._oArgumentParser)
+        self._addOptionSilent(self._oArgumentParser)
+        self._addOptionVerbose(self._oArgumentParser)
+        self._addOptionJobs(self._oArgumentParser)
+        self._oArgumentParser.add_argument(
+            '-b', '--band', type=float, metavar='<percent>', default=10.0,
+            help='tolerated deviation from the cluster-wide mean usage, in percent (default: 10)'
+        )
+        self._oArgumentParser.add_argument(
+            '-m', '--max-migrations', type=int, metavar='<quantity>', default=None,
+            help='maximum quantity of migrations (default: unlimited)'
+        )
+        oGroup = self._oArgumentParser.add_mutually_exclusive_group()
+        oGroup.add_argument(
+            '--plan', action='store_true',
+            help='show the migrations plan (default)'
+        )
+        oGroup.add_argument(
+            '--apply', action='store_true',
+            help='execute the (local) host migrations'
+        )
+
+
+    #
+    # Execution
+    #
+
+    def execute(self, _sCommand=None, _lArguments=None):
+        """
+        Execute the command
+
+        @param str  _sCommand    Command name
+        @param list _lArguments  Command arguments
+
+        @return int  0 on success, non-zero in case of failure
+        """
+
+        # Arguments
+        self._initArgumentParser(_sCommand)
+        self._initArguments(_lArguments)
+
+        # Rebalance the cluster
+        try:
+            # Load config
+            oClusterConfig = KiscCluster_config(self._oArguments.config)
+            lsErrors = oClusterConfig.load()
+            if lsErrors:
+                if self._oArguments.verbose >= KiscRuntime.VERBOSE_DEBUG:
+                    for sError in lsErrors:
+                        sys.stderr.write('%s\n' % sError)
+                else:
+                    sys.stderr.write('%s\n' % lsErrors[-1])
+                return 255
+            oClusterConfig.VERBOSE(self._oArguments.verbose)
+
+            # Load hosts
+            oPlacement = KiscCluster_placement(oClusterConfig)
+            oPlacement.VERBOSE(self._oArguments.verbose)
+            lsErrors = oPlacement.load()
+            if lsErrors:
+                if self._oArguments.verbose >= KiscRuntime.VERBOSE_DEBUG:
+                    for sError in lsErrors:
+                        sys.stderr.write('%s\n' % sError)
+                else:
+                    sys.stderr.write('%s\n' % lsErrors[-1])
+                return 255
+
+            # Plan migrations
+            ltMigrations = oPlacement.rebalance(self._oArguments.band/100.0, self._oArguments.max_migrations)
+
+            # Show plan
+            if not self._oArguments.apply:
+                for (sResource_id, sHost_from, sHost_to) in ltMigrations:
+                    sys.stdout.write('%s resource migrate %s %s\n' % (sHost_from, sResource_id, sHost_to))
+                return 0
+
+            # Apply (local) plan
+            sHost_id = oClusterConfig.getHostByHostname().id()
+            oClusterHost = KiscCluster_host(oClusterConfig, sHost_id)
+            oClusterHost.VERBOSE(self._oArguments.verbose)
+            fStart = time.time()
+            (lsErrors, ltResults) = oClusterHost.migrateResources(
+                [(tMigration[0], tMigration[2]) for tMigration in ltMigrations if tMigration[1] == sHost_id],
+                self._oArguments.jobs, self._oArguments.jobs_per_host, False, self._progress
+            )
+
+            # Summary
+            if not self._oArguments.silent:
+                iMigrated = len([tResult for tResult in ltResults if not tResult[2]])
+                sys.stdout.write('%s Rebalanced %d/%d (failed: %d; remote: %d) in %.1fs\n' % (sHost_id, iMigrated, len(ltResults), len(ltResults)-iMigrated, len(ltMigrations)-len(ltResults), time.time()-fStart))
+            if lsErrors:
+                if self._oArguments.verbose >= KiscRuntime.VERBOSE_DEBUG:
+                    for sError in lsErrors:
+                        sys.stderr.write('%s\n' % sError)
+                else:
+                    sys.stderr.write('%s\n' % lsErrors[-1])
+                return 255
+
+        except (OSError, RuntimeError) as e:
+            sys.stderr.write('%s\n' % str(e))
+            return 255
+
+        # Done
+        return 0
@@ -71,6 +71,8 @@ class KiscCli_host(KiscCli_kisc):
                     start the host (and its bootstrap resources)
                   stop
                     stop the host (and its bootstrap resources)
+                  evacuate
+                    migrate all the host resources to other host(s)
                   status
                     query the host status
                   runtime
@@ -29,16 +29,16 @@
 # KiSC
 from KiSC import \
      KISC_VERSION, \
-     KISC_CONFIG_FILE
-from KiSC.Runtime import \
-     KiscRuntime
+     KISC_CONFIG_FILE, \
+     KISC_LOCAL_RUNTIME_DIR
 
 # Standard
-import argparse
+# NOTE: other modules - KiSC.Runtime included - are imported only when (and
+#       if) needed, for the quickest startup (see benchmarks/startup.py)
 import errno
 import os
 import sys
-import textwrap
+import time
 
 
 #------------------------------------------------------------------------------
@@ -50,6 +50,25 @@ class KiscCli_kisc:
     KiSC command-line utility (main entry point)
     """
 
+    #--------------------------------------------------------------------------
+    # CONSTANTS
+    #--------------------------------------------------------------------------
+
+    # Agent readiness timeout, after which commands are executed in-process
+    # (e.g. while the agent is busy serving another request; seconds)
+    AGENT_TIMEOUT = 2.0
+
+    # Commands and their sub-commands (KiSC.Cli.<command>[_<sub-command>] modules)
+    COMMANDS = {
+        'config': ('show', 'list', 'resolve'),
+        'cluster': ('status', 'capacity', 'rebalance'),
+        'host': ('start', 'stop', 'evacuate', 'runtime', 'status'),
+        'resource': ('start', 'suspend', 'resume', 'stop', 'migrate', 'runtime', 'status', 'list', 'place', 'help'),
+        'trace': ('summarize',),
+        'agent': ('serve',),
+    }
+
+
     #--------------------------------------------------------------------------
     # METHODS
     #--------------------------------------------------------------------------
@@ -66,6 +85,8 @@ class KiscCli_kisc:
         @param str _sSynopsis  Additional help (synopsis)
         """
 
+        import argparse
+
         # Command
         if _sCommand is None:
             _sCommand = sys.argv[0].split(os.sep)[-1]
@@ -146,6 +167,8 @@ class KiscCli_kisc:
         Adds the '--verbose' option to the given argument parser
         """
 
+        from KiSC.Runtime import KiscRuntime
+
         # Add argument
         _oArgumentParser.add_argument(
             '-V', '--verbose', type=int, metavar='<verbose-level>', default=0,
@@ -220,6 +243,59 @@ class KiscCli_kisc:
         )
 
 
+    def _addOptionJobs(self, _oArgumentParser, _iJobs = 1, _bPerHost = True):
+        """
+        Adds the '--jobs' (and '--jobs-per-host') options to the given argument parser
+
+        @param ArgumentParser _oArgumentParser  Argument parser
+        @param int            _iJobs            Default quantity of concurrent jobs
+        @param bool           _bPerHost         Add the '--jobs-per-host' option
+        """
+
+        # Add argument
+        _oArgumentParser.add_argument(
+            '-j', '--jobs', type=int, metavar='<jobs>', default=_iJobs,
+            help='maximum quantity of concurrent jobs (default: %d)' % _iJobs
+        )
+        if _bPerHost:
+            _oArgumentParser.add_argument(
+                '--jobs-per-host', type=int, metavar='<jobs>', default=1,
+                help='maximum quantity of concurrent jobs per (target) host (default: 1)'
+            )
+
+
+    #
+    # Progress
+    #
+
+    def _progress(self, _sResource_id, _sHost_id, _lsErrors, _fDuration):
+        """
+        Show (resources) migration progress (on stdout/stderr)
+
+        @param str   _sResource_id  Resource (ID)
+        @param str   _sHost_id      (Target) host (ID)
+        @param list  _lsErrors      None if migration is starting, (ordered) error messages otherwise (empty on success)
+        @param float _fDuration     Migration duration (seconds)
+        """
+        from KiSC.Runtime import KiscRuntime
+
+        if _lsErrors is None:
+            if not self._oArguments.silent:
+                sys.stdout.write('%s Migrating %s\n' % (_sResource_id, _sHost_id or '-'))
+        elif _lsErrors:
+            if self._oArguments.verbose >= KiscRuntime.VERBOSE_DEBUG:
+                for sError in _lsErrors:
+                    sys.stderr.write('%s\n' % sError)
+            else:
+                sys.stderr.write('%s\n' % _lsErrors[-1])
+            if not self._oArguments.silent:
+                sys.stdout.write('%s Failed %s\n' % (_sResource_id, _sHost_id or '-'))
+        else:
+            if not self._oArguments.silent:
+                sys.stdout.write('%s Migrated %s (%.1fs)\n' % (_sResource_id, _sHost_id, _fDuration))
+        sys.stdout.flush()
+
+
     #
     # Execution
     #
@@ -229,6 +305,8 @@ class KiscCli_kisc:
         Show help (on stdout)
         """
 
+        import textwrap
+
         sys.stdout.write('usage: kisc <command> [<sub-command>]\n')
         sys.stdout.write(
             textwrap.dedent('''
@@ -241,27 +319,157 @@ class KiscCli_kisc:
                     host management
                   resource
                     resource management
+                  trace
+                    tracing (profiling) data analysis
+                  agent
+                    local agent (serving the other commands over a Unix
+                    socket)
+
+                options:
+                  --trace <trace-file>
+                    record commands, runtime and configuration operations
+                    (phases) as JSONL spans into the given file (default:
+                    KISC_TRACE environment variable)
+                  --profile[=<directory>]
+                    profile the command (cProfile), dumping its statistics
+                    to '<directory>/kisc.<command>.<timestamp>.<pid>.pstats'
+                    (default: KISC_PROFILE environment variable, or the
+                    temporary files directory)
+                  --profile-top <quantity>
+                    show the given quantity of top (cumulative time)
+                    functions on standard error (default: KISC_PROFILE_TOP
+                    environment variable)
+                  --simulate <settings>
+                    simulate the system commands (network, mounts, libvirt,
+                    Pacemaker, services, health checks) in-memory, with the
+                    given latency/failure injection settings (see
+                    KiscRuntime_simulator; default: KISC_SIMULATE
+                    environment variable)
+                  --no-agent
+                    execute the command in-process, even if a KiSC agent
+                    is listening on its socket (default: KISC_AGENT
+                    environment variable, or '%s/kisc.sock';
+                    'none' to disable)
 
                 help:
                   kisc <command> [<sub-command>] --help
-            ''')
+            ''') % KISC_LOCAL_RUNTIME_DIR
         )
 
 
-    def execute(self):
+    def _profile(self, _sDirectory, _iTop, _sCommand, _fExecute):
+        """
+        Execute the given function within the (cProfile) profiler, dumping its
+        statistics to '<directory>/kisc.<command>.<timestamp>.<pid>.pstats'
+
+        Statistics are dumped even if the function raises an exception (or
+        exits); they may be browsed with 'python -m pstats <file>'.
+
+        @param str      _sDirectory  Statistics directory (temporary files directory if empty)
+        @param int      _iTop        Quantity of top (cumulative time) functions to show on standard error (None for none)
+        @param str      _sCommand    Command name
+        @param function _fExecute    Function (command execution)
+
+        @return mixed  Function result
+        """
+
+        # Modules (loaded only when profiling)
+        import cProfile
+        import pstats
+        import tempfile
+
+        # Profile
+        if not _sDirectory:
+            _sDirectory = tempfile.gettempdir()
+        sFile = os.path.join(_sDirectory, 'kisc.%s.%s.%d.pstats' % (_sCommand.replace(' ', '_'), time.strftime('%Y%m%dT%H%M%S'), os.getpid()))
+        oProfile = cProfile.Profile()
+        try:
+            return oProfile.runcall(_fExecute)
+        finally:
+            try:
+                os.makedirs(_sDirectory, exist_ok=True)
+                oProfile.dump_stats(sFile)
+            except OSError as e:
+                sys.stderr.write('WARNING: Failed to dump profile statistics; %s\n' % str(e))
+            if _iTop:
+                sys.stderr.write('PROFILE: %s\n' % sFile)
+                pstats.Stats(oProfile, stream=sys.stderr).sort_stats('cumulative').print_stats(_iTop)
+
+
+    def _agent(self, _sSocket, _lsArgv):
+        """
+        Execute the given command line via the KiSC agent listening on the
+        given socket (see KiscCli_agent_serve), relaying its standard output/error
+
+        @param str  _sSocket  Agent (Unix) socket path
+        @param list _lsArgv   Command line (including the program name)
+
+        @exception OSError  If the agent connection is lost (while executing the command)
+
+        @return int  Command exit code, None if no agent is available (or ready within AGENT_TIMEOUT)
+        """
+
+        # Modules (loaded only when using the agent)
+        import json
+        import socket
+
+        # Connect (falling back to in-process execution if no agent is available)
+        # NOTE: the agent serves one request at a time; the request is sent only once the agent is ready
+        #       (and greeted us), such as a busy agent never delays nor executes a request twice
+        oSocket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            with oSocket.makefile('r', encoding='utf-8') as oFile:
+                try:
+                    oSocket.settimeout(KiscCli_kisc.AGENT_TIMEOUT)
+                    oSocket.connect(_sSocket)
+                    if 'ready' not in json.loads(oFile.readline() or '{}'):
+                        return None
+                    oSocket.settimeout(None)
+                    dRequest = {
+                        'argv': _lsArgv,
+                        'cwd': os.getcwd(),
+                        'environment': {sKey: sValue for (sKey, sValue) in os.environ.items() if sKey[:5] == 'KISC_'},
+                    }
+                    oSocket.sendall((json.dumps(dRequest)+'\n').encode('utf-8'))
+                except (OSError, ValueError):
+                    return None
+
+                # Relay the command output (one JSON message per line) and exit code
+                for sLine in oFile:
+                    dMessage = json.loads(sLine)
+                    if 'stdout' in dMessage:
+                        sys.stdout.write(dMessage['stdout'])
+                        sys.stdout.flush()
+                    elif 'stderr' in dMessage:
+                        sys.stderr.write(dMessage['stderr'])
+                        sys.stderr.flush()
+                    elif 'exit' in dMessage:
+                        return dMessage['exit']
+            raise OSError(errno.EPIPE, 'Lost connection to KiSC agent (%s)' % _sSocket)
+        finally:
+            oSocket.close()
+
+
+    def execute(self, _lsArgv=None, _bAgent=True):
         """
         Execute the command
 
+        @param list _lsArgv  Command line (including the program name; default: sys.argv)
+        @param bool _bAgent  Execute the command via the KiSC agent, if available
+
         @return int  0 on success, non-zero in case of failure
         """
 
+        if _lsArgv is None:
+            _lsArgv = sys.argv
+
         try:
 
             # Check arguments
-            if len(sys.argv)<=1:
+            if len(_lsArgv)<=1:
                 sys.stderr.write('ERROR: Too few arguments\n')
                 return errno.EINVAL
-            elif sys.argv[1] in ['help', '--help', '-h']:
+            elif _lsArgv[1] in ['help', '--help', '-h']:
                 self._help()
                 return 0
 
@@ -269,8 +477,55 @@ class KiscCli_kisc:
             sCommand_main = None
             sCommand_sub = None
             lArguments = list()
-            for i in range(1, len(sys.argv)):
-                s = sys.argv[i]
+            sTrace = None
+            bTrace = False
+            sProfile = os.environ.get('KISC_PROFILE') or None
+            sProfileTop = os.environ.get('KISC_PROFILE_TOP')
+            bProfileTop = False
+            sSimulate = os.environ.get('KISC_SIMULATE') or None
+            bSimulate = False
+            sAgent = os.environ.get('KISC_AGENT') or KISC_LOCAL_RUNTIME_DIR+os.sep+'kisc.sock'
+            for i in range(1, len(_lsArgv)):
+                s = _lsArgv[i]
+                if bTrace:
+                    sTrace = s
+                    bTrace = False
+                    continue
+                elif bProfileTop:
+                    sProfileTop = s
+                    bProfileTop = False
+                    continue
+                elif bSimulate:
+                    sSimulate = s
+                    bSimulate = False
+                    continue
+                elif s == '--trace':
+                    bTrace = True
+                    continue
+                elif s[:8] == '--trace=':
+                    sTrace = s[8:]
+                    continue
+                elif s == '--profile':
+                    sProfile = str()
+                    continue
+                elif s[:10] == '--profile=':
+                    sProfile = s[10:]
+                    continue
+                elif s == '--profile-top':
+                    bProfileTop = True
+                    continue
+                elif s[:14] == '--profile-top=':
+                    sProfileTop = s[14:]
+                    continue
+                elif s == '--simulate':
+                    bSimulate = True
+                    continue
+                elif s[:11] == '--simulate=':
+                    sSimulate = s[11:]
+                    continue
+                elif s == '--no-agent':
+                    sAgent = 'none'
+                    continue
                 if s[0]!='-':
                     if sCommand_main is None:
                         sCommand_main = s
@@ -281,11 +536,24 @@ class KiscCli_kisc:
                 lArguments += [s]
 
             # Sanitize input
-            import re
-            if re.search('[^a-z]', sCommand_main):
-                raise RuntimeError('Invalid command')
-            if sCommand_sub is not None and re.search('[^a-z]', sCommand_sub):
-                raise RuntimeError('Invalid sub-command')
+            if sCommand_main not in KiscCli_kisc.COMMANDS \
+               or sCommand_sub is not None and sCommand_sub not in KiscCli_kisc.COMMANDS[sCommand_main]:
+                sys.stderr.write('ERROR: Invalid (sub-)command\n')
+                return errno.EINVAL
+            iProfileTop = None
+            if sProfileTop:
+                try:
+                    iProfileTop = int(sProfileTop)
+                except ValueError:
+                    raise RuntimeError('Invalid profile top quantity (%s)' % sProfileTop)
+
+            # Agent (see KiscCli_agent_serve)
+            # NOTE: profiled, simulated, (possibly) standard input-reading commands and the agent itself are executed in-process
+            if _bAgent and sAgent != 'none' and sProfile is None and sSimulate is None \
+               and sCommand_main not in ('agent', 'trace') and (sCommand_main, sCommand_sub) != ('config', 'resolve'):
+                iExit = self._agent(sAgent, _lsArgv)
+                if iExit is not None:
+                    return iExit
 
             # Instantiate command
             if sCommand_sub is None:
@@ -316,12 +584,50 @@ class KiscCli_kisc:
             sys.stderr.write('ERROR: %s\n' % str(e))
             raise e
 
+        # Runtime
+        from KiSC.Runtime import \
+             KiscRuntime, \
+             KiscRuntime_trace
+        from KiSC.Runtime.metrics import \
+             KiscRuntime_metrics
+
+        # Simulation
+        if sSimulate is not None:
+            from KiSC.Runtime.simulator import KiscRuntime_simulator
+            try:
+                KiscRuntime.setBackend(KiscRuntime_simulator(sSimulate))
+            except RuntimeError as e:
+                sys.stderr.write('ERROR: %s\n' % str(e))
+                return errno.EINVAL
+
+        # Tracing (and metrics; see KiscCluster_config.load())
+        # NOTE: trace analysis commands and the agent are not traced (or measured) themselves
+        if sCommand_main not in ('trace', 'agent'):
+            try:
+                KiscRuntime_trace.open(sTrace)
+            except OSError as e:
+                sys.stderr.write('ERROR: Failed to open trace file; %s\n' % str(e))
+                return e.errno
+            KiscRuntime_metrics.enable()
+
         # Execute command
+        oTrace = KiscRuntime_trace.span(KiscRuntime_trace.KIND_COMMAND, sCommand, None, {'arguments': ' '.join(lArguments)})
+        iExit = None
+        fStart = time.monotonic()
         try:
-            return oCommand().execute('kisc %s' % sCommand, lArguments)
+            if sProfile is None:
+                iExit = oCommand().execute('kisc %s' % sCommand, lArguments)
+            else:
+                iExit = self._profile(sProfile, iProfileTop, sCommand, lambda: oCommand().execute('kisc %s' % sCommand, lArguments))
+            return iExit
         except (OSError, RuntimeError) as e:
             sys.stderr.write('%s\n' % str(e))
             raise e
+        finally:
+            oTrace.end(iExit if iExit is not None else -1)
+            KiscRuntime_trace.close()
+            KiscRuntime_metrics.command(sCommand, iExit if iExit is not None else -1, time.monotonic()-fStart)
+            KiscRuntime_metrics.flush()
 
 
 #------------------------------------------------------------------------------
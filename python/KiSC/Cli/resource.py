@@ -81,6 +81,8 @@ class KiscCli_resource(KiscCli_kisc):
                     show the resource configuration and runtime status
                   list
                     list resources (IDs) running on (local) host
+                  place
+                    find the host(s) best fitting the resource(s) consumables
                   help
                     display help on the given resource type
             ''')
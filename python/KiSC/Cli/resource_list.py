@@ -33,9 +33,12 @@ from KiSC.Cli import \
      KiscCli_kisc
 from KiSC.Cluster import \
      KiscCluster_config, \
-     KiscCluster_host
+     KiscCluster_host, \
+     KiscCluster_resource
 from KiSC.Runtime import \
      KiscRuntime
+from KiSC.Runtime.aio import \
+     KiscRuntime_aio
 
 # Standard
 import textwrap
@@ -80,6 +83,11 @@ class KiscCli_resource_list(KiscCli_kisc):
         self._addOptionConfig(self._oArgumentParser)
         self._addOptionVerbose(self._oArgumentParser)
         self._addOptionBootstrap(self._oArgumentParser)
+        self._addOptionJobs(self._oArgumentParser, 8, False)
+        self._oArgumentParser.add_argument(
+            '--status', action='store_true',
+            help='show the resources local status'
+        )
 
 
     #
@@ -126,8 +134,20 @@ class KiscCli_resource_list(KiscCli_kisc):
                 raise RuntimeError('Host not started')
 
             # List resources
-            for sResource_id in oClusterHost.host().getResourcesIDs(self._oArguments.bootstrap):
-                sys.stdout.write('%s\n' % sResource_id)
+            lsResources_ids = oClusterHost.host().getResourcesIDs(self._oArguments.bootstrap)
+            if self._oArguments.status:
+                # ... query status concurrently
+                loClusterResources = list()
+                for sResource_id in lsResources_ids:
+                    oClusterResource = KiscCluster_resource(oClusterConfig, sHost_id, sResource_id, self._oArguments.bootstrap)
+                    oClusterResource.VERBOSE(self._oArguments.verbose)
+                    loClusterResources.append(oClusterResource)
+                liStatus = KiscRuntime_aio.run(KiscRuntime_aio.gather([oClusterResource.statusAsync(True) for oClusterResource in loClusterResources], self._oArguments.jobs))
+                for iIndex in range(0, len(lsResources_ids)):
+                    sys.stdout.write('%s %s\n' % (lsResources_ids[iIndex], KiscRuntime.STATUS_MESSAGE[liStatus[iIndex]]))
+            else:
+                for sResource_id in lsResources_ids:
+                    sys.stdout.write('%s\n' % sResource_id)
 
         except (OSError, RuntimeError) as e:
             sys.stderr.write('%s\n' % str(e))
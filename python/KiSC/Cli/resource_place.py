@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+
+# KiSC
+from KiSC import \
+     KISC_CONFIG_FILE
+from KiSC.Cli import \
+     KiscCli_kisc
+from KiSC.Cluster import \
+     KiscCluster_config, \
+     KiscCluster_placement
+from KiSC.Runtime import \
+     KiscRuntime
+
+# Standard
+import textwrap
+import sys
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscCli_resource_place(KiscCli_kisc):
+    """
+    KiSC command-line utility - (Sub)command 'resource place'
+    """
+
+    #--------------------------------------------------------------------------
+    # METHODS
+    #--------------------------------------------------------------------------
+
+    #
+    # Arguments
+    #
+
+    def _initArgumentParser(self, _sCommand=None):
+        """
+        Create the arguments parser (and help generator)
+
+        @param str _sCommand  Command name
+        """
+
+        # Parent
+        KiscCli_kisc._initArgumentParser(
+            self,
+            _sCommand,
+            textwrap.dedent('''
+                synopsis:
+                  find the (started) host(s) best fitting the resource(s) consumables
+
+                output:
+                  <resource-id> <host-id> (one line per resource; "-" if no host fits)
+                  <resource-id> <host-id> <score> (one line per host, when ranking)
+            ''')
+        )
+
+        # Arguments
+        self._addOptionConfig(self._oArgumentParser)
+        self._addOptionVerbose(self._oArgumentParser)
+        self._addOptionForce(self._oArgumentParser)
+        self._oArgumentParser.add_argument(
+            '--pack', action='store_true',
+            help='pack resources on the fullest fitting hosts (default: spread them on the emptiest ones)'
+        )
+        self._oArgumentParser.add_argument(
+            '--rank', action='store_true',
+            help='list all fitting hosts, ranked by decreasing preference'
+        )
+        self._oArgumentParser.add_argument(
+            'resources', type=str, metavar='<resource-id>', nargs='+',
+            help='resource identifier (ID)'
+        )
+
+
+    #
+    # Execution
+    #
+
+    def execute(self, _sCommand=None, _lArguments=None):
+        """
+        Execute the command
+
+        @param str  _sCommand    Command name
+        @param list _lArguments  Command arguments
+
+        @return int  0 on success, non-zero in case of failure
+        """
+
+        # Arguments
+        self._initArgumentParser(_sCommand)
+        self._initArguments(_lArguments)
+
+        # Place the resources
+        iExit = 0
+        try:
+            # Load config
+            oClusterConfig = KiscCluster_config(self._oArguments.config)
+            lsErrors = oClusterConfig.load()
+            if lsErrors:
+                if self._oArguments.verbose >= KiscRuntime.VERBOSE_DEBUG:
+                    for sError in lsErrors:
+                        sys.stderr.write('%s\n' % sError)
+                else:
+                    sys.stderr.write('%s\n' % lsErrors[-1])
+                return 255
+            oClusterConfig.VERBOSE(self._oArguments.verbose)
+
+            # Load hosts
+            oPlacement = KiscCluster_placement(oClusterConfig)
+            oPlacement.VERBOSE(self._oArguments.verbose)
+            lsErrors = oPlacement.load()
+            if lsErrors:
+                if self._oArguments.verbose >= KiscRuntime.VERBOSE_DEBUG:
+                    for sError in lsErrors:
+                        sys.stderr.write('%s\n' % sError)
+                else:
+                    sys.stderr.write('%s\n' % lsErrors[-1])
+                return 255
+
+            # Rank hosts
+            if self._oArguments.rank:
+                for sResource_id in self._oArguments.resources:
+                    ltHosts = oPlacement.rank(sResource_id, None, self._oArguments.pack, self._oArguments.force)
+                    if not ltHosts:
+                        sys.stderr.write('No suitable host (%s)\n' % sResource_id)
+                        iExit = 1
+                    for (sHost_id, fScore) in ltHosts:
+                        sys.stdout.write('%s %s %.3f\n' % (sResource_id, sHost_id, fScore))
+
+            # Place resources
+            else:
+                for (sResource_id, sHost_id) in oPlacement.place(self._oArguments.resources, self._oArguments.pack, self._oArguments.force):
+                    if sHost_id is None:
+                        sys.stderr.write('No suitable host (%s)\n' % sResource_id)
+                        iExit = 1
+                    sys.stdout.write('%s %s\n' % (sResource_id, sHost_id or '-'))
+
+        except (OSError, RuntimeError) as e:
+            sys.stderr.write('%s\n' % str(e))
+            return 255
+
+        # Done
+        return iExit
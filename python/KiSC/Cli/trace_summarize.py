@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# KiSC
+from KiSC.Cli import \
+     KiscCli_kisc
+from KiSC.Runtime import \
+     KiscRuntime_trace
+
+# Standard
+import textwrap
+import sys
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscCli_trace_summarize(KiscCli_kisc):
+    """
+    KiSC command-line utility - (Sub)command 'trace summarize'
+    """
+
+    #--------------------------------------------------------------------------
+    # CONSTANTS
+    #--------------------------------------------------------------------------
+
+    # Aggregation keys
+    KEYS = ['kind', 'phase', 'type', 'resource', 'name', 'code', 'pid']
+
+
+    #--------------------------------------------------------------------------
+    # METHODS
+    #--------------------------------------------------------------------------
+
+    #
+    # Arguments
+    #
+
+    def _initArgumentParser(self, _sCommand=None):
+        """
+        Create the arguments parser (and help generator)
+
+        @param str _sCommand  Command name
+        """
+
+        # Parent
+        KiscCli_kisc._initArgumentParser(
+            self,
+            _sCommand,
+            textwrap.dedent('''
+                synopsis:
+                  summarize (aggregate) the spans durations of the given trace file(s)
+                  - see 'kisc --trace' - by the given keys, by decreasing total duration;
+                  output is shown as:
+                    <key> ... <count> <total> <p50> <p95> <max>
+                  (durations in milliseconds)
+
+                keys:
+                  kind      span kind (command, phase, shell, echo, runtime, config)
+                  phase     (enclosing) phase; e.g. 'host start', 'resource status'
+                  type      originating resource type
+                  resource  originating resource (<type>:<id>@<host>)
+                  name      span name; e.g. shell command (and sub-command)
+                  code      exit code
+                  pid       process ID
+            ''')
+        )
+
+        # Arguments
+        self._oArgumentParser.add_argument(
+            '-b', '--by', type=str, metavar='<key>[,...]', default='kind,phase,type,name',
+            help='aggregation keys (default: kind,phase,type,name)'
+        )
+        self._oArgumentParser.add_argument(
+            '-k', '--kind', type=str, metavar='<kind>[,...]',
+            help='consider only the given span kind(s)'
+        )
+        self._oArgumentParser.add_argument(
+            '-n', '--top', type=int, metavar='<quantity>',
+            help='show only the given quantity of aggregates (with the highest total duration)'
+        )
+        self._oArgumentParser.add_argument(
+            'file', type=str, metavar='<trace-file>', nargs='*', default=['-'],
+            help='trace file (default: standard input)'
+        )
+
+
+    #
+    # Execution
+    #
+
+    def execute(self, _sCommand=None, _lArguments=None):
+        """
+        Execute the command
+
+        @param str  _sCommand    Command name
+        @param list _lArguments  Command arguments
+
+        @return int  0 on success, non-zero in case of failure
+        """
+
+        # Arguments
+        self._initArgumentParser(_sCommand)
+        self._initArguments(_lArguments)
+        lsKeys = [sKey.strip() for sKey in self._oArguments.by.split(',') if sKey.strip()]
+        for sKey in lsKeys:
+            if sKey not in KiscCli_trace_summarize.KEYS:
+                self._oArgumentParser.error('Invalid aggregation key (%s)' % sKey)
+        if not lsKeys:
+            self._oArgumentParser.error('Missing aggregation key')
+
+        # Summarize trace
+        try:
+
+            # Load trace(s)
+            ldRecords = list()
+            for sFile in self._oArguments.file:
+                ldRecords.extend(KiscRuntime_trace.read(sFile))
+            if self._oArguments.kind:
+                lsKinds = self._oArguments.kind.split(',')
+                ldRecords = [dRecord for dRecord in ldRecords if dRecord.get('kind') in lsKinds]
+
+            # Aggregate
+            ltSummary = KiscRuntime_trace.summarize(ldRecords, lsKeys)
+            if self._oArguments.top is not None:
+                ltSummary = ltSummary[:self._oArguments.top]
+
+            # Show summary
+            llsRows = [lsKeys+['count', 'total', 'p50', 'p95', 'max']]
+            for (tKeys, iCount, fTotal, fP50, fP95, fMax) in ltSummary:
+                llsRows.append(['-' if mKey is None else str(mKey) for mKey in tKeys]+['%d' % iCount]+['%.1f' % (f*1000.0) for f in (fTotal, fP50, fP95, fMax)])
+            liWidths = [max([len(lsRow[i]) for lsRow in llsRows]) for i in range(0, len(llsRows[0]))]
+            iKeys = len(lsKeys)
+            for lsRow in llsRows:
+                sys.stdout.write('%s\n' % '  '.join([lsRow[i].ljust(liWidths[i]) if i < iKeys else lsRow[i].rjust(liWidths[i]) for i in range(0, len(lsRow))]).rstrip())
+
+        except (OSError, RuntimeError) as e:
+            sys.stderr.write('%s\n' % str(e))
+            return 255
+
+        # Done
+        return 0
@@ -26,6 +26,8 @@
 #------------------------------------------------------------------------------
 
 # KiSC
+from .capacity import KiscCluster_capacity
 from .config import KiscCluster_config
 from .host import KiscCluster_host
+from .placement import KiscCluster_placement
 from .resource import KiscCluster_resource
@@ -0,0 +1,402 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# KiSC
+from KiSC.Runtime import \
+     KiscRuntime, \
+     KiscRuntime_consumables
+
+# Standard
+from configparser import \
+     Error as ConfigParserError, \
+     RawConfigParser
+import os
+import os.path
+import sys
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscCluster_capacity:
+    """
+    Cluster-level consumables (capacity) index
+
+    The index - stored in the global runtime directory - records the provided
+    and used consumables of each started host, such as the cluster capacity
+    can be queried with a single file read rather than parsing each host
+    runtime. It is (incrementally) updated whenever a host runtime is saved
+    or deleted (see KiscCluster_host.saveRuntime()/deleteRuntime()), and
+    automatically rebuilt when missing or lacking started hosts (e.g. hosts
+    started before the index was introduced; see self.load()).
+    """
+
+    #--------------------------------------------------------------------------
+    # CONSTRUCTORS
+    #--------------------------------------------------------------------------
+
+    def __init__(self, _oClusterConfig):
+        # Properties
+        self._oClusterConfig = _oClusterConfig
+        self._dtHosts = dict()
+
+        # ... paths
+        sIndex_dir = self._oClusterConfig.getDirectoryRuntimeGlobal()
+        self._dsPaths = {
+            'index_dir': sIndex_dir,
+            'index_file': sIndex_dir+os.sep+'capacity.idx',
+            'lock_file': sIndex_dir+os.sep+'capacity.lock',
+        }
+
+        # ... debugging
+        self._iVerbose = KiscRuntime.VERBOSE_NONE
+
+
+    #--------------------------------------------------------------------------
+    # METHODS: self
+    #--------------------------------------------------------------------------
+
+    #
+    # Debugging
+    #
+
+    def VERBOSE(self, _iVerbose):
+        """
+        Set verbosity level
+
+        @param int _iVerbose  Verbosity level (self KiscRuntime.VERBOSE_* constants)
+        """
+
+        self._iVerbose = _iVerbose
+
+
+    def _ERROR(self, _sMessage):
+        """
+        Print ERROR message to standard error
+
+        @param str _sMessage  Message to print
+        """
+
+        if(self._iVerbose >= KiscRuntime.VERBOSE_ERROR):
+            sys.stderr.write('ERROR[CC] %s\n' % _sMessage.replace('\n', '¬'))
+
+
+    def _WARNING(self, _sMessage):
+        """
+        Print WARNING message to standard error
+
+        @param str _sMessage  Message to print
+        """
+
+        if(self._iVerbose >= KiscRuntime.VERBOSE_WARNING):
+            sys.stderr.write('WARNING[CC] %s\n' % _sMessage.replace('\n', '¬'))
+
+
+    def _INFO(self, _sMessage):
+        """
+        Print INFO message to standard error
+
+        @param str _sMessage  Message to print
+        """
+
+        if(self._iVerbose >= KiscRuntime.VERBOSE_INFO):
+            sys.stderr.write('INFO[CC] %s\n' % _sMessage.replace('\n', '¬'))
+
+
+    def _DEBUG(self, _sMessage):
+        """
+        Print DEBUG message to standard error
+
+        @param str _sMessage  Message to print
+        """
+
+        if(self._iVerbose >= KiscRuntime.VERBOSE_DEBUG):
+            sys.stderr.write('DEBUG[CC] %s\n' % _sMessage.replace('\n', '¬'))
+
+
+    #
+    # Index (file)
+    #
+
+    def _read(self):
+        """
+        Read the index from file (missing file meaning empty index)
+
+        @exception OSError            Index file I/O error
+        @exception RuntimeError       Consumables parse error
+        @exception ConfigParserError  Index parse error
+        """
+
+        self._dtHosts = dict()
+        if not os.path.isfile(self._dsPaths['index_file']):
+            return
+        oIndex = RawConfigParser()
+        oIndex.optionxform = lambda sOption: sOption  # do not lowercase option (key) name
+        with open(self._dsPaths['index_file'], 'r') as oFile:
+            oIndex.read_file(oFile, self._dsPaths['index_file'])
+        for sHost_id in oIndex.sections():
+            self._dtHosts[sHost_id] = (
+                KiscRuntime_consumables(oIndex.get(sHost_id, 'CONSUMABLES', fallback=None), -1),
+                KiscRuntime_consumables(oIndex.get(sHost_id, 'CONSUMABLES_USED', fallback=None), 1),
+            )
+
+
+    def _write(self):
+        """
+        (Atomically) write the index to file
+
+        @exception OSError  Index file I/O error
+        """
+
+        s = ''
+        for sHost_id in sorted(self._dtHosts.keys()):
+            (oConsumables, oConsumables_used) = self._dtHosts[sHost_id]
+            s += '[%s]\nCONSUMABLES=%s\nCONSUMABLES_USED=%s\n\n' % (sHost_id, oConsumables.toString(), oConsumables_used.toString())
+        sIndex_file_tmp = '%s.%d.tmp' % (self._dsPaths['index_file'], os.getpid())
+        iUmask = os.umask(0o077)
+        try:
+            with open(sIndex_file_tmp, 'w') as oFile:
+                oFile.write(s)
+            os.rename(sIndex_file_tmp, self._dsPaths['index_file'])
+        finally:
+            os.umask(iUmask)
+
+
+    def _modify(self, _fModify):
+        """
+        (Exclusively) read, modify and write the index
+
+        @param function _fModify  Modification function (called without argument, once the index is read)
+
+        @exception OSError            Index file I/O error
+        @exception RuntimeError       Consumables parse error
+        @exception ConfigParserError  Index parse error
+        """
+
+        import fcntl
+        os.makedirs(self._dsPaths['index_dir'], exist_ok=True)
+        with open(self._dsPaths['lock_file'], 'a') as oLock:
+            fcntl.flock(oLock, fcntl.LOCK_EX)
+            try:
+                self._read()
+                _fModify()
+                self._write()
+            finally:
+                fcntl.flock(oLock, fcntl.LOCK_UN)
+
+
+    def _missing(self):
+        """
+        Return the (started) hosts missing from the (read) index, i.e. hosts
+        having a runtime file but no index entry
+
+        @return list  Hosts IDs; None if the index file does not exist
+
+        @exception OSError  Runtime directory I/O error
+        """
+
+        if not os.path.isfile(self._dsPaths['index_file']):
+            return None
+        try:
+            setFiles = set(os.listdir(self._oClusterConfig.getDirectoryRuntimeGlobal()))
+        except FileNotFoundError:
+            return list()
+        lsHosts_ids = list()
+        for sHost_id in self._oClusterConfig.getHostsIDs():
+            if sHost_id in self._dtHosts:
+                continue
+            if self._oClusterConfig.getHost(sHost_id).type()+':'+sHost_id+'.run' in setFiles:
+                lsHosts_ids.append(sHost_id)
+        return lsHosts_ids
+
+
+    #
+    # Setters
+    #
+
+    def load(self, _bRebuild = True):
+        """
+        Load the index from file
+
+        The index is (automatically) rebuilt if it is missing or lacks
+        started hosts (see self.rebuild()).
+
+        @param bool _bRebuild  Rebuild the index if missing or incomplete
+
+        @return list  Empty if index is successfully loaded, (ordered) error messages otherwise
+        """
+        if self._iVerbose: self._DEBUG('Loading index')
+        lsErrors = list()
+
+        try:
+            self._read()
+            if _bRebuild:
+                lsHosts_ids = self._missing()
+                if lsHosts_ids is None:
+                    if self._iVerbose: self._WARNING('Index missing; rebuilding')
+                elif lsHosts_ids:
+                    if self._iVerbose: self._WARNING('Index lacking hosts (%s); rebuilding' % ','.join(lsHosts_ids))
+                if lsHosts_ids is None or lsHosts_ids:
+                    lsErrors = self.rebuild(True)
+                    if lsErrors:
+                        lsErrors.append('Failed to rebuild capacity index (see --rebuild)')
+        except (OSError, RuntimeError, ConfigParserError) as e:
+            if self._iVerbose: self._ERROR(str(e))
+            lsErrors.append(str(e))
+
+        return lsErrors
+
+
+    def update(self, _oHost):
+        """
+        Update the given host consumables in the index
+
+        @param KiscResource_cluster_host _oHost  Host resource (object)
+
+        @exception OSError            Index file I/O error
+        @exception RuntimeError       Consumables parse error
+        @exception ConfigParserError  Index parse error
+        """
+        if self._iVerbose: self._DEBUG('Updating host (%s)' % _oHost.id())
+
+        def modify():
+            self._dtHosts[_oHost.id()] = (
+                KiscRuntime_consumables(_oHost.config().get('CONSUMABLES', None), -1),
+                KiscRuntime_consumables(_oHost.config().get('$CONSUMABLES_USED', None), 1),
+            )
+        self._modify(modify)
+
+
+    def remove(self, _sHost_id):
+        """
+        Remove the given host from the index
+
+        @param str _sHost_id  Host ID
+
+        @exception OSError            Index file I/O error
+        @exception RuntimeError       Consumables parse error
+        @exception ConfigParserError  Index parse error
+        """
+        if self._iVerbose: self._DEBUG('Removing host (%s)' % _sHost_id)
+
+        def modify():
+            self._dtHosts.pop(_sHost_id, None)
+        self._modify(modify)
+
+
+    def rebuild(self, _bMissing = False):
+        """
+        Rebuild the index from the (started) hosts runtime
+
+        The hosts runtime are read while holding the index lock, such as
+        concurrent (incremental) updates are not lost.
+
+        @param bool _bMissing  Rebuild only if the index is (still) missing or incomplete (once the lock is acquired)
+
+        @return list  Empty if index is successfully rebuilt, (ordered) error messages otherwise
+        """
+        if self._iVerbose: self._INFO('Rebuilding index')
+        lsErrors = list()
+
+        from KiSC.Cluster.host import KiscCluster_host
+        try:
+            def modify():
+                if _bMissing:
+                    lsHosts_ids = self._missing()
+                    if lsHosts_ids is not None and not lsHosts_ids:
+                        if self._iVerbose: self._DEBUG('Index already rebuilt')
+                        return
+                dtHosts = dict()
+                for sHost_id in self._oClusterConfig.getHostsIDs():
+                    oClusterHost = KiscCluster_host(self._oClusterConfig, sHost_id)
+                    oClusterHost.VERBOSE(self._iVerbose)
+                    if not oClusterHost.existsRuntime():
+                        continue
+                    oClusterHost.loadRuntime()
+                    dsConfig = oClusterHost.host().config()
+                    dtHosts[sHost_id] = (
+                        KiscRuntime_consumables(dsConfig.get('CONSUMABLES', None), -1),
+                        KiscRuntime_consumables(dsConfig.get('$CONSUMABLES_USED', None), 1),
+                    )
+                self._dtHosts = dtHosts
+                if self._iVerbose: self._INFO('Index rebuilt (%d)' % len(dtHosts))
+            # NOTE: the runtime lock is acquired before the index lock, as in KiscCluster_host.saveRuntime()
+            with KiscCluster_host.lockRuntime(self._oClusterConfig):
+                self._modify(modify)
+
+        except (OSError, RuntimeError, ConfigParserError) as e:
+            if self._iVerbose: self._ERROR(str(e))
+            lsErrors.append(str(e))
+
+        return lsErrors
+
+
+    #
+    # Getters
+    #
+
+    def getHostsIDs(self):
+        """
+        Return the (started) hosts IDs
+
+        @return list  Hosts IDs
+        """
+
+        return sorted(self._dtHosts.keys())
+
+
+    def getCapacity(self, _lsHosts_ids = None):
+        """
+        Return the (aggregated) consumables capacity of the given hosts
+
+        Illimited consumables (on any host) are reported with negative total
+        and free quantities.
+
+        @param list _lsHosts_ids  Hosts IDs (default: all indexed hosts)
+
+        @return dict  Dictionary associating consumables ID and their (total, used, free) quantities
+        """
+
+        dliCapacity = dict()
+        for sHost_id in (self.getHostsIDs() if _lsHosts_ids is None else _lsHosts_ids):
+            if sHost_id not in self._dtHosts:
+                continue
+            (oConsumables, oConsumables_used) = self._dtHosts[sHost_id]
+            for sConsumable_id in oConsumables.ids():
+                iTotal = oConsumables.get(sConsumable_id)
+                iUsed = oConsumables_used.get(sConsumable_id, 0)
+                liCapacity = dliCapacity.setdefault(sConsumable_id, [0, 0, 0])
+                if iTotal < 0 or liCapacity[0] < 0:
+                    liCapacity[0] = -1
+                    liCapacity[2] = -1
+                else:
+                    liCapacity[0] += iTotal
+                    liCapacity[2] += iTotal-iUsed
+                liCapacity[1] += iUsed
+        return {sConsumable_id: tuple(dliCapacity[sConsumable_id]) for sConsumable_id in dliCapacity}
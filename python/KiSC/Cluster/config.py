@@ -34,13 +34,17 @@ from KiSC import \
 from KiSC.Resource import \
      kiscResource
 from KiSC.Runtime import \
-     KiscRuntime
+     KiscRuntime, \
+     KiscRuntime_trace
+from KiSC.Runtime.metrics import \
+     KiscRuntime_metrics
 
 # Standard
 import configparser
 import os
 import os.path
 import sys
+import threading
 
 
 #------------------------------------------------------------------------------
@@ -52,6 +56,18 @@ class KiscCluster_config:
     Cluster configuration object
     """
 
+    #--------------------------------------------------------------------------
+    # CLASS PROPERTIES
+    #--------------------------------------------------------------------------
+
+    # Configuration files cache (see cache())
+    _bCache = False
+    _oLock_cache = threading.Lock()
+    _dtFiles = dict()  # (file, case-sensitive) -> (signature, sections)
+    _dtGlobs = dict()  # pattern -> (directory signature, files)
+    _sHostname = None
+
+
     #--------------------------------------------------------------------------
     # CONSTRUCTORS
     #--------------------------------------------------------------------------
@@ -217,6 +233,7 @@ class KiscCluster_config:
         lsErrors = list()
 
         # Load configuration from disc
+        oTrace = KiscRuntime_trace.span(KiscRuntime_trace.KIND_CONFIG, 'load', None, {'file': self._sConfigFile})
         try:
             # Defaults
             sDirectoryCache = KISC_CACHE_DIR
@@ -224,30 +241,38 @@ class KiscCluster_config:
             sDirectoryRuntimeGlobal = KISC_GLOBAL_RUNTIME_DIR
 
             # Load base configuration from file
-            with open(self._sConfigFile, 'r') as oFile:
-                oConfig = configparser.RawConfigParser()
-                oConfig.read_file(oFile, self._sConfigFile)
+            dsKiSC = dict(KiscCluster_config.readFile(self._sConfigFile, False)).get('KiSC', dict())
 
             # Parse base configuration section (KiSC)
-            if oConfig.has_section('KiSC'):
-                if oConfig.has_option('KiSC', 'cache_dir'):
-                    sDirectoryCache = oConfig.get('KiSC', 'cache_dir')
-                if oConfig.has_option('KiSC', 'local_runtime_dir'):
-                    sDirectoryRuntimeLocal = oConfig.get('KiSC', 'local_runtime_dir')
-                if oConfig.has_option('KiSC', 'global_runtime_dir'):
-                    sDirectoryRuntimeGlobal = oConfig.get('KiSC', 'global_runtime_dir')
+            if 'cache_dir' in dsKiSC:
+                sDirectoryCache = dsKiSC['cache_dir']
+            if 'local_runtime_dir' in dsKiSC:
+                sDirectoryRuntimeLocal = dsKiSC['local_runtime_dir']
+            if 'global_runtime_dir' in dsKiSC:
+                sDirectoryRuntimeGlobal = dsKiSC['global_runtime_dir']
+            sMetricsFile = sDirectoryRuntimeLocal+os.sep+'kisc.prom'
+            if 'metrics_file' in dsKiSC:
+                sMetricsFile = dsKiSC['metrics_file']
 
             # Store base configuration
             self._dsConfig['config_file'] = self._sConfigFile
             self._dsConfig['cache_dir'] = sDirectoryCache
             self._dsConfig['local_runtime_dir'] = sDirectoryRuntimeLocal
             self._dsConfig['global_runtime_dir'] = sDirectoryRuntimeGlobal
+            self._dsConfig['metrics_file'] = sMetricsFile
 
             # Make sure local cache/runtime directories exists
             # NOTE: ideally, those are located on a tmpfs partition
             os.makedirs(self._dsConfig['cache_dir'], exist_ok=True)
             os.makedirs(self._dsConfig['local_runtime_dir'], exist_ok=True)
 
+            # Enable (or disable) metrics (Prometheus textfile; see KiscRuntime_metrics.flush())
+            if self._dsConfig['metrics_file']:
+                KiscRuntime_metrics.open(self._dsConfig['metrics_file'])
+                KiscRuntime_metrics.collect(self.__collectMetrics)
+            else:
+                KiscRuntime_metrics.close()
+
             # Loop through other sections/resources (IDs)
             lsErrors_sub = self.__loadResources(self._sConfigFile, True, True)
             if lsErrors_sub:
@@ -259,11 +284,39 @@ class KiscCluster_config:
         except (OSError, configparser.Error, RuntimeError) as e:
             if self._iVerbose: self._ERROR(str(e))
             lsErrors.append(str(e))
+        finally:
+            oTrace.end(1 if lsErrors else 0)
 
         # Done
         return lsErrors
 
 
+    def __collectMetrics(self):
+        """
+        Set the (local) host metrics gauges - consumables, from the cluster
+        capacity index (see KiscRuntime_metrics.collect())
+        """
+
+        from KiSC.Cluster.capacity import KiscCluster_capacity
+        try:
+            sHost_id = self.getHostByHostname().id()
+            oClusterCapacity = KiscCluster_capacity(self)
+            if oClusterCapacity.load(False):
+                return
+        except RuntimeError:
+            return
+        for sName in ('kisc_host_consumables', 'kisc_host_consumables_used', 'kisc_host_consumables_free'):
+            KiscRuntime_metrics.clear(sName, {'host': sHost_id})
+        dtCapacity = oClusterCapacity.getCapacity([sHost_id])
+        for sConsumable_id in dtCapacity:
+            (iTotal, iUsed, iFree) = dtCapacity[sConsumable_id]
+            dsLabels = {'host': sHost_id, 'consumable': sConsumable_id}
+            KiscRuntime_metrics.gauge('kisc_host_consumables_used', dsLabels, iUsed)
+            if iTotal >= 0:
+                KiscRuntime_metrics.gauge('kisc_host_consumables', dsLabels, iTotal)
+                KiscRuntime_metrics.gauge('kisc_host_consumables_free', dsLabels, iFree)
+
+
     def __loadResources(self, _sConfigFile, _bBootstrap = False, _bAutostart = False):
         """
         Load resources configuration from file
@@ -280,15 +333,12 @@ class KiscCluster_config:
         try:
 
             # Load configuration from file
-            with open(_sConfigFile, 'r') as oFile:
-                oConfig = configparser.RawConfigParser()
-                oConfig.optionxform = lambda sOption: sOption  # do not lowercase option (key) name
-                oConfig.read_file(oFile, _sConfigFile)
+            ltSections = KiscCluster_config.readFile(_sConfigFile, True)
 
             # Loop through sections/resources (IDs)
-            for sId in oConfig.sections():
+            for (sId, dsConfig) in ltSections:
                 if sId == 'KiSC': continue
-                dsConfig = {tOption[0]: tOption[1] for tOption in oConfig.items(sId)}
+                dsConfig = dict(dsConfig)
                 if 'TYPE' not in dsConfig:
                     lsErrors.append('<%s> [%s] Invalid configuration section; missing "TYPE" parameter' % (_sConfigFile, sId))
                     continue
@@ -302,8 +352,7 @@ class KiscCluster_config:
                         if lsErrors_sub:
                             lsErrors.extend(['<%s> %s' % (_sConfigFile, sError) for sError in lsErrors_sub])
                     if 'directory' in dsConfig:
-                        import glob
-                        for sFile in glob.glob('%s/%s' % (dsConfig['directory'], dsConfig.get('glob', '*.cfg'))):
+                        for sFile in KiscCluster_config.globFiles(dsConfig['directory'], dsConfig.get('glob', '*.cfg')):
                             lsErrors_sub = self.__loadResources(sFile, bBootstrap_sub, bAutostart_sub)
                             if lsErrors_sub:
                                 lsErrors.extend(['<%s> %s' % (_sConfigFile, sError) for sError in lsErrors_sub])
@@ -351,6 +400,9 @@ class KiscCluster_config:
                 lsErrors.extend(lsErrors_sub)
                 raise RuntimeError('Invalid resource configuration')
 
+            # Parse resource consumables (once)
+            oResource.consumes()
+
             # Add resource
             if _sType == 'cluster_host':
                 # ... host definition
@@ -415,6 +467,9 @@ class KiscCluster_config:
                 lsErrors.extend(lsErrors_sub)
                 raise RuntimeError('Invalid resource configuration')
 
+            # Parse resource consumables (once)
+            oResource.consumes()
+
             # Add resource
             if _sId in self._diResources:
                 raise RuntimeError('Resource with same ID already exist')
@@ -560,8 +615,7 @@ class KiscCluster_config:
         """
 
         if _sHostname is None:
-            import socket
-            _sHostname = socket.getfqdn()
+            _sHostname = KiscCluster_config.__hostname()
         for oHost in self._doHosts.values():
             if _sHostname == oHost.getHostname():
                 return oHost
@@ -587,6 +641,16 @@ class KiscCluster_config:
         return self._doHostgroups[_sHostgroup_id]
 
 
+    def getHostgroupsIDs(self):
+        """
+        Get all hosts group IDs
+
+        @return list  Hosts groups IDs
+        """
+
+        return self._doHostgroups.keys()
+
+
     def getResources(self, _bBootstrap = False):
         """
         Get all resources, ordered as per configuration file(s)
@@ -741,28 +805,31 @@ class KiscCluster_config:
             try:
 
                 # ... retrieve configuration
+                oResource_sub = None
                 if sResource_id == 'KiSC':
                     dsConfig = self._dsConfig
                 elif sResource_id == '$HOST':
                     if _mHost is None:
                         raise RuntimeError('Target host not specified')
-                    dsConfig = _mHost.config()
+                    oResource_sub = _mHost
                 elif sResource_id == '$SELF':
                     if _mResource is None:
                         raise RuntimeError('Target resource not specified')
-                    dsConfig = _mResource.config()
+                    oResource_sub = _mResource
                 else:
                     try:
                         oResource_sub = self.getResource(sResource_id, False)
                     except RuntimeError as e:
                         oResource_sub = self.getResource(sResource_id, True)
+                if oResource_sub is not None:
                     dsConfig = oResource_sub.config()
 
                 # ... retrieve configuration setting
                 if sSetting[:8] == 'CONSUMES':
                     sConsumable_id = sSetting[9:-1]
-                    diConsumables = KiscRuntime.parseDictionary(dsConfig['CONSUMES'], 1, int)
-                    sValue = str(diConsumables[sConsumable_id])
+                    if oResource_sub is None or not oResource_sub.consumes().has(sConsumable_id):
+                        raise KeyError(sConsumable_id)
+                    sValue = str(oResource_sub.consumes().get(sConsumable_id))
                 elif sSetting[:11] == 'CONSUMABLES':
                     sConsumable_id = sSetting[12:-1]
                     diConsumables = KiscRuntime.parseDictionary(dsConfig['CONSUMABLES'], 1, int)
@@ -860,31 +927,161 @@ class KiscCluster_config:
         """
         if self._iVerbose: self._INFO('Caching file: %s > %s' % (_sFile_from, _sFile_to))
 
-        # Load source file
-        if self._iVerbose: self._DEBUG('Reading file (%s)' % _sFile_from)
-        if _sFile_from is None:
-            sFile = sys.stdin.read()
-        else:
-            with open(_sFile_from, 'r') as oFile:
-                sFile = oFile.read()
+        with KiscRuntime_trace.span(KiscRuntime_trace.KIND_CONFIG, 'resolve', None, {'file': _sFile_to}):
+            # Load source file
+            if self._iVerbose: self._DEBUG('Reading file (%s)' % _sFile_from)
+            if _sFile_from is None:
+                sFile = sys.stdin.read()
+            else:
+                with open(_sFile_from, 'r') as oFile:
+                    sFile = oFile.read()
 
-        # Resolve variables
-        sFile = self.resolveString(sFile, _mHost, _mResource, _bBootstrap)
+            # Resolve variables
+            sFile = self.resolveString(sFile, _mHost, _mResource, _bBootstrap)
 
-        # Save destination file
-        if self._iVerbose: self._DEBUG('Writing file (%s)' % _sFile_to)
-        if _sFile_to is None:
-            sys.stdout.write(sFile)
-        else:
-            os.makedirs(os.path.dirname(_sFile_to), exist_ok=True)
-            iUmask = os.umask(0o077)
-            oFile = None
-            try:
-                oFile = open(_sFile_to, 'w')
-                oFile.write(sFile)
-                if _tPermissions is not None:
-                    (mUser, mGroup, mMode) = _tPermissions
-                    KiscRuntime.perms(oFile.fileno(), mUser, mGroup, mMode, _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
-            finally:
-                if oFile: oFile.close()
-                os.umask(iUmask)
+            # Save destination file
+            if self._iVerbose: self._DEBUG('Writing file (%s)' % _sFile_to)
+            if _sFile_to is None:
+                sys.stdout.write(sFile)
+            else:
+                os.makedirs(os.path.dirname(_sFile_to), exist_ok=True)
+                iUmask = os.umask(0o077)
+                oFile = None
+                try:
+                    oFile = open(_sFile_to, 'w')
+                    oFile.write(sFile)
+                    if _tPermissions is not None:
+                        (mUser, mGroup, mMode) = _tPermissions
+                        KiscRuntime.perms(oFile.fileno(), mUser, mGroup, mMode, _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                finally:
+                    if oFile: oFile.close()
+                    os.umask(iUmask)
+
+
+    #--------------------------------------------------------------------------
+    # HELPERS
+    #--------------------------------------------------------------------------
+
+    def cache(_bEnable = True):
+        """
+        Enable (or disable) the configuration files cache
+
+        Once enabled, configuration files are parsed - and included directories
+        globbed - only once, as long as their (stat) signature does not change,
+        and the local hostname (FQDN) is resolved only once, until a
+        configuration file changes; this makes sense only for long-lived
+        processes (see KiscCli_agent_serve).
+
+        @param bool _bEnable  Enable (or disable) the cache
+        """
+
+        with KiscCluster_config._oLock_cache:
+            KiscCluster_config._bCache = _bEnable
+            KiscCluster_config._dtFiles = dict()
+            KiscCluster_config._dtGlobs = dict()
+            KiscCluster_config._sHostname = None
+
+
+    def readFile(_sFile, _bCaseSensitive = True):
+        """
+        Parse the given (INI) configuration file and return its sections
+
+        @param str  _sFile           Configuration file (path)
+        @param bool _bCaseSensitive  Do not lowercase option (key) names
+
+        @exception OSError              On file I/O error
+        @exception configparser.Error  On file parsing error
+
+        @return list  Ordered (section, options dictionary) tuples; the dictionaries MUST NOT be modified
+        """
+
+        if not KiscCluster_config._bCache:
+            return KiscCluster_config.__parseFile(_sFile, _bCaseSensitive)
+
+        tKey = (_sFile, _bCaseSensitive)
+        tSignature = KiscCluster_config.__signature(_sFile)
+        with KiscCluster_config._oLock_cache:
+            tCached = KiscCluster_config._dtFiles.get(tKey, None)
+            if tCached is not None and tCached[0] == tSignature:
+                KiscRuntime_metrics.cache('config', True)
+                return tCached[1]
+        KiscRuntime_metrics.cache('config', False)
+        ltSections = KiscCluster_config.__parseFile(_sFile, _bCaseSensitive)
+        with KiscCluster_config._oLock_cache:
+            KiscCluster_config._dtFiles[tKey] = (tSignature, ltSections)
+            KiscCluster_config._sHostname = None  # configuration changed; resolve the hostname anew
+        return ltSections
+
+
+    def globFiles(_sDirectory, _sGlob = '*.cfg'):
+        """
+        Return the files matching the given pattern in the given directory
+
+        @param str _sDirectory  Directory (path)
+        @param str _sGlob       File pattern
+
+        @return list  Files (paths)
+        """
+
+        import glob
+        sPattern = '%s/%s' % (_sDirectory, _sGlob)
+        if not KiscCluster_config._bCache or os.sep in _sGlob:
+            return glob.glob(sPattern)
+
+        # NOTE: adding, removing or renaming files changes the directory signature
+        try:
+            tSignature = KiscCluster_config.__signature(_sDirectory)
+        except OSError:
+            return list()
+        with KiscCluster_config._oLock_cache:
+            tCached = KiscCluster_config._dtGlobs.get(sPattern, None)
+            if tCached is not None and tCached[0] == tSignature:
+                return tCached[1]
+        lsFiles = glob.glob(sPattern)
+        with KiscCluster_config._oLock_cache:
+            KiscCluster_config._dtGlobs[sPattern] = (tSignature, lsFiles)
+        return lsFiles
+
+
+    def __parseFile(_sFile, _bCaseSensitive):
+        """
+        Parse the given (INI) configuration file and return its sections
+
+        @return list  Ordered (section, options dictionary) tuples
+        """
+
+        with open(_sFile, 'r') as oFile:
+            oConfig = configparser.RawConfigParser()
+            if _bCaseSensitive:
+                oConfig.optionxform = lambda sOption: sOption  # do not lowercase option (key) name
+            oConfig.read_file(oFile, _sFile)
+        return [(sId, {tOption[0]: tOption[1] for tOption in oConfig.items(sId)}) for sId in oConfig.sections()]
+
+
+    def __signature(_sPath):
+        """
+        Return the given file (or directory) signature, changing whenever it is modified
+
+        @exception OSError  On file I/O error
+
+        @return tuple  (modification time, size, inode) tuple
+        """
+
+        oStat = os.stat(_sPath)
+        return (oStat.st_mtime_ns, oStat.st_size, oStat.st_ino)
+
+
+    def __hostname():
+        """
+        Return the local hostname (FQDN)
+
+        @return str  Local hostname
+        """
+
+        sHostname = KiscCluster_config._sHostname
+        if sHostname is None:
+            import socket
+            sHostname = socket.getfqdn()
+            if KiscCluster_config._bCache:
+                KiscCluster_config._sHostname = sHostname
+        return sHostname
@@ -30,15 +30,18 @@ from KiSC.Resource import \
      KiscResource, \
      kiscResource
 from KiSC.Runtime import \
-     KiscRuntime
+     KiscRuntime, \
+     KiscRuntime_trace
 
 # Standard
 from configparser import \
      RawConfigParser
+import contextlib
 import os
 import os.path
 import stat
 import sys
+import threading
 
 
 #------------------------------------------------------------------------------
@@ -50,6 +53,17 @@ class KiscCluster_host:
     Cluster-level host object
     """
 
+    #--------------------------------------------------------------------------
+    # CLASS PROPERTIES
+    #--------------------------------------------------------------------------
+
+    # Runtime file(s) lock, serializing concurrent registrations across threads
+    # (see self.migrateResources()) and processes (see KiscCluster_host.lockRuntime())
+    _oRuntimeLock = threading.RLock()
+    _iRuntimeLock_fd = None
+    _iRuntimeLock_depth = 0
+
+
     #--------------------------------------------------------------------------
     # CONSTRUCTORS
     #--------------------------------------------------------------------------
@@ -70,6 +84,9 @@ class KiscCluster_host:
             'runtime_file': sHost_runtime_file,
         }
 
+        # ... tracing
+        self._sTrace = KiscRuntime_trace.resource(self._oHost.type(), self._oHost.id(), self._sHost_id)
+
         # ... debugging
         self._iVerbose = KiscRuntime.VERBOSE_NONE
 
@@ -151,6 +168,41 @@ class KiscCluster_host:
         return self._oHost
 
 
+    @contextlib.contextmanager
+    def lockRuntime(_oClusterConfig):
+        """
+        (Exclusively) lock the hosts runtime files, across threads and processes
+
+        The lock is re-entrant (within the same thread). It MUST be acquired
+        before the capacity index lock (see KiscCluster_capacity).
+
+        @param KiscCluster_config _oClusterConfig  Cluster configuration (object)
+
+        @exception OSError  Lock file I/O error
+        """
+
+        import fcntl
+        with KiscCluster_host._oRuntimeLock:
+            if not KiscCluster_host._iRuntimeLock_depth:
+                sDirectory = _oClusterConfig.getDirectoryRuntimeGlobal()
+                os.makedirs(sDirectory, exist_ok=True)
+                iFd = os.open(sDirectory+os.sep+'cluster_host.lock', os.O_RDWR|os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(iFd, fcntl.LOCK_EX)
+                except OSError as e:
+                    os.close(iFd)
+                    raise e
+                KiscCluster_host._iRuntimeLock_fd = iFd
+            KiscCluster_host._iRuntimeLock_depth += 1
+            try:
+                yield
+            finally:
+                KiscCluster_host._iRuntimeLock_depth -= 1
+                if not KiscCluster_host._iRuntimeLock_depth:
+                    os.close(KiscCluster_host._iRuntimeLock_fd)  # (releasing the lock)
+                    KiscCluster_host._iRuntimeLock_fd = None
+
+
     def existsRuntime(self):
         """
         Return whether the host runtime configuration and status file exists
@@ -171,15 +223,18 @@ class KiscCluster_host:
         """
         if self._iVerbose: self._DEBUG('Saving runtime')
 
-        os.makedirs(os.path.dirname(self._dsPaths['runtime_file']), exist_ok=True)
-        iUmask = os.umask(0o077)
-        oFile = None
-        try:
-            oFile = open(self._dsPaths['runtime_file'], 'w')
-            oFile.write(self._oHost.toString(True))
-        finally:
-            if oFile: oFile.close()
-            os.umask(iUmask)
+        with KiscRuntime_trace.span(KiscRuntime_trace.KIND_RUNTIME, 'save', self._sTrace, {'file': self._dsPaths['runtime_file']}):
+            os.makedirs(os.path.dirname(self._dsPaths['runtime_file']), exist_ok=True)
+            with KiscCluster_host.lockRuntime(self._oClusterConfig):
+                iUmask = os.umask(0o077)
+                oFile = None
+                try:
+                    oFile = open(self._dsPaths['runtime_file'], 'w')
+                    oFile.write(self._oHost.toString(True))
+                finally:
+                    if oFile: oFile.close()
+                    os.umask(iUmask)
+                self._updateCapacity()
 
 
     def loadRuntime(self):
@@ -191,12 +246,14 @@ class KiscCluster_host:
         """
         if self._iVerbose: self._DEBUG('Loading runtime')
 
-        with open(self._dsPaths['runtime_file'], 'r') as oFile:
-            oRuntimeConfig = RawConfigParser()
-            oRuntimeConfig.optionxform = lambda sOption: sOption  # do not lowercase option (key) name
-            oRuntimeConfig.read_file(oFile, self._dsPaths['runtime_file'])
-        self._oHost = kiscResource(self._oHost.type(), self._oHost.id(), {tOption[0]: tOption[1] for tOption in oRuntimeConfig.items(self._oHost.id())})
-        self._oHost.VERBOSE(self._iVerbose)
+        with KiscRuntime_trace.span(KiscRuntime_trace.KIND_RUNTIME, 'load', self._sTrace, {'file': self._dsPaths['runtime_file']}):
+            with KiscCluster_host.lockRuntime(self._oClusterConfig):
+                with open(self._dsPaths['runtime_file'], 'r') as oFile:
+                    oRuntimeConfig = RawConfigParser()
+                    oRuntimeConfig.optionxform = lambda sOption: sOption  # do not lowercase option (key) name
+                    oRuntimeConfig.read_file(oFile, self._dsPaths['runtime_file'])
+            self._oHost = kiscResource(self._oHost.type(), self._oHost.id(), {tOption[0]: tOption[1] for tOption in oRuntimeConfig.items(self._oHost.id())})
+            self._oHost.VERBOSE(self._iVerbose)
 
 
     def deleteRuntime(self):
@@ -207,7 +264,32 @@ class KiscCluster_host:
         """
         if self._iVerbose: self._DEBUG('Deleting runtime')
 
-        os.unlink(self._dsPaths['runtime_file'])
+        with KiscRuntime_trace.span(KiscRuntime_trace.KIND_RUNTIME, 'delete', self._sTrace, {'file': self._dsPaths['runtime_file']}):
+            with KiscCluster_host.lockRuntime(self._oClusterConfig):
+                os.unlink(self._dsPaths['runtime_file'])
+                self._updateCapacity(True)
+
+
+    def _updateCapacity(self, _bRemove = False):
+        """
+        Update the cluster capacity index (see KiscCluster_capacity)
+
+        Index update failures are not fatal (the index can be rebuilt).
+
+        @param bool _bRemove  Remove the host from the index
+        """
+
+        from KiSC.Cluster.capacity import KiscCluster_capacity
+        from configparser import Error as ConfigParserError
+        try:
+            oClusterCapacity = KiscCluster_capacity(self._oClusterConfig)
+            oClusterCapacity.VERBOSE(self._iVerbose)
+            if _bRemove:
+                oClusterCapacity.remove(self._sHost_id)
+            else:
+                oClusterCapacity.update(self._oHost)
+        except (OSError, RuntimeError, ConfigParserError) as e:
+            if self._iVerbose: self._WARNING('Failed to update capacity index; %s' % str(e))
 
 
     #
@@ -224,6 +306,7 @@ class KiscCluster_host:
         lsErrors = list()
 
         # Start the host
+        oTrace = KiscRuntime_trace.phase('host start', self._sTrace)
         try:
 
             # ... virtual ?
@@ -278,6 +361,8 @@ class KiscCluster_host:
             if self._iVerbose: self._ERROR(str(e))
             lsErrors.append(str(e))
             self.stop(True)
+        finally:
+            oTrace.end(1 if lsErrors else 0)
 
         # Done
         return lsErrors
@@ -295,6 +380,7 @@ class KiscCluster_host:
         lsErrors = list()
 
         # Stop the host
+        oTrace = KiscRuntime_trace.phase('host stop', self._sTrace)
         try:
 
             # ... virtual ?
@@ -361,7 +447,7 @@ class KiscCluster_host:
 
             # ... delete runtime file
             if bHost_runtime_file:
-                os.unlink(self._dsPaths['runtime_file'])
+                self.deleteRuntime()
 
             # ... done
             if self._iVerbose: self._INFO('Stopped')
@@ -369,6 +455,8 @@ class KiscCluster_host:
         except (OSError, RuntimeError) as e:
             if self._iVerbose: self._ERROR(str(e))
             lsErrors.append(str(e))
+        finally:
+            oTrace.end(1 if lsErrors else 0)
 
         # Done
         return lsErrors
@@ -387,6 +475,7 @@ class KiscCluster_host:
 
         # Status check
         iStatus = KiscRuntime.STATUS_STOPPED
+        oTrace = KiscRuntime_trace.phase('host status', self._sTrace)
         try:
 
             bHost_runtime_file = self.existsRuntime()
@@ -408,12 +497,215 @@ class KiscCluster_host:
         except (OSError, RuntimeError) as e:
             if self._iVerbose: self._ERROR(str(e))
             iStatus = KiscRuntime.STATUS_ERROR
+        finally:
+            oTrace.end(1 if iStatus == KiscRuntime.STATUS_ERROR else 0, {'status': KiscRuntime.STATUS_MESSAGE[iStatus]})
 
         # Done
         if self._iVerbose: self._INFO('Status is %s' % KiscRuntime.STATUS_MESSAGE[iStatus])
         return iStatus
 
 
+    #
+    # Migration
+    #
+
+    def evacuate(self, _sHost_id = None, _iJobs = 1, _iJobsPerHost = 1, _bForce = False, _fCallback = None):
+        """
+        Evacuate the host, migrating all its (regular) resources to the given host
+        or - if none is given - to automatically selected hosts
+
+        Resources that do not support migration (see KiscResource.isMigratable())
+        are skipped - left running on the host - and reported as such.
+
+        @param str      _sHost_id      Target host ID (automatically selected if None)
+        @param int      _iJobs         Maximum quantity of concurrent migrations
+        @param int      _iJobsPerHost  Maximum quantity of concurrent migrations per target host
+        @param bool     _bForce        Forcefully migrate resources (allow consumables oversubscription)
+        @param function _fCallback     Progress callback (see self.migrateResources())
+
+        @return (list, list, list)  1st tuple: Empty if host is successfully evacuated, (ordered) error messages otherwise
+                                    2nd tuple: list of (sResource_id, sHost_id, lsErrors, fDuration) migration results
+                                    3rd tuple: list of skipped (non-migratable) resources (IDs)
+        """
+        if self._iVerbose: self._INFO('Evacuating')
+        lsErrors = list()
+        ltResults = list()
+        lsSkipped = list()
+
+        # Evacuate the host
+        try:
+
+            # ... localhost ?
+            if self._sHost_id != self._oClusterConfig.getHostByHostname().id():
+                raise RuntimeError('Cannot evacuate remote host')
+
+            # ... same host ?
+            if self._sHost_id == _sHost_id:
+                raise RuntimeError('Cannot evacuate host to itself')
+
+            # ... check host status
+            if self.status(True, KiscRuntime.STATUS_STARTED) != KiscRuntime.STATUS_STARTED:
+                raise RuntimeError('Host not started')
+
+            # ... registration delegation ?
+            if self._oHost.registerTo() is not None:
+                raise RuntimeError('Resource registration delegated to other host')
+
+            # ... skip non-migratable resources
+            lsResources_ids = list()
+            for sResource_id in self._oHost.getResourcesIDs():
+                if self._oClusterConfig.getResource(sResource_id).isMigratable():
+                    lsResources_ids.append(sResource_id)
+                else:
+                    if self._iVerbose: self._WARNING('Resource does not support migration; skipping (%s)' % sResource_id)
+                    lsSkipped.append(sResource_id)
+
+            # ... migrate the host's (regular) resources
+            (lsErrors_sub, ltResults) = self.migrateResources([(sResource_id, _sHost_id) for sResource_id in lsResources_ids], _iJobs, _iJobsPerHost, _bForce, _fCallback)
+            if lsErrors_sub:
+                lsErrors.extend(lsErrors_sub)
+                raise RuntimeError('Failed to evacuate host')
+
+            # ... done
+            if self._iVerbose: self._INFO('Evacuated')
+
+        except (OSError, RuntimeError) as e:
+            if self._iVerbose: self._ERROR(str(e))
+            lsErrors.append(str(e))
+
+        # Done
+        return (lsErrors, ltResults, lsSkipped)
+
+
+    def migrateResources(self, _ltMigrations, _iJobs = 1, _iJobsPerHost = 1, _bForce = False, _fCallback = None):
+        """
+        Concurrently migrate the given resources from this (local) host
+
+        Migrations are dispatched as soon as the global and per-(target)host
+        concurrency limits allow it, provided the target host has enough
+        consumables left - accounting for the migrations already dispatched -
+        such as registrations may never fail once a resource has been moved.
+        Migrations without target host are dispatched to the best-ranked host
+        (see KiscCluster_placement.rank()).
+
+        The progress callback is called from the calling thread, with the
+        (sResource_id, sHost_id, lsErrors, fDuration) arguments, lsErrors
+        being None when the migration is dispatched.
+
+        @param list     _ltMigrations  List of (sResource_id, sHost_id) migrations (sHost_id may be None)
+        @param int      _iJobs         Maximum quantity of concurrent migrations
+        @param int      _iJobsPerHost  Maximum quantity of concurrent migrations per target host
+        @param bool     _bForce        Forcefully migrate resources (allow consumables oversubscription)
+        @param function _fCallback     Progress callback
+
+        @return (list, list)  1st tuple: Empty if all resources are successfully migrated, (ordered) error messages otherwise
+                              2nd tuple: list of (sResource_id, sHost_id, lsErrors, fDuration) migration results
+        """
+        if self._iVerbose: self._INFO('Migrating resources (%d)' % len(_ltMigrations))
+        lsErrors = list()
+        ltResults = list()
+        if not _ltMigrations:
+            return (lsErrors, ltResults)
+
+        # Migrate resources
+        import concurrent.futures
+        import time
+        _iJobs = max(1, _iJobs)
+        _iJobsPerHost = max(1, _iJobsPerHost)
+
+        # ... target hosts (and their consumables)
+        from KiSC.Cluster.placement import KiscCluster_placement
+        oPlacement = KiscCluster_placement(self._oClusterConfig)
+        oPlacement.VERBOSE(self._iVerbose)
+        lsErrors_sub = oPlacement.load()
+        if lsErrors_sub:
+            lsErrors.extend(lsErrors_sub)
+            lsErrors.append('Failed to load target hosts')
+            if self._iVerbose: self._ERROR(lsErrors[-1])
+            return (lsErrors, ltResults)
+
+        # ... target selection; returns (sHost_id, None) to dispatch, (None, None) to wait and (None, sError) to fail
+        diRunning = {sHost_id: 0 for sHost_id in oPlacement.getHostsIDs() if sHost_id != self._sHost_id}
+        def target(sResource_id, sHost_id):
+            if sHost_id is not None:
+                if sHost_id == self._sHost_id:
+                    return (None, 'Cannot migrate resource from/to same host')
+                if sHost_id not in diRunning:
+                    return (None, 'Target host not started (%s)' % sHost_id)
+                if not self._oClusterConfig.isHostResource(sHost_id, sResource_id):
+                    return (None, 'Resource is not allowed to run on target host (%s)' % sHost_id)
+                if sHost_id not in [tHost[0] for tHost in oPlacement.rank(sResource_id, self._sHost_id, False, _bForce)]:
+                    return (None, 'Target host\'s consumables exhausted (%s)' % sHost_id)
+                if diRunning[sHost_id] >= _iJobsPerHost:
+                    return (None, None)
+                return (sHost_id, None)
+            ltHosts = oPlacement.rank(sResource_id, self._sHost_id, False, _bForce)
+            if not ltHosts:
+                return (None, 'No suitable target host')
+            ltHosts = [tHost for tHost in ltHosts if diRunning[tHost[0]] < _iJobsPerHost]
+            if not ltHosts:
+                return (None, None)
+            return (max(ltHosts, key=lambda tHost: (tHost[1], -diRunning[tHost[0]]))[0], None)
+
+        # ... migration (worker)
+        def migrate(sResource_id, sHost_id):
+            from KiSC.Cluster.resource import KiscCluster_resource
+            try:
+                oClusterResource = KiscCluster_resource(self._oClusterConfig, self._sHost_id, sResource_id)
+                oClusterResource.VERBOSE(self._iVerbose)
+                return oClusterResource.migrate(sHost_id, _bForce)
+            except (OSError, RuntimeError, SystemError) as e:
+                return [str(e)]
+
+        # ... dispatch
+        ltPending = list(_ltMigrations)
+        dtRunning = dict()
+        oExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=_iJobs)
+        try:
+            while ltPending or dtRunning:
+                for tMigration in list(ltPending):
+                    if len(dtRunning) >= _iJobs:
+                        break
+                    (sResource_id, sHost_id) = tMigration
+                    try:
+                        (sHost_id, sError) = target(sResource_id, sHost_id)
+                    except RuntimeError as e:
+                        sError = str(e)
+                    if sHost_id is None and sError is None:
+                        continue
+                    ltPending.remove(tMigration)
+                    if sError is not None:
+                        if self._iVerbose: self._ERROR('%s (%s)' % (sError, sResource_id))
+                        ltResults.append((sResource_id, tMigration[1], [sError], 0.0))
+                        if _fCallback: _fCallback(*ltResults[-1])
+                        continue
+                    if self._iVerbose: self._INFO('Dispatching resource migration (%s > %s)' % (sResource_id, sHost_id))
+                    oPlacement.reserve(sResource_id, sHost_id, self._sHost_id)
+                    diRunning[sHost_id] += 1
+                    dtRunning[oExecutor.submit(KiscRuntime_trace.bind(migrate), sResource_id, sHost_id)] = (sResource_id, sHost_id, time.time())
+                    if _fCallback: _fCallback(sResource_id, sHost_id, None, 0.0)
+                if not dtRunning:
+                    break
+                (loDone, loNotDone) = concurrent.futures.wait(list(dtRunning.keys()), return_when=concurrent.futures.FIRST_COMPLETED)
+                for oFuture in loDone:
+                    (sResource_id, sHost_id, fStart) = dtRunning.pop(oFuture)
+                    diRunning[sHost_id] -= 1
+                    ltResults.append((sResource_id, sHost_id, oFuture.result(), time.time()-fStart))
+                    if _fCallback: _fCallback(*ltResults[-1])
+        finally:
+            oExecutor.shutdown(wait=True)
+
+        # ... summary
+        iFailed = len([tResult for tResult in ltResults if tResult[2]])
+        if iFailed:
+            lsErrors.append('Failed to migrate resources (%d/%d)' % (iFailed, len(_ltMigrations)))
+            if self._iVerbose: self._ERROR(lsErrors[-1])
+        elif self._iVerbose: self._INFO('Resources migrated (%d)' % len(_ltMigrations))
+
+        # Done
+        return (lsErrors, ltResults)
+
+
     #
     # Registration
     #
@@ -442,25 +734,28 @@ class KiscCluster_host:
             if not _bBootstrap and self._oHost.registerTo() is not None:
                 raise SystemError('Resource registration delegated to other host')
 
-            # ... runtime status check
-            if not self.existsRuntime():
-                raise RuntimeError('Host not started')
+            # ... (atomically) load, update and save runtime configuration and status
+            with KiscCluster_host.lockRuntime(self._oClusterConfig):
 
-            # ... load runtime configuration and status from file
-            self.loadRuntime()
+                # ... runtime status check
+                if not self.existsRuntime():
+                    raise RuntimeError('Host not started')
 
-            # ... register resource
-            lsErrors_sub = self._oHost.registerResource(_oResource, _bBootstrap, _bCheck, _bOversubscribe)
-            if lsErrors_sub:
-                lsErrors.extend(lsErrors_sub)
-                raise RuntimeError('Failed to register host\'s resource (%s)' % _oResource.id())
+                # ... load runtime configuration and status from file
+                self.loadRuntime()
 
-            # ... check ?
-            if _bCheck:
-                return lsErrors
+                # ... register resource
+                lsErrors_sub = self._oHost.registerResource(_oResource, _bBootstrap, _bCheck, _bOversubscribe)
+                if lsErrors_sub:
+                    lsErrors.extend(lsErrors_sub)
+                    raise RuntimeError('Failed to register host\'s resource (%s)' % _oResource.id())
 
-            # ... save runtime configuration and status to file
-            self.saveRuntime()
+                # ... check ?
+                if _bCheck:
+                    return lsErrors
+
+                # ... save runtime configuration and status to file
+                self.saveRuntime()
 
             # ... done
             if self._iVerbose: self._INFO('Resource registered (%s)' % _oResource.id())
@@ -495,21 +790,24 @@ class KiscCluster_host:
             if not _bBootstrap and self._oHost.registerTo() is not None:
                 raise SystemError('Resource registration delegated to other host')
 
-            # ... runtime status check
-            if not self.existsRuntime():
-                raise RuntimeError('Host not started')
+            # ... (atomically) load, update and save runtime configuration and status
+            with KiscCluster_host.lockRuntime(self._oClusterConfig):
 
-            # ... load runtime configuration and status from file
-            self.loadRuntime()
+                # ... runtime status check
+                if not self.existsRuntime():
+                    raise RuntimeError('Host not started')
 
-            # ... unregister resource
-            lsErrors_sub = self._oHost.unregisterResource(_oResource, _bBootstrap)
-            if lsErrors_sub:
-                lsErrors.extend(lsErrors_sub)
-                raise RuntimeError('Failed to unregister host\'s resource (%s)' % _oResource.id())
+                # ... load runtime configuration and status from file
+                self.loadRuntime()
 
-            # ... save runtime configuration and status to file
-            self.saveRuntime()
+                # ... unregister resource
+                lsErrors_sub = self._oHost.unregisterResource(_oResource, _bBootstrap)
+                if lsErrors_sub:
+                    lsErrors.extend(lsErrors_sub)
+                    raise RuntimeError('Failed to unregister host\'s resource (%s)' % _oResource.id())
+
+                # ... save runtime configuration and status to file
+                self.saveRuntime()
 
             # ... done
             if self._iVerbose: self._INFO('Resource unregistered (%s)' % _oResource.id())
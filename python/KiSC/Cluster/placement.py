@@ -0,0 +1,586 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# KiSC
+from KiSC.Runtime import \
+     KiscRuntime
+
+# Standard
+import sys
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscCluster_placement:
+    """
+    Cluster-level (consumables-aware) resources placement engine
+
+    The started hosts runtime is read once (see self.load()) and consumables
+    are then kept in columnar form - one list per consumable, indexed by
+    registration host (see 'register_to') - such as hosts scoring amounts to
+    a few list comprehensions per (consumed) consumable, however many hosts
+    there are.
+
+    The score of a host is the lowest fraction of (limited) consumables that
+    would remain free once the resource is placed on it; hosts which would
+    end up with negative scores - exhausted consumables - are not eligible
+    (unless oversubscription is allowed).
+    """
+
+    #--------------------------------------------------------------------------
+    # CONSTRUCTORS
+    #--------------------------------------------------------------------------
+
+    def __init__(self, _oClusterConfig):
+        # Properties
+        self._oClusterConfig = _oClusterConfig
+
+        # ... hosts, registration hosts (pools) and caches (see self._reset())
+        self._reset()
+
+        # ... debugging
+        self._iVerbose = KiscRuntime.VERBOSE_NONE
+
+
+    #--------------------------------------------------------------------------
+    # METHODS: self
+    #--------------------------------------------------------------------------
+
+    #
+    # Debugging
+    #
+
+    def VERBOSE(self, _iVerbose):
+        """
+        Set verbosity level
+
+        @param int _iVerbose  Verbosity level (self KiscRuntime.VERBOSE_* constants)
+        """
+
+        self._iVerbose = _iVerbose
+
+
+    def _ERROR(self, _sMessage):
+        """
+        Print ERROR message to standard error
+
+        @param str _sMessage  Message to print
+        """
+
+        if(self._iVerbose >= KiscRuntime.VERBOSE_ERROR):
+            sys.stderr.write('ERROR[CP] %s\n' % _sMessage.replace('\n', '¬'))
+
+
+    def _WARNING(self, _sMessage):
+        """
+        Print WARNING message to standard error
+
+        @param str _sMessage  Message to print
+        """
+
+        if(self._iVerbose >= KiscRuntime.VERBOSE_WARNING):
+            sys.stderr.write('WARNING[CP] %s\n' % _sMessage.replace('\n', '¬'))
+
+
+    def _INFO(self, _sMessage):
+        """
+        Print INFO message to standard error
+
+        @param str _sMessage  Message to print
+        """
+
+        if(self._iVerbose >= KiscRuntime.VERBOSE_INFO):
+            sys.stderr.write('INFO[CP] %s\n' % _sMessage.replace('\n', '¬'))
+
+
+    def _DEBUG(self, _sMessage):
+        """
+        Print DEBUG message to standard error
+
+        @param str _sMessage  Message to print
+        """
+
+        if(self._iVerbose >= KiscRuntime.VERBOSE_DEBUG):
+            sys.stderr.write('DEBUG[CP] %s\n' % _sMessage.replace('\n', '¬'))
+
+
+    #
+    # Loading
+    #
+
+    def _reset(self):
+        """
+        Reset the loaded hosts, registration hosts (pools) consumables and caches
+        """
+
+        # ... hosts (eligible for placement) and their registration (pool) index
+        self._lsHosts_ids = list()
+        self._diHosts = dict()
+        self._liHosts_pools = list()
+
+        # ... registration hosts (pools) and their consumables (columns)
+        self._lsPools_ids = list()
+        self._diPools = dict()
+        self._dlfConsumables = dict()
+        self._dlfConsumables_used = dict()
+
+        # ... registration hosts (pools) resources
+        self._llsPools_resources = list()
+
+        # ... caches
+        self._dlbAllowed = dict()
+        self._ddiConsumes = dict()
+
+
+    def load(self, _lsHosts_ids = None):
+        """
+        Load the (started) hosts runtime configuration and status
+
+        Virtual hosts are not eligible for placement; they only provide the
+        consumables of the hosts delegating them resources registration.
+
+        @param list _lsHosts_ids  Hosts (IDs) eligible for placement (default: all hosts)
+
+        @return list  Empty if hosts are successfully loaded, (ordered) error messages otherwise
+        """
+        if self._iVerbose: self._INFO('Loading hosts')
+        lsErrors = list()
+
+        # Load hosts
+        from KiSC.Cluster.host import KiscCluster_host
+        try:
+            self._reset()
+
+            # ... (started) hosts runtime
+            dtHosts = dict()
+            for sHost_id in self._oClusterConfig.getHostsIDs():
+                oClusterHost = KiscCluster_host(self._oClusterConfig, sHost_id)
+                oClusterHost.VERBOSE(self._iVerbose)
+                if not oClusterHost.existsRuntime():
+                    continue
+                oClusterHost.loadRuntime()
+                dtHosts[sHost_id] = (oClusterHost.host(), oClusterHost.host().registerTo() or sHost_id)
+
+            # ... eligible hosts and registration hosts (pools)
+            if _lsHosts_ids is None:
+                _lsHosts_ids = self._oClusterConfig.getHostsIDs()
+            for sHost_id in _lsHosts_ids:
+                if sHost_id not in dtHosts:
+                    continue
+                (oHost, sPool_id) = dtHosts[sHost_id]
+                if oHost.isVirtual() or sPool_id not in dtHosts:
+                    continue
+                if sPool_id not in self._diPools:
+                    self._diPools[sPool_id] = len(self._lsPools_ids)
+                    self._lsPools_ids.append(sPool_id)
+                self._diHosts[sHost_id] = len(self._lsHosts_ids)
+                self._lsHosts_ids.append(sHost_id)
+                self._liHosts_pools.append(self._diPools[sPool_id])
+
+            # ... consumables (columns); illimited or missing consumables are infinite,
+            #     zero-quantity ones infinitesimal (avoiding divisions by zero)
+            iPools = len(self._lsPools_ids)
+            for iPool in range(iPools):
+                oHost = dtHosts[self._lsPools_ids[iPool]][0]
+                diConsumables = oHost.getConsumables()
+                diConsumables_used = oHost.getConsumablesUsed()
+                for sConsumable_id in diConsumables:
+                    if sConsumable_id not in self._dlfConsumables:
+                        self._dlfConsumables[sConsumable_id] = [float('inf')]*iPools
+                        self._dlfConsumables_used[sConsumable_id] = [0.0]*iPools
+                    if diConsumables[sConsumable_id] >= 0:
+                        self._dlfConsumables[sConsumable_id][iPool] = float(diConsumables[sConsumable_id]) or sys.float_info.min
+                    self._dlfConsumables_used[sConsumable_id][iPool] = float(diConsumables_used.get(sConsumable_id, 0))
+                self._llsPools_resources.append(oHost.getResourcesIDs())
+
+            # ... done
+            if self._iVerbose: self._INFO('Hosts loaded (%d/%d)' % (len(self._lsHosts_ids), len(self._lsPools_ids)))
+
+        except (OSError, RuntimeError) as e:
+            if self._iVerbose: self._ERROR(str(e))
+            lsErrors.append(str(e))
+
+        # Done
+        return lsErrors
+
+
+    #
+    # Helpers
+    #
+
+    def getHostsIDs(self):
+        """
+        Return the hosts (IDs) eligible for placement
+
+        @return list  List of hosts IDs
+        """
+
+        return self._lsHosts_ids
+
+
+    def getRegistrationHostID(self, _sHost_id):
+        """
+        Return the registration host (ID) of the given (eligible) host
+
+        @param str _sHost_id  Host ID
+
+        @return str  Registration host ID, None if host is not eligible for placement
+        """
+
+        if _sHost_id not in self._diHosts:
+            return None
+        return self._lsPools_ids[self._liHosts_pools[self._diHosts[_sHost_id]]]
+
+
+    def _pool(self, _sHost_id):
+        """
+        Return the registration host (pool) index of the given host
+
+        @param str _sHost_id  Host ID (may be None)
+
+        @return int  Registration host index, -1 if host is not eligible for placement
+        """
+
+        if _sHost_id not in self._diHosts:
+            return -1
+        return self._liHosts_pools[self._diHosts[_sHost_id]]
+
+
+    def _consumes(self, _sResource_id):
+        """
+        Return the (cached) consumables consumed by the given resource
+
+        @param str _sResource_id  Resource ID
+
+        @return dict  Dictionary associating consumables ID and their consumed quantity
+
+        @exception RuntimeError  If resource cannot be found
+        """
+
+        if _sResource_id not in self._ddiConsumes:
+            diConsumes = self._oClusterConfig.getResource(_sResource_id).consumes().toDict()
+            self._ddiConsumes[_sResource_id] = {k: diConsumes[k] for k in diConsumes if k in self._dlfConsumables}
+        return self._ddiConsumes[_sResource_id]
+
+
+    def _allowed(self, _sResource_id):
+        """
+        Return the (cached) hosts allowance mask of the given resource
+
+        @param str _sResource_id  Resource ID
+
+        @return list  List of booleans, indexed as self._lsHosts_ids
+
+        @exception RuntimeError  If resource cannot be found
+        """
+
+        sConfigHosts = self._oClusterConfig.getResource(_sResource_id).config().get('HOSTS', '@ALL')
+        if sConfigHosts not in self._dlbAllowed:
+            self._dlbAllowed[sConfigHosts] = [self._oClusterConfig.isHostAllowed(sConfigHosts, sHost_id) for sHost_id in self._lsHosts_ids]
+        return self._dlbAllowed[sConfigHosts]
+
+
+    #
+    # Placement
+    #
+
+    def score(self, _sResource_id, _sHost_from = None):
+        """
+        Return the score of all eligible hosts for the given resource
+
+        When the resource is already running on a host (e.g. when migrating),
+        the hosts sharing its registration host are scored as if the resource
+        was released (and the host itself is not eligible).
+
+        @param str _sResource_id  Resource ID
+        @param str _sHost_from    Host (ID) the resource is running on (if any)
+
+        @return list  List of scores (None for disallowed hosts), indexed as self.getHostsIDs()
+
+        @exception RuntimeError  If resource cannot be found
+        """
+
+        # Registration hosts (pools) score
+        diConsumes = self._consumes(_sResource_id)
+        iPool_from = self._pool(_sHost_from)
+        lfScores_pools = [1.0]*len(self._lsPools_ids)
+        for sConsumable_id in diConsumes:
+            fConsumes = float(diConsumes[sConsumable_id])
+            lfConsumables_used = self._dlfConsumables_used[sConsumable_id]
+            if iPool_from >= 0:
+                lfConsumables_used = list(lfConsumables_used)
+                lfConsumables_used[iPool_from] -= fConsumes
+            lfScores_pools = [
+                fScore if fScore < fRemaining else fRemaining
+                for (fScore, fRemaining) in zip(
+                    lfScores_pools,
+                    [1.0-(fUsed+fConsumes)/fAvailable for (fUsed, fAvailable) in zip(lfConsumables_used, self._dlfConsumables[sConsumable_id])]
+                )
+            ]
+
+        # Hosts score
+        lfScores = [lfScores_pools[iPool] if bAllowed else None for (iPool, bAllowed) in zip(self._liHosts_pools, self._allowed(_sResource_id))]
+        if _sHost_from in self._diHosts:
+            lfScores[self._diHosts[_sHost_from]] = None
+        return lfScores
+
+
+    def rank(self, _sResource_id, _sHost_from = None, _bPack = False, _bOversubscribe = False):
+        """
+        Return the ranked list of hosts the given resource may be placed on
+
+        Hosts are ranked by decreasing score - spreading resources across hosts -
+        or, when packing, by increasing score - best-fit, keeping hosts free.
+
+        @param str  _sResource_id    Resource ID
+        @param str  _sHost_from      Host (ID) the resource is running on (if any)
+        @param bool _bPack           Pack resources (best-fit) rather than spread them
+        @param bool _bOversubscribe  Allow consumables oversubscription (DANGEROUS)
+
+        @return list  List of (sHost_id, fScore) tuples
+
+        @exception RuntimeError  If resource cannot be found
+        """
+
+        lfScores = self.score(_sResource_id, _sHost_from)
+        liHosts = [i for i in range(len(lfScores)) if lfScores[i] is not None and (_bOversubscribe or lfScores[i] >= 0.0)]
+        if _bPack:
+            liHosts.sort(key=lambda i: lfScores[i])
+        else:
+            liHosts.sort(key=lambda i: -lfScores[i])
+        return [(self._lsHosts_ids[i], lfScores[i]) for i in liHosts]
+
+
+    def reserve(self, _sResource_id, _sHost_id, _sHost_from = None):
+        """
+        Reserve (account for) the consumables of the given resource on the given host
+
+        @param str _sResource_id  Resource ID
+        @param str _sHost_id      Host (ID) the resource is placed on
+        @param str _sHost_from    Host (ID) the resource is running on (if any)
+
+        @exception RuntimeError  If resource cannot be found
+        """
+
+        iPool = self._pool(_sHost_id)
+        iPool_from = self._pool(_sHost_from)
+        if iPool == iPool_from:
+            return
+        diConsumes = self._consumes(_sResource_id)
+        for sConsumable_id in diConsumes:
+            if iPool >= 0:
+                self._dlfConsumables_used[sConsumable_id][iPool] += diConsumes[sConsumable_id]
+            if iPool_from >= 0:
+                self._dlfConsumables_used[sConsumable_id][iPool_from] -= diConsumes[sConsumable_id]
+
+
+    def place(self, _lsResources_ids, _bPack = False, _bOversubscribe = False, _bReserve = True):
+        """
+        Place the given resources on the best-fitting hosts
+
+        Resources are placed by decreasing size - their largest share of the
+        cluster-wide consumables - each on the best-ranked host (see self.rank()),
+        consumables being reserved as resources are placed: on the least-loaded
+        host by default (worst-fit decreasing heuristic, spreading resources) or,
+        when packing, on the most-loaded host that fits (best-fit decreasing
+        bin-packing heuristic).
+
+        @param list _lsResources_ids  Resources (IDs)
+        @param bool _bPack            Pack resources (best-fit) rather than spread them
+        @param bool _bOversubscribe   Allow consumables oversubscription (DANGEROUS)
+        @param bool _bReserve         Keep consumables reserved once placed
+
+        @return list  List of (sResource_id, sHost_id) tuples, in the given resources order (sHost_id being None if no host fits)
+
+        @exception RuntimeError  If resource cannot be found
+        """
+        if self._iVerbose: self._INFO('Placing resources (%d)' % len(_lsResources_ids))
+
+        # Resources size (largest share of cluster-wide consumables)
+        dfConsumables_total = {k: sum([f for f in self._dlfConsumables[k] if f < float('inf')]) for k in self._dlfConsumables}
+        def size(sResource_id):
+            diConsumes = self._consumes(sResource_id)
+            return max([diConsumes[k]/dfConsumables_total[k] for k in diConsumes if dfConsumables_total[k] > 0.0] or [0.0])
+
+        # Place resources (by decreasing size)
+        dsPlacements = dict()
+        dlfConsumables_used = {k: list(self._dlfConsumables_used[k]) for k in self._dlfConsumables_used}
+        for sResource_id in sorted(_lsResources_ids, key=lambda s: -size(s)):
+            ltHosts = self.rank(sResource_id, None, _bPack, _bOversubscribe)
+            if not ltHosts:
+                if self._iVerbose: self._WARNING('No suitable host (%s)' % sResource_id)
+                dsPlacements[sResource_id] = None
+                continue
+            dsPlacements[sResource_id] = ltHosts[0][0]
+            if self._iVerbose: self._DEBUG('Resource placed (%s > %s; %.3f)' % (sResource_id, ltHosts[0][0], ltHosts[0][1]))
+            self.reserve(sResource_id, ltHosts[0][0])
+        if not _bReserve:
+            self._dlfConsumables_used = dlfConsumables_used
+
+        # Done
+        return [(sResource_id, dsPlacements[sResource_id]) for sResource_id in _lsResources_ids]
+
+
+    def rebalance(self, _fBand = 0.1, _iMigrations = None):
+        """
+        Plan the migrations bringing the registration hosts consumables usage
+        within the given band around the cluster-wide mean usage
+
+        The registration host with the largest deviation - for any of its
+        consumables - is repeatedly picked and the single migration reducing
+        the most the out-of-band deviation of both its source and target hosts
+        is planned, until all hosts fall within band (or no migration brings
+        them closer to it); hosts within band are thus never pushed out of it,
+        and imbalance is never merely shifted from one host to another. Each
+        resource is migrated at most once and consumables are never
+        oversubscribed. Resources that do not support migration (see
+        KiscResource.isMigratable()) are never moved, nor are those registered
+        to another host than the one running them (see 'register_to'; the host
+        they actually run on being unknown).
+
+        @param float _fBand        Tolerated deviation from the cluster-wide mean usage (fraction)
+        @param int   _iMigrations  Maximum quantity of migrations (default: unlimited)
+
+        @return list  Ordered list of (sResource_id, sHost_from, sHost_to) migrations
+
+        @exception RuntimeError  If resource cannot be found
+        """
+        if self._iVerbose: self._INFO('Planning rebalancing (band: %.3f)' % _fBand)
+        ltMigrations = list()
+
+        # Limited consumables and their cluster-wide mean usage
+        lsConsumables = list()
+        lfMeans = list()
+        for sConsumable_id in sorted(self._dlfConsumables.keys()):
+            lfConsumables = self._dlfConsumables[sConsumable_id]
+            fAvailable = sum([f for f in lfConsumables if f < float('inf')])
+            if fAvailable <= 0.0:
+                continue
+            fUsed = sum([f for (f, fA) in zip(self._dlfConsumables_used[sConsumable_id], lfConsumables) if fA < float('inf')])
+            lsConsumables.append(sConsumable_id)
+            lfMeans.append(fUsed/fAvailable)
+        if not lsConsumables:
+            return ltMigrations
+        llfConsumables = [self._dlfConsumables[k] for k in lsConsumables]
+        llfConsumables_used = [self._dlfConsumables_used[k] for k in lsConsumables]
+
+        # Deviation (signed; largest in absolute value) of the given pool usage, once given resource consumption is added
+        def deviation(iPool, diConsumes, iSign):
+            fDeviation = 0.0
+            for i in range(len(lsConsumables)):
+                fAvailable = llfConsumables[i][iPool]
+                if fAvailable == float('inf') or fAvailable < 1.0:
+                    continue
+                f = (llfConsumables_used[i][iPool]+iSign*diConsumes.get(lsConsumables[i], 0))/fAvailable-lfMeans[i]
+                if abs(f) > abs(fDeviation):
+                    fDeviation = f
+            return fDeviation
+
+        # Deviation exceeding the band
+        def excess(fDeviation):
+            return max(0.0, abs(fDeviation)-_fBand)
+
+        # Whether the given resource fits the given pool
+        def fits(iPool, diConsumes):
+            for i in range(len(lsConsumables)):
+                if llfConsumables_used[i][iPool]+diConsumes.get(lsConsumables[i], 0) > llfConsumables[i][iPool]:
+                    return False
+            return True
+
+        # Pools hosts and movable resources (registered on the - single - host running them)
+        iPools = len(self._lsPools_ids)
+        lliPools_hosts = [list() for i in range(iPools)]
+        for iHost in range(len(self._lsHosts_ids)):
+            lliPools_hosts[self._liHosts_pools[iHost]].append(iHost)
+        setResources_ids = set(self._oClusterConfig.getResourcesIDs())
+        llsResources = [list() for i in range(iPools)]
+        for iPool in range(iPools):
+            if lliPools_hosts[iPool] == [self._diHosts.get(self._lsPools_ids[iPool], -1)]:
+                llsResources[iPool] = [s for s in self._llsPools_resources[iPool] if s in setResources_ids and self._oClusterConfig.getResource(s).isMigratable()]
+
+        # Plan migrations
+        lfDeviations = [deviation(iPool, {}, 0) for iPool in range(iPools)]
+        if self._iVerbose: self._DEBUG('Largest deviation: %.3f' % max([abs(f) for f in lfDeviations]))
+        setStuck = set()
+        setMoved = set()
+        while _iMigrations is None or len(ltMigrations) < _iMigrations:
+
+            # ... (non-stuck) pool with the largest deviation
+            liPools = [i for i in range(iPools) if abs(lfDeviations[i]) > _fBand and i not in setStuck]
+            if not liPools:
+                break
+            iPool = max(liPools, key=lambda i: abs(lfDeviations[i]))
+
+            # ... candidate sources and targets (among the most deviating pools of the opposite sign)
+            liPools_opposite = sorted(range(iPools), key=lambda i: lfDeviations[i], reverse=(lfDeviations[iPool] < 0.0))
+            liPools_opposite = [i for i in liPools_opposite if i != iPool][:8]
+            if lfDeviations[iPool] > 0.0:
+                ltPairs = [(iPool, i) for i in liPools_opposite]
+            else:
+                ltPairs = [(i, iPool) for i in liPools_opposite]
+
+            # ... best migration
+            tBest = None
+            for (iPool_from, iPool_to) in ltPairs:
+                fExcess_before = excess(lfDeviations[iPool_from])+excess(lfDeviations[iPool_to])
+                for sResource_id in llsResources[iPool_from]:
+                    if sResource_id in setMoved:
+                        continue
+                    diConsumes = self._consumes(sResource_id)
+                    if not fits(iPool_to, diConsumes):
+                        continue
+                    lbAllowed = self._allowed(sResource_id)
+                    liHosts = [i for i in lliPools_hosts[iPool_to] if lbAllowed[i]]
+                    if not liHosts:
+                        continue
+                    fDeviation_from = deviation(iPool_from, diConsumes, -1)
+                    fDeviation_to = deviation(iPool_to, diConsumes, 1)
+                    fGain = fExcess_before-excess(fDeviation_from)-excess(fDeviation_to)
+                    if fGain > 1e-9 and (tBest is None or fGain > tBest[0]):
+                        tBest = (fGain, sResource_id, iPool_from, iPool_to, liHosts[0], fDeviation_from, fDeviation_to)
+            if tBest is None:
+                setStuck.add(iPool)
+                continue
+
+            # ... apply migration
+            (fGain, sResource_id, iPool_from, iPool_to, iHost, fDeviation_from, fDeviation_to) = tBest
+            sHost_from = self._lsHosts_ids[lliPools_hosts[iPool_from][0]]
+            sHost_to = self._lsHosts_ids[iHost]
+            if self._iVerbose: self._DEBUG('Migration planned (%s: %s > %s; gain: %.3f)' % (sResource_id, sHost_from, sHost_to, fGain))
+            self.reserve(sResource_id, sHost_to, sHost_from)
+            llsResources[iPool_from].remove(sResource_id)
+            setMoved.add(sResource_id)
+            lfDeviations[iPool_from] = fDeviation_from
+            lfDeviations[iPool_to] = fDeviation_to
+            ltMigrations.append((sResource_id, sHost_from, sHost_to))
+
+        # Done
+        if self._iVerbose: self._INFO('Rebalancing planned (%d migrations; largest deviation: %.3f)' % (len(ltMigrations), max([abs(f) for f in lfDeviations])))
+        return ltMigrations
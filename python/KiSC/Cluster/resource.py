@@ -30,7 +30,8 @@ from KiSC.Resource import \
      KiscResource, \
      kiscResource
 from KiSC.Runtime import \
-     KiscRuntime
+     KiscRuntime, \
+     KiscRuntime_trace
 
 # Standard
 from configparser import \
@@ -74,6 +75,10 @@ class KiscCluster_resource:
             'resource_prefix': sResource_resource_prefix,
             'runtime_file': sResource_runtime_file,
         }
+        self._oResource.RUNTIME(self._oClusterConfig.getDirectoryRuntimeLocal())
+
+        # ... tracing
+        self._sTrace = KiscRuntime_trace.resource(self._oResource.type(), self._sResource_id, self._sHost_id)
 
         # ... debugging
         self._iVerbose = KiscRuntime.VERBOSE_NONE
@@ -175,15 +180,16 @@ class KiscCluster_resource:
         """
         if self._iVerbose: self._DEBUG('Saving runtime')
 
-        os.makedirs(os.path.dirname(self._dsPaths['runtime_file']), exist_ok=True)
-        iUmask = os.umask(0o077)
-        oFile = None
-        try:
-            oFile = open(self._dsPaths['runtime_file'], 'w')
-            oFile.write(self._oResource.toString(True))
-        finally:
-            if oFile: oFile.close()
-            os.umask(iUmask)
+        with KiscRuntime_trace.span(KiscRuntime_trace.KIND_RUNTIME, 'save', self._sTrace, {'file': self._dsPaths['runtime_file']}):
+            os.makedirs(os.path.dirname(self._dsPaths['runtime_file']), exist_ok=True)
+            iUmask = os.umask(0o077)
+            oFile = None
+            try:
+                oFile = open(self._dsPaths['runtime_file'], 'w')
+                oFile.write(self._oResource.toString(True))
+            finally:
+                if oFile: oFile.close()
+                os.umask(iUmask)
 
 
     def loadRuntime(self):
@@ -195,12 +201,14 @@ class KiscCluster_resource:
         """
         if self._iVerbose: self._DEBUG('Loading runtime')
 
-        with open(self._dsPaths['runtime_file'], 'r') as oFile:
-            oRuntimeConfig = RawConfigParser()
-            oRuntimeConfig.optionxform = lambda sOption: sOption  # do not lowercase option (key) name
-            oRuntimeConfig.read_file(oFile, self._dsPaths['runtime_file'])
-        self._oResource = kiscResource(self._oResource.type(), self._oResource.id(), {tOption[0]: tOption[1] for tOption in oRuntimeConfig.items(self._oResource.id())})
-        self._oResource.VERBOSE(self._iVerbose)
+        with KiscRuntime_trace.span(KiscRuntime_trace.KIND_RUNTIME, 'load', self._sTrace, {'file': self._dsPaths['runtime_file']}):
+            with open(self._dsPaths['runtime_file'], 'r') as oFile:
+                oRuntimeConfig = RawConfigParser()
+                oRuntimeConfig.optionxform = lambda sOption: sOption  # do not lowercase option (key) name
+                oRuntimeConfig.read_file(oFile, self._dsPaths['runtime_file'])
+            self._oResource = kiscResource(self._oResource.type(), self._oResource.id(), {tOption[0]: tOption[1] for tOption in oRuntimeConfig.items(self._oResource.id())})
+            self._oResource.VERBOSE(self._iVerbose)
+            self._oResource.RUNTIME(self._oClusterConfig.getDirectoryRuntimeLocal())
 
 
     def deleteRuntime(self):
@@ -211,7 +219,8 @@ class KiscCluster_resource:
         """
         if self._iVerbose: self._DEBUG('Deleting runtime')
 
-        os.unlink(self._dsPaths['runtime_file'])
+        with KiscRuntime_trace.span(KiscRuntime_trace.KIND_RUNTIME, 'delete', self._sTrace, {'file': self._dsPaths['runtime_file']}):
+            os.unlink(self._dsPaths['runtime_file'])
 
 
     #
@@ -231,6 +240,7 @@ class KiscCluster_resource:
 
         # Start the resource
         bForceStopOnError = False
+        oTrace = KiscRuntime_trace.phase('resource start', self._sTrace)
         try:
 
             # ... localhost ?
@@ -318,6 +328,8 @@ class KiscCluster_resource:
             if self._iVerbose: self._ERROR(str(e))
             lsErrors.append(str(e))
             if bForceStopOnError: self.stop(True)
+        finally:
+            oTrace.end(1 if lsErrors else 0)
 
         # Done
         return lsErrors
@@ -333,6 +345,7 @@ class KiscCluster_resource:
         lsErrors = list()
 
         # Suspend the resource
+        oTrace = KiscRuntime_trace.phase('resource suspend', self._sTrace)
         try:
 
             # ... bootstrap ?
@@ -373,6 +386,8 @@ class KiscCluster_resource:
         except (OSError, RuntimeError) as e:
             if self._iVerbose: self._ERROR(str(e))
             lsErrors.append(str(e))
+        finally:
+            oTrace.end(1 if lsErrors else 0)
 
         # Done
         return lsErrors
@@ -388,6 +403,7 @@ class KiscCluster_resource:
         lsErrors = list()
 
         # Resume the resource
+        oTrace = KiscRuntime_trace.phase('resource resume', self._sTrace)
         try:
 
             # ... bootstrap ?
@@ -428,6 +444,8 @@ class KiscCluster_resource:
         except (OSError, RuntimeError) as e:
             if self._iVerbose: self._ERROR(str(e))
             lsErrors.append(str(e))
+        finally:
+            oTrace.end(1 if lsErrors else 0)
 
         # Done
         return lsErrors
@@ -446,6 +464,7 @@ class KiscCluster_resource:
 
         # Stop the resource
         bForceStopOnError = False
+        oTrace = KiscRuntime_trace.phase('resource stop', self._sTrace)
         try:
 
             # ... localhost ?
@@ -515,6 +534,8 @@ class KiscCluster_resource:
             if self._iVerbose: self._ERROR(str(e))
             lsErrors.append(str(e))
             if bForceStopOnError: self.stop(True)
+        finally:
+            oTrace.end(1 if lsErrors else 0)
 
         # Done
         return lsErrors
@@ -533,6 +554,7 @@ class KiscCluster_resource:
 
         # Migrate the resource
         bForceStopOnError = False
+        oTrace = KiscRuntime_trace.phase('resource migrate', self._sTrace)
         try:
 
             # ... bootstrap ?
@@ -603,8 +625,12 @@ class KiscCluster_resource:
                     lsErrors.extend(lsErrors_sub)
                     raise RuntimeError('Remote host\'s resources registration check failed')
 
-            # ... migrate the resource
-            lsErrors_sub = self._oResource.migrate(oClusterHost_remote.host())
+            # ... migrate the resource (reporting its progress to the runtime file)
+            self._oResource.PROGRESS(self.saveRuntime)
+            try:
+                lsErrors_sub = self._oResource.migrate(oClusterHost_remote.host())
+            finally:
+                self._oResource.PROGRESS(None)
             if lsErrors_sub:
                 lsErrors.extend(lsErrors_sub)
                 raise RuntimeError('Failed to migrate resource')
@@ -648,15 +674,19 @@ class KiscCluster_resource:
             if self._iVerbose: self._ERROR(str(e))
             lsErrors.append(str(e))
             if bForceStopOnError: self.stop(True)
+        finally:
+            oTrace.end(1 if lsErrors else 0)
 
         # Done
         return lsErrors
 
 
-    def status(self, _bLocal = False, _iIntent = None):
+    def _status(self, _bLocal, _iIntent):
         """
-        Query the resource status
-        
+        Query the resource status (generator), yielding each (local) resource
+        status query - as its _bStateful argument - and receiving its result;
+        shared by status() and statusAsync(), which perform the actual query
+
         @param bool _bLocal   Query the resource local status (in addition to its global status)
         @param int  _iIntent  Intent (status) of the status check
 
@@ -666,13 +696,14 @@ class KiscCluster_resource:
 
         # Status check
         iStatus = KiscRuntime.STATUS_STOPPED
+        oTrace = KiscRuntime_trace.phase('resource status', self._sTrace)
         try:
 
             bResource_runtime_file = self.existsRuntime()
             if bResource_runtime_file:
                 self.loadRuntime()
             if _bLocal:
-                iResource_status = self._oResource.status(True, _iIntent)
+                iResource_status = yield True
                 if iResource_status == KiscRuntime.STATUS_UNKNOWN or iResource_status == KiscRuntime.STATUS_ERROR:
                     raise RuntimeError('Failed to query local resource status')
                 bResource_started = (iResource_status != KiscRuntime.STATUS_STOPPED)
@@ -684,12 +715,62 @@ class KiscCluster_resource:
                     else:
                         raise RuntimeError('Resource started locally but not globally')
             elif bResource_runtime_file:
-                iStatus = self._oResource.status(False, _iIntent)
+                iStatus = yield False
 
         except (OSError, RuntimeError) as e:
             if self._iVerbose: self._ERROR(str(e))
             iStatus = KiscRuntime.STATUS_ERROR
+        finally:
+            oTrace.end(1 if iStatus == KiscRuntime.STATUS_ERROR else 0, {'status': KiscRuntime.STATUS_MESSAGE[iStatus]})
 
         # Done
         if self._iVerbose: self._INFO('Status is %s' % KiscRuntime.STATUS_MESSAGE[iStatus])
         return iStatus
+
+
+    def status(self, _bLocal = False, _iIntent = None):
+        """
+        Query the resource status
+        
+        @param bool _bLocal   Query the resource local status (in addition to its global status)
+        @param int  _iIntent  Intent (status) of the status check
+
+        @return int  Resource status (see KiscRuntime.STATUS_* constants)
+        """
+
+        oStatus = self._status(_bLocal, _iIntent)
+        try:
+            bStateful = next(oStatus)
+            while True:
+                try:
+                    iResource_status = self._oResource.status(bStateful, _iIntent)
+                except BaseException as e:
+                    bStateful = oStatus.throw(e)  # handled (or re-raised) by _status()
+                    continue
+                bStateful = oStatus.send(iResource_status)
+        except StopIteration as e:
+            return e.value
+
+
+    async def statusAsync(self, _bLocal = False, _iIntent = None):
+        """
+        Query the resource status, asynchronously (see KiscResource.statusAsync())
+        
+        @param bool _bLocal   Query the resource local status (in addition to its global status)
+        @param int  _iIntent  Intent (status) of the status check
+
+        @return int  Resource status (see KiscRuntime.STATUS_* constants)
+        """
+
+        oStatus = self._status(_bLocal, _iIntent)
+        try:
+            bStateful = next(oStatus)
+            while True:
+                try:
+                    iResource_status = await self._oResource.statusAsync(bStateful, _iIntent)
+                except BaseException as e:
+                    bStateful = oStatus.throw(e)  # handled (or re-raised) by _status()
+                    continue
+                bStateful = oStatus.send(iResource_status)
+        except StopIteration as e:
+            return e.value
@@ -61,6 +61,9 @@ class KiscResource_cluster_copy(KiscResource):
        command to execute after the file is cached
      - [OPTIONAL] config_file (STRING; path):
        cluster variables configuration file
+     - [OPTIONAL] command_timeout_start (NUMBER; seconds [*none]):
+       timeout for each (shell) command executed by the start operation,
+       after which the command is killed (see KiscResource)
     """
 
 
@@ -107,7 +110,7 @@ class KiscResource_cluster_copy(KiscResource):
 
             # ... pre-cache command ?
             if 'command_pre' in self._dsConfig:
-                KiscRuntime.shell(self._dsConfig['command_pre'].split(' '), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                KiscRuntime.shell(self._dsConfig['command_pre'].split(' '), _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
 
             # ... permissions
             mUser = self._dsConfig.get('user', None)
@@ -139,7 +142,7 @@ class KiscResource_cluster_copy(KiscResource):
 
             # ... post-cache command ?
             if 'command_post' in self._dsConfig:
-                KiscRuntime.shell(self._dsConfig['command_post'].split(' '), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                KiscRuntime.shell(self._dsConfig['command_post'].split(' '), _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
 
             # ... done
             self._iStatus = KiscRuntime.STATUS_STARTED
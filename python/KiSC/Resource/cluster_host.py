@@ -28,6 +28,7 @@
 # KiSC
 from KiSC.Resource import KiscResource
 from KiSC.Runtime import KiscRuntime
+from KiSC.Runtime import KiscRuntime_consumables
 
 # Standard
 import socket
@@ -66,8 +67,8 @@ class KiscResource_cluster_host(KiscResource):
         self._bInitialized = False
         self._sHostname = None  # lazily initialized
         self._lsAliases = None  # lazily initialized
-        self._diConsumables = None  # lazily initialized
-        self._diConsumables_used = None  # lazily initialized
+        self._oConsumables = None  # lazily initialized
+        self._oConsumables_used = None  # lazily initialized
         self._bVirtual = None  # lazily initialized
         self._sResisterAs_id = None  # lazily initialized
 
@@ -80,9 +81,9 @@ class KiscResource_cluster_host(KiscResource):
 
         # Consumables
         # ... available
-        self._diConsumables = KiscRuntime.parseDictionary(self._dsConfig.get('CONSUMABLES', None), -1, int)
+        self._oConsumables = KiscRuntime_consumables(self._dsConfig.get('CONSUMABLES', None), -1)
         # ... consumed
-        self._diConsumables_used = KiscRuntime.parseDictionary(self._dsConfig.get('$CONSUMABLES_USED', None), 1, int)
+        self._oConsumables_used = KiscRuntime_consumables(self._dsConfig.get('$CONSUMABLES_USED', None), 1)
 
         # Virtual <-> Registration
         self._bVirtual = KiscRuntime.parseBool(self._dsConfig.get('virtual', False))
@@ -319,47 +320,31 @@ class KiscResource_cluster_host(KiscResource):
                 return lsErrors
 
             # ... check consumables
-            diConsumables_used = dict()
-            diConsumes = KiscRuntime.parseDictionary(_oResource._dsConfig.get('CONSUMES', None), 1, int)
-            for sConsumable_id in diConsumes:
-                iConsumable_wanted = diConsumes[sConsumable_id]
-                if sConsumable_id in self._diConsumables:
-                    iConsumable_available = self._diConsumables[sConsumable_id]
+            oConsumes = _oResource.consumes()
+            if self._iVerbose:
+                for sConsumable_id in self._oConsumables.missing(oConsumes):
+                    self._WARNING('Consumable not available (%s)' % sConsumable_id)
+            for sConsumable_id in self._oConsumables.exhausted(self._oConsumables_used, oConsumes):
+                if _bOversubscribe:
+                    if self._iVerbose and not _bCheck: self._WARNING('Consumable oversubscription (%s); %d > %d' % (sConsumable_id, self._oConsumables_used.get(sConsumable_id, 0)+oConsumes.get(sConsumable_id), self._oConsumables.get(sConsumable_id)))
                 else:
-                    if self._iVerbose: self._WARNING('Consumable not available (%s)' % sConsumable_id)
-                    continue
-                if iConsumable_available >= 0:
-                    if sConsumable_id in self._diConsumables_used:
-                        iConsumable_used = self._diConsumables_used[sConsumable_id]
-                    else:
-                        iConsumable_used = 0
-                    iConsumable_remaining = iConsumable_available-iConsumable_used
-                    if iConsumable_wanted > iConsumable_remaining:
-                        if _bOversubscribe:
-                            if self._iVerbose and not _bCheck: self._WARNING('Consumable oversubscription (%s); %d > %d' % (sConsumable_id, iConsumable_used+iConsumable_wanted, iConsumable_available))
-                        else:
-                            raise RuntimeError('Consumable exhausted (%s)' % sConsumable_id)
-                diConsumables_used[sConsumable_id] = iConsumable_wanted
+                    raise RuntimeError('Consumable exhausted (%s)' % sConsumable_id)
 
             # ... check ?
             if _bCheck:
                 return lsErrors
 
             # ... finalize
-            for sConsumable_id in diConsumables_used:
-                if self._iVerbose: self._DEBUG('Registering consumable (%s:%d)' % (sConsumable_id, diConsumables_used[sConsumable_id]))
-                if sConsumable_id in self._diConsumables_used:
-                    self._diConsumables_used[sConsumable_id] += diConsumables_used[sConsumable_id]
-                else:
-                    self._diConsumables_used[sConsumable_id] = diConsumables_used[sConsumable_id]
+            if self._iVerbose: self._DEBUG('Registering consumables (%s)' % oConsumes.toString())
+            self._oConsumables_used.add(oConsumes, self._oConsumables)
             lsResources.append(sResource_id)
             if _bBootstrap:
                 self._dsConfig['$BOOTSTRAP'] = ','.join(lsResources)
             else:
                 self._dsConfig['$RESOURCES'] = ','.join(lsResources)
-            if len(self._diConsumables_used):
-                self._dsConfig['$CONSUMABLES_USED'] = ','.join(['%s:%d' % (k, self._diConsumables_used[k]) for k in sorted(self._diConsumables_used.keys())])
-            self._dsConfig['$CONSUMABLES_FREE'] = ','.join(['%s:%d' % (k, self._diConsumables[k] - self._diConsumables_used.get(k, 0)) for k in sorted(self._diConsumables.keys())])
+            if not self._oConsumables_used.isEmpty():
+                self._dsConfig['$CONSUMABLES_USED'] = self._oConsumables_used.toString()
+            self._dsConfig['$CONSUMABLES_FREE'] = self._oConsumables.free(self._oConsumables_used).toString()
             if self._iVerbose: self._INFO('Resource registered (%s)' % _oResource.id())
 
         except RuntimeError as e:
@@ -406,21 +391,14 @@ class KiscResource_cluster_host(KiscResource):
                 return lsErrors
 
             # ... consumables
-            diConsumables_used = dict()
-            diConsumes = KiscRuntime.parseDictionary(_oResource._dsConfig.get('CONSUMES', None), 1, int)
-            for sConsumable_id in diConsumes:
-                if sConsumable_id not in self._diConsumables_used:
-                    if self._iVerbose: self._WARNING('Consumable not registered (%s)' % sConsumable_id)
-                    continue
-                iConsumable_wanted = diConsumes[sConsumable_id]
-                diConsumables_used[sConsumable_id] = iConsumable_wanted
+            oConsumes = _oResource.consumes()
+            if self._iVerbose:
+                for sConsumable_id in self._oConsumables_used.missing(oConsumes):
+                    self._WARNING('Consumable not registered (%s)' % sConsumable_id)
 
             # ... finalize
-            for sConsumable_id in diConsumables_used:
-                if self._iVerbose: self._DEBUG('Unregistering consumable (%s:%d)' % (sConsumable_id, diConsumables_used[sConsumable_id]))
-                self._diConsumables_used[sConsumable_id] -= diConsumables_used[sConsumable_id]
-                if self._diConsumables_used[sConsumable_id] == 0:
-                    del self._diConsumables_used[sConsumable_id]
+            if self._iVerbose: self._DEBUG('Unregistering consumables (%s)' % oConsumes.toString())
+            self._oConsumables_used.subtract(oConsumes, self._oConsumables_used).prune()
             lsResources.remove(sResource_id)
             if _bBootstrap:
                 self._dsConfig['$BOOTSTRAP'] = ','.join(lsResources)
@@ -430,10 +408,10 @@ class KiscResource_cluster_host(KiscResource):
                 self._dsConfig['$RESOURCES'] = ','.join(lsResources)
                 if not len(self._dsConfig['$RESOURCES']):
                     del self._dsConfig['$RESOURCES']
-            self._dsConfig['$CONSUMABLES_USED'] = ','.join(['%s:%d' % (k, self._diConsumables_used[k]) for k in sorted(self._diConsumables_used.keys())])
+            self._dsConfig['$CONSUMABLES_USED'] = self._oConsumables_used.toString()
             if not len(self._dsConfig['$CONSUMABLES_USED']):
                 del self._dsConfig['$CONSUMABLES_USED']
-            self._dsConfig['$CONSUMABLES_FREE'] = ','.join(['%s:%d' % (k, self._diConsumables[k] - self._diConsumables_used.get(k, 0)) for k in sorted(self._diConsumables.keys())])
+            self._dsConfig['$CONSUMABLES_FREE'] = self._oConsumables.free(self._oConsumables_used).toString()
             if self._iVerbose: self._INFO('Resource unregistered (%s)' % _oResource.id())
 
         except RuntimeError as e:
@@ -470,7 +448,7 @@ class KiscResource_cluster_host(KiscResource):
 
         if not self._bInitialized:
             self._initProperties()
-        return self._diConsumables
+        return self._oConsumables.toDict()
 
 
     def getConsumablesUsed(self):
@@ -482,7 +460,7 @@ class KiscResource_cluster_host(KiscResource):
 
         if not self._bInitialized:
             self._initProperties()
-        return self._diConsumables_used
+        return self._oConsumables_used.toDict()
 
 
     def getConsumablesFree(self):
@@ -494,4 +472,4 @@ class KiscResource_cluster_host(KiscResource):
 
         if not self._bInitialized:
             self._initProperties()
-        return {k: self._diConsumables[k] - self._diConsumables_used.get(k, 0) for k in sorted(self._diConsumables.keys())}
+        return self._oConsumables.free(self._oConsumables_used).toDict()
@@ -0,0 +1,190 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# KiSC
+from KiSC.Resource import KiscResource
+from KiSC.Runtime import KiscRuntime
+from KiSC.Runtime.prober import KiscRuntime_prober
+
+# Standard
+import sys
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscResource_health_http(KiscResource):
+    """
+    HTTP (GET) health check
+
+    Configuration parameters are:
+     - [REQUIRED] address (STRING; comma-separated http[s]://<host>[:<port>][/<path>]):
+       URL(s) to query
+     - [OPTIONAL] satisfy (NUMBER):
+       consider check successfull if the given count of URLs are healthy (default: all)
+     - [OPTIONAL] timeout (NUMBER; seconds [*5]):
+       individual timeout for each URL
+     - [OPTIONAL] status (STRING; regular expression [*[23][0-9][0-9]]):
+       response status code to expect
+     - [OPTIONAL] expect (STRING; regular expression):
+       response body (content) to expect
+     - [OPTIONAL] tls_verify (*yes|no):
+       whether to verify the server (TLS) certificate
+     - [OPTIONAL] cache_ttl (NUMBER; seconds [*60]):
+       time-to-live of the cached check result, re-used by status queries (0 to disable)
+
+    URLs are checked concurrently (see KiscRuntime_prober), those targeting
+    the same server re-using the same (keep-alive) connection. The check
+    completes - and outstanding connections are closed - as soon as its
+    outcome is decided; per-URL results (response time, 'timeout', 'refused',
+    'mismatch', 'error' or 'cancelled') are recorded in the $HTTP_RESULTS
+    runtime status.
+    """
+
+
+    #--------------------------------------------------------------------------
+    # CONSTRUCTORS
+    #--------------------------------------------------------------------------
+
+    def __init__(self, _sId, _dsConfig):
+        KiscResource.__init__(self, _sId, _dsConfig)
+
+
+    #--------------------------------------------------------------------------
+    # METHODS: self
+    #--------------------------------------------------------------------------
+
+    def _probe(self):
+        """
+        Probe the resource health
+
+        @return list  Empty if the resource is healthy, (ordered) error messages otherwise
+        """
+        lsErrors = list()
+
+        # Probe
+        try:
+
+            # ... satisfy ?
+            try:
+                iSatisfy = int(self._dsConfig['satisfy'])
+            except KeyError:
+                iSatisfy = None
+            except ValueError:
+                raise RuntimeError('Invalid "satisfy" setting (%s)' % self._dsConfig['satisfy'])
+            iSatisfied = 0
+
+            # ... timeout
+            try:
+                fTimeout = float(self._dsConfig.get('timeout', 5))
+            except ValueError:
+                raise RuntimeError('Invalid timeout value (%s)' % self._dsConfig['timeout'])
+
+            # ... TLS verification
+            bVerify = KiscRuntime.parseBool(self._dsConfig.get('tls_verify', True))
+
+            # ... URL(s)
+            lsAddresses = [sAddress.strip() for sAddress in self._dsConfig['address'].split(',') if len(sAddress.strip())]
+            iAddresses = len(lsAddresses)
+            if iSatisfy is None:
+                iSatisfy = iAddresses
+
+            # ... check all URL(s) concurrently (until quorum is reached or can no longer be)
+            if self._iVerbose >= KiscRuntime.VERBOSE_TRACE: sys.stderr.write('TRACE[http] %s\n' % ' '.join(lsAddresses))
+            oProber = KiscRuntime_prober()
+            for sAddress in lsAddresses:
+                oProber.addHttp(sAddress, fTimeout, self._dsConfig.get('status', None), self._dsConfig.get('expect', None), bVerify)
+            lsResults = list()
+            for (iIndex, (sResult, fLatency)) in enumerate(oProber.run(iSatisfy)):
+                if sResult == KiscRuntime_prober.RESULT_OK:
+                    iSatisfied += 1
+                    sResult = '%.3fms' % fLatency
+                lsResults.append('%s %s' % (lsAddresses[iIndex], sResult))
+                if self._iVerbose: self._DEBUG('HTTP %s: %s' % (lsAddresses[iIndex], sResult))
+            self._dsConfig['$HTTP_RESULTS'] = ','.join(lsResults)
+
+            # ... satisfied ?
+            if iSatisfied < iSatisfy:
+                raise RuntimeError('HTTP check failed (%d<%d)' % (iSatisfied, iSatisfy))
+            self._iStatus = KiscRuntime.STATUS_STARTED
+
+        except (OSError, RuntimeError) as e:
+            if self._iVerbose: self._ERROR(str(e))
+            self._iStatus = KiscRuntime.STATUS_ERROR
+            lsErrors.append(str(e))
+
+        # Done
+        return lsErrors
+
+
+    #--------------------------------------------------------------------------
+    # METHODS: KiscResource (implemented/overriden)
+    #--------------------------------------------------------------------------
+
+    def type(self):
+        return 'health_http'
+
+
+    def verify(self):
+        lsErrors = list()
+        if not len(self._dsConfig.get('address', str())):
+            lsErrors.append('Invalid resource configuration; missing "address" setting')
+        return lsErrors
+
+
+    def start(self):
+        if self._iVerbose: self._INFO('Starting')
+        lsErrors = list()
+
+        # Be idempotent
+        if self.status(True, KiscRuntime.STATUS_STARTED) == KiscRuntime.STATUS_STARTED:
+            if self._iVerbose: self._INFO('Already started')
+            return lsErrors
+
+        # Start the resource (probe its health, caching the result)
+        lsErrors = self._HEALTH(self._probe, ['$HTTP_RESULTS'], True)
+        if self._iVerbose and not lsErrors: self._INFO('Started')
+
+        # Done
+        return lsErrors
+
+
+    def stop(self):
+        self._HEALTH_CLEAR()
+        self._iStatus = KiscRuntime.STATUS_STOPPED
+        if self._iVerbose: self._INFO('Stopped')
+        return list()
+
+
+    def status(self, _bStateful = True, _iIntent = None):
+        if _bStateful and _iIntent != KiscRuntime.STATUS_STOPPED and self._iStatus in (KiscRuntime.STATUS_STARTED, KiscRuntime.STATUS_ERROR):
+            # re-probe the resource health, unless the cached result is still valid
+            self._HEALTH(self._probe, ['$HTTP_RESULTS'])
+        if self._iVerbose: self._INFO('Status is %s' % KiscRuntime.STATUS_MESSAGE[self._iStatus])
+        return self._iStatus
@@ -28,9 +28,11 @@
 # KiSC
 from KiSC.Resource import KiscResource
 from KiSC.Runtime import KiscRuntime
+from KiSC.Runtime.icmp import KiscRuntime_icmp
 
 # Standard
-import copy
+import re
+import sys
 
 
 #------------------------------------------------------------------------------
@@ -60,6 +62,14 @@ class KiscResource_health_ping6(KiscResource):
        mark to tag ping packet(s) with
      - [OPTIONAL] flow (STRING):
        IPv6 flow label (hexadecimal) identifier
+     - [OPTIONAL] cache_ttl (NUMBER; seconds [*60]):
+       time-to-live of the cached check result, re-used by status queries (0 to disable)
+
+    Addresses are pinged concurrently, using the in-process ICMPv6 engine
+    (see KiscRuntime_icmp) or - if unavailable - the 'ping6' command. The check
+    completes - and outstanding pings are cancelled - as soon as its outcome
+    is decided; per-address results (round-trip time, 'unreachable' or
+    'cancelled') are recorded in the $PING_RESULTS runtime status.
 
     For further details, see:
      - [CLI] man ping6
@@ -75,30 +85,114 @@ class KiscResource_health_ping6(KiscResource):
 
 
     #--------------------------------------------------------------------------
-    # METHODS: KiscResource (implemented/overriden)
+    # METHODS: self
     #--------------------------------------------------------------------------
 
-    def type(self):
-        return 'health_ping6'
+    def _pingEngine(self, _lsAddresses, _iSatisfy):
+        """
+        Ping the given addresses using the in-process ICMPv6 engine
 
+        @param list _lsAddresses  IPv6 addresses
+        @param int  _iSatisfy     Quorum
 
-    def verify(self):
-        lsErrors = list()
-        if not len(self._dsConfig.get('address', str())):
-            lsErrors.append('Invalid resource configuration; missing "address" setting')
-        return lsErrors
+        @exception OSError       On ping error
+        @exception RuntimeError  On invalid settings
 
+        @return list  (bReachable, sResult) tuple for each address, None if the engine is unavailable
+        """
 
-    def start(self):
-        lsErrors = list()
+        # ... flow label (not supported by the engine)
+        if 'flow' in self._dsConfig:
+            return None
 
-        # Be idempotent
-        if self.status(True, KiscRuntime.STATUS_STARTED) == KiscRuntime.STATUS_STARTED:
-            if self._iVerbose: self._INFO('Already started')
-            return lsErrors
+        # Settings
+        try:
+            iCount = int(self._dsConfig.get('count', 1))
+            fInterval = float(self._dsConfig.get('interval', 1))
+            fTimeout = float(self._dsConfig.get('timeout', 5))
+            fDeadline = float(self._dsConfig['deadline']) if 'deadline' in self._dsConfig else None
+        except ValueError as e:
+            raise RuntimeError('Invalid ping setting; %s' % str(e))
+
+        # Engine
+        try:
+            oIcmp = KiscRuntime_icmp(True, self._dsConfig.get('interface', None), self._dsConfig.get('mark', None))
+        except OSError as e:
+            if self._iVerbose: self._DEBUG('ICMP engine unavailable (%s); using ping6 command' % str(e))
+            return None
 
-        # Start the resource
-        if self._iVerbose: self._INFO('Starting')
+        # Ping
+        try:
+            if self._iVerbose >= KiscRuntime.VERBOSE_TRACE: sys.stderr.write('TRACE[icmp] ping6 %s\n' % ' '.join(_lsAddresses))
+            ltResults = list()
+            for (bReachable, fRtt) in oIcmp.ping(_lsAddresses, iCount, fInterval, fTimeout, fDeadline, _iSatisfy):
+                if bReachable is None:
+                    ltResults.append((False, 'cancelled'))
+                elif bReachable:
+                    ltResults.append((True, '%.3fms' % fRtt))
+                else:
+                    ltResults.append((False, 'unreachable'))
+            return ltResults
+        finally:
+            oIcmp.close()
+
+
+    def _pingCommand(self, _lsAddresses, _iSatisfy):
+        """
+        Ping the given addresses using the 'ping6' command (one process per address)
+
+        @param list _lsAddresses  IPv6 addresses
+        @param int  _iSatisfy     Quorum
+
+        @exception OSError  On ping error
+
+        @return list  (bReachable, sResult) tuple for each address
+        """
+
+        # ... ping command
+        lsCommand = ['ping6', '-q', '-n']
+        oRegexpRtt = re.compile('= [0-9.]+/([0-9.]+)/')
+
+        # ... arguments
+        lsCommand.extend(['-c', self._dsConfig.get('count', '1')])
+        lsCommand.extend(['-i', self._dsConfig.get('interval', '1')])
+        lsCommand.extend(['-W', self._dsConfig.get('timeout', '5')])
+
+        # ... options
+        if 'deadline' in self._dsConfig:
+            lsCommand.extend(['-w', self._dsConfig['deadline']])
+        if 'interface' in self._dsConfig:
+            lsCommand.extend(['-I', self._dsConfig['interface']])
+        if 'mark' in self._dsConfig:
+            lsCommand.extend(['-m', self._dsConfig['mark']])
+        if 'flow' in self._dsConfig:
+            lsCommand.extend(['-F', self._dsConfig['flow']])
+
+        # Ping
+        ltResults = list()
+        for (iReturnCode, fDuration, sOutput) in KiscRuntime.shellQuorum([lsCommand+[sAddress] for sAddress in _lsAddresses], _iSatisfy, _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE):
+            if iReturnCode is None:
+                ltResults.append((False, 'cancelled'))
+            elif iReturnCode == 0:
+                oMatch = oRegexpRtt.search(sOutput)
+                ltResults.append((True, '%sms' % (oMatch.group(1) if oMatch is not None else '%.3f' % (1000.0*fDuration))))
+            elif iReturnCode == 1:
+                # address not reachable
+                ltResults.append((False, 'unreachable'))
+            else:
+                raise OSError(iReturnCode, sOutput.strip(), 0)
+        return ltResults
+
+
+    def _probe(self):
+        """
+        Probe the resource health
+
+        @return list  Empty if the resource is healthy, (ordered) error messages otherwise
+        """
+        lsErrors = list()
+
+        # Probe
         try:
 
             # ... satisfy ?
@@ -110,51 +204,29 @@ class KiscResource_health_ping6(KiscResource):
                 raise RuntimeError('Invalid "satisfy" setting (%s)' % self._dsConfig['satisfy'])
             iSatisfied = 0
 
-            # ... ping command
-            lsCommand = ['ping6', '-q', '-n']
-
-            # ... arguments
-            lsCommand.extend(['-c', self._dsConfig.get('count', '1')])
-            lsCommand.extend(['-i', self._dsConfig.get('interval', '1')])
-            lsCommand.extend(['-W', self._dsConfig.get('timeout', '5')])
-
-            # ... options
-            if 'deadline' in self._dsConfig:
-                lsCommand.extend(['-w', self._dsConfig['deadline']])
-            if 'interface' in self._dsConfig:
-                lsCommand.extend(['-I', self._dsConfig['interface']])
-            if 'mark' in self._dsConfig:
-                lsCommand.extend(['-m', self._dsConfig['mark']])
-            if 'flow' in self._dsConfig:
-                lsCommand.extend(['-F', self._dsConfig['flow']])
-
-            # ... loop through IP address(es)
-            iAddresses = 0
-            for sAddress in self._dsConfig['address'].split(','):
-                sAddress = sAddress.strip()
-                if not len(sAddress): continue
-                iAddresses += 1
-                lsCommand_sub = copy.deepcopy(lsCommand)
-                lsCommand_sub.append(sAddress)
-                try:
-                    KiscRuntime.shell(lsCommand_sub, _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            # ... IP address(es)
+            lsAddresses = [sAddress.strip() for sAddress in self._dsConfig['address'].split(',') if len(sAddress.strip())]
+            iAddresses = len(lsAddresses)
+            if iSatisfy is None:
+                iSatisfy = iAddresses
+
+            # ... ping all address(es) concurrently (until quorum is reached or can no longer be)
+            ltResults = self._pingEngine(lsAddresses, iSatisfy)
+            if ltResults is None:
+                ltResults = self._pingCommand(lsAddresses, iSatisfy)
+            lsResults = list()
+            for iIndex in range(0, iAddresses):
+                (bReachable, sResult) = ltResults[iIndex]
+                if bReachable:
                     iSatisfied += 1
-                except OSError as e:
-                    if e.filename == 0 and e.errno == 1:
-                        # address not reachable
-                        pass
-                    else:
-                        raise e
+                lsResults.append('%s %s' % (lsAddresses[iIndex], sResult))
+                if self._iVerbose: self._DEBUG('Ping %s: %s' % (lsAddresses[iIndex], sResult))
+            self._dsConfig['$PING_RESULTS'] = ','.join(lsResults)
 
             # ... satisfied ?
-            if iSatisfy is None:
-                if iSatisfied < iAddresses:
-                    raise RuntimeError('Ping failed (%d<%d)' % (iSatisfied, iAddresses))
-            else:
-                if iSatisfied < iSatisfy:
-                    raise RuntimeError('Ping failed (%d<%d)' % (iSatisfied, iSatisfy))
+            if iSatisfied < iSatisfy:
+                raise RuntimeError('Ping failed (%d<%d)' % (iSatisfied, iSatisfy))
             self._iStatus = KiscRuntime.STATUS_STARTED
-            if self._iVerbose: self._INFO('Started')
 
         except (OSError, RuntimeError) as e:
             if self._iVerbose: self._ERROR(str(e))
@@ -165,12 +237,48 @@ class KiscResource_health_ping6(KiscResource):
         return lsErrors
 
 
+    #--------------------------------------------------------------------------
+    # METHODS: KiscResource (implemented/overriden)
+    #--------------------------------------------------------------------------
+
+    def type(self):
+        return 'health_ping6'
+
+
+    def verify(self):
+        lsErrors = list()
+        if not len(self._dsConfig.get('address', str())):
+            lsErrors.append('Invalid resource configuration; missing "address" setting')
+        return lsErrors
+
+
+    def start(self):
+        if self._iVerbose: self._INFO('Starting')
+        lsErrors = list()
+
+        # Be idempotent
+        if self.status(True, KiscRuntime.STATUS_STARTED) == KiscRuntime.STATUS_STARTED:
+            if self._iVerbose: self._INFO('Already started')
+            return lsErrors
+
+        # Start the resource (probe its health, caching the result)
+        lsErrors = self._HEALTH(self._probe, ['$PING_RESULTS'], True)
+        if self._iVerbose and not lsErrors: self._INFO('Started')
+
+        # Done
+        return lsErrors
+
+
     def stop(self):
+        self._HEALTH_CLEAR()
         self._iStatus = KiscRuntime.STATUS_STOPPED
         if self._iVerbose: self._INFO('Stopped')
         return list()
 
 
     def status(self, _bStateful = True, _iIntent = None):
+        if _bStateful and _iIntent != KiscRuntime.STATUS_STOPPED and self._iStatus in (KiscRuntime.STATUS_STARTED, KiscRuntime.STATUS_ERROR):
+            # re-probe the resource health, unless the cached result is still valid
+            self._HEALTH(self._probe, ['$PING_RESULTS'])
         if self._iVerbose: self._INFO('Status is %s' % KiscRuntime.STATUS_MESSAGE[self._iStatus])
         return self._iStatus
@@ -45,6 +45,11 @@ class KiscResource_health_stonith(KiscResource):
        device parameters (as per 'stonith -t <device_type> -n')
      - [OPTIONAL] count (NUMBER [*1]):
        number of times to perform the check
+     - [OPTIONAL] cache_ttl (NUMBER; seconds [*60]):
+       time-to-live of the cached check result, re-used by status queries (0 to disable)
+     - [OPTIONAL] command_timeout_status (NUMBER; seconds [*none]):
+       timeout for each (shell) command executed by the status operation,
+       after which the command is killed (see KiscResource)
 
     For further details, see:
      - [CLI] man stonith
@@ -60,30 +65,18 @@ class KiscResource_health_stonith(KiscResource):
 
 
     #--------------------------------------------------------------------------
-    # METHODS: KiscResource (implemented/overriden)
+    # METHODS: self
     #--------------------------------------------------------------------------
 
-    def type(self):
-        return 'health_stonith'
-
-
-    def verify(self):
-        lsErrors = list()
-        if not len(self._dsConfig.get('device_type', str())):
-            lsErrors.append('Invalid resource configuration; missing "device_type" setting')
-        return lsErrors
-
+    def _probe(self):
+        """
+        Probe the resource health
 
-    def start(self):
+        @return list  Empty if the resource is healthy, (ordered) error messages otherwise
+        """
         lsErrors = list()
 
-        # Be idempotent
-        if self.status(True, KiscRuntime.STATUS_STARTED) == KiscRuntime.STATUS_STARTED:
-            if self._iVerbose: self._INFO('Already started')
-            return lsErrors
-
-        # Start the resource
-        if self._iVerbose: self._INFO('Starting')
+        # Probe
         try:
 
             # ... stonith command
@@ -99,9 +92,8 @@ class KiscResource_health_stonith(KiscResource):
                     lsCommand.append('%s=%s' % (sParameter_name, dsParameters[sParameter_name]))
 
             # ... do it !
-            KiscRuntime.shell(lsCommand, _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(lsCommand, _fTimeout = self._TIMEOUT('status'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             self._iStatus = KiscRuntime.STATUS_STARTED
-            if self._iVerbose: self._INFO('Started')
 
         except (OSError, RuntimeError) as e:
             if self._iVerbose: self._ERROR(str(e))
@@ -112,12 +104,48 @@ class KiscResource_health_stonith(KiscResource):
         return lsErrors
 
 
+    #--------------------------------------------------------------------------
+    # METHODS: KiscResource (implemented/overriden)
+    #--------------------------------------------------------------------------
+
+    def type(self):
+        return 'health_stonith'
+
+
+    def verify(self):
+        lsErrors = list()
+        if not len(self._dsConfig.get('device_type', str())):
+            lsErrors.append('Invalid resource configuration; missing "device_type" setting')
+        return lsErrors
+
+
+    def start(self):
+        if self._iVerbose: self._INFO('Starting')
+        lsErrors = list()
+
+        # Be idempotent
+        if self.status(True, KiscRuntime.STATUS_STARTED) == KiscRuntime.STATUS_STARTED:
+            if self._iVerbose: self._INFO('Already started')
+            return lsErrors
+
+        # Start the resource (probe its health, caching the result)
+        lsErrors = self._HEALTH(self._probe, [], True)
+        if self._iVerbose and not lsErrors: self._INFO('Started')
+
+        # Done
+        return lsErrors
+
+
     def stop(self):
+        self._HEALTH_CLEAR()
         self._iStatus = KiscRuntime.STATUS_STOPPED
         if self._iVerbose: self._INFO('Stopped')
         return list()
 
 
     def status(self, _bStateful = True, _iIntent = None):
+        if _bStateful and _iIntent != KiscRuntime.STATUS_STOPPED and self._iStatus in (KiscRuntime.STATUS_STARTED, KiscRuntime.STATUS_ERROR):
+            # re-probe the resource health, unless the cached result is still valid
+            self._HEALTH(self._probe, [])
         if self._iVerbose: self._INFO('Status is %s' % KiscRuntime.STATUS_MESSAGE[self._iStatus])
         return self._iStatus
@@ -103,6 +103,9 @@ class KiscResource_network_bond(KiscResource):
        quantity of tranmsit queues
      - [OPTIONAL] numrxqueues (NUMBER):
        quantity of receive queues
+     - [OPTIONAL] command_timeout_<operation> (NUMBER; seconds [*none]):
+       timeout for each (shell) command executed by the given operation
+       (start, stop or status), after which the command is killed (see KiscResource)
 
     For further details, see:
      - [CLI] man ip-link
@@ -151,7 +154,7 @@ class KiscResource_network_bond(KiscResource):
         try:
 
             # ... load bonding driver (but do not create any default device)
-            KiscRuntime.shell(['modprobe', 'bonding', 'max_bonds=0'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(['modprobe', 'bonding', 'max_bonds=0'], _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
 
             # ... add device
             lsCommand = [
@@ -162,7 +165,7 @@ class KiscResource_network_bond(KiscResource):
                 if sSetting in self._dsConfig:
                     lsCommand.extend([sSetting, self._dsConfig[sSetting]])
             lsCommand.extend(['type', 'bond', 'mode', self._dsConfig['mode']])
-            KiscRuntime.shell(lsCommand, _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(lsCommand, _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
 
             # ... options
             for sSetting in ['miimon', 'updelay', 'downdelay', 'use_carrier',
@@ -176,7 +179,7 @@ class KiscResource_network_bond(KiscResource):
 
             # ... attach slaves
             for sDevice in self._dsConfig['devices'].split(','):
-                KiscRuntime.shell(['ip', 'link', 'set', sDevice, 'master', self._dsConfig['name'], 'up'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                KiscRuntime.shell(['ip', 'link', 'set', sDevice, 'master', self._dsConfig['name'], 'up'], _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
 
             # ... default/active slave
             for sSetting in ['active_slave', 'primary']:
@@ -184,7 +187,7 @@ class KiscResource_network_bond(KiscResource):
                     KiscRuntime.echo(self._dsConfig[sSetting], '/sys/class/net/%s/bonding/%s' % (self._dsConfig['name'], sSetting), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
 
             # ... UP!
-            KiscRuntime.shell(['ip', 'link', 'set', self._dsConfig['name'], 'up'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(['ip', 'link', 'set', self._dsConfig['name'], 'up'], _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             self._iStatus = KiscRuntime.STATUS_STARTED
             if self._iVerbose: self._INFO('Started')
 
@@ -210,7 +213,7 @@ class KiscResource_network_bond(KiscResource):
 
         # ... DOWN!
         try:
-            KiscRuntime.shell(['ip', 'link', 'set', self._dsConfig['name'], 'down'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(['ip', 'link', 'set', self._dsConfig['name'], 'down'], _fTimeout = self._TIMEOUT('stop'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
         except OSError as e:
             if self._iVerbose: self._WARNING(str(e))
             lsErrors.append(str(e))
@@ -218,14 +221,14 @@ class KiscResource_network_bond(KiscResource):
         # ... detach slaves
         for sDevice in self._dsConfig['devices'].split(','):
             try:
-                KiscRuntime.shell(['ip', 'link', 'set', sDevice, 'nomaster', 'down'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                KiscRuntime.shell(['ip', 'link', 'set', sDevice, 'nomaster', 'down'], _fTimeout = self._TIMEOUT('stop'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             except OSError as e:
                 if self._iVerbose: self._WARNING(str(e))
                 lsErrors.append(str(e))
 
         # ... delete device
         try:
-            KiscRuntime.shell(['ip', 'link', 'delete', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(['ip', 'link', 'delete', self._dsConfig['name']], _fTimeout = self._TIMEOUT('stop'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             self._iStatus = KiscRuntime.STATUS_STOPPED
             if self._iVerbose: self._INFO('Stopped')
         except OSError as e:
@@ -237,7 +240,11 @@ class KiscResource_network_bond(KiscResource):
         return lsErrors
 
 
-    def status(self, _bStateful = True, _iIntent = None):
+    def _status(self, _bStateful, _iIntent):
+        """
+        Query the resource status (generator), yielding each status (shell)
+        command; shared by status() and statusAsync() (see KiscResource._STATUS())
+        """
         if self._iVerbose: self._INFO('Querying status')
         iStatus = KiscRuntime.STATUS_STARTED
 
@@ -247,7 +254,7 @@ class KiscResource_network_bond(KiscResource):
             # NOTE: look only for a name match, independently from potentially mismatching
             #       type, devices, mode or options
             try:
-                KiscRuntime.shell(['test', '-e', '/sys/class/net/%s' % self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                yield ['test', '-e', '/sys/class/net/%s' % self._dsConfig['name']]
             except OSError as e:
                 if e.filename == 0 and e.errno == 1:
                     iStatus = KiscRuntime.STATUS_STOPPED
@@ -258,7 +265,7 @@ class KiscResource_network_bond(KiscResource):
             # UP ?
             if iStatus == KiscRuntime.STATUS_STARTED and _iIntent == KiscRuntime.STATUS_STARTED:
                 try:
-                    KiscRuntime.shell(['grep', '-Fq', 'up', '/sys/class/net/%s/operstate' % self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                    yield ['grep', '-Fq', 'up', '/sys/class/net/%s/operstate' % self._dsConfig['name']]
                 except OSError as e:
                     if self._iVerbose: self._ERROR(str(e))
                     iStatus = KiscRuntime.STATUS_ERROR
@@ -270,3 +277,11 @@ class KiscResource_network_bond(KiscResource):
         self._iStatus = iStatus
         if self._iVerbose: self._INFO('Status is %s' % KiscRuntime.STATUS_MESSAGE[self._iStatus])
         return self._iStatus
+
+
+    def status(self, _bStateful = True, _iIntent = None):
+        return self._STATUS(self._status(_bStateful, _iIntent))
+
+
+    async def statusAsync(self, _bStateful = True, _iIntent = None):
+        return await self._STATUS_ASYNC(self._status(_bStateful, _iIntent))
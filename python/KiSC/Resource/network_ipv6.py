@@ -49,6 +49,9 @@ class KiscResource_network_ipv6(KiscResource):
        address label
      - [OPTIONAL] scope (*global|site|link|host|NUMBER):
        address scope
+     - [OPTIONAL] command_timeout_<operation> (NUMBER; seconds [*none]):
+       timeout for each (shell) command executed by the given operation
+       (start, stop or status), after which the command is killed (see KiscResource)
 
     For further details, see:
      - [CLI] man ip-address
@@ -108,7 +111,7 @@ class KiscResource_network_ipv6(KiscResource):
             lsCommand.extend(['dev', self._dsConfig['device']])
 
             # ... DO IT!
-            KiscRuntime.shell(lsCommand, _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(lsCommand, _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             self._iStatus = KiscRuntime.STATUS_STARTED
             if self._iVerbose: self._INFO('Started')
 
@@ -138,7 +141,7 @@ class KiscResource_network_ipv6(KiscResource):
                 'ip', '-6', 'address', 'delete',
                 '%s/%s' % (self._dsConfig['address'], self._dsConfig['mask']),
                 'dev', self._dsConfig['device']
-            ], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            ], _fTimeout = self._TIMEOUT('stop'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             self._iStatus = KiscRuntime.STATUS_STARTED
             if self._iVerbose: self._INFO('Stopped')
         except OSError as e:
@@ -150,7 +153,11 @@ class KiscResource_network_ipv6(KiscResource):
         return lsErrors
 
 
-    def status(self, _bStateful = True, _iIntent = None):
+    def _status(self, _bStateful, _iIntent):
+        """
+        Query the resource status (generator), yielding each status (shell)
+        command; shared by status() and statusAsync() (see KiscResource._STATUS())
+        """
         if self._iVerbose: self._INFO('Querying status')
         iStatus = KiscRuntime.STATUS_STARTED
 
@@ -160,10 +167,10 @@ class KiscResource_network_ipv6(KiscResource):
             # NOTE: look only for an address match, independently from potentially mismatching
             #       network mask, device or options
             try:
-                KiscRuntime.shell([
+                yield [
                     [ 'ip', '-6', 'address', 'show' ],
                     [ 'grep', '-Fqi', 'inet6 %s/' % self._dsConfig['address'].replace('::', ':0:') ]
-                ], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                ]
             except OSError as e:
                 if e.filename == 0 and e.errno == 1:
                     iStatus = KiscRuntime.STATUS_STOPPED
@@ -178,3 +185,11 @@ class KiscResource_network_ipv6(KiscResource):
         self._iStatus = iStatus
         if self._iVerbose: self._INFO('Status is %s' % KiscRuntime.STATUS_MESSAGE[self._iStatus])
         return self._iStatus
+
+
+    def status(self, _bStateful = True, _iIntent = None):
+        return self._STATUS(self._status(_bStateful, _iIntent))
+
+
+    async def statusAsync(self, _bStateful = True, _iIntent = None):
+        return await self._STATUS_ASYNC(self._status(_bStateful, _iIntent))
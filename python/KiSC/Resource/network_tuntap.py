@@ -47,6 +47,9 @@ class KiscResource_network_tuntap(KiscResource):
        owner user
      - [OPTIONAL] group (GID|GROUPNAME):
        owner group
+     - [OPTIONAL] command_timeout_<operation> (NUMBER; seconds [*none]):
+       timeout for each (shell) command executed by the given operation
+       (start, stop or status), after which the command is killed (see KiscResource)
 
     For further details, see:
      - [CLI] ip tuntap help
@@ -103,7 +106,7 @@ class KiscResource_network_tuntap(KiscResource):
                     lsCommand.extend([sSetting, self._dsConfig[sSetting]])
 
             # ... DO IT!
-            KiscRuntime.shell(lsCommand, _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(lsCommand, _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             self._iStatus = KiscRuntime.STATUS_STARTED
             if self._iVerbose: self._INFO('Started')
 
@@ -129,7 +132,7 @@ class KiscResource_network_tuntap(KiscResource):
 
         # ... delete device
         try:
-            KiscRuntime.shell(['ip', 'tuntap', 'delete', 'dev', self._dsConfig['name'], 'mode', self._dsConfig['mode']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(['ip', 'tuntap', 'delete', 'dev', self._dsConfig['name'], 'mode', self._dsConfig['mode']], _fTimeout = self._TIMEOUT('stop'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             self._iStatus = KiscRuntime.STATUS_STOPPED
             if self._iVerbose: self._INFO('Stopped')
         except OSError as e:
@@ -141,7 +144,11 @@ class KiscResource_network_tuntap(KiscResource):
         return lsErrors
 
 
-    def status(self, _bStateful = True, _iIntent = None):
+    def _status(self, _bStateful, _iIntent):
+        """
+        Query the resource status (generator), yielding each status (shell)
+        command; shared by status() and statusAsync() (see KiscResource._STATUS())
+        """
         if self._iVerbose: self._INFO('Querying status')
         iStatus = KiscRuntime.STATUS_STARTED
 
@@ -151,7 +158,7 @@ class KiscResource_network_tuntap(KiscResource):
             # NOTE: look only for a name match, independently from potentially mismatching
             #       type, devices, mode or options
             try:
-                KiscRuntime.shell(['test', '-e', '/sys/class/net/%s' % self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                yield ['test', '-e', '/sys/class/net/%s' % self._dsConfig['name']]
             except OSError as e:
                 if e.filename == 0 and e.errno == 1:
                     iStatus = KiscRuntime.STATUS_STOPPED
@@ -166,3 +173,11 @@ class KiscResource_network_tuntap(KiscResource):
         self._iStatus = iStatus
         if self._iVerbose: self._INFO('Status is %s' % KiscRuntime.STATUS_MESSAGE[self._iStatus])
         return self._iStatus
+
+
+    def status(self, _bStateful = True, _iIntent = None):
+        return self._STATUS(self._status(_bStateful, _iIntent))
+
+
+    async def statusAsync(self, _bStateful = True, _iIntent = None):
+        return await self._STATUS_ASYNC(self._status(_bStateful, _iIntent))
@@ -73,6 +73,9 @@ class KiscResource_network_vlan(KiscResource):
        quantity of tranmsit queues
      - [OPTIONAL] numrxqueues (NUMBER):
        quantity of receive queues
+     - [OPTIONAL] command_timeout_<operation> (NUMBER; seconds [*none]):
+       timeout for each (shell) command executed by the given operation
+       (start, stop or status), after which the command is killed (see KiscResource)
 
     For further details, see:
      - [CLI] man ip-link
@@ -149,10 +152,10 @@ class KiscResource_network_vlan(KiscResource):
                     lsCommand.append(sSetting.replace('_', '-'))
                     for sMapping in self._dsConfig[sSetting].split(','):
                         lsCommand.append(sMapping)
-            KiscRuntime.shell(lsCommand, _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(lsCommand, _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
 
             # ... UP!
-            KiscRuntime.shell(['ip', 'link', 'set', self._dsConfig['name'], 'up'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(['ip', 'link', 'set', self._dsConfig['name'], 'up'], _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             self._iStatus = KiscRuntime.STATUS_STARTED
             if self._iVerbose: self._INFO('Started')
 
@@ -178,14 +181,14 @@ class KiscResource_network_vlan(KiscResource):
 
         # ... DOWN!
         try:
-            KiscRuntime.shell(['ip', 'link', 'set', self._dsConfig['name'], 'down'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(['ip', 'link', 'set', self._dsConfig['name'], 'down'], _fTimeout = self._TIMEOUT('stop'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
         except OSError as e:
             if self._iVerbose: self._WARNING(str(e))
             lsErrors.append(str(e))
 
         # ... delete device
         try:
-            KiscRuntime.shell(['ip', 'link', 'delete', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(['ip', 'link', 'delete', self._dsConfig['name']], _fTimeout = self._TIMEOUT('stop'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             self._iStatus = KiscRuntime.STATUS_STOPPED
             if self._iVerbose: self._INFO('Stopped')
         except OSError as e:
@@ -197,7 +200,11 @@ class KiscResource_network_vlan(KiscResource):
         return lsErrors
 
 
-    def status(self, _bStateful = True, _iIntent = None):
+    def _status(self, _bStateful, _iIntent):
+        """
+        Query the resource status (generator), yielding each status (shell)
+        command; shared by status() and statusAsync() (see KiscResource._STATUS())
+        """
         if self._iVerbose: self._INFO('Querying status')
         iStatus = KiscRuntime.STATUS_STARTED
 
@@ -207,7 +214,7 @@ class KiscResource_network_vlan(KiscResource):
             # NOTE: look only for a name match, independently from potentially mismatching
             #       type, VLAN ID, physical device or options
             try:
-                KiscRuntime.shell(['test', '-e', '/sys/class/net/%s' % self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                yield ['test', '-e', '/sys/class/net/%s' % self._dsConfig['name']]
             except OSError as e:
                 if e.filename == 0 and e.errno == 1:
                     iStatus = KiscRuntime.STATUS_STOPPED
@@ -218,7 +225,7 @@ class KiscResource_network_vlan(KiscResource):
             # UP ?
             if iStatus == KiscRuntime.STATUS_STARTED and _iIntent == KiscRuntime.STATUS_STARTED:
                 try:
-                    KiscRuntime.shell(['grep', '-Fq', 'up', '/sys/class/net/%s/operstate' % self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                    yield ['grep', '-Fq', 'up', '/sys/class/net/%s/operstate' % self._dsConfig['name']]
                 except OSError as e:
                     if self._iVerbose: self._ERROR(str(e))
                     iStatus = KiscRuntime.STATUS_ERROR
@@ -230,3 +237,11 @@ class KiscResource_network_vlan(KiscResource):
         self._iStatus = iStatus
         if self._iVerbose: self._INFO('Status is %s' % KiscRuntime.STATUS_MESSAGE[self._iStatus])
         return self._iStatus
+
+
+    def status(self, _bStateful = True, _iIntent = None):
+        return self._STATUS(self._status(_bStateful, _iIntent))
+
+
+    async def statusAsync(self, _bStateful = True, _iIntent = None):
+        return await self._STATUS_ASYNC(self._status(_bStateful, _iIntent))
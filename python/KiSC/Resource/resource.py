@@ -27,9 +27,13 @@
 
 # KiSC
 from KiSC.Runtime import KiscRuntime
+from KiSC.Runtime import KiscRuntime_consumables
+from KiSC.Runtime import KiscRuntime_healthcache
 
 # Standard
+import os
 import sys
+import time
 
 
 #------------------------------------------------------------------------------
@@ -40,6 +44,14 @@ class KiscResource:
     """
     Generic (virtual) resource class, mother of all actual resources classes
     (cluster, storage, network, services, etc.).
+
+    Common configuration parameters are:
+     - [OPTIONAL] command_timeout_<operation> (NUMBER; seconds [*none]):
+       timeout for each (shell) command executed by the given operation
+       (start, suspend, resume, stop, migrate or status); commands are killed
+       - along their process group - once it expires (see KiscRuntime.shell());
+       NOT to be confused with the 'timeout_<operation>' settings of some
+       resources (maximum time to wait for the resource to reach a state)
     """
 
     #--------------------------------------------------------------------------
@@ -58,6 +70,7 @@ class KiscResource:
         self._sId = _sId
         self._dsConfig = _dsConfig
         self._iStatus = KiscRuntime.STATUS_UNKNOWN
+        self._oConsumes = None  # lazily initialized
 
         # ... fill mandatory self.dump() fields
         self._dsConfig['TYPE'] = self.type()
@@ -75,6 +88,12 @@ class KiscResource:
         # ... debugging
         self._iVerbose = KiscRuntime.VERBOSE_NONE
 
+        # ... progress
+        self._fProgress = None
+
+        # ... (local) runtime directory
+        self._sDirectoryRuntime = None
+
 
     def __str__(self):
         return self.toString()
@@ -210,6 +229,214 @@ class KiscResource:
             sys.stderr.write('DEBUG[LR:%s:%s] %s\n' % (self.type(), self.id(), _sMessage.replace('\n', '¬')))
 
 
+    #
+    # Progress
+    #
+
+    def PROGRESS(self, _fProgress):
+        """
+        Set progress callback
+
+        The callback is called (without arguments) by long-running operations,
+        each time their progress (runtime status) is updated.
+
+        @param function _fProgress  Progress callback (None to disable)
+        """
+
+        self._fProgress = _fProgress
+
+
+    def _PROGRESS(self):
+        """
+        Call the progress callback (if any)
+        """
+
+        if self._fProgress is not None:
+            try:
+                self._fProgress()
+            except OSError as e:
+                self._WARNING('Failed to report progress; %s' % str(e))
+
+
+    #
+    # Runtime
+    #
+
+    def RUNTIME(self, _sDirectoryRuntime):
+        """
+        Set the (local) runtime directory
+
+        Resources may keep host-specific runtime data (e.g. cached health check
+        results) in this directory.
+
+        @param str _sDirectoryRuntime  Runtime directory (path; None if unavailable)
+        """
+
+        self._sDirectoryRuntime = _sDirectoryRuntime
+
+
+    #
+    # Timeout
+    #
+
+    def _TIMEOUT(self, _sOperation, _fDefault = None):
+        """
+        Return the timeout for the given operation (shell) commands
+
+        The timeout is set by the 'command_timeout_<operation>' setting, defaulting
+        to the given default - no timeout, unless specified - if missing (or invalid).
+
+        @param str   _sOperation  Operation (start, suspend, resume, stop, migrate or status)
+        @param float _fDefault    Default timeout (seconds; None for no timeout)
+
+        @return float  Timeout (seconds; None for no timeout)
+        """
+
+        sSetting = 'command_timeout_'+_sOperation
+        try:
+            return float(self._dsConfig[sSetting])
+        except KeyError:
+            return _fDefault
+        except ValueError:
+            self._WARNING('Invalid timeout value (%s); using default (%s)' % (self._dsConfig[sSetting], '%gs' % _fDefault if _fDefault is not None else 'none'))
+            return _fDefault
+
+
+    #
+    # Status
+    #
+
+    def _STATUS(self, _oStatus, _fQuery = None):
+        """
+        Drive the given status query generator, performing each query it yields
+        and sending back its result (or throwing back its exception); status()
+        and statusAsync() thus share the same (generator) implementation
+
+        @param generator _oStatus  Status query generator (returning the resource status)
+        @param function  _fQuery   Query function (default: execute the yielded shell command;
+                                   see KiscRuntime.shell())
+
+        @return int  Resource status (see KiscRuntime.STATUS_* constants)
+        """
+
+        if _fQuery is None:
+            _fQuery = lambda mCommand: KiscRuntime.shell(mCommand, _fTimeout = self._TIMEOUT('status'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+        try:
+            mQuery = next(_oStatus)
+            while True:
+                try:
+                    mResult = _fQuery(mQuery)
+                except BaseException as e:
+                    mQuery = _oStatus.throw(e)  # handled (or re-raised) by the generator
+                    continue
+                mQuery = _oStatus.send(mResult)
+        except StopIteration as e:
+            return e.value
+
+
+    async def _STATUS_ASYNC(self, _oStatus, _fQuery = None):
+        """
+        Drive the given status query generator, asynchronously (see self._STATUS())
+
+        @param generator _oStatus  Status query generator (returning the resource status)
+        @param function  _fQuery   Query function, returning an awaitable (default: execute
+                                   the yielded shell command; see KiscRuntime_aio.shell())
+
+        @return int  Resource status (see KiscRuntime.STATUS_* constants)
+        """
+
+        from KiSC.Runtime.aio import KiscRuntime_aio
+        if _fQuery is None:
+            _fQuery = lambda mCommand: KiscRuntime_aio.shell(mCommand, _fTimeout = self._TIMEOUT('status'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+        try:
+            mQuery = next(_oStatus)
+            while True:
+                try:
+                    mResult = await _fQuery(mQuery)
+                except BaseException as e:
+                    mQuery = _oStatus.throw(e)  # handled (or re-raised) by the generator
+                    continue
+                mQuery = _oStatus.send(mResult)
+        except StopIteration as e:
+            return e.value
+
+
+    #
+    # Health check
+    #
+
+    def _HEALTH(self, _fProbe, _lsKeys, _bForce = False):
+        """
+        Probe the resource health, re-using the cached result unless expired
+
+        The result is cached in the (local) runtime directory - if set - for
+        the 'cache_ttl' setting (seconds; default: 60; 0 to disable caching),
+        probing being single-flight (see KiscRuntime_healthcache).
+
+        @param function _fProbe  Probe function; must set self._iStatus and return error messages (list)
+        @param list     _lsKeys  Runtime status keys set by the probe (and to cache along its outcome)
+        @param bool     _bForce  Probe regardless of the cached result
+
+        @return list  Empty if the resource is healthy, (ordered) error messages otherwise
+        """
+
+        # Settings
+        try:
+            fTTL = float(self._dsConfig.get('cache_ttl', 60))
+        except ValueError:
+            self._iStatus = KiscRuntime.STATUS_ERROR
+            return ['Invalid "cache_ttl" setting (%s)' % self._dsConfig['cache_ttl']]
+
+        # Probe (without cache)
+        if self._sDirectoryRuntime is None or fTTL <= 0:
+            return _fProbe()
+
+        # Probe (with cache)
+        def fProbe():
+            lsErrors_sub = _fProbe()
+            dsResult = {sKey: self._dsConfig[sKey] for sKey in _lsKeys if sKey in self._dsConfig}
+            dsResult['status'] = KiscRuntime.STATUS_MESSAGE[self._iStatus]
+            dsResult['errors'] = '; '.join(lsErrors_sub)
+            return dsResult
+        oCache = KiscRuntime_healthcache(self._sDirectoryRuntime+os.sep+self.type()+':'+self.id()+'.health', self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+        try:
+            (dsResult, bCached) = oCache.probe(0.0 if _bForce else fTTL, fProbe)
+        except OSError as e:
+            self._WARNING('Failed to cache health check result; %s' % str(e))
+            return _fProbe()
+        if not _bForce:
+            from KiSC.Runtime.metrics import KiscRuntime_metrics
+            KiscRuntime_metrics.cache('health', bCached)
+        if bCached:
+            for sKey in _lsKeys:
+                if sKey in dsResult:
+                    self._dsConfig[sKey] = dsResult[sKey]
+            self._iStatus = KiscRuntime.STATUS_ERROR
+            for iStatus in range(KiscRuntime.STATUS_UNKNOWN, KiscRuntime.STATUS_ERROR+1):
+                if dsResult.get('status') == KiscRuntime.STATUS_MESSAGE[iStatus]:
+                    self._iStatus = iStatus
+                    break
+            if self._iVerbose: self._DEBUG('Using cached health check result (%s)' % time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(float(dsResult['timestamp']))))
+        self._dsConfig['$HEALTH_TIMESTAMP'] = dsResult['timestamp']
+        self._dsConfig['$HEALTH_LATENCY'] = '%sms' % dsResult['latency']
+        return [sError for sError in dsResult.get('errors', '').split('; ') if len(sError)]
+
+
+    def _HEALTH_CLEAR(self):
+        """
+        Clear the cached health check result (if any)
+        """
+
+        self._dsConfig.pop('$HEALTH_TIMESTAMP', None)
+        self._dsConfig.pop('$HEALTH_LATENCY', None)
+        if self._sDirectoryRuntime is None:
+            return
+        try:
+            KiscRuntime_healthcache(self._sDirectoryRuntime+os.sep+self.type()+':'+self.id()+'.health').clear()
+        except OSError as e:
+            self._WARNING('Failed to clear cached health check result; %s' % str(e))
+
+
     #--------------------------------------------------------------------------
     # METHODS: self (to be implemented)
     #--------------------------------------------------------------------------
@@ -292,6 +519,16 @@ class KiscResource:
         raise SystemError('KiscResource.stop() not implemented')
 
 
+    def isMigratable(self):
+        """
+        Return whether the resource supports migration (see migrate())
+
+        @return bool  True if the resource may be migrated, False otherwise
+        """
+
+        return False
+
+
     def migrate(self, _oHost):
         """
         Migrate the resource to the given host (idempotently)
@@ -310,7 +547,7 @@ class KiscResource:
         The purpose status MAY be used to adapt the status check for a specific prupose; e.g. when stopping
         a resource, it may be desirable to perform only a "shallow" status check.
 
-        @param bood _bStateful  Query the resource status (rather than just returning its cached value)
+        @param bool _bStateful  Query the resource status (rather than just returning its cached value)
         @param int  _iIntent    Intent (status) of the status check
 
         @return int  Resource status (see KiscRuntime.STATUS_* constants)
@@ -319,6 +556,58 @@ class KiscResource:
         raise SystemError('KiscResource.status() not implemented')
 
 
+    #
+    # Resource (asynchronous)
+    #
+
+    def startAsync(self):
+        """
+        Start the resource (idempotently), asynchronously
+
+        The default implementation executes start() in a worker thread (see
+        KiscRuntime_aio.thread()); resources MAY override it with a native
+        (coroutine) implementation.
+
+        @return awaitable  See start()
+        """
+
+        from KiSC.Runtime.aio import KiscRuntime_aio
+        return KiscRuntime_aio.thread(self.start)
+
+
+    def stopAsync(self):
+        """
+        Stop the resource (idempotently), asynchronously
+
+        The default implementation executes stop() in a worker thread (see
+        KiscRuntime_aio.thread()); resources MAY override it with a native
+        (coroutine) implementation.
+
+        @return awaitable  See stop()
+        """
+
+        from KiSC.Runtime.aio import KiscRuntime_aio
+        return KiscRuntime_aio.thread(self.stop)
+
+
+    def statusAsync(self, _bStateful = True, _iIntent = None):
+        """
+        Query the resource status, asynchronously
+
+        The default implementation executes status() in a worker thread (see
+        KiscRuntime_aio.thread()); resources MAY override it with a native
+        (coroutine) implementation.
+
+        @param bool _bStateful  Query the resource status (rather than just returning its cached value)
+        @param int  _iIntent    Intent (status) of the status check
+
+        @return awaitable  See status()
+        """
+
+        from KiSC.Runtime.aio import KiscRuntime_aio
+        return KiscRuntime_aio.thread(self.status, _bStateful, _iIntent)
+
+
     #
     # Registration
     #
@@ -405,6 +694,24 @@ class KiscResource:
         return KiscRuntime.parseList(self._dsConfig.get('$HOSTS', None))
 
 
+    #
+    # Consumables
+    #
+
+    def consumes(self):
+        """
+        Return the consumables consumed by the resource (parsed once and cached)
+
+        @return KiscRuntime_consumables  Consumables vector
+
+        @exception RuntimeError  On 'CONSUMES' parse error
+        """
+
+        if self._oConsumes is None:
+            self._oConsumes = KiscRuntime_consumables(self._dsConfig.get('CONSUMES', None), 1)
+        return self._oConsumes
+
+
 #------------------------------------------------------------------------------
 # FACTORY
 #------------------------------------------------------------------------------
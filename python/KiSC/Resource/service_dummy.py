@@ -84,6 +84,15 @@ class KiscResource_service_dummy(KiscResource):
         return list()
 
 
+    def isMigratable(self):
+        return True
+
+
+    def migrate(self, _oHost):
+        if self._iVerbose: self._INFO('Migrated')
+        return list()
+
+
     def status(self, _bStateful = True, _iIntent = None):
         if self._iStatus == KiscRuntime.STATUS_UNKNOWN:
             self._iStatus = KiscRuntime.STATUS_STOPPED
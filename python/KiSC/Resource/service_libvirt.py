@@ -27,6 +27,7 @@
 
 # KiSC
 from KiSC.Runtime import KiscRuntime
+from KiSC.Runtime import KiscRuntime_virsh
 from KiSC.Resource import KiscResource
 
 # Standard
@@ -62,6 +63,37 @@ class KiscResource_service_libvirt(KiscResource):
        maximum time to wait for domain to stop
      - [OPTIONAL] timeout_migrate (NUMBER; seconds[*60]):
        maximum time to wait for domain to migrate
+       (before suspending it or - if post-copy is enabled - switching to post-copy)
+     - [OPTIONAL] migrate_parallel (NUMBER; connections[*0]):
+       quantity of parallel migration connections (0 = single connection)
+     - [OPTIONAL] migrate_compressed (BOOLEAN[*no]):
+       compress the migration data
+     - [OPTIONAL] migrate_compression_methods (STRING; comma-separated):
+       compression methods (e.g. 'xbzrle', 'mt', 'zlib', 'zstd')
+     - [OPTIONAL] migrate_bandwidth (NUMBER; MiB/s[*0]):
+       maximum migration bandwidth (0 = unlimited)
+     - [OPTIONAL] migrate_auto_converge (BOOLEAN[*no]):
+       throttle the domain CPUs to force the migration to converge
+     - [OPTIONAL] migrate_postcopy (BOOLEAN[*no]):
+       enable post-copy migration (switched to on timeout)
+     - [OPTIONAL] migrate_postcopy_after_precopy (BOOLEAN[*no]):
+       switch to post-copy as soon as the first pre-copy iteration is complete
+     - [OPTIONAL] migrate_sample_interval (NUMBER; seconds[*5]):
+       migration progress ('virsh domjobinfo') sampling interval (0 = disabled)
+     - [OPTIONAL] command_timeout_<operation> (NUMBER; seconds [*none]):
+       timeout for each (shell) command executed by the given operation
+       (start, suspend, resume, stop, migrate or status), after which the
+       command is killed (see KiscResource); NOT the maximum time to wait
+       for the domain state (see timeout_<operation>)
+
+    The migration progress and (final) report are exposed in the resource
+    runtime status, as the $MIGRATION_* keys:
+     - $MIGRATION_STATUS: running, completed or failed
+     - $MIGRATION_ELAPSED: time elapsed (seconds)
+     - $MIGRATION_PROCESSED: data processed (bytes)
+     - $MIGRATION_REMAINING: data remaining (bytes; while running)
+     - $MIGRATION_RATE: migration rate (MiB/s; average, once completed)
+     - $MIGRATION_DOWNTIME: domain downtime (milliseconds; once completed)
 
     For further details, see:
      - [CLI] man virsh
@@ -125,26 +157,19 @@ class KiscResource_service_libvirt(KiscResource):
                 raise RuntimeError('Configuration file not cached')
 
             # ... start/create domain
-            if 'config_file' not in self._dsConfig:
-                KiscRuntime.shell(['virsh', '-q', 'start', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
-            else:
-                KiscRuntime.shell(['virsh', '-q', 'create', self._sCachedConfigFile], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
-
-            # ... wait for domain to start
-            while iTimeout >= 0:
-                iTimeout -= 1
-                try:
-                    if KiscRuntime.shell(['virsh', 'domstate', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE).strip() == 'running':
-                        break;
-                except OSError as e:
-                    if e.filename == 0:
-                        pass
-                    else:
-                        raise e
-                if iTimeout < 0:
-                    KiscRuntime.shell(['virsh', '-q', 'destroy', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
-                    raise RuntimeError('Domain did not stop')
-                time.sleep(1)
+            oListener = self._listen()
+            try:
+                if 'config_file' not in self._dsConfig:
+                    KiscRuntime_virsh.shell(['start', self._dsConfig['name']], _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                else:
+                    KiscRuntime_virsh.shell(['create', self._sCachedConfigFile], _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+
+                # ... wait for domain to start
+                if not self._wait(oListener, 'running', iTimeout):
+                    KiscRuntime_virsh.shell(['destroy', self._dsConfig['name']], _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                    raise RuntimeError('Domain did not start')
+            finally:
+                self._unlisten(oListener)
 
             # ... done
             self._iStatus = KiscRuntime.STATUS_STARTED
@@ -181,22 +206,15 @@ class KiscResource_service_libvirt(KiscResource):
                 raise RuntimeError('Invalid timeout value (%s)' % self._dsConfig['timeout_suspend'])
 
             # ... suspend domain
-            KiscRuntime.shell(['virsh', '-q', 'suspend', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
-
-            # ... wait for domain to suspend
-            while iTimeout >= 0:
-                iTimeout -= 1
-                try:
-                    if KiscRuntime.shell(['virsh', 'domstate', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE).strip() == 'paused':
-                        break;
-                except OSError as e:
-                    if e.filename == 0:
-                        break
-                    else:
-                        raise e
-                if iTimeout < 0:
+            oListener = self._listen()
+            try:
+                KiscRuntime_virsh.shell(['suspend', self._dsConfig['name']], _fTimeout = self._TIMEOUT('suspend'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+
+                # ... wait for domain to suspend
+                if not self._wait(oListener, 'paused', iTimeout, True):
                     raise RuntimeError('Domain did not suspend')
-                time.sleep(1)
+            finally:
+                self._unlisten(oListener)
 
             # ... done
             self._iStatus = KiscRuntime.STATUS_SUSPENDED
@@ -233,25 +251,18 @@ class KiscResource_service_libvirt(KiscResource):
                 raise RuntimeError('Invalid timeout value (%s)' % self._dsConfig['timeout_resume'])
 
             # ... resume domain
-            KiscRuntime.shell(['virsh', '-q', 'resume', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
-
-            # ... wait for domain to resume
-            while iTimeout >= 0:
-                iTimeout -= 1
-                try:
-                    if KiscRuntime.shell(['virsh', 'domstate', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE).strip() == 'running':
-                        break;
-                except OSError as e:
-                    if e.filename == 0:
-                        break
-                    else:
-                        raise e
-                if iTimeout < 0:
+            oListener = self._listen()
+            try:
+                KiscRuntime_virsh.shell(['resume', self._dsConfig['name']], _fTimeout = self._TIMEOUT('resume'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+
+                # ... wait for domain to resume
+                if not self._wait(oListener, 'running', iTimeout, True):
                     raise RuntimeError('Domain did not resume')
-                time.sleep(1)
+            finally:
+                self._unlisten(oListener)
 
             # ... done
-            self._iStatus = KiscRuntime.STATUS_RESUMED
+            self._iStatus = KiscRuntime.STATUS_STARTED
             if self._iVerbose: self._INFO('Resumed')
 
         except OSError as e:
@@ -282,23 +293,16 @@ class KiscResource_service_libvirt(KiscResource):
                 raise RuntimeError('Invalid timeout value (%s)' % self._dsConfig['timeout_stop'])
 
             # ... stop domain
-            KiscRuntime.shell(['virsh', '-q', 'shutdown', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
-
-            # ... wait for domain to stop
-            while iTimeout >= 0:
-                iTimeout -= 1
-                try:
-                    if KiscRuntime.shell(['virsh', 'domstate', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE).strip() == 'shut off':
-                        break;
-                except OSError as e:
-                    if e.filename == 0:
-                        break
-                    else:
-                        raise e
-                if iTimeout < 0:
-                    KiscRuntime.shell(['virsh', '-q', 'destroy', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            oListener = self._listen()
+            try:
+                KiscRuntime_virsh.shell(['shutdown', self._dsConfig['name']], _fTimeout = self._TIMEOUT('stop'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+
+                # ... wait for domain to stop
+                if not self._wait(oListener, 'shut off', iTimeout, True):
+                    KiscRuntime_virsh.shell(['destroy', self._dsConfig['name']], _fTimeout = self._TIMEOUT('stop'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
                     raise RuntimeError('Domain did not stop')
-                time.sleep(1)
+            finally:
+                self._unlisten(oListener)
 
             # ... done
             self._iStatus = KiscRuntime.STATUS_STOPPED
@@ -313,6 +317,10 @@ class KiscResource_service_libvirt(KiscResource):
         return lsErrors
 
 
+    def isMigratable(self):
+        return True
+
+
     def migrate(self, _oHost):
         if self._iVerbose: self._INFO('Migrating')
         lsErrors = list()
@@ -336,11 +344,40 @@ class KiscResource_service_libvirt(KiscResource):
             except ValueError:
                 raise RuntimeError('Invalid timeout value (%s)' % self._dsConfig['timeout_migrate'])
 
+            # ... tuning
+            try:
+                iParallel = int(self._dsConfig.get('migrate_parallel', 0))
+                iBandwidth = int(self._dsConfig.get('migrate_bandwidth', 0))
+                fSampleInterval = float(self._dsConfig.get('migrate_sample_interval', 5))
+            except ValueError as e:
+                raise RuntimeError('Invalid migration setting; %s' % str(e))
+            bCompressed = KiscRuntime.parseBool(self._dsConfig.get('migrate_compressed', False))
+            bAutoConverge = KiscRuntime.parseBool(self._dsConfig.get('migrate_auto_converge', False))
+            bPostcopy = KiscRuntime.parseBool(self._dsConfig.get('migrate_postcopy', False))
+
             # ... migrate domain
             lsCommand = ['virsh', '-q', 'migrate', '--live']
-            if iTimeout > 0: lsCommand.extend(['--timeout', str(iTimeout), '--timeout-suspend'])
+            if iParallel > 0:
+                lsCommand.extend(['--parallel', '--parallel-connections', str(iParallel)])
+            if bCompressed:
+                lsCommand.append('--compressed')
+                if 'migrate_compression_methods' in self._dsConfig:
+                    lsCommand.extend(['--comp-methods', self._dsConfig['migrate_compression_methods']])
+            if iBandwidth > 0:
+                lsCommand.extend(['--bandwidth', str(iBandwidth)])
+            if bAutoConverge:
+                lsCommand.append('--auto-converge')
+            if bPostcopy:
+                lsCommand.append('--postcopy')
+                if KiscRuntime.parseBool(self._dsConfig.get('migrate_postcopy_after_precopy', False)):
+                    lsCommand.append('--postcopy-after-precopy')
+            if iTimeout > 0:
+                lsCommand.extend(['--timeout', str(iTimeout), '--timeout-postcopy' if bPostcopy else '--timeout-suspend'])
             lsCommand.extend([self._dsConfig['name'], sRemoteUri])
-            KiscRuntime.shell(lsCommand, _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            try:
+                self._migrate(lsCommand, fSampleInterval)
+            finally:
+                KiscRuntime_virsh.invalidate(self._dsConfig['name'])
 
             # ... done
             self._iStatus = KiscRuntime.STATUS_STARTED
@@ -355,7 +392,11 @@ class KiscResource_service_libvirt(KiscResource):
         return lsErrors
 
 
-    def status(self, _bStateful = True, _iIntent = None):
+    def _status(self, _bStateful, _iIntent):
+        """
+        Query the resource status (generator), yielding the domain name (to query
+        the state of); shared by status() and statusAsync() (see KiscResource._STATUS())
+        """
         if self._iVerbose: self._INFO('Querying status')
         iStatus = KiscRuntime.STATUS_UNKNOWN
 
@@ -363,7 +404,7 @@ class KiscResource_service_libvirt(KiscResource):
 
             # Query domain state
             try:
-                sOutput = KiscRuntime.shell(['virsh', 'domstate', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE).strip()
+                sOutput = yield self._dsConfig['name']
                 if sOutput is None or not len(sOutput):
                     iStatus = KiscRuntime.STATUS_ERROR
                 elif sOutput == 'shut off':
@@ -386,3 +427,229 @@ class KiscResource_service_libvirt(KiscResource):
         self._iStatus = iStatus
         if self._iVerbose: self._INFO('Status is %s' % KiscRuntime.STATUS_MESSAGE[self._iStatus])
         return self._iStatus
+
+
+    def status(self, _bStateful = True, _iIntent = None):
+        return self._STATUS(self._status(_bStateful, _iIntent), lambda sName: KiscRuntime_virsh.domstate(sName, _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE))
+
+
+    async def statusAsync(self, _bStateful = True, _iIntent = None):
+        return await self._STATUS_ASYNC(self._status(_bStateful, _iIntent), lambda sName: KiscRuntime_virsh.domstateAsync(sName, _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE))
+
+
+    #--------------------------------------------------------------------------
+    # METHODS: self
+    #--------------------------------------------------------------------------
+
+    #
+    # Helpers
+    #
+
+    def _migrate(self, _lsCommand, _fSampleInterval):
+        """
+        Execute the given migration command, sampling its progress with
+        'virsh domjobinfo' and reporting it as $MIGRATION_* runtime status
+
+        @param list  _lsCommand        Migration command ('virsh migrate ...')
+        @param float _fSampleInterval  Progress sampling interval (seconds)
+
+        @exception OSError  On migration (command) error
+        """
+
+        sName = self._dsConfig['name']
+        for sKey in [sKey for sKey in self._dsConfig if sKey.startswith('$MIGRATION_')]:
+            del self._dsConfig[sKey]
+        self._dsConfig['$MIGRATION_STATUS'] = 'running'
+
+        # ... progress
+        def progress():
+            try:
+                dfJobInfo = self._jobinfo(KiscRuntime_virsh.shell(['domjobinfo', sName], _fTimeout = self._TIMEOUT('status'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE))
+            except OSError:
+                return
+            if 'Data processed' not in dfJobInfo:
+                return
+            self._dsConfig['$MIGRATION_ELAPSED'] = '%.1f' % (dfJobInfo.get('Time elapsed', 1000.0*(time.time()-fStart))/1000.0)
+            self._dsConfig['$MIGRATION_PROCESSED'] = '%d' % dfJobInfo['Data processed']
+            if 'Data remaining' in dfJobInfo:
+                self._dsConfig['$MIGRATION_REMAINING'] = '%d' % dfJobInfo['Data remaining']
+            if 'Memory bandwidth' in dfJobInfo:
+                self._dsConfig['$MIGRATION_RATE'] = '%.1f' % (dfJobInfo['Memory bandwidth']/1048576.0)
+            if self._iVerbose: self._DEBUG('Migration progress: %s MiB processed, %s MiB remaining, %s MiB/s' % (
+                int(dfJobInfo['Data processed']/1048576.0),
+                int(dfJobInfo.get('Data remaining', 0.0)/1048576.0),
+                self._dsConfig.get('$MIGRATION_RATE', '-'),
+            ))
+            self._PROGRESS()
+
+        # Migrate
+        fStart = time.time()
+        try:
+            KiscRuntime.shell(
+                _lsCommand,
+                _fTimeout = self._TIMEOUT('migrate'),
+                _fProgress = progress if _fSampleInterval > 0.0 else None,
+                _fProgressInterval = _fSampleInterval,
+                _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE
+            )
+        except OSError as e:
+            self._dsConfig.pop('$MIGRATION_REMAINING', None)
+            self._dsConfig['$MIGRATION_STATUS'] = 'failed'
+            self._dsConfig['$MIGRATION_ELAPSED'] = '%.1f' % (time.time()-fStart)
+            raise OSError(e.errno, e.strerror, 0)
+        fDuration = time.time()-fStart
+        self._dsConfig.pop('$MIGRATION_REMAINING', None)
+
+        # Report
+        self._dsConfig['$MIGRATION_STATUS'] = 'completed'
+        try:
+            dfJobInfo = self._jobinfo(KiscRuntime_virsh.shell(['domjobinfo', '--completed', sName], _fTimeout = self._TIMEOUT('status'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE))
+        except OSError:
+            dfJobInfo = dict()
+        if 'Time elapsed' in dfJobInfo:
+            fDuration = dfJobInfo['Time elapsed']/1000.0
+        self._dsConfig['$MIGRATION_ELAPSED'] = '%.1f' % fDuration
+        if 'Data processed' in dfJobInfo:
+            self._dsConfig['$MIGRATION_PROCESSED'] = '%d' % dfJobInfo['Data processed']
+        if 'Total downtime' in dfJobInfo:
+            self._dsConfig['$MIGRATION_DOWNTIME'] = '%d' % dfJobInfo['Total downtime']
+        if '$MIGRATION_PROCESSED' in self._dsConfig and fDuration > 0.0:
+            self._dsConfig['$MIGRATION_RATE'] = '%.1f' % (int(self._dsConfig['$MIGRATION_PROCESSED'])/1048576.0/fDuration)
+        if self._iVerbose: self._INFO('Migrated in %s seconds (%s MiB processed, %s MiB/s, %s ms downtime)' % (
+            self._dsConfig['$MIGRATION_ELAPSED'],
+            int(int(self._dsConfig.get('$MIGRATION_PROCESSED', 0))/1048576.0),
+            self._dsConfig.get('$MIGRATION_RATE', '-'),
+            self._dsConfig.get('$MIGRATION_DOWNTIME', '-'),
+        ))
+
+
+    def _jobinfo(self, _sOutput):
+        """
+        Parse the given 'virsh domjobinfo' output
+
+        @param str _sOutput  'virsh domjobinfo' output
+
+        @return dict  Job information (float) values, per (human-readable) name;
+                      sizes in bytes, rates in bytes/s, times in milliseconds
+        """
+
+        import re
+        oRegexpValue = re.compile('^([^:]+):\\s+([0-9.]+)\\s*(\\S*)')
+        dfUnits = {'B': 1.0, 'KiB': 1024.0, 'MiB': 1048576.0, 'GiB': 1073741824.0, 'TiB': 1099511627776.0}
+        dfJobInfo = dict()
+        for sLine in _sOutput.splitlines():
+            oMatch = oRegexpValue.match(sLine.strip())
+            if oMatch is None:
+                continue
+            sUnit = oMatch.group(3).split('/')[0]
+            try:
+                dfJobInfo[oMatch.group(1).strip()] = float(oMatch.group(2))*dfUnits.get(sUnit, 1.0)
+            except ValueError:
+                pass
+        return dfJobInfo
+
+
+    def _listen(self):
+        """
+        Start listening to the domains lifecycle events (see self._wait())
+
+        The listener must be started before acting on the domain, for its
+        lifecycle events not to be missed.
+
+        @return Popen  Events listener ('virsh event' process; see KiscRuntime.spawn()),
+                       None if unavailable (or a command backend is set)
+        """
+
+        if KiscRuntime.getBackend() is not None:
+            return None
+        try:
+            return KiscRuntime.spawn(['virsh', '-q', 'event', '--event', 'lifecycle', '--loop'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+        except OSError as e:
+            if self._iVerbose: self._WARNING('Failed to listen to domain events; %s' % str(e))
+            return None
+
+
+    def _unlisten(self, _oListener):
+        """
+        Stop listening to the domains lifecycle events
+
+        @param Popen _oListener  Events listener (see self._listen())
+        """
+
+        if _oListener is None:
+            return
+        KiscRuntime.reap(_oListener, _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+
+
+    def _wait(self, _oListener, _sState, _iTimeout, _bUndefined = False):
+        """
+        Wait for the domain to reach the given state
+
+        The domain state is (re-)checked as soon as one of its lifecycle events
+        is received (see self._listen()) or - otherwise or if the events are
+        unavailable - with an adaptive backoff interval (see KiscRuntime.wait()).
+
+        @param Popen _oListener   Events listener (may be None)
+        @param str   _sState      Domain state (as reported by 'virsh domstate')
+        @param int   _iTimeout    Maximum time to wait for (seconds)
+        @param bool  _bUndefined  Whether an undefined (vanished) domain matches the state
+
+        @return bool  True if the domain reached the given state, False on timeout
+
+        @exception OSError  On domain state query error
+        """
+
+        import re
+        import select
+        sName = self._dsConfig['name']
+        oRegexpEvent = re.compile('^event \'lifecycle\' for domain \'?(.+?)\'?: (\\S+)')
+        dsEventsStates = {
+            'Started': 'running',
+            'Resumed': 'running',
+            'Suspended': 'paused',
+            'Stopped': 'shut off',
+        }
+        lbyBuffer = [bytes()]
+        lbEOF = [False]
+
+        # ... domain state check
+        def condition():
+            try:
+                return KiscRuntime_virsh.shell(['domstate', sName], _fTimeout = self._TIMEOUT('status'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE).strip() == _sState
+            except OSError as e:
+                if e.filename == 0:
+                    return _bUndefined
+                raise e
+
+        # ... domain lifecycle event wait; returns True if the event matches the state
+        def wait(fInterval):
+            if _oListener is None or lbEOF[0] or _oListener.poll() is not None:
+                time.sleep(fInterval)
+                return False
+            fDeadline = time.time()+fInterval
+            while True:
+                fRemaining = fDeadline-time.time()
+                if fRemaining <= 0.0 or not select.select([_oListener.stdout], [], [], fRemaining)[0]:
+                    return False
+                byData = os.read(_oListener.stdout.fileno(), 4096)
+                if not byData:
+                    # (listener exited but is not reaped yet; fall back to polling)
+                    lbEOF[0] = True
+                    time.sleep(max(0.0, fDeadline-time.time()))
+                    return False
+                lbyLines = (lbyBuffer[0]+byData).split(b'\n')
+                lbyBuffer[0] = lbyLines.pop()
+                bEvent = False
+                for byLine in lbyLines:
+                    oMatch = oRegexpEvent.match(byLine.decode(errors='replace').strip())
+                    if oMatch is None or oMatch.group(1) != sName:
+                        continue
+                    if self._iVerbose: self._DEBUG('Domain event (%s)' % oMatch.group(2))
+                    if dsEventsStates.get(oMatch.group(2), None) == _sState:
+                        return True
+                    bEvent = True
+                if bEvent:
+                    return False
+
+        # ... wait
+        return KiscRuntime.wait(condition, _iTimeout, wait)
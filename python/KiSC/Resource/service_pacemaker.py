@@ -27,12 +27,12 @@
 
 # KiSC
 from KiSC.Runtime import KiscRuntime
+from KiSC.Runtime import KiscRuntime_pacemaker
 from KiSC.Resource import KiscResource
 
 # Standard
 import os
 import stat
-import time
 
 
 #------------------------------------------------------------------------------
@@ -50,17 +50,34 @@ class KiscResource_service_pacemaker(KiscResource):
        (Pacemaker) resource configuration file (*.xml)
        if specified, the (Pacemaker) resource configuration will be created/updated
        based on the given file when the resource is started
+       (either a <resources> element or a single resource element)
      - [OPTIONAL] constraint_file (STRING; path):
        (Pacemaker) constraint configuration file (*.xml)
        if specified, the (Pacemaker) constraint configuration will be created/updated
        based on the given file when the resource is started
+       (either a <constraints> element or a single constraint element)
      - [OPTIONAL] timeout_start (NUMBER; seconds[*15]):
        maximum time to wait for (Pacemaker) resource to start
      - [OPTIONAL] timeout_stop (NUMBER; seconds[*60]):
        maximum time to wait for (Pacemaker) resource to stop
+     - [OPTIONAL] timeout_cib (NUMBER; seconds[*15]):
+       maximum time to wait for the (local) CIB to be updated, once the
+       resource/constraint configuration has been submitted
      - [OPTIONAL] cleanup (*no|yes):
        whether to delete the (Pacemaker) resource/constraint configuration when
        the resource is stopped
+     - [OPTIONAL] command_timeout_<operation> (NUMBER; seconds [*none]):
+       timeout for each (shell) command executed by the given operation
+       (start, stop or status), after which the command is killed (see
+       KiscResource); NOT the maximum time to wait for the (Pacemaker)
+       resource state (see timeout_<operation>)
+
+    The resource and constraint configurations are applied as a single CIB
+    update - unless already present in the (local) CIB - after which the
+    (local) CIB configuration epoch is waited for to change; the
+    resource placement is then waited for with an adaptive backoff interval.
+    The resource status is answered from a cluster status snapshot shared by
+    all resources (see KiscRuntime_pacemaker).
 
     For further details, see:
      - [CLI] man cibadmin
@@ -87,12 +104,149 @@ class KiscResource_service_pacemaker(KiscResource):
 
     def _cleanup(self):
         if KiscRuntime.parseBool(self._dsConfig.get('cleanup', False)):
+            lsXPaths = list()
             if 'constraint_file' in self._dsConfig:
-                KiscRuntime.shell(['cibadmin', '-o', 'constraints', '-d', '-f', '-A', '//rsc_location[@rsc=\'%s\']' % self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
-                time.sleep(3)
+                lsXPaths.append('//constraints/rsc_location[@rsc=\'%s\']' % self._dsConfig['name'])
             if 'resource_file' in self._dsConfig:
-                KiscRuntime.shell(['cibadmin', '-o', 'resources', '-D', '-A', '//primitive[@id=\'%s\'] | //group[@id=\'%s\']' % (self._dsConfig['name'], self._dsConfig['name'])], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
-                time.sleep(3)
+                lsXPaths.append('//resources/primitive[@id=\'%s\'] | //resources/group[@id=\'%s\']' % (self._dsConfig['name'], self._dsConfig['name']))
+            if lsXPaths:
+                try:
+                    KiscRuntime.shell(['cibadmin', '-d', '-f', '-A', ' | '.join(lsXPaths)], _fTimeout = self._TIMEOUT('stop'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                finally:
+                    KiscRuntime_pacemaker.invalidate()
+
+
+    def _update(self):
+        """
+        Create/update the (Pacemaker) resource and constraint configuration,
+        as a single (CIB) transaction, and wait for the (local) CIB to be updated
+
+        @exception OSError       On CIB update error
+        @exception RuntimeError  On configuration files error or CIB update timeout
+        """
+
+        import xml.etree.ElementTree as ET
+
+        # Combined configuration fragment
+        oConfiguration = ET.Element('configuration')
+        for (sScope, sFile) in [('resources', self._sCachedResourceFile), ('constraints', self._sCachedConstraintFile)]:
+            if sFile is None:
+                continue
+            try:
+                oElement = ET.parse(sFile).getroot()
+            except ET.ParseError as e:
+                raise RuntimeError('Invalid configuration file (%s); %s' % (sFile, str(e)))
+            if oElement.tag != sScope:
+                oScope = ET.Element(sScope)
+                oScope.append(oElement)
+                oElement = oScope
+            oConfiguration.append(oElement)
+        if not len(oConfiguration):
+            return
+
+        # ... timeout
+        try:
+            iTimeout = int(self._dsConfig['timeout_cib'])
+        except KeyError:
+            iTimeout = 15
+        except ValueError:
+            raise RuntimeError('Invalid timeout value (%s)' % self._dsConfig['timeout_cib'])
+
+        # Update
+        tEpoch = self._epoch()
+        if self._applied(oConfiguration):
+            if self._iVerbose: self._DEBUG('CIB already up-to-date')
+            return
+        try:
+            KiscRuntime.shell(['cibadmin', '-o', 'configuration', '-M', '-c', '-X', ET.tostring(oConfiguration, encoding='unicode')], _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+        finally:
+            KiscRuntime_pacemaker.invalidate()
+        if tEpoch[1] >= 0 and not KiscRuntime.wait(lambda: self._epoch() > tEpoch, iTimeout):
+            raise RuntimeError('CIB not updated')
+
+
+    def _applied(self, _oConfiguration):
+        """
+        Return whether the given configuration fragment is already present in
+        the (local) CIB; in other words, whether merging it (cibadmin -M) would
+        leave the CIB configuration unchanged
+
+        @param  ElementTree.Element  _oConfiguration  Configuration fragment (<configuration> element)
+
+        @exception OSError  On CIB query error
+
+        @return bool  True if the fragment is already present, False otherwise
+        """
+
+        import xml.etree.ElementTree as ET
+
+        def contains(_oCurrent, _oFragment):
+            if _oCurrent.tag != _oFragment.tag:
+                return False
+            for (sAttribute, sValue) in _oFragment.items():
+                if _oCurrent.get(sAttribute) != sValue:
+                    return False
+            if (_oFragment.text or str()).strip() != (_oCurrent.text or str()).strip():
+                return False
+            for oFragment_child in _oFragment:
+                if 'id' in oFragment_child.attrib:
+                    loCurrent_children = [o for o in _oCurrent if o.tag == oFragment_child.tag and o.get('id') == oFragment_child.get('id')]
+                else:
+                    loCurrent_children = [o for o in _oCurrent if o.tag == oFragment_child.tag]
+                if not any(contains(o, oFragment_child) for o in loCurrent_children):
+                    return False
+            return True
+
+        for oScope in _oConfiguration:
+            sOutput = KiscRuntime.shell(['cibadmin', '-Q', '-l', '-o', oScope.tag], _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            try:
+                oCurrent = ET.fromstring(sOutput)
+            except ET.ParseError:
+                return False
+            if not contains(oCurrent, oScope):
+                return False
+        return True
+
+
+    def _epoch(self):
+        """
+        Return the (local) CIB configuration epoch
+
+        The status-related update counter (num_updates) is ignored, such as to
+        track configuration changes only.
+
+        @exception OSError  On CIB query error
+
+        @return tuple  (admin_epoch, epoch) tuple
+        """
+
+        import re
+        sOutput = KiscRuntime.shell(['cibadmin', '-Q', '-l', '-A', '/cib', '--no-children'], _fTimeout = self._TIMEOUT('status'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+        oMatch = re.search('<cib\\s[^>]*>', sOutput)
+        if oMatch is None:
+            return (-1, -1)
+        diEpoch = dict()
+        for sAttribute in ['admin_epoch', 'epoch']:
+            oMatch_attribute = re.search('\\s%s="(\\d+)"' % sAttribute, oMatch.group(0))
+            diEpoch[sAttribute] = int(oMatch_attribute.group(1)) if oMatch_attribute is not None else -1
+        return (diEpoch['admin_epoch'], diEpoch['epoch'])
+
+
+    def _locate(self):
+        """
+        Locate the (Pacemaker) resource
+
+        @exception OSError  On resource query error
+
+        @return str  Nodes the resource is running on (comma-separated; empty if stopped or undefined)
+        """
+
+        try:
+            return ','.join(KiscRuntime.shell(['crm_resource', '-Q', '-r', self._dsConfig['name'], '-W'], _fTimeout = self._TIMEOUT('status'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE).split())
+        except OSError as e:
+            if e.filename == 0 and e.errno == 6:
+                return str()
+            raise e
 
 
     #--------------------------------------------------------------------------
@@ -148,24 +302,17 @@ class KiscResource_service_pacemaker(KiscResource):
                 raise RuntimeError('Constraint configuration file not cached')
 
             # ... update Pacemaker resource/constraint configuration
-            if self._sCachedResourceFile is not None:
-                KiscRuntime.shell(['cibadmin', '-o', 'resources', '-M', '-c', '-x', self._sCachedResourceFile], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
-                time.sleep(3)
-            if self._sCachedConstraintFile is not None:
-                KiscRuntime.shell(['cibadmin', '-o', 'constraints', '-M', '-c', '-x', self._sCachedConstraintFile], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
-                time.sleep(3)
+            self._update()
 
             # ... start resource
-            KiscRuntime.shell(['crm_resource', '-Q', '-r', self._dsConfig['name'], '-m', '-p', 'target-role', '-v', 'Started'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            try:
+                KiscRuntime.shell(['crm_resource', '-Q', '-r', self._dsConfig['name'], '-m', '-p', 'target-role', '-v', 'Started'], _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            finally:
+                KiscRuntime_pacemaker.invalidate()
 
             # ... wait for resource to start
-            while iTimeout >= 0:
-                iTimeout -= 1
-                if KiscRuntime.shell(['crm_resource', '-Q', '-r', self._dsConfig['name'], '-W'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE).strip():
-                    break;
-                if iTimeout < 0:
-                    raise RuntimeError('Resource did not start')
-                time.sleep(1)
+            if not KiscRuntime.wait(lambda: len(self._locate()) > 0, iTimeout):
+                raise RuntimeError('Resource did not start')
 
             # ... done
             self._iStatus = KiscRuntime.STATUS_STARTED
@@ -205,16 +352,14 @@ class KiscResource_service_pacemaker(KiscResource):
                 iTimeout = 60
 
             # ... stop resource
-            KiscRuntime.shell(['crm_resource', '-Q', '-r', self._dsConfig['name'], '-m', '-p', 'target-role', '-v', 'Stopped'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            try:
+                KiscRuntime.shell(['crm_resource', '-Q', '-r', self._dsConfig['name'], '-m', '-p', 'target-role', '-v', 'Stopped'], _fTimeout = self._TIMEOUT('stop'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            finally:
+                KiscRuntime_pacemaker.invalidate()
 
             # ... wait for resource to stop
-            while iTimeout >= 0:
-                iTimeout -= 1
-                if not KiscRuntime.shell(['crm_resource', '-Q', '-r', self._dsConfig['name'], '-W'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE).strip():
-                    break;
-                if iTimeout < 0:
-                    raise RuntimeError('Resource did not stop')
-                time.sleep(1)
+            if not KiscRuntime.wait(lambda: not len(self._locate()), iTimeout):
+                raise RuntimeError('Resource did not stop')
 
             # ... clean-up configuration
             self._cleanup()
@@ -232,7 +377,11 @@ class KiscResource_service_pacemaker(KiscResource):
         return lsErrors
 
 
-    def status(self, _bStateful = True, _iIntent = None):
+    def _status(self, _bStateful, _iIntent):
+        """
+        Query the resource status (generator), yielding the resource name (to
+        locate); shared by status() and statusAsync() (see KiscResource._STATUS())
+        """
         if self._iVerbose: self._INFO('Querying status')
         iStatus = KiscRuntime.STATUS_UNKNOWN
 
@@ -240,20 +389,17 @@ class KiscResource_service_pacemaker(KiscResource):
 
             # Locate resource on Pacekamer cluster
             try:
-                sOutput = KiscRuntime.shell(['crm_resource', '-Q', '-r', self._dsConfig['name'], '-W'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE).strip()
-                if sOutput is None or not len(sOutput):
+                sOutput = ','.join((yield self._dsConfig['name']))
+                if not len(sOutput):
                     if '$PACEMAKER_NODES' in self._dsConfig:
                         del self._dsConfig['$PACEMAKER_NODES']
                     iStatus = KiscRuntime.STATUS_STOPPED
                 else:
                     self._dsConfig['$PACEMAKER_NODES'] = sOutput
                     iStatus = KiscRuntime.STATUS_STARTED
-            except OSError as e:
-                if e.filename == 0 and e.errno == 6:
-                    iStatus = KiscRuntime.STATUS_STOPPED
-                else:
-                    if self._iVerbose: self._ERROR(str(e))
-                    iStatus = KiscRuntime.STATUS_ERROR
+            except (OSError, RuntimeError) as e:
+                if self._iVerbose: self._ERROR(str(e))
+                iStatus = KiscRuntime.STATUS_ERROR
 
         else:
             iStatus = self._iStatus 
@@ -262,3 +408,11 @@ class KiscResource_service_pacemaker(KiscResource):
         self._iStatus = iStatus
         if self._iVerbose: self._INFO('Status is %s' % KiscRuntime.STATUS_MESSAGE[self._iStatus])
         return self._iStatus
+
+
+    def status(self, _bStateful = True, _iIntent = None):
+        return self._STATUS(self._status(_bStateful, _iIntent), lambda sName: KiscRuntime_pacemaker.locate(sName, _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE))
+
+
+    async def statusAsync(self, _bStateful = True, _iIntent = None):
+        return await self._STATUS_ASYNC(self._status(_bStateful, _iIntent), lambda sName: KiscRuntime_pacemaker.locateAsync(sName, _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE))
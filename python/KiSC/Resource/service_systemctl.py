@@ -47,6 +47,9 @@ class KiscResource_service_systemctl(KiscResource):
        unit name
      - [OPTIONAL] restart (*no|yes):
        restart unit if already started
+     - [OPTIONAL] command_timeout_<operation> (NUMBER; seconds [*none]):
+       timeout for each (shell) command executed by the given operation
+       (start, stop or status), after which the command is killed (see KiscResource)
 
     For further details, see:
      - [CLI] man systemctl
@@ -96,9 +99,9 @@ class KiscResource_service_systemctl(KiscResource):
         # Start the resource
         try:
             if bRestart:
-                KiscRuntime.shell(['systemctl', '-q', 'restart', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                KiscRuntime.shell(['systemctl', '-q', 'restart', self._dsConfig['name']], _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             else:
-                KiscRuntime.shell(['systemctl', '-q', 'start', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                KiscRuntime.shell(['systemctl', '-q', 'start', self._dsConfig['name']], _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             self._iStatus = KiscRuntime.STATUS_STARTED
             if self._iVerbose: self._INFO('Started')
         except OSError as e:
@@ -121,7 +124,7 @@ class KiscResource_service_systemctl(KiscResource):
 
         # Stop the resource
         try:
-            KiscRuntime.shell(['systemctl', '-q', 'stop', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(['systemctl', '-q', 'stop', self._dsConfig['name']], _fTimeout = self._TIMEOUT('stop'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             self._iStatus = KiscRuntime.STATUS_STOPPED
             if self._iVerbose: self._INFO('Stopped')
         except OSError as e:
@@ -141,7 +144,7 @@ class KiscResource_service_systemctl(KiscResource):
 
             # Exists ?
             try:
-                KiscRuntime.shell(['systemctl', '-q', 'is-active', self._dsConfig['name']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                KiscRuntime.shell(['systemctl', '-q', 'is-active', self._dsConfig['name']], _fTimeout = self._TIMEOUT('status'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
                 iStatus = KiscRuntime.STATUS_STARTED
             except OSError as e:
                 if e.filename == 0:
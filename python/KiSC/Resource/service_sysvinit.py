@@ -47,6 +47,9 @@ class KiscResource_service_sysvinit(KiscResource):
        init script name
      - [OPTIONAL] restart (*no|yes):
        restart unit if already started
+     - [OPTIONAL] command_timeout_<operation> (NUMBER; seconds [*none]):
+       timeout for each (shell) command executed by the given operation
+       (start, stop or status), after which the command is killed (see KiscResource)
 
     For further details, see:
      - [CLI] man invoke-rc.d
@@ -96,9 +99,9 @@ class KiscResource_service_sysvinit(KiscResource):
         # Start the resource
         try:
             if bRestart:
-                KiscRuntime.shell(['invoke-rc.d', '--quiet', self._dsConfig['name'], 'restart'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                KiscRuntime.shell(['invoke-rc.d', '--quiet', self._dsConfig['name'], 'restart'], _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             else:
-                KiscRuntime.shell(['invoke-rc.d', '--quiet', self._dsConfig['name'], 'start'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                KiscRuntime.shell(['invoke-rc.d', '--quiet', self._dsConfig['name'], 'start'], _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             self._iStatus = KiscRuntime.STATUS_STARTED
             if self._iVerbose: self._INFO('Started')
         except OSError as e:
@@ -121,7 +124,7 @@ class KiscResource_service_sysvinit(KiscResource):
 
         # Stop the resource
         try:
-            KiscRuntime.shell(['invoke-rc.d', '--quiet', self._dsConfig['name'], 'stop'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(['invoke-rc.d', '--quiet', self._dsConfig['name'], 'stop'], _fTimeout = self._TIMEOUT('stop'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             self._iStatus = KiscRuntime.STATUS_STOPPED
             if self._iVerbose: self._INFO('Stopped')
         except OSError as e:
@@ -141,7 +144,7 @@ class KiscResource_service_sysvinit(KiscResource):
 
             # Exists ?
             try:
-                KiscRuntime.shell(['invoke-rc.d', '--quiet', self._dsConfig['name'], 'status'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                KiscRuntime.shell(['invoke-rc.d', '--quiet', self._dsConfig['name'], 'status'], _fTimeout = self._TIMEOUT('status'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
                 iStatus = KiscRuntime.STATUS_STARTED
             except OSError as e:
                 # REF: http://refspecs.linuxbase.org/LSB_3.1.0/LSB-Core-generic/LSB-Core-generic/iniscrptact.html
@@ -52,6 +52,9 @@ class KiscResource_storage_mount(KiscResource):
        mount options
      - [OPTIONAL] mkdir (*yes|no):
        create mountpoint directory, if needs be
+     - [OPTIONAL] command_timeout_<operation> (NUMBER; seconds [*none]):
+       timeout for each (shell) command executed by the given operation
+       (start, stop or status), after which the command is killed (see KiscResource)
 
     For further details, see:
      - [CLI] man mount
@@ -106,7 +109,7 @@ class KiscResource_storage_mount(KiscResource):
             if 'options' in self._dsConfig:
                 lsCommand.extend(['-o', self._dsConfig['options']])
             lsCommand.extend([self._dsConfig['device'], self._dsConfig['mountpoint']])
-            KiscRuntime.shell(lsCommand, _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(lsCommand, _fTimeout = self._TIMEOUT('start'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             self._iStatus = KiscRuntime.STATUS_STARTED
             if self._iVerbose: self._INFO('Started')
 
@@ -132,7 +135,7 @@ class KiscResource_storage_mount(KiscResource):
 
         # ... unmount device
         try:
-            KiscRuntime.shell(['umount', self._dsConfig['mountpoint']], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+            KiscRuntime.shell(['umount', self._dsConfig['mountpoint']], _fTimeout = self._TIMEOUT('stop'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             self._iStatus = KiscRuntime.STATUS_STOPPED
             if self._iVerbose: self._INFO('Stopped')
         except OSError as e:
@@ -154,7 +157,7 @@ class KiscResource_storage_mount(KiscResource):
             # NOTE: look only for a mountpoint match, independently from potentially mismatching
             #       fstype, device or options
             try:
-                KiscRuntime.shell(['awk', 'BEGIN{e=22}; {if($2=="%s") {e=0; exit}}; END {exit e}' % self._dsConfig['mountpoint'], '/proc/mounts'], _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
+                KiscRuntime.shell(['awk', 'BEGIN{e=22}; {if($2=="%s") {e=0; exit}}; END {exit e}' % self._dsConfig['mountpoint'], '/proc/mounts'], _fTimeout = self._TIMEOUT('status'), _bTrace = self._iVerbose >= KiscRuntime.VERBOSE_TRACE)
             except OSError as e:
                 if e.filename == 0 and e.errno == 22:
                     iStatus = KiscRuntime.STATUS_STOPPED
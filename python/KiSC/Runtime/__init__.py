@@ -28,3 +28,22 @@
 # KiSC
 from .runtime import \
      KiscRuntime
+from .timeout import \
+     KiscRuntime_timeout
+from .spawn import \
+     KiscRuntime_spawn
+from .trace import \
+     KiscRuntime_trace
+from .consumables import \
+     KiscRuntime_consumables
+from .virsh import \
+     KiscRuntime_virsh
+from .pacemaker import \
+     KiscRuntime_pacemaker
+from .healthcache import \
+     KiscRuntime_healthcache
+from .backend import \
+     KiscRuntime_backend
+# NOTE: KiscRuntime_aio, KiscRuntime_icmp, KiscRuntime_metrics, KiscRuntime_prober
+#       and KiscRuntime_simulator are imported from their own module where used
+#       (e.g. 'from KiSC.Runtime.aio import KiscRuntime_aio'), for faster startup
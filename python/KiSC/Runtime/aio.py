@@ -0,0 +1,324 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# KiSC
+from .runtime import \
+     KiscRuntime
+from .timeout import \
+     KiscRuntime_timeout
+from .trace import \
+     KiscRuntime_trace
+
+# Standard
+# NOTE: asyncio is imported by the helpers themselves (it is not needed for most commands and is slow to import)
+import errno
+import functools
+import os
+import signal
+import sys
+import threading
+import time
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscRuntime_aio:
+    """
+    Asynchronous (asyncio) execution helpers
+
+    Allow resources actions to be overlapped on a single event loop: shell
+    commands are executed as asyncio subprocesses - with the same semantics as
+    KiscRuntime.shell() - and blocking (synchronous) functions in (pooled)
+    worker threads.
+    """
+
+    #--------------------------------------------------------------------------
+    # CONSTANTS
+    #--------------------------------------------------------------------------
+
+    # Worker threads (for blocking functions)
+    THREADS_MAX = 32
+
+
+    #--------------------------------------------------------------------------
+    # CLASS PROPERTIES
+    #--------------------------------------------------------------------------
+
+    # Worker threads
+    _oExecutor = None
+    _oLock = threading.Lock()
+
+    # Shared (single-flight) tasks
+    _doTasks = dict()
+
+
+    #--------------------------------------------------------------------------
+    # HELPERS
+    #--------------------------------------------------------------------------
+
+    async def shell(_llsCommands, _sWorkingDirectory = None, _bRedirectStdOut = True, _bIgnoreReturnCode = False, _fTimeout = None, _bTrace = False):
+        """
+        Execute the given shell (piped) command(s) within the given working
+        directory and returns the resulting standard output (coroutine)
+
+        Piped commands run concurrently, each in its own process group (session),
+        which is killed - SIGTERM, then SIGKILL after KiscRuntime.SHELL_KILL_GRACE
+        seconds - if the timeout expires; or SIGKILL-ed right away if the
+        coroutine is cancelled.
+
+        @param list  _llsCommands        Command(s) path and arguments
+        @param str   _sWorkingDirectory  Directory to switch to before executing the command
+        @param bool  _bRedirectStdOut    Redirect standard output
+        @param bool  _bIgnoreReturnCode  Do not raise error in case of non-zero return code
+        @param float _fTimeout           Timeout (seconds) for all (piped) command(s) to complete (None for no timeout)
+        @param bool  _bTrace             Print TRACE message to standard error
+
+        @exception RuntimeError  On arguments error
+        @exception OSError       See KiscRuntime.shell()
+
+        @return str  Resulting standard output (if redirected), None otherwise
+        """
+
+        import asyncio
+        import subprocess
+
+        # Check
+        if not _llsCommands:
+            raise RuntimeError('Missing/empty command argument')
+
+        # Handle single command
+        if not type(_llsCommands[0]) is list:
+            _llsCommands = [_llsCommands]
+        if _bTrace: sys.stderr.write('TRACE[shell] %s%s (async)\n' % (' | '.join([' '.join(lsCommand) for lsCommand in _llsCommands]), ' (timeout: %gs)' % _fTimeout if _fTimeout is not None else ''))
+
+        # Execute (piped) command(s)
+        with KiscRuntime_trace.shell(_llsCommands, _fTimeout):
+            if KiscRuntime.getBackend() is not None:
+                return await KiscRuntime.getBackend().shellAsync(_llsCommands, _bRedirectStdOut, _bIgnoreReturnCode, _fTimeout)
+            iIndex_last = len(_llsCommands)-1
+            loProcesses = list()
+            bDone = False
+            try:
+
+                # ... spawn
+                iFd_stdin = None
+                for iIndex in range(0, len(_llsCommands)):
+                    iFd_stdout = None
+                    if iIndex < iIndex_last:
+                        (iFd_pipe, iFd_stdout) = os.pipe()
+                    elif _bRedirectStdOut:
+                        iFd_stdout = subprocess.PIPE
+                    try:
+                        oProcess = await asyncio.create_subprocess_exec(
+                            *_llsCommands[iIndex],
+                            cwd=_sWorkingDirectory,
+                            stdin=iFd_stdin,
+                            stdout=iFd_stdout,
+                            stderr=subprocess.PIPE,
+                            start_new_session=True
+                        )
+                    except OSError as e:
+                        if iIndex < iIndex_last:
+                            os.close(iFd_pipe)
+                        raise OSError(e.errno, str(e), iIndex_last-iIndex)
+                    finally:
+                        # (parent copies of the pipes)
+                        if iFd_stdin is not None:
+                            os.close(iFd_stdin)
+                            iFd_stdin = None
+                        if iIndex < iIndex_last:
+                            os.close(iFd_stdout)
+                    loProcesses.append(oProcess)
+                    if iIndex < iIndex_last:
+                        iFd_stdin = iFd_pipe
+
+                # ... wait
+                try:
+                    ltOutputs = await asyncio.wait_for(asyncio.gather(*[oProcess.communicate() for oProcess in loProcesses]), _fTimeout)
+                except asyncio.TimeoutError:
+                    await KiscRuntime_aio.__kill(loProcesses)
+                    if _bTrace: sys.stderr.write('TRACE[shell] %s: timed out (%gs); killed\n' % (' | '.join([' '.join(lsCommand) for lsCommand in _llsCommands]), _fTimeout))
+                    raise KiscRuntime_timeout('Command timed out after %gs (%s)' % (_fTimeout, _llsCommands[0][0]))
+                bDone = True
+
+            finally:
+
+                # ... kill outstanding commands (cancellation)
+                if not bDone:
+                    for oProcess in loProcesses:
+                        if oProcess.returncode is None:
+                            try:
+                                os.killpg(oProcess.pid, signal.SIGKILL)
+                            except OSError:
+                                pass
+
+            # Check
+            # NOTE: (non-last) piped commands may be killed by SIGPIPE, if the next command exits before reading all their output
+            for iIndex in range(0, len(_llsCommands)):
+                if iIndex < iIndex_last and loProcesses[iIndex].returncode == -signal.SIGPIPE:
+                    continue
+                if not _bIgnoreReturnCode and loProcesses[iIndex].returncode != 0:
+                    raise OSError(loProcesses[iIndex].returncode, ltOutputs[iIndex][1].decode(sys.getfilesystemencoding()), iIndex_last-iIndex)
+            if _bRedirectStdOut:
+                if ltOutputs[-1][0]:
+                    return ltOutputs[-1][0].decode(sys.getfilesystemencoding())
+                else:
+                    return str()
+            else:
+                return None
+
+
+    async def __kill(_loProcesses):
+        """
+        Kill the given processes' groups, gracefully - SIGTERM, then SIGKILL
+        after KiscRuntime.SHELL_KILL_GRACE seconds
+
+        @param list _loProcesses  Processes (asyncio.subprocess.Process)
+        """
+
+        import asyncio
+        for iSignal in (signal.SIGTERM, signal.SIGKILL):
+            loOutstanding = [oProcess for oProcess in _loProcesses if oProcess.returncode is None]
+            if not loOutstanding:
+                return
+            for oProcess in loOutstanding:
+                try:
+                    os.killpg(oProcess.pid, iSignal)
+                except OSError:
+                    pass
+            await asyncio.wait([asyncio.ensure_future(oProcess.wait()) for oProcess in loOutstanding], timeout=KiscRuntime.SHELL_KILL_GRACE)
+
+
+    def thread(_fFunction, *_lArguments, **_dArguments):
+        """
+        Execute the given (blocking) function in a worker thread
+
+        @param function _fFunction  Function
+        @param list     _lArguments  Function (positional) arguments
+        @param dict     _dArguments  Function (keyword) arguments
+
+        @return asyncio.Future  Function result (awaitable)
+        """
+
+        import asyncio
+        with KiscRuntime_aio._oLock:
+            if KiscRuntime_aio._oExecutor is None:
+                import concurrent.futures
+                KiscRuntime_aio._oExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=KiscRuntime_aio.THREADS_MAX)
+        return asyncio.get_event_loop().run_in_executor(KiscRuntime_aio._oExecutor, functools.partial(KiscRuntime_trace.bind(_fFunction), *_lArguments, **_dArguments))
+
+
+    async def shared(_mKey, _fCoroutine):
+        """
+        Await the given coroutine (function), executed once for all concurrent
+        callers using the same key (coroutine)
+
+        @param mixed    _mKey        Key (hashable)
+        @param function _fCoroutine  Coroutine function (without arguments)
+
+        @return mixed  Coroutine result
+        """
+
+        import asyncio
+        tKey = (id(asyncio.get_event_loop()), _mKey)
+        oTask = KiscRuntime_aio._doTasks.get(tKey, None)
+        if oTask is None:
+            oTask = asyncio.ensure_future(_fCoroutine())
+            KiscRuntime_aio._doTasks[tKey] = oTask
+            oTask.add_done_callback(lambda _oTask: KiscRuntime_aio._doTasks.pop(tKey, None))
+        return await asyncio.shield(oTask)
+
+
+    async def wait(_fCondition, _fTimeout, _fIntervalMin = 0.05, _fIntervalMax = 1.0):
+        """
+        Wait for the given condition to be met, checking it with an adaptive
+        (exponential) backoff interval (coroutine; see KiscRuntime.wait())
+
+        @param function _fCondition    Condition (function returning True - or an awaitable resolving to True - once met)
+        @param float    _fTimeout      Maximum time to wait for (seconds)
+        @param float    _fIntervalMin  Initial check interval (seconds)
+        @param float    _fIntervalMax  Maximum check interval (seconds)
+
+        @return bool  True if the condition is met, False on timeout
+        """
+
+        import asyncio
+        fDeadline = time.time()+_fTimeout
+        fInterval = _fIntervalMin
+        while True:
+            mMet = _fCondition()
+            if asyncio.iscoroutine(mMet) or isinstance(mMet, asyncio.Future):
+                mMet = await mMet
+            if mMet:
+                return True
+            fRemaining = fDeadline-time.time()
+            if fRemaining <= 0.0:
+                return False
+            await asyncio.sleep(min(fInterval, fRemaining))
+            fInterval = min(2.0*fInterval, _fIntervalMax)
+
+
+    async def gather(_loAwaitables, _iJobs = None):
+        """
+        Await the given awaitables, concurrently (coroutine)
+
+        @param list _loAwaitables  Awaitables (e.g. coroutines)
+        @param int  _iJobs         Maximum quantity of concurrently awaited awaitables (None for no limit)
+
+        @return list  Results, in the same order as the awaitables
+        """
+
+        import asyncio
+        if _iJobs is None or _iJobs <= 0:
+            return await asyncio.gather(*_loAwaitables)
+        oSemaphore = asyncio.Semaphore(_iJobs)
+        async def fLimited(_oAwaitable):
+            async with oSemaphore:
+                return await _oAwaitable
+        return await asyncio.gather(*[fLimited(oAwaitable) for oAwaitable in _loAwaitables])
+
+
+    def run(_oAwaitable):
+        """
+        Run the given awaitable on a new event loop, until completed
+
+        @param awaitable _oAwaitable  Awaitable (e.g. coroutine)
+
+        @return mixed  Awaitable result
+        """
+
+        import asyncio
+        oLoop = asyncio.new_event_loop()
+        try:
+            asyncio.set_event_loop(oLoop)
+            return oLoop.run_until_complete(_oAwaitable)
+        finally:
+            asyncio.set_event_loop(None)
+            oLoop.close()
@@ -0,0 +1,240 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# KiSC
+from .timeout import \
+     KiscRuntime_timeout
+
+# Standard
+import errno
+import sys
+import time
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscRuntime_backend:
+    """
+    Command backend (base class)
+
+    A command backend executes the shell commands, file writes ('echo') and
+    concurrent (quorum) commands in place of the operating system, once set
+    as the runtime backend (see KiscRuntime.backend()); the KiscRuntime.shell()
+    semantics - standard output, OSError on non-zero exit code or timeout - are
+    implemented here, from the two methods backends MUST implement:
+     - latency(): the time a command takes (slept for, synchronously or
+       asynchronously, before it is run)
+     - run(): the (instantaneous) command execution
+    """
+
+    #--------------------------------------------------------------------------
+    # METHODS: self (to be implemented by backends)
+    #--------------------------------------------------------------------------
+
+    def latency(self, _lsCommand):
+        """
+        Return the time the given command takes to execute
+
+        @param list _lsCommand  Command path and arguments
+
+        @return float  Command latency (seconds)
+        """
+
+        return 0.0
+
+
+    def run(self, _lsCommand, _sStdIn = None):
+        """
+        Execute the given command (once its latency has elapsed)
+
+        @param list _lsCommand  Command path and arguments
+        @param str  _sStdIn     Standard input (None if none)
+
+        @exception OSError  If the command can not be executed (as subprocess.Popen)
+
+        @return tuple  (iReturnCode, sStdOut, sStdErr) tuple
+        """
+
+        raise SystemError('KiscRuntime_backend.run() not implemented')
+
+
+    def write(self, _sString, _sFilename, _sMode = 'w'):
+        """
+        Write (echo) the given string into the given file
+
+        @param str _sString    String to write
+        @param str _sFilename  File to write into
+        @param str _sMode      File opening mode
+
+        @exception OSError  On file I/O error
+        """
+
+        with open(_sFilename, _sMode) as oFile:
+            oFile.write(_sString)
+
+
+    #--------------------------------------------------------------------------
+    # METHODS: self (KiscRuntime interface)
+    #--------------------------------------------------------------------------
+
+    def shell(self, _llsCommands, _bRedirectStdOut = True, _bIgnoreReturnCode = False, _fTimeout = None):
+        """
+        Execute the given (piped) command(s) and return the resulting standard
+        output (see KiscRuntime.shell())
+
+        @param list  _llsCommands        Commands path and arguments
+        @param bool  _bRedirectStdOut    Redirect standard output
+        @param bool  _bIgnoreReturnCode  Do not raise error in case of non-zero return code
+        @param float _fTimeout           Timeout (seconds) for all (piped) command(s) to complete (None for no timeout)
+
+        @exception OSError  See KiscRuntime.shell()
+
+        @return str  Resulting standard output (if redirected), None otherwise
+        """
+
+        fDeadline = time.monotonic()+_fTimeout if _fTimeout is not None else None
+        sStdOut = None
+        for iIndex in range(0, len(_llsCommands)):
+            fLatency = self.latency(_llsCommands[iIndex])
+            if fDeadline is not None and time.monotonic()+fLatency > fDeadline:
+                time.sleep(max(0.0, fDeadline-time.monotonic()))
+                raise KiscRuntime_timeout('Command timed out after %gs (%s)' % (_fTimeout, _llsCommands[iIndex][0]))
+            if fLatency > 0.0:
+                time.sleep(fLatency)
+            sStdOut = self.__run(_llsCommands, iIndex, sStdOut, _bIgnoreReturnCode)
+        return self.__output(sStdOut, _bRedirectStdOut)
+
+
+    async def shellAsync(self, _llsCommands, _bRedirectStdOut = True, _bIgnoreReturnCode = False, _fTimeout = None):
+        """
+        Execute the given (piped) command(s) and return the resulting standard
+        output (coroutine; see KiscRuntime_aio.shell())
+
+        @param list  _llsCommands        Commands path and arguments
+        @param bool  _bRedirectStdOut    Redirect standard output
+        @param bool  _bIgnoreReturnCode  Do not raise error in case of non-zero return code
+        @param float _fTimeout           Timeout (seconds) for all (piped) command(s) to complete (None for no timeout)
+
+        @exception OSError  See KiscRuntime.shell()
+
+        @return str  Resulting standard output (if redirected), None otherwise
+        """
+
+        import asyncio
+        fDeadline = time.monotonic()+_fTimeout if _fTimeout is not None else None
+        sStdOut = None
+        for iIndex in range(0, len(_llsCommands)):
+            fLatency = self.latency(_llsCommands[iIndex])
+            if fDeadline is not None and time.monotonic()+fLatency > fDeadline:
+                await asyncio.sleep(max(0.0, fDeadline-time.monotonic()))
+                raise KiscRuntime_timeout('Command timed out after %gs (%s)' % (_fTimeout, _llsCommands[iIndex][0]))
+            if fLatency > 0.0:
+                await asyncio.sleep(fLatency)
+            sStdOut = self.__run(_llsCommands, iIndex, sStdOut, _bIgnoreReturnCode)
+        return self.__output(sStdOut, _bRedirectStdOut)
+
+
+    def shellQuorum(self, _llsCommands, _iSatisfy = None):
+        """
+        Execute the given commands concurrently, until the given quorum of
+        successful commands is reached - or can no longer be reached (see
+        KiscRuntime.shellQuorum())
+
+        @param list _llsCommands  Commands path and arguments
+        @param int  _iSatisfy     Quorum (default: all commands)
+
+        @exception OSError  If a command fails to execute, with the filename property
+                            set to the index of the erroneous command
+
+        @return list  See KiscRuntime.shellQuorum()
+        """
+
+        if _iSatisfy is None:
+            _iSatisfy = len(_llsCommands)
+
+        # Commands complete in order of latency (as if run concurrently)
+        lfLatencies = [self.latency(lsCommand) for lsCommand in _llsCommands]
+        ltResults = [(None, 0.0, str())]*len(_llsCommands)
+        iSucceeded = 0
+        iPending = len(_llsCommands)
+        fElapsed = 0.0
+        for iIndex in sorted(range(0, len(_llsCommands)), key=lambda iIndex: lfLatencies[iIndex]):
+            if not iPending or iSucceeded >= _iSatisfy or iSucceeded+iPending < _iSatisfy:
+                break
+            if lfLatencies[iIndex] > fElapsed:
+                time.sleep(lfLatencies[iIndex]-fElapsed)
+                fElapsed = lfLatencies[iIndex]
+            try:
+                (iReturnCode, sStdOut, sStdErr) = self.run(_llsCommands[iIndex])
+            except OSError as e:
+                raise OSError(e.errno, str(e), iIndex)
+            ltResults[iIndex] = (iReturnCode, lfLatencies[iIndex], sStdOut+sStdErr)
+            iPending -= 1
+            if iReturnCode == 0:
+                iSucceeded += 1
+        for iIndex in range(0, len(_llsCommands)):
+            if ltResults[iIndex][0] is None:
+                ltResults[iIndex] = (None, fElapsed, str())
+        return ltResults
+
+
+    #
+    # Helpers
+    #
+
+    def __run(self, _llsCommands, _iIndex, _sStdIn, _bIgnoreReturnCode):
+        """
+        Run the given (piped) command, with KiscRuntime.shell() error semantics
+
+        @return str  Command standard output
+        """
+
+        iIndex_last = len(_llsCommands)-1
+        try:
+            (iReturnCode, sStdOut, sStdErr) = self.run(_llsCommands[_iIndex], _sStdIn)
+        except OSError as e:
+            raise OSError(e.errno, str(e), iIndex_last-_iIndex)
+        if not _bIgnoreReturnCode and iReturnCode != 0:
+            raise OSError(iReturnCode, sStdErr, iIndex_last-_iIndex)
+        return sStdOut
+
+
+    def __output(self, _sStdOut, _bRedirectStdOut):
+        """
+        Return (or write) the final standard output, as KiscRuntime.shell()
+
+        @return str  Standard output (if redirected), None otherwise
+        """
+
+        if _bRedirectStdOut:
+            return _sStdOut or str()
+        if _sStdOut:
+            sys.stdout.write(_sStdOut)
+        return None
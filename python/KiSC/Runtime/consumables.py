@@ -0,0 +1,341 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# KiSC
+from .runtime import \
+     KiscRuntime
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscRuntime_consumables:
+    """
+    Consumables vector
+
+    Consumables quantities are stored as integers, indexed by consumable
+    IDs whose ordering is fixed for the whole (process) runtime; the set
+    of defined consumables is kept as a bit mask (a missing consumable
+    being different from a zero-quantity one).
+
+    Consumables strings (see KiscRuntime.parseDictionary()) are parsed
+    only once, when the vector is created, and serialized back - using
+    the same "<consumable-id>:<quantity>[,...]" format - on demand.
+
+    NOTE: the consumables IDs table is process-wide - shared by all cluster
+    configurations loaded in the process - since vectors are created by
+    resources, which know nothing of their cluster configuration. Its
+    ordering is also specific to the process; vectors are thus always
+    persisted (host runtime, capacity index) in the string format.
+    """
+
+    #--------------------------------------------------------------------------
+    # CLASS PROPERTIES
+    #--------------------------------------------------------------------------
+
+    # Consumables IDs (ordering)
+    _lsIDs = list()
+    _diIDs = dict()
+
+
+    #--------------------------------------------------------------------------
+    # CONSTRUCTORS
+    #--------------------------------------------------------------------------
+
+    def __init__(self, _sConsumables = None, _iDefaultQuantity = 1):
+        """
+        Instantiate a new consumables vector
+
+        @param str _sConsumables      Consumables string (comma-separated <consumable-id>:<quantity> pairs)
+        @param int _iDefaultQuantity  Default quantity (for consumables without quantity)
+
+        @exception RuntimeError  On parse error
+        """
+
+        # Properties
+        self._liQuantities = list()
+        self._iMask = 0
+
+        # ... parse
+        diConsumables = KiscRuntime.parseDictionary(_sConsumables, _iDefaultQuantity, int)
+        for sConsumable_id in diConsumables:
+            self.set(sConsumable_id, diConsumables[sConsumable_id])
+
+
+    def __str__(self):
+        return self.toString()
+
+
+    #--------------------------------------------------------------------------
+    # METHODS: self
+    #--------------------------------------------------------------------------
+
+    #
+    # Helpers
+    #
+
+    def _index(self, _sConsumable_id):
+        """
+        Return the (global) index of the given consumable, registering it if need be
+
+        @param str _sConsumable_id  Consumable ID
+
+        @return int  Consumable index
+        """
+
+        if _sConsumable_id not in KiscRuntime_consumables._diIDs:
+            KiscRuntime_consumables._diIDs[_sConsumable_id] = len(KiscRuntime_consumables._lsIDs)
+            KiscRuntime_consumables._lsIDs.append(_sConsumable_id)
+        return KiscRuntime_consumables._diIDs[_sConsumable_id]
+
+
+    def _quantities(self, _iLength):
+        """
+        Return the quantities list, padded (in place) to the given length
+
+        @param int _iLength  Minimal list length
+
+        @return list  Quantities list
+        """
+
+        if len(self._liQuantities) < _iLength:
+            self._liQuantities.extend([0]*(_iLength-len(self._liQuantities)))
+        return self._liQuantities
+
+
+    def _ids(self, _iMask):
+        """
+        Return the (sorted) consumables IDs matching the given mask
+
+        @param int _iMask  Consumables mask
+
+        @return list  Consumables IDs
+        """
+
+        return sorted([KiscRuntime_consumables._lsIDs[i] for i in range(_iMask.bit_length()) if (_iMask >> i) & 1])
+
+
+    #
+    # Getters/Setters
+    #
+
+    def copy(self):
+        """
+        Return a copy of this consumables vector
+
+        @return KiscRuntime_consumables  Consumables vector
+        """
+
+        oConsumables = KiscRuntime_consumables()
+        oConsumables._liQuantities = list(self._liQuantities)
+        oConsumables._iMask = self._iMask
+        return oConsumables
+
+
+    def ids(self):
+        """
+        Return the (sorted) defined consumables IDs
+
+        @return list  Consumables IDs
+        """
+
+        return self._ids(self._iMask)
+
+
+    def has(self, _sConsumable_id):
+        """
+        Return whether the given consumable is defined
+
+        @param str _sConsumable_id  Consumable ID
+
+        @return bool  True if consumable is defined, False otherwise
+        """
+
+        i = KiscRuntime_consumables._diIDs.get(_sConsumable_id, -1)
+        return i >= 0 and bool((self._iMask >> i) & 1)
+
+
+    def get(self, _sConsumable_id, _mDefault = None):
+        """
+        Return the quantity of the given consumable
+
+        @param str _sConsumable_id  Consumable ID
+        @param any _mDefault        Default value (if consumable is not defined)
+
+        @return int  Consumable quantity
+        """
+
+        if not self.has(_sConsumable_id):
+            return _mDefault
+        return self._quantities(len(KiscRuntime_consumables._lsIDs))[KiscRuntime_consumables._diIDs[_sConsumable_id]]
+
+
+    def set(self, _sConsumable_id, _iQuantity):
+        """
+        Set the quantity of the given consumable
+
+        @param str _sConsumable_id  Consumable ID
+        @param int _iQuantity       Consumable quantity (None to undefine the consumable)
+        """
+
+        i = self._index(_sConsumable_id)
+        if _iQuantity is None:
+            self._iMask &= ~(1 << i)
+            if i < len(self._liQuantities):
+                self._liQuantities[i] = 0
+        else:
+            self._quantities(i+1)[i] = _iQuantity
+            self._iMask |= (1 << i)
+
+
+    def isEmpty(self):
+        """
+        Return whether no consumable is defined
+
+        @return bool  True if no consumable is defined, False otherwise
+        """
+
+        return not self._iMask
+
+
+    def toDict(self):
+        """
+        Return the consumables dictionary
+
+        @return dict  Dictionary associating consumables ID and their quantity
+        """
+
+        return {sConsumable_id: self.get(sConsumable_id) for sConsumable_id in self.ids()}
+
+
+    def toString(self):
+        """
+        Return the consumables string (comma-separated <consumable-id>:<quantity> pairs)
+
+        @return str  Consumables string
+        """
+
+        return ','.join(['%s:%d' % (sConsumable_id, self.get(sConsumable_id)) for sConsumable_id in self.ids()])
+
+
+    #
+    # Operations
+    #
+
+    def add(self, _oConsumables, _oMask = None, _iSign = 1):
+        """
+        Add (in place) the given consumables to this vector
+
+        @param KiscRuntime_consumables _oConsumables  Consumables vector
+        @param KiscRuntime_consumables _oMask         Restrict operation to the consumables defined in this vector
+        @param int                     _iSign         Operation sign (1: addition, -1: subtraction)
+
+        @return KiscRuntime_consumables  This (updated) vector
+        """
+
+        iMask = _oConsumables._iMask if _oMask is None else _oConsumables._iMask & _oMask._iMask
+        iLength = iMask.bit_length()
+        liQuantities = _oConsumables._quantities(iLength)
+        self._liQuantities = [
+            iQuantity+_iSign*iOperand if (iMask >> i) & 1 else iQuantity
+            for (i, (iQuantity, iOperand)) in enumerate(zip(self._quantities(iLength), liQuantities))
+        ] + self._liQuantities[len(liQuantities):]
+        self._iMask |= iMask
+        return self
+
+
+    def subtract(self, _oConsumables, _oMask = None):
+        """
+        Subtract (in place) the given consumables from this vector
+
+        @param KiscRuntime_consumables _oConsumables  Consumables vector
+        @param KiscRuntime_consumables _oMask         Restrict operation to the consumables defined in this vector
+
+        @return KiscRuntime_consumables  This (updated) vector
+        """
+
+        return self.add(_oConsumables, _oMask, -1)
+
+
+    def prune(self):
+        """
+        Undefine (in place) the zero-quantity consumables
+
+        @return KiscRuntime_consumables  This (updated) vector
+        """
+
+        for (i, iQuantity) in enumerate(self._liQuantities):
+            if not iQuantity:
+                self._iMask &= ~(1 << i)
+        return self
+
+
+    def missing(self, _oConsumables):
+        """
+        Return the consumables defined in the given vector but not in this one
+
+        @param KiscRuntime_consumables _oConsumables  Consumables vector
+
+        @return list  Consumables IDs
+        """
+
+        return self._ids(_oConsumables._iMask & ~self._iMask)
+
+
+    def free(self, _oConsumables_used):
+        """
+        Return the free consumables, this vector being the provided consumables
+
+        @param KiscRuntime_consumables _oConsumables_used  Used consumables vector
+
+        @return KiscRuntime_consumables  Free consumables vector
+        """
+
+        return self.copy().subtract(_oConsumables_used, self)
+
+
+    def exhausted(self, _oConsumables_used, _oConsumes):
+        """
+        Return the consumables that would be exhausted by the given consumption,
+        this vector being the provided consumables (negative quantities meaning
+        illimited ones)
+
+        @param KiscRuntime_consumables _oConsumables_used  Used consumables vector
+        @param KiscRuntime_consumables _oConsumes          Consumed consumables vector
+
+        @return list  Consumables IDs
+        """
+
+        iMask = self._iMask & _oConsumes._iMask
+        iLength = iMask.bit_length()
+        return self._ids(sum([
+            1 << i
+            for (i, (iAvailable, iUsed, iWanted)) in enumerate(zip(self._quantities(iLength), _oConsumables_used._quantities(iLength), _oConsumes._quantities(iLength)))
+            if (iMask >> i) & 1 and iAvailable >= 0 and iUsed+iWanted > iAvailable
+        ]))
@@ -0,0 +1,182 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# Standard
+from configparser import \
+    Error as ConfigParserError, \
+    RawConfigParser
+import fcntl
+import os
+import sys
+import time
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscRuntime_healthcache:
+    """
+    Health check result cache
+
+    The result of a health check probe - probe time, outcome and latency,
+    along with any resource-specific runtime status - is saved to a (local)
+    cache file, such that status queries can re-use it until it expires
+    rather than probing every time. Probing is single-flight: concurrent
+    callers (threads or processes) serialize on an exclusive lock (a companion
+    '.lock' file) and those that had to wait re-use the result of the probe
+    they waited for.
+    """
+
+    #--------------------------------------------------------------------------
+    # CONSTANTS
+    #--------------------------------------------------------------------------
+
+    # Cache file (INI) section
+    SECTION = 'health'
+
+
+    #--------------------------------------------------------------------------
+    # CONSTRUCTORS
+    #--------------------------------------------------------------------------
+
+    def __init__(self, _sFile, _bTrace = False):
+        # Properties
+        self._sFile = _sFile
+        self._bTrace = _bTrace
+
+
+    #--------------------------------------------------------------------------
+    # METHODS
+    #--------------------------------------------------------------------------
+
+    def load(self):
+        """
+        Load the cached result
+
+        @return dict  Cached result (including 'timestamp' and 'latency'), None if unavailable
+        """
+
+        try:
+            with open(self._sFile, 'r') as oFile:
+                oConfig = RawConfigParser()
+                oConfig.optionxform = lambda sOption: sOption  # do not lowercase option (key) name
+                oConfig.read_file(oFile, self._sFile)
+            dsResult = {tOption[0]: tOption[1] for tOption in oConfig.items(self.SECTION)}
+            float(dsResult['timestamp'])
+            return dsResult
+        except (OSError, ConfigParserError, KeyError, ValueError):
+            # missing or corrupted cache file
+            return None
+
+
+    def save(self, _dsResult):
+        """
+        Save the given result (atomically)
+
+        @param dict _dsResult  Result (including 'timestamp' and 'latency')
+
+        @exception OSError  Cache file I/O error
+        """
+
+        oConfig = RawConfigParser()
+        oConfig.optionxform = lambda sOption: sOption  # do not lowercase option (key) name
+        oConfig.add_section(self.SECTION)
+        for sKey in sorted(_dsResult.keys()):
+            oConfig.set(self.SECTION, sKey, str(_dsResult[sKey]).replace('\n', ' '))
+        sFile_tmp = '%s.%d.tmp' % (self._sFile, os.getpid())
+        iUmask = os.umask(0o077)
+        try:
+            with open(sFile_tmp, 'w') as oFile:
+                oConfig.write(oFile)
+            os.rename(sFile_tmp, self._sFile)
+        finally:
+            os.umask(iUmask)
+            if os.path.exists(sFile_tmp):
+                os.unlink(sFile_tmp)
+
+
+    def clear(self):
+        """
+        Clear the cached result
+
+        @exception OSError  Cache file I/O error
+        """
+
+        # NOTE: the lock file is left in place, for (waiting) concurrent callers to keep on serializing on it
+        try:
+            os.unlink(self._sFile)
+        except FileNotFoundError:
+            pass
+
+
+    def probe(self, _fTTL, _fProbe):
+        """
+        Return the cached result, if not expired, or probe (single-flight) and cache its result
+
+        @param float    _fTTL    Cached result time-to-live (seconds); 0 to force probing
+        @param function _fProbe  Probe function (without arguments), returning its result (dict)
+
+        @exception OSError  Cache file I/O error
+
+        @return (dict, bool)  Result (including 'timestamp' and 'latency') and whether it was cached
+        """
+
+        # Cached result (no locking required; see save())
+        fStart = time.time()
+        if _fTTL > 0:
+            dsResult = self.load()
+            if dsResult is not None and 0 <= fStart-float(dsResult['timestamp']) < _fTTL:
+                if self._bTrace: sys.stderr.write('TRACE[health] %s: cached\n' % self._sFile)
+                return (dsResult, True)
+
+        # Probe (single-flight)
+        os.makedirs(os.path.dirname(self._sFile), exist_ok=True)
+        iFd = os.open(self._sFile+'.lock', os.O_RDWR|os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(iFd, fcntl.LOCK_EX)
+
+            # ... probed while we were waiting ?
+            dsResult = self.load()
+            if dsResult is not None:
+                fTimestamp = float(dsResult['timestamp'])
+                if fTimestamp >= fStart or (_fTTL > 0 and 0 <= time.time()-fTimestamp < _fTTL):
+                    if self._bTrace: sys.stderr.write('TRACE[health] %s: cached (in-flight)\n' % self._sFile)
+                    return (dsResult, True)
+
+            # ... probe
+            if self._bTrace: sys.stderr.write('TRACE[health] %s: probing\n' % self._sFile)
+            fTimestamp = time.time()
+            dsResult = dict(_fProbe())
+            dsResult['timestamp'] = '%.3f' % fTimestamp
+            dsResult['latency'] = '%.3f' % (1000.0*(time.time()-fTimestamp))
+            self.save(dsResult)
+            return (dsResult, False)
+
+        finally:
+            os.close(iFd)  # (also) releases the lock
@@ -0,0 +1,351 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# KiSC
+from .runtime import \
+     KiscRuntime
+
+# Standard
+import errno
+import os
+import socket
+import struct
+import threading
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscRuntime_icmp:
+    """
+    In-process ICMP/ICMPv6 echo (ping) engine
+
+    Echo requests are sent to all targets from a single socket - preferably
+    an unprivileged ICMP datagram socket (see the net.ipv4.ping_group_range
+    kernel setting), otherwise a raw socket (requiring the CAP_NET_RAW
+    capability) - and their replies matched by sequence number and source
+    address, allowing sub-second timeouts and many concurrent targets without
+    forking any process.
+
+    Should no socket be available, instantiation fails (OSError), letting the
+    caller fall back to the 'ping' command.
+    """
+
+    #--------------------------------------------------------------------------
+    # CONSTANTS
+    #--------------------------------------------------------------------------
+
+    # ICMP
+    ICMP_ECHO_REQUEST = 8
+    ICMP_ECHO_REPLY = 0
+    ICMPV6_ECHO_REQUEST = 128
+    ICMPV6_ECHO_REPLY = 129
+
+    # Socket options (Linux)
+    SO_BINDTODEVICE = 25
+    SO_MARK = 36
+
+
+    #--------------------------------------------------------------------------
+    # CLASS PROPERTIES
+    #--------------------------------------------------------------------------
+
+    # Identifiers
+    _iIdentifier = os.getpid() & 0xffff
+    _oLock = threading.Lock()
+
+
+    #--------------------------------------------------------------------------
+    # CONSTRUCTORS
+    #--------------------------------------------------------------------------
+
+    def __init__(self, _bIPv6 = False, _sInterface = None, _sMark = None):
+        """
+        Open a new ICMP (echo) socket
+
+        @param bool _bIPv6       Use ICMPv6 (instead of ICMP)
+        @param str  _sInterface  Interface (name) or network address to send packets from
+        @param str  _sMark       Mark to tag packets with
+
+        @exception OSError  On socket error (e.g. insufficient privileges) or if a
+                            command backend is set (see KiscRuntime.setBackend())
+        """
+
+        # Check
+        if KiscRuntime.getBackend() is not None:
+            raise OSError(errno.ENOTSUP, 'Not supported with a command backend')
+
+        # Properties
+        self._bIPv6 = _bIPv6
+        self._iFamily = socket.AF_INET6 if _bIPv6 else socket.AF_INET
+        self._oSocket = None
+        self._bRaw = False
+        with KiscRuntime_icmp._oLock:
+            KiscRuntime_icmp._iIdentifier = (KiscRuntime_icmp._iIdentifier+1) & 0xffff
+            self._iIdentifier = KiscRuntime_icmp._iIdentifier
+        self._iSequence = 0
+
+        # ... socket (unprivileged datagram or raw)
+        iProtocol = socket.IPPROTO_ICMPV6 if _bIPv6 else socket.IPPROTO_ICMP
+        try:
+            self._oSocket = socket.socket(self._iFamily, socket.SOCK_DGRAM, iProtocol)
+        except OSError:
+            self._oSocket = socket.socket(self._iFamily, socket.SOCK_RAW, iProtocol)
+            self._bRaw = True
+        try:
+            self._oSocket.setblocking(False)
+
+            # ... options
+            if _sInterface is not None:
+                try:
+                    socket.inet_pton(self._iFamily, _sInterface)
+                    self._oSocket.bind((_sInterface, 0))
+                except OSError:
+                    self._oSocket.setsockopt(socket.SOL_SOCKET, KiscRuntime_icmp.SO_BINDTODEVICE, _sInterface.encode())
+            if _sMark is not None:
+                try:
+                    iMark = int(_sMark, 0)
+                except ValueError:
+                    raise OSError(22, 'Invalid mark (%s)' % _sMark)
+                self._oSocket.setsockopt(socket.SOL_SOCKET, KiscRuntime_icmp.SO_MARK, iMark)
+
+        except OSError as e:
+            self.close()
+            raise e
+
+
+    #--------------------------------------------------------------------------
+    # METHODS: self
+    #--------------------------------------------------------------------------
+
+    def close(self):
+        """
+        Close the socket
+        """
+
+        if self._oSocket is not None:
+            self._oSocket.close()
+            self._oSocket = None
+
+
+    def isRaw(self):
+        """
+        Return whether the socket is a raw (privileged) one
+
+        @return bool  True if raw, False otherwise (datagram)
+        """
+
+        return self._bRaw
+
+
+    def ping(self, _lsAddresses, _iCount = 1, _fInterval = 1.0, _fTimeout = 5.0, _fDeadline = None, _iSatisfy = None):
+        """
+        Ping the given addresses, concurrently, until the given quorum of
+        reachable addresses is reached - or can no longer be reached
+
+        An address is reachable as soon as one echo reply is received from it;
+        it is unreachable once all (count) echo requests have been sent and the
+        last one timed out (or the deadline is reached).
+
+        @param list  _lsAddresses  Network addresses (or host names) to ping
+        @param int   _iCount       Maximum echo requests to send (per address)
+        @param float _fInterval    Interval between echo requests (seconds)
+        @param float _fTimeout     Timeout for each echo request (seconds)
+        @param float _fDeadline    Absolute deadline for the whole check (seconds)
+        @param int   _iSatisfy     Quorum (default: all addresses)
+
+        @exception OSError  On socket or address resolution error
+
+        @return list  (bReachable, fRtt) tuple for each address, where bReachable is None
+                      for addresses whose check was cancelled and fRtt is the (first)
+                      echo round-trip time (milliseconds; None if unreachable)
+        """
+
+        import heapq
+        import select
+        import time
+
+        # Check
+        if _iSatisfy is None:
+            _iSatisfy = len(_lsAddresses)
+
+        # Targets
+        ltTargets = list()
+        for sAddress in _lsAddresses:
+            tSockAddr = socket.getaddrinfo(sAddress, None, self._iFamily, socket.SOCK_DGRAM)[0][4]
+            ltTargets.append((tSockAddr, self.__key(tSockAddr)))
+        ltResults = [(None, None)]*len(ltTargets)
+
+        # Schedule
+        fStart = time.time()
+        fDeadline = fStart+_fDeadline if _fDeadline is not None else None
+        ltSchedule = [(fStart, iIndex, 0) for iIndex in range(0, len(ltTargets))]
+        heapq.heapify(ltSchedule)
+        dtSent = dict()  # sequence -> (index, time sent)
+        lfExpires = [None]*len(ltTargets)  # index -> last request expiry time
+        iSucceeded = 0
+        iPending = len(ltTargets)
+
+        # Loop
+        while iPending and iSucceeded < _iSatisfy and iSucceeded+iPending >= _iSatisfy:
+            fNow = time.time()
+
+            # ... deadline
+            if fDeadline is not None and fNow >= fDeadline:
+                for iIndex in range(0, len(ltTargets)):
+                    if ltResults[iIndex][0] is None:
+                        ltResults[iIndex] = (False, None)
+                        iPending -= 1
+                break
+
+            # ... expired targets (all requests sent and last one timed out)
+            for iIndex in range(0, len(ltTargets)):
+                if ltResults[iIndex][0] is None and lfExpires[iIndex] is not None and fNow >= lfExpires[iIndex]:
+                    ltResults[iIndex] = (False, None)
+                    lfExpires[iIndex] = None
+                    iPending -= 1
+            if not iPending or iSucceeded+iPending < _iSatisfy:
+                break
+
+            # ... send (scheduled) requests
+            while ltSchedule and ltSchedule[0][0] <= fNow:
+                (fTime, iIndex, iRequest) = heapq.heappop(ltSchedule)
+                if ltResults[iIndex][0] is not None:
+                    continue
+                self._iSequence = (self._iSequence+1) & 0xffff
+                dtSent[self._iSequence] = (iIndex, time.time())
+                try:
+                    self._oSocket.sendto(self.__request(self._iSequence), ltTargets[iIndex][0])
+                except OSError:
+                    pass  # e.g. network unreachable; consider request lost
+                if iRequest+1 < _iCount:
+                    heapq.heappush(ltSchedule, (fStart+(iRequest+1)*_fInterval, iIndex, iRequest+1))
+                else:
+                    lfExpires[iIndex] = time.time()+_fTimeout
+
+            # ... wait for replies (until next event)
+            lfEvents = [fExpires for fExpires in lfExpires if fExpires is not None]
+            if ltSchedule: lfEvents.append(ltSchedule[0][0])
+            if fDeadline is not None: lfEvents.append(fDeadline)
+            fWait = max(0.0, min(lfEvents)-time.time()) if lfEvents else _fTimeout
+            if not select.select([self._oSocket], [], [], fWait)[0]:
+                continue
+
+            # ... receive replies
+            while True:
+                try:
+                    (byData, tSockAddr) = self._oSocket.recvfrom(65536)
+                except (BlockingIOError, InterruptedError):
+                    break
+                fReceived = time.time()
+                iSequence = self.__reply(byData)
+                if iSequence is None or iSequence not in dtSent:
+                    continue
+                (iIndex, fSent) = dtSent[iSequence]
+                if ltResults[iIndex][0] is not None or self.__key(tSockAddr) != ltTargets[iIndex][1]:
+                    continue
+                ltResults[iIndex] = (True, 1000.0*(fReceived-fSent))
+                lfExpires[iIndex] = None  # decided; no longer an event to wait for
+                iSucceeded += 1
+                iPending -= 1
+
+        # Done
+        return ltResults
+
+
+    #
+    # Helpers
+    #
+
+    def __key(self, _tSockAddr):
+        """
+        Return the (binary) address key for the given socket address
+
+        @param tuple _tSockAddr  Socket address
+
+        @return bytes  Binary address
+        """
+
+        return socket.inet_pton(self._iFamily, _tSockAddr[0].split('%')[0])
+
+
+    def __request(self, _iSequence):
+        """
+        Build an echo request packet
+
+        @param int _iSequence  Sequence number
+
+        @return bytes  ICMP(v6) echo request packet
+        """
+
+        iType = KiscRuntime_icmp.ICMPV6_ECHO_REQUEST if self._bIPv6 else KiscRuntime_icmp.ICMP_ECHO_REQUEST
+        byPayload = b'KiSC-ping'+bytes(23)
+        byPacket = struct.pack('!BBHHH', iType, 0, 0, self._iIdentifier, _iSequence)+byPayload
+        if not self._bIPv6:
+            # (ICMPv6 checksum is computed by the kernel)
+            byPacket = byPacket[:2]+struct.pack('!H', self.__checksum(byPacket))+byPacket[4:]
+        return byPacket
+
+
+    def __reply(self, _byData):
+        """
+        Parse the given echo reply packet
+
+        @param bytes _byData  Received packet
+
+        @return int  Sequence number, None if not a matching echo reply
+        """
+
+        if self._bRaw and not self._bIPv6:
+            _byData = _byData[(_byData[0] & 0x0f)*4:]  # strip IPv4 header
+        if len(_byData) < 8:
+            return None
+        (iType, iCode, iChecksum, iIdentifier, iSequence) = struct.unpack('!BBHHH', _byData[:8])
+        if iType != (KiscRuntime_icmp.ICMPV6_ECHO_REPLY if self._bIPv6 else KiscRuntime_icmp.ICMP_ECHO_REPLY):
+            return None
+        if self._bRaw and iIdentifier != self._iIdentifier:
+            return None  # (datagram sockets identifier is set - and filtered - by the kernel)
+        return iSequence
+
+
+    def __checksum(self, _byData):
+        """
+        Compute the (internet) checksum of the given data
+
+        @param bytes _byData  Data
+
+        @return int  Checksum
+        """
+
+        if len(_byData) % 2:
+            _byData += b'\x00'
+        iSum = sum(struct.unpack('!%dH' % (len(_byData)//2), _byData))
+        iSum = (iSum >> 16)+(iSum & 0xffff)
+        iSum += iSum >> 16
+        return ~iSum & 0xffff
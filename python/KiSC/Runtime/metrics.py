@@ -0,0 +1,479 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# KiSC
+from .trace import \
+     KiscRuntime_trace
+
+# Standard
+import json
+import os
+import os.path
+import threading
+import time
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscRuntime_metrics:
+    """
+    Prometheus (node_exporter textfile collector) metrics
+
+    Counters and histograms are accumulated in-process - from the operations
+    spans (see KiscRuntime_trace.observe()) and explicit calls, as soon as
+    enabled (see enable()) - and, once the metrics file is known (see open()),
+    merged,
+    at the end of each invocation (see flush()), into a persistent state file
+    ('<metrics-file>.json'), from which the metrics file is (atomically)
+    re-written. Gauges are (re)set by collectors (see collect()) at flush
+    time, or explicitly.
+    """
+
+    #--------------------------------------------------------------------------
+    # CONSTANTS
+    #--------------------------------------------------------------------------
+
+    # Histograms buckets (seconds)
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+    # Metrics (type, help)
+    METRICS = {
+        'kisc_commands_total': ('counter', 'KiSC (CLI) commands, by command and result'),
+        'kisc_command_duration_seconds': ('histogram', 'KiSC (CLI) commands duration, by command'),
+        'kisc_operations_total': ('counter', 'Hosts/resources operations, by operation, resource type and result'),
+        'kisc_operation_duration_seconds': ('histogram', 'Hosts/resources operations duration, by operation and resource type'),
+        'kisc_shell_commands_total': ('counter', 'Shell commands, by command and result'),
+        'kisc_shell_duration_seconds': ('histogram', 'Shell commands duration, by command'),
+        'kisc_config_duration_seconds': ('histogram', 'Configuration load/resolve duration, by operation'),
+        'kisc_runtime_duration_seconds': ('histogram', 'Runtime files load/save/delete duration, by operation'),
+        'kisc_cache_requests_total': ('counter', 'Cache requests, by cache and result (hit/miss)'),
+        'kisc_host_consumables': ('gauge', 'Host consumables total quantity (unlimited consumables omitted)'),
+        'kisc_host_consumables_used': ('gauge', 'Host consumables used quantity'),
+        'kisc_host_consumables_free': ('gauge', 'Host consumables free quantity (unlimited consumables omitted)'),
+        'kisc_resource_status': ('gauge', 'Resources (last known) status, by resource (1 for the current status)'),
+        'kisc_resources': ('gauge', 'Resources quantity, by resource type and (last known) status'),
+        'kisc_metrics_timestamp_seconds': ('gauge', 'Metrics last update time'),
+    }
+
+    # Operations (phases) outcome, as resources status
+    OPERATIONS_STATUS = {
+        'resource start': 'Started',
+        'resource resume': 'Started',
+        'resource suspend': 'Suspended',
+        'resource stop': None,
+        'resource migrate': None,
+    }
+
+
+    #--------------------------------------------------------------------------
+    # CLASS PROPERTIES
+    #--------------------------------------------------------------------------
+
+    # Metrics file
+    _bEnabled = False
+    _sFile = None
+    _oLock = threading.Lock()
+
+    # (In-process) metrics; keyed by (name, labels)
+    _dfCounters = dict()
+    _dlHistograms = dict()
+    _dmGauges = dict()  # (None values delete the gauge)
+    _ltClears = list()  # (name, labels subset) gauges to delete (before setting the new ones)
+
+    # Collectors
+    _lfCollectors = list()
+
+
+    #--------------------------------------------------------------------------
+    # HELPERS
+    #--------------------------------------------------------------------------
+
+    #
+    # Setup
+    #
+
+    def enable():
+        """
+        Enable metrics (collection), before their file is known (see open())
+        """
+
+        KiscRuntime_metrics._bEnabled = True
+        KiscRuntime_trace.observe(KiscRuntime_metrics.__observe)
+
+
+    def open(_sFile):
+        """
+        Enable metrics, to the given (Prometheus textfile) file
+
+        @param str _sFile  Metrics file path (*.prom)
+        """
+
+        KiscRuntime_metrics._sFile = _sFile
+        KiscRuntime_metrics.enable()
+
+
+    def close():
+        """
+        Disable metrics (discarding the metrics not flushed yet, and collectors)
+        """
+
+        KiscRuntime_metrics._bEnabled = False
+        KiscRuntime_metrics._sFile = None
+        KiscRuntime_metrics._lfCollectors = list()
+        KiscRuntime_trace.observe(KiscRuntime_metrics.__observe, False)
+        with KiscRuntime_metrics._oLock:
+            KiscRuntime_metrics._dfCounters = dict()
+            KiscRuntime_metrics._dlHistograms = dict()
+            KiscRuntime_metrics._dmGauges = dict()
+            KiscRuntime_metrics._ltClears = list()
+
+
+    def isEnabled():
+        """
+        Return whether metrics are enabled
+
+        @return bool  True if enabled, False otherwise
+        """
+
+        return KiscRuntime_metrics._bEnabled
+
+
+    def collect(_fCollector):
+        """
+        Register the given collector, called (without argument) at flush time
+        to (re)set gauges
+
+        @param function _fCollector  Collector
+        """
+
+        if _fCollector not in KiscRuntime_metrics._lfCollectors:
+            KiscRuntime_metrics._lfCollectors.append(_fCollector)
+
+
+    #
+    # Metrics
+    #
+
+    def count(_sName, _dsLabels, _fValue = 1):
+        """
+        Increment the given counter
+
+        @param str   _sName     Metric name
+        @param dict  _dsLabels  Labels
+        @param float _fValue    Increment
+        """
+
+        if not KiscRuntime_metrics._bEnabled:
+            return
+        tKey = (_sName, KiscRuntime_metrics.__labels(_dsLabels))
+        with KiscRuntime_metrics._oLock:
+            KiscRuntime_metrics._dfCounters[tKey] = KiscRuntime_metrics._dfCounters.get(tKey, 0)+_fValue
+
+
+    def observe(_sName, _dsLabels, _fValue):
+        """
+        Add the given observation (e.g. duration) to the given histogram
+
+        @param str   _sName     Metric name
+        @param dict  _dsLabels  Labels
+        @param float _fValue    Observed value
+        """
+
+        if not KiscRuntime_metrics._bEnabled:
+            return
+        tKey = (_sName, KiscRuntime_metrics.__labels(_dsLabels))
+        iBucket = len(KiscRuntime_metrics.BUCKETS)
+        for i in range(0, len(KiscRuntime_metrics.BUCKETS)):
+            if _fValue <= KiscRuntime_metrics.BUCKETS[i]:
+                iBucket = i
+                break
+        with KiscRuntime_metrics._oLock:
+            lHistogram = KiscRuntime_metrics._dlHistograms.get(tKey, None)
+            if lHistogram is None:
+                lHistogram = [[0]*(len(KiscRuntime_metrics.BUCKETS)+1), 0.0, 0]
+                KiscRuntime_metrics._dlHistograms[tKey] = lHistogram
+            lHistogram[0][iBucket] += 1
+            lHistogram[1] += _fValue
+            lHistogram[2] += 1
+
+
+    def gauge(_sName, _dsLabels, _fValue):
+        """
+        Set (or delete) the given gauge
+
+        @param str   _sName     Metric name
+        @param dict  _dsLabels  Labels
+        @param float _fValue    Value (None to delete the gauge)
+        """
+
+        if not KiscRuntime_metrics._bEnabled:
+            return
+        tKey = (_sName, KiscRuntime_metrics.__labels(_dsLabels))
+        with KiscRuntime_metrics._oLock:
+            KiscRuntime_metrics._dmGauges[tKey] = _fValue
+
+
+    def clear(_sName, _dsLabels):
+        """
+        Delete all gauges matching the given name and labels (subset)
+
+        @param str  _sName     Metric name
+        @param dict _dsLabels  Labels (subset)
+        """
+
+        if not KiscRuntime_metrics._bEnabled:
+            return
+        tLabels = KiscRuntime_metrics.__labels(_dsLabels)
+        with KiscRuntime_metrics._oLock:
+            for tKey in [tKey for tKey in KiscRuntime_metrics._dmGauges if KiscRuntime_metrics.__matches(tKey, _sName, tLabels)]:
+                del KiscRuntime_metrics._dmGauges[tKey]
+            KiscRuntime_metrics._ltClears.append((_sName, tLabels))
+
+
+    def cache(_sCache, _bHit):
+        """
+        Count a cache request
+
+        @param str  _sCache  Cache name
+        @param bool _bHit    Whether the request was a hit (or a miss)
+        """
+
+        KiscRuntime_metrics.count('kisc_cache_requests_total', {'cache': _sCache, 'result': 'hit' if _bHit else 'miss'})
+
+
+    def command(_sCommand, _iCode, _fDuration):
+        """
+        Record a (CLI) command execution
+
+        @param str   _sCommand   Command name
+        @param int   _iCode      Exit code
+        @param float _fDuration  Duration (seconds)
+        """
+
+        KiscRuntime_metrics.count('kisc_commands_total', {'command': _sCommand, 'result': 'ok' if not _iCode else 'error'})
+        KiscRuntime_metrics.observe('kisc_command_duration_seconds', {'command': _sCommand}, _fDuration)
+
+
+    #
+    # File
+    #
+
+    def flush():
+        """
+        Merge the (in-process) metrics into the state file and (atomically)
+        re-write the metrics file
+
+        Errors are ignored (metrics must never break operations).
+
+        @return bool  True on success, False otherwise
+        """
+
+        if KiscRuntime_metrics._sFile is None:
+            return False
+        for fCollector in KiscRuntime_metrics._lfCollectors:
+            fCollector()
+        KiscRuntime_metrics.gauge('kisc_metrics_timestamp_seconds', {}, round(time.time(), 3))
+
+        # Swap (in-process) metrics
+        with KiscRuntime_metrics._oLock:
+            dfCounters = KiscRuntime_metrics._dfCounters
+            dlHistograms = KiscRuntime_metrics._dlHistograms
+            dmGauges = KiscRuntime_metrics._dmGauges
+            ltClears = KiscRuntime_metrics._ltClears
+            KiscRuntime_metrics._dfCounters = dict()
+            KiscRuntime_metrics._dlHistograms = dict()
+            KiscRuntime_metrics._dmGauges = dict()
+            KiscRuntime_metrics._ltClears = list()
+
+        # Merge (exclusively)
+        import fcntl
+        sFile = KiscRuntime_metrics._sFile
+        iUmask = os.umask(0o022)
+        try:
+            sDirectory = os.path.dirname(sFile)
+            if sDirectory:
+                os.makedirs(sDirectory, exist_ok=True)
+            with open(sFile+'.lock', 'a') as oLock:
+                fcntl.flock(oLock, fcntl.LOCK_EX)
+                try:
+                    dState = KiscRuntime_metrics.__load(sFile+'.json')
+                    for (tKey, fValue) in dfCounters.items():
+                        dState['counters'][tKey] = dState['counters'].get(tKey, 0)+fValue
+                    for (tKey, lHistogram) in dlHistograms.items():
+                        lState = dState['histograms'].get(tKey, None)
+                        if lState is None or len(lState[0]) != len(lHistogram[0]):
+                            dState['histograms'][tKey] = lHistogram
+                        else:
+                            lState[0] = [lState[0][i]+lHistogram[0][i] for i in range(0, len(lHistogram[0]))]
+                            lState[1] += lHistogram[1]
+                            lState[2] += lHistogram[2]
+                    for (sName, tLabels) in ltClears:
+                        for tKey in [tKey for tKey in dState['gauges'] if KiscRuntime_metrics.__matches(tKey, sName, tLabels)]:
+                            del dState['gauges'][tKey]
+                    for (tKey, fValue) in dmGauges.items():
+                        if fValue is None:
+                            dState['gauges'].pop(tKey, None)
+                        else:
+                            dState['gauges'][tKey] = fValue
+                    KiscRuntime_metrics.__write(sFile+'.json', KiscRuntime_metrics.__dump(dState))
+                    KiscRuntime_metrics.__write(sFile, KiscRuntime_metrics.render(dState))
+                finally:
+                    fcntl.flock(oLock, fcntl.LOCK_UN)
+        except (OSError, TypeError, ValueError):
+            return False
+        finally:
+            os.umask(iUmask)
+        return True
+
+
+    def render(_dState):
+        """
+        Render the given metrics (state) in Prometheus text exposition format
+
+        @param dict _dState  Metrics state ('counters', 'histograms' and 'gauges' dictionaries)
+
+        @return str  Metrics (text)
+        """
+
+        # Derived gauges: resources quantity, by type and status
+        dfGauges = dict(_dState['gauges'])
+        for (tKey, fValue) in _dState['gauges'].items():
+            if tKey[0] != 'kisc_resource_status' or not fValue:
+                continue
+            dsLabels = dict(tKey[1])
+            tKey_resources = ('kisc_resources', KiscRuntime_metrics.__labels({'type': dsLabels.get('type', ''), 'status': dsLabels.get('status', '')}))
+            dfGauges[tKey_resources] = dfGauges.get(tKey_resources, 0)+1
+
+        # Render (series lines, per metric and labels)
+        dltMetrics = dict()
+        for (tKey, fValue) in _dState['counters'].items():
+            dltMetrics.setdefault(tKey[0], list()).append((tKey[1], ['%s%s %s' % (tKey[0], KiscRuntime_metrics.__format(tKey[1]), KiscRuntime_metrics.__number(fValue))]))
+        for (tKey, fValue) in dfGauges.items():
+            dltMetrics.setdefault(tKey[0], list()).append((tKey[1], ['%s%s %s' % (tKey[0], KiscRuntime_metrics.__format(tKey[1]), KiscRuntime_metrics.__number(fValue))]))
+        for (tKey, lHistogram) in _dState['histograms'].items():
+            lsLines = list()
+            dltMetrics.setdefault(tKey[0], list()).append((tKey[1], lsLines))
+            iCumulated = 0
+            for i in range(0, len(lHistogram[0])):
+                iCumulated += lHistogram[0][i]
+                sBound = '+Inf' if i >= len(KiscRuntime_metrics.BUCKETS) else KiscRuntime_metrics.__number(KiscRuntime_metrics.BUCKETS[i])
+                lsLines.append('%s_bucket%s %d' % (tKey[0], KiscRuntime_metrics.__format(tKey[1]+(('le', sBound),)), iCumulated))
+            lsLines.append('%s_sum%s %s' % (tKey[0], KiscRuntime_metrics.__format(tKey[1]), KiscRuntime_metrics.__number(lHistogram[1])))
+            lsLines.append('%s_count%s %d' % (tKey[0], KiscRuntime_metrics.__format(tKey[1]), lHistogram[2]))
+        s = ''
+        for sName in sorted(dltMetrics.keys()):
+            (sType, sHelp) = KiscRuntime_metrics.METRICS.get(sName, ('untyped', sName))
+            s += '# HELP %s %s\n# TYPE %s %s\n' % (sName, sHelp, sName, sType)
+            for (tLabels, lsLines) in sorted(dltMetrics[sName], key=lambda tSeries: tSeries[0]):
+                s += '\n'.join(lsLines)+'\n'
+        return s
+
+
+    #
+    # (Private)
+    #
+
+    def __observe(_dRecord):
+        # Span observer (see KiscRuntime_trace.observe())
+        sKind = _dRecord['kind']
+        sName = _dRecord['name']
+        fDuration = _dRecord['duration']
+        sResult = 'ok' if not _dRecord['code'] else 'error'
+        if sKind == KiscRuntime_trace.KIND_SHELL:
+            KiscRuntime_metrics.count('kisc_shell_commands_total', {'command': sName, 'result': sResult})
+            KiscRuntime_metrics.observe('kisc_shell_duration_seconds', {'command': sName}, fDuration)
+        elif sKind == KiscRuntime_trace.KIND_PHASE:
+            sResource = _dRecord.get('resource') or ''
+            sType = sResource.split(':', 1)[0]
+            KiscRuntime_metrics.count('kisc_operations_total', {'operation': sName, 'type': sType, 'result': sResult})
+            KiscRuntime_metrics.observe('kisc_operation_duration_seconds', {'operation': sName, 'type': sType}, fDuration)
+            # ... resources status
+            if sResource and sName[:9] == 'resource ':
+                if sName == 'resource status':
+                    sStatus = _dRecord.get('status')
+                elif sName in KiscRuntime_metrics.OPERATIONS_STATUS and sResult == 'ok':
+                    sStatus = KiscRuntime_metrics.OPERATIONS_STATUS[sName]
+                else:
+                    return
+                KiscRuntime_metrics.clear('kisc_resource_status', {'resource': sResource})
+                if sStatus is not None:
+                    KiscRuntime_metrics.gauge('kisc_resource_status', {'resource': sResource, 'type': sType, 'status': sStatus}, 1)
+        elif sKind == KiscRuntime_trace.KIND_CONFIG:
+            KiscRuntime_metrics.observe('kisc_config_duration_seconds', {'operation': sName}, fDuration)
+        elif sKind == KiscRuntime_trace.KIND_RUNTIME:
+            KiscRuntime_metrics.observe('kisc_runtime_duration_seconds', {'operation': sName}, fDuration)
+
+
+    def __labels(_dsLabels):
+        return tuple(sorted((str(sKey), str(mValue)) for (sKey, mValue) in _dsLabels.items()))
+
+
+    def __matches(_tKey, _sName, _tLabels):
+        return _tKey[0] == _sName and set(_tLabels) <= set(_tKey[1])
+
+
+    def __format(_tLabels):
+        if not _tLabels:
+            return ''
+        return '{%s}' % ','.join(['%s="%s"' % (sKey, sValue.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for (sKey, sValue) in _tLabels])
+
+
+    def __number(_fValue):
+        if isinstance(_fValue, float) and _fValue.is_integer():
+            return '%d' % _fValue
+        return repr(_fValue)
+
+
+    def __load(_sFile):
+        dState = {'counters': dict(), 'histograms': dict(), 'gauges': dict()}
+        try:
+            with open(_sFile, 'r') as oFile:
+                dJson = json.load(oFile)
+        except (OSError, ValueError):
+            return dState
+        for sSection in dState:
+            for lEntry in dJson.get(sSection, list()):
+                dState[sSection][(lEntry[0], tuple(tuple(lLabel) for lLabel in lEntry[1]))] = lEntry[2]
+        return dState
+
+
+    def __dump(_dState):
+        return json.dumps({sSection: [[tKey[0], tKey[1], mValue] for (tKey, mValue) in sorted(_dState[sSection].items())] for sSection in _dState})
+
+
+    def __write(_sFile, _sContent):
+        sFile_tmp = '%s.%d.tmp' % (_sFile, os.getpid())
+        try:
+            with open(sFile_tmp, 'w') as oFile:
+                oFile.write(_sContent)
+            os.rename(sFile_tmp, _sFile)
+        finally:
+            if os.path.exists(sFile_tmp):
+                os.unlink(sFile_tmp)
@@ -0,0 +1,257 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# KiSC
+from .runtime import \
+     KiscRuntime
+
+# Standard
+import threading
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscRuntime_pacemaker:
+    """
+    Pacemaker cluster status snapshot
+
+    Rather than querying the CIB for each and every resource ('crm_resource
+    -W'), the whole cluster status is retrieved once ('crm_mon' XML output)
+    and parsed into a resource-to-nodes placement index, shared by all
+    resources within the (KiSC) process runtime and refreshed when older
+    than SNAPSHOT_TTL (or explicitly invalidated, after state-changing
+    commands).
+    """
+
+    #--------------------------------------------------------------------------
+    # CONSTANTS
+    #--------------------------------------------------------------------------
+
+    # Snapshot
+    SNAPSHOT_TTL = 5.0
+
+
+    #--------------------------------------------------------------------------
+    # CLASS PROPERTIES
+    #--------------------------------------------------------------------------
+
+    # Snapshot
+    _tSnapshot = None
+    _oLock = threading.Lock()
+
+
+    #--------------------------------------------------------------------------
+    # HELPERS
+    #--------------------------------------------------------------------------
+
+    def placement(_fMaxAge = None, _bTrace = False):
+        """
+        Return the (snapshot) placement of all resources
+
+        Groups and clones are indexed along their members (primitives), each
+        being placed on the union of its members' nodes.
+
+        @param float _fMaxAge  Maximum snapshot age (seconds; default: SNAPSHOT_TTL)
+        @param bool  _bTrace   Print TRACE message to standard error
+
+        @exception OSError       On cluster status query error
+        @exception RuntimeError  On cluster status parsing error
+
+        @return dict  Nodes (list) the resources are running on, per resource name
+        """
+
+        import time
+        from .metrics import KiscRuntime_metrics
+        if _fMaxAge is None:
+            _fMaxAge = KiscRuntime_pacemaker.SNAPSHOT_TTL
+
+        # Snapshot
+        with KiscRuntime_pacemaker._oLock:
+            tSnapshot = KiscRuntime_pacemaker._tSnapshot
+            if tSnapshot is not None and time.time()-tSnapshot[0] <= _fMaxAge:
+                KiscRuntime_metrics.cache('pacemaker', True)
+                return tSnapshot[1]
+        KiscRuntime_metrics.cache('pacemaker', False)
+
+        # Refresh
+        fTimestamp = time.time()
+        try:
+            sOutput = KiscRuntime.shell(['crm_mon', '-1', '--output-as=xml'], _bTrace = _bTrace)
+        except OSError as e:
+            if e.filename != 0:
+                raise e
+            sOutput = KiscRuntime.shell(['crm_mon', '-1', '--as-xml'], _bTrace = _bTrace)  # Pacemaker < 2.0.3
+        dlsPlacement = KiscRuntime_pacemaker.parse(sOutput)
+        with KiscRuntime_pacemaker._oLock:
+            KiscRuntime_pacemaker._tSnapshot = (fTimestamp, dlsPlacement)
+        return dlsPlacement
+
+
+    async def placementAsync(_fMaxAge = None, _bTrace = False):
+        """
+        Return the (snapshot) placement of all resources (coroutine)
+
+        Same as placement(), the snapshot being refreshed using an asynchronous
+        command, once for all concurrent callers (see KiscRuntime_aio.shared()).
+
+        @param float _fMaxAge  Maximum snapshot age (seconds; default: SNAPSHOT_TTL)
+        @param bool  _bTrace   Print TRACE message to standard error
+
+        @exception OSError       On cluster status query error
+        @exception RuntimeError  On cluster status parsing error
+
+        @return dict  See placement()
+        """
+
+        import time
+        from .aio import KiscRuntime_aio
+        from .metrics import KiscRuntime_metrics
+        if _fMaxAge is None:
+            _fMaxAge = KiscRuntime_pacemaker.SNAPSHOT_TTL
+
+        # Snapshot
+        with KiscRuntime_pacemaker._oLock:
+            tSnapshot = KiscRuntime_pacemaker._tSnapshot
+            if tSnapshot is not None and time.time()-tSnapshot[0] <= _fMaxAge:
+                KiscRuntime_metrics.cache('pacemaker', True)
+                return tSnapshot[1]
+        KiscRuntime_metrics.cache('pacemaker', False)
+
+        # Refresh
+        async def fRefresh():
+            fTimestamp = time.time()
+            try:
+                sOutput = await KiscRuntime_aio.shell(['crm_mon', '-1', '--output-as=xml'], _bTrace = _bTrace)
+            except OSError as e:
+                if e.filename != 0:
+                    raise e
+                sOutput = await KiscRuntime_aio.shell(['crm_mon', '-1', '--as-xml'], _bTrace = _bTrace)  # Pacemaker < 2.0.3
+            dlsPlacement = KiscRuntime_pacemaker.parse(sOutput)
+            with KiscRuntime_pacemaker._oLock:
+                KiscRuntime_pacemaker._tSnapshot = (fTimestamp, dlsPlacement)
+            return dlsPlacement
+        return await KiscRuntime_aio.shared('pacemaker:placement', fRefresh)
+
+
+    def parse(_sXml):
+        """
+        Parse the given cluster status ('crm_mon' XML output) into a placement index
+
+        @param str _sXml  Cluster status (XML)
+
+        @exception RuntimeError  On parsing error
+
+        @return dict  Nodes (list) the resources are running on, per resource name
+        """
+
+        import xml.etree.ElementTree as ET
+        try:
+            oRoot = ET.fromstring(_sXml)
+        except ET.ParseError as e:
+            raise RuntimeError('Invalid cluster status; %s' % str(e))
+        oResources = oRoot.find('resources')
+        if oResources is None:
+            raise RuntimeError('Invalid cluster status; missing resources')
+
+        dlsPlacement = dict()
+
+        # ... resources (recursively)
+        def index(oElement):
+            lsNodes = list()
+            if oElement.tag == 'resource':
+                # (whatever its role, including transitional ones - Starting, Stopping, etc. - as 'crm_resource -W')
+                if oElement.get('active', 'false') == 'true':
+                    lsNodes = [oNode.get('name') for oNode in oElement.findall('node')]
+            elif oElement.tag in ('group', 'clone', 'bundle', 'replica'):
+                for oChild in oElement:
+                    for sNode in index(oChild):
+                        if sNode not in lsNodes:
+                            lsNodes.append(sNode)
+            else:
+                return lsNodes
+            if oElement.tag == 'replica':
+                return lsNodes  # bundles' replicas (numbered; not a resource)
+            sName = oElement.get('id', None)
+            if sName is not None:
+                sName = sName.split(':')[0]  # anonymous clones' instances
+                lsNodes_indexed = dlsPlacement.setdefault(sName, list())
+                for sNode in lsNodes:
+                    if sNode not in lsNodes_indexed:
+                        lsNodes_indexed.append(sNode)
+            return lsNodes
+
+        for oElement in oResources:
+            index(oElement)
+        return dlsPlacement
+
+
+    def locate(_sName, _fMaxAge = None, _bTrace = False):
+        """
+        Return the nodes the given resource is running on, from the placement
+        snapshot (see placement())
+
+        @param str   _sName    Resource name
+        @param float _fMaxAge  Maximum snapshot age (seconds; default: SNAPSHOT_TTL)
+        @param bool  _bTrace   Print TRACE message to standard error
+
+        @exception OSError       On cluster status query error
+        @exception RuntimeError  On cluster status parsing error
+
+        @return list  Nodes the resource is running on (empty if stopped or undefined)
+        """
+
+        return KiscRuntime_pacemaker.placement(_fMaxAge, _bTrace).get(_sName, list())
+
+
+    async def locateAsync(_sName, _fMaxAge = None, _bTrace = False):
+        """
+        Return the nodes the given resource is running on, from the placement
+        snapshot (coroutine; see locate())
+
+        @param str   _sName    Resource name
+        @param float _fMaxAge  Maximum snapshot age (seconds; default: SNAPSHOT_TTL)
+        @param bool  _bTrace   Print TRACE message to standard error
+
+        @exception OSError       On cluster status query error
+        @exception RuntimeError  On cluster status parsing error
+
+        @return list  Nodes the resource is running on (empty if stopped or undefined)
+        """
+
+        return (await KiscRuntime_pacemaker.placementAsync(_fMaxAge, _bTrace)).get(_sName, list())
+
+
+    def invalidate():
+        """
+        Invalidate the placement snapshot
+        """
+
+        with KiscRuntime_pacemaker._oLock:
+            KiscRuntime_pacemaker._tSnapshot = None
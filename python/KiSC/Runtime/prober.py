@@ -0,0 +1,519 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# Standard
+import errno
+import re
+import selectors
+import socket
+import time
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscRuntime_prober:
+    """
+    Concurrent (selector-based) TCP/HTTP prober
+
+    Probes are added beforehand (see addTcp() and addHttp()) and then run
+    all at once, within a single thread, each with its own timeout; the run
+    completes - and outstanding probes are cancelled - as soon as the given
+    quorum of successful probes is reached or can no longer be reached.
+
+    HTTP probes targeting the same server share a single (keep-alive)
+    connection, their requests being sent one after the other.
+    """
+
+    #--------------------------------------------------------------------------
+    # CONSTANTS
+    #--------------------------------------------------------------------------
+
+    # Results
+    RESULT_OK = 'ok'
+    RESULT_TIMEOUT = 'timeout'
+    RESULT_REFUSED = 'refused'
+    RESULT_MISMATCH = 'mismatch'
+    RESULT_ERROR = 'error'
+    RESULT_CANCELLED = 'cancelled'
+
+
+    #--------------------------------------------------------------------------
+    # CONSTRUCTORS
+    #--------------------------------------------------------------------------
+
+    def __init__(self):
+        """
+        Instantiate a new prober
+        """
+
+        # Properties
+        self._ldProbes = list()
+        self._ldConnections = list()
+        self._dConnections_http = dict()  # (scheme, host, port) -> connection
+
+
+    #--------------------------------------------------------------------------
+    # METHODS: self
+    #--------------------------------------------------------------------------
+
+    def addTcp(self, _sAddress, _fTimeout = 5.0, _bySend = None, _sExpect = None):
+        """
+        Add a TCP (connect) probe
+
+        @param str   _sAddress  Target address (<host>:<port>, [<IPv6>]:<port>)
+        @param float _fTimeout  Timeout (seconds)
+        @param bytes _bySend    Data to send once connected
+        @param str   _sExpect   Regular expression to match the received data (banner) against
+
+        @exception RuntimeError  On invalid address or regular expression
+
+        @return int  Probe index
+        """
+
+        (sHost, iPort) = self.__hostPort(_sAddress, None)
+        dProbe = self.__probe(_sAddress, _fTimeout)
+        dProbe['expect'] = self.__regexp(_sExpect) if _sExpect is not None else None
+        dConnection = self.__connection(sHost, iPort, None)
+        dConnection['probes'].append(dProbe)
+        if _bySend:
+            dConnection['out'] = _bySend
+        return dProbe['index']
+
+
+    def addHttp(self, _sUrl, _fTimeout = 5.0, _sStatus = None, _sExpect = None, _bVerify = True):
+        """
+        Add a HTTP (GET) probe
+
+        @param str   _sUrl      Target URL (http[s]://<host>[:<port>][/<path>])
+        @param float _fTimeout  Timeout (seconds)
+        @param str   _sStatus   Regular expression to match the response status code against (default: 2xx or 3xx)
+        @param str   _sExpect   Regular expression to match the response body against
+        @param bool  _bVerify   Verify the server (TLS) certificate
+
+        @exception RuntimeError  On invalid URL or regular expression
+
+        @return int  Probe index
+        """
+
+        oMatch = re.match('^(https?)://([^/?#]+)([^#]*)', _sUrl)
+        if oMatch is None:
+            raise RuntimeError('Invalid URL (%s)' % _sUrl)
+        sScheme = oMatch.group(1)
+        (sHost, iPort) = self.__hostPort(oMatch.group(2), 443 if sScheme == 'https' else 80)
+        sPath = oMatch.group(3) or '/'
+        dProbe = self.__probe(_sUrl, _fTimeout)
+        dProbe['status'] = self.__regexp(_sStatus if _sStatus is not None else '[23][0-9][0-9]')
+        dProbe['expect'] = self.__regexp(_sExpect) if _sExpect is not None else None
+        dProbe['request'] = (
+            'GET %s HTTP/1.1\r\nHost: %s\r\nUser-Agent: KiSC\r\nAccept: */*\r\nConnection: keep-alive\r\n\r\n'
+            % (sPath, oMatch.group(2))
+        ).encode('latin-1')
+
+        # ... (shared) connection
+        tKey = (sScheme, sHost, iPort, _bVerify)
+        dConnection = self._dConnections_http.get(tKey, None)
+        if dConnection is None:
+            dConnection = self.__connection(sHost, iPort, 'https' if sScheme == 'https' else 'http')
+            dConnection['verify'] = _bVerify
+            self._dConnections_http[tKey] = dConnection
+        dConnection['probes'].append(dProbe)
+        return dProbe['index']
+
+
+    def run(self, _iSatisfy = None):
+        """
+        Run all probes, concurrently, until the given quorum of successful probes
+        is reached - or can no longer be reached
+
+        @param int _iSatisfy  Quorum (default: all probes)
+
+        @return list  (sResult, fLatency) tuple for each probe, where sResult is one
+                      of the RESULT_* constants and fLatency the probe duration
+                      (milliseconds; None unless successful)
+        """
+
+        # Check
+        if _iSatisfy is None:
+            _iSatisfy = len(self._ldProbes)
+
+        # Start
+        oSelector = selectors.DefaultSelector()
+        fStart = time.time()
+        for dProbe in self._ldProbes:
+            dProbe['start'] = fStart
+            dProbe['deadline'] = fStart+dProbe['timeout']
+        for dConnection in self._ldConnections:
+            self.__connect(oSelector, dConnection)
+
+        # Loop
+        try:
+            while True:
+                iSucceeded = len([dProbe for dProbe in self._ldProbes if dProbe['result'] == KiscRuntime_prober.RESULT_OK])
+                iPending = len([dProbe for dProbe in self._ldProbes if dProbe['result'] is None])
+                if not iPending or iSucceeded >= _iSatisfy or iSucceeded+iPending < _iSatisfy:
+                    break
+
+                # ... timeouts
+                fNow = time.time()
+                for dConnection in self._ldConnections:
+                    if dConnection['probes'] and fNow >= dConnection['probes'][0]['deadline']:
+                        self.__fail(oSelector, dConnection, KiscRuntime_prober.RESULT_TIMEOUT)
+                lfDeadlines = [dConnection['probes'][0]['deadline'] for dConnection in self._ldConnections if dConnection['probes']]
+                if not lfDeadlines:
+                    continue
+
+                # ... I/O
+                for (oKey, iEvents) in oSelector.select(max(0.0, min(lfDeadlines)-time.time())):
+                    self.__io(oSelector, oKey.data, iEvents)
+
+        finally:
+
+            # ... close connections
+            for dConnection in self._ldConnections:
+                self.__close(oSelector, dConnection)
+            oSelector.close()
+
+        # Done
+        ltResults = list()
+        for dProbe in self._ldProbes:
+            if dProbe['result'] is None:
+                dProbe['result'] = KiscRuntime_prober.RESULT_CANCELLED
+            ltResults.append((dProbe['result'], dProbe['latency']))
+        return ltResults
+
+
+    #
+    # Helpers
+    #
+
+    def __probe(self, _sTarget, _fTimeout):
+        dProbe = {
+            'index': len(self._ldProbes),
+            'target': _sTarget,
+            'timeout': _fTimeout,
+            'result': None,
+            'latency': None,
+        }
+        self._ldProbes.append(dProbe)
+        return dProbe
+
+
+    def __connection(self, _sHost, _iPort, _sProtocol):
+        dConnection = {
+            'host': _sHost,
+            'port': _iPort,
+            'protocol': _sProtocol,
+            'verify': True,
+            'probes': list(),
+            'socket': None,
+            'state': None,
+            'out': bytes(),
+            'in': bytes(),
+        }
+        self._ldConnections.append(dConnection)
+        return dConnection
+
+
+    def __hostPort(self, _sAddress, _iPortDefault):
+        oMatch = re.match('^(?:\\[([^\\]]+)\\]|([^:]+))(?::([0-9]+))?$', _sAddress.strip())
+        if oMatch is None or (oMatch.group(3) is None and _iPortDefault is None):
+            raise RuntimeError('Invalid address (%s)' % _sAddress)
+        return (oMatch.group(1) or oMatch.group(2), int(oMatch.group(3)) if oMatch.group(3) is not None else _iPortDefault)
+
+
+    def __regexp(self, _sRegexp):
+        try:
+            return re.compile(_sRegexp.encode('utf-8'))
+        except re.error as e:
+            raise RuntimeError('Invalid regular expression (%s); %s' % (_sRegexp, str(e)))
+
+
+    def __connect(self, _oSelector, _dConnection):
+        """
+        (Re-)connect the given connection, for its first pending probe
+        """
+
+        self.__close(_oSelector, _dConnection)
+        if not _dConnection['probes']:
+            return
+        try:
+            tAddrInfo = socket.getaddrinfo(_dConnection['host'], _dConnection['port'], 0, socket.SOCK_STREAM)[0]
+            oSocket = socket.socket(tAddrInfo[0], tAddrInfo[1], tAddrInfo[2])
+            oSocket.setblocking(False)
+            oSocket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            _dConnection['socket'] = oSocket
+            iErrno = oSocket.connect_ex(tAddrInfo[4])
+            if iErrno not in (0, errno.EINPROGRESS):
+                raise OSError(iErrno, 'Connection failed')
+        except OSError as e:
+            self.__fail(_oSelector, _dConnection, KiscRuntime_prober.RESULT_REFUSED if e.errno == errno.ECONNREFUSED else KiscRuntime_prober.RESULT_ERROR)
+            return
+        _dConnection['state'] = 'connect'
+        _dConnection['in'] = bytes()
+        _oSelector.register(oSocket, selectors.EVENT_WRITE, _dConnection)
+
+
+    def __close(self, _oSelector, _dConnection):
+        if _dConnection['socket'] is None:
+            return
+        try:
+            _oSelector.unregister(_dConnection['socket'])
+        except (KeyError, ValueError):
+            pass
+        _dConnection['socket'].close()
+        _dConnection['socket'] = None
+        _dConnection['state'] = None
+
+
+    def __done(self, _dConnection, _sResult):
+        """
+        Complete the first pending probe of the given connection
+        """
+
+        dProbe = _dConnection['probes'].pop(0)
+        dProbe['result'] = _sResult
+        if _sResult == KiscRuntime_prober.RESULT_OK:
+            dProbe['latency'] = 1000.0*(time.time()-dProbe['start'])
+
+
+    def __fail(self, _oSelector, _dConnection, _sResult):
+        """
+        Fail the first pending probe of the given connection and move on to the next one
+        """
+
+        self.__done(_dConnection, _sResult)
+        if _dConnection['protocol'] is None:
+            self.__close(_oSelector, _dConnection)
+        else:
+            self.__connect(_oSelector, _dConnection)
+
+
+    def __events(self, _oSelector, _dConnection, _iEvents):
+        _oSelector.modify(_dConnection['socket'], _iEvents, _dConnection)
+
+
+    def __io(self, _oSelector, _dConnection, _iEvents):
+        """
+        Handle the given connection I/O event(s)
+        """
+
+        import ssl
+        oSocket = _dConnection['socket']
+        if oSocket is None:
+            return
+        try:
+
+            # Connect
+            if _dConnection['state'] == 'connect':
+                iErrno = oSocket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if iErrno:
+                    raise OSError(iErrno, 'Connection failed')
+                if _dConnection['protocol'] == 'https':
+                    oContext = ssl.create_default_context()
+                    if not _dConnection['verify']:
+                        oContext.check_hostname = False
+                        oContext.verify_mode = ssl.CERT_NONE
+                    _oSelector.unregister(oSocket)
+                    oSocket = oContext.wrap_socket(oSocket, server_hostname=_dConnection['host'], do_handshake_on_connect=False)
+                    _dConnection['socket'] = oSocket
+                    _oSelector.register(oSocket, selectors.EVENT_WRITE, _dConnection)
+                    _dConnection['state'] = 'handshake'
+                else:
+                    self.__ready(_oSelector, _dConnection)
+                    return
+
+            # TLS handshake
+            if _dConnection['state'] == 'handshake':
+                try:
+                    oSocket.do_handshake()
+                except ssl.SSLWantReadError:
+                    self.__events(_oSelector, _dConnection, selectors.EVENT_READ)
+                    return
+                except ssl.SSLWantWriteError:
+                    self.__events(_oSelector, _dConnection, selectors.EVENT_WRITE)
+                    return
+                self.__ready(_oSelector, _dConnection)
+                return
+
+            # Send
+            if _dConnection['state'] == 'send':
+                try:
+                    iSent = oSocket.send(_dConnection['out'])
+                except (ssl.SSLWantReadError, ssl.SSLWantWriteError, BlockingIOError):
+                    return
+                _dConnection['out'] = _dConnection['out'][iSent:]
+                if not _dConnection['out']:
+                    if _dConnection['protocol'] is None and _dConnection['probes'][0]['expect'] is None:
+                        self.__done(_dConnection, KiscRuntime_prober.RESULT_OK)
+                        self.__close(_oSelector, _dConnection)
+                        return
+                    _dConnection['state'] = 'recv'
+                    self.__events(_oSelector, _dConnection, selectors.EVENT_READ)
+                return
+
+            # Receive
+            if _dConnection['state'] == 'recv':
+                bEOF = False
+                while True:
+                    try:
+                        byData = oSocket.recv(65536)
+                    except (ssl.SSLWantReadError, BlockingIOError):
+                        break
+                    if not byData:
+                        bEOF = True
+                        break
+                    _dConnection['in'] += byData
+                self.__received(_oSelector, _dConnection, bEOF)
+
+        except (OSError, ssl.SSLError) as e:
+            if _dConnection['probes']:
+                self.__fail(_oSelector, _dConnection, KiscRuntime_prober.RESULT_REFUSED if e.errno == errno.ECONNREFUSED else KiscRuntime_prober.RESULT_ERROR)
+            else:
+                self.__close(_oSelector, _dConnection)
+
+
+    def __ready(self, _oSelector, _dConnection):
+        """
+        Connection (re-)established; start the first pending probe exchange
+        """
+
+        dProbe = _dConnection['probes'][0]
+        if _dConnection['protocol'] is not None:
+            _dConnection['out'] = dProbe['request']
+        if _dConnection['out']:
+            _dConnection['state'] = 'send'
+            self.__events(_oSelector, _dConnection, selectors.EVENT_WRITE)
+        elif dProbe['expect'] is not None:
+            _dConnection['state'] = 'recv'
+            self.__events(_oSelector, _dConnection, selectors.EVENT_READ)
+        else:
+            self.__done(_dConnection, KiscRuntime_prober.RESULT_OK)
+            self.__close(_oSelector, _dConnection)
+
+
+    def __received(self, _oSelector, _dConnection, _bEOF):
+        """
+        Data received; check the first pending probe response
+        """
+
+        dProbe = _dConnection['probes'][0]
+
+        # TCP (banner)
+        if _dConnection['protocol'] is None:
+            if dProbe['expect'].search(_dConnection['in']):
+                self.__done(_dConnection, KiscRuntime_prober.RESULT_OK)
+                self.__close(_oSelector, _dConnection)
+            elif _bEOF:
+                self.__fail(_oSelector, _dConnection, KiscRuntime_prober.RESULT_MISMATCH)
+            return
+
+        # HTTP
+        tResponse = self.__httpResponse(_dConnection['in'], _bEOF)
+        if tResponse is None:
+            if _bEOF:
+                self.__fail(_oSelector, _dConnection, KiscRuntime_prober.RESULT_ERROR)
+            return
+        (byStatus, byBody, iConsumed, bKeepAlive) = tResponse
+        _dConnection['in'] = _dConnection['in'][iConsumed:]
+        if dProbe['status'].fullmatch(byStatus) and (dProbe['expect'] is None or dProbe['expect'].search(byBody)):
+            self.__done(_dConnection, KiscRuntime_prober.RESULT_OK)
+        else:
+            self.__done(_dConnection, KiscRuntime_prober.RESULT_MISMATCH)
+
+        # ... next request (re-using the connection, if kept alive)
+        if not _dConnection['probes']:
+            self.__close(_oSelector, _dConnection)
+        elif bKeepAlive and not _bEOF:
+            self.__ready(_oSelector, _dConnection)
+        else:
+            self.__connect(_oSelector, _dConnection)
+
+
+    def __httpResponse(self, _byData, _bEOF):
+        """
+        Parse the given HTTP response
+
+        @return tuple  (byStatus, byBody, iConsumed, bKeepAlive) tuple, None if incomplete
+        """
+
+        iHeaders = _byData.find(b'\r\n\r\n')
+        if iHeaders < 0:
+            return None
+        lbyLines = _byData[:iHeaders].split(b'\r\n')
+        lbyStatus = lbyLines[0].split(b' ', 2)
+        if len(lbyStatus) < 2 or not lbyStatus[0].startswith(b'HTTP/'):
+            raise OSError(errno.EPROTO, 'Invalid HTTP response')
+        dbyHeaders = dict()
+        for byLine in lbyLines[1:]:
+            (byName, byColon, byValue) = byLine.partition(b':')
+            dbyHeaders[byName.strip().lower()] = byValue.strip()
+        bKeepAlive = dbyHeaders.get(b'connection', b'').lower() != b'close' and lbyStatus[0] != b'HTTP/1.0'
+        iBody = iHeaders+4
+
+        # ... chunked
+        if dbyHeaders.get(b'transfer-encoding', b'').lower() == b'chunked':
+            byBody = bytes()
+            iOffset = iBody
+            while True:
+                iLine = _byData.find(b'\r\n', iOffset)
+                if iLine < 0:
+                    return None
+                try:
+                    iSize = int(_byData[iOffset:iLine].split(b';')[0], 16)
+                except ValueError:
+                    raise OSError(errno.EPROTO, 'Invalid HTTP chunk')
+                if iSize == 0:
+                    iEnd = _byData.find(b'\r\n\r\n', iLine)
+                    if iEnd < 0:
+                        return None
+                    return (lbyStatus[1], byBody, iEnd+4, bKeepAlive)
+                if len(_byData) < iLine+2+iSize+2:
+                    return None
+                byBody += _byData[iLine+2:iLine+2+iSize]
+                iOffset = iLine+2+iSize+2
+
+        # ... content length
+        if b'content-length' in dbyHeaders:
+            try:
+                iLength = int(dbyHeaders[b'content-length'])
+            except ValueError:
+                raise OSError(errno.EPROTO, 'Invalid HTTP content length')
+            if len(_byData) < iBody+iLength:
+                return None
+            return (lbyStatus[1], _byData[iBody:iBody+iLength], iBody+iLength, bKeepAlive)
+
+        # ... no body
+        if lbyStatus[1] in (b'204', b'304') or lbyStatus[1].startswith(b'1'):
+            return (lbyStatus[1], bytes(), iBody, bKeepAlive)
+
+        # ... until connection close
+        if not _bEOF:
+            return None
+        return (lbyStatus[1], _byData[iBody:], len(_byData), False)
@@ -25,11 +25,20 @@
 # MODULES
 #------------------------------------------------------------------------------
 
+# KiSC
+from .spawn import \
+     KiscRuntime_spawn
+from .timeout import \
+     KiscRuntime_timeout
+from .trace import \
+     KiscRuntime_trace
+
 # Standard
 import errno
 import os
-import subprocess
+import signal
 import sys
+import time
 
 
 #------------------------------------------------------------------------------
@@ -67,11 +76,46 @@ class KiscRuntime:
         STATUS_ERROR: "Error",
         }
 
+    # Shell
+    SHELL_KILL_GRACE = 2.0  # grace period between SIGTERM and SIGKILL
+
+
+    #--------------------------------------------------------------------------
+    # CLASS PROPERTIES
+    #--------------------------------------------------------------------------
+
+    # Command backend (None for the operating system)
+    _oBackend = None
+
+    # Background processes trace spans (see spawn()/reap())
+    _doSpans = dict()
+
 
     #--------------------------------------------------------------------------
     # HELPERS
     #--------------------------------------------------------------------------
 
+    def setBackend(_oBackend = None):
+        """
+        Set the command backend, which shell commands and file echoes are
+        delegated to (see KiscRuntime_backend, KiscRuntime_simulator)
+
+        @param KiscRuntime_backend _oBackend  Command backend (None for the operating system)
+        """
+
+        KiscRuntime._oBackend = _oBackend
+
+
+    def getBackend():
+        """
+        Return the command backend
+
+        @return KiscRuntime_backend  Command backend, None for the operating system
+        """
+
+        return KiscRuntime._oBackend
+
+
     def echo(_sString, _sFilename, _sMode = 'w', _bTrace = False):
         """
         Echo the given string into the given file
@@ -86,31 +130,51 @@ class KiscRuntime:
         if _bTrace: sys.stderr.write('TRACE[echo] %s > %s (%s)\n' % (_sString, _sFilename, _sMode))
 
         # Open file
-        oFile = open(_sFilename, _sMode)
-        oFile.write(_sString)
-        oFile.close()
+        with KiscRuntime_trace.span(KiscRuntime_trace.KIND_ECHO, 'echo', None, {'file': _sFilename}):
+            if KiscRuntime._oBackend is not None:
+                KiscRuntime._oBackend.write(_sString, _sFilename, _sMode)
+                return
+            oFile = open(_sFilename, _sMode)
+            oFile.write(_sString)
+            oFile.close()
 
 
-    def shell(_llsCommands, _sWorkingDirectory = None, _bRedirectStdOut = True, _bIgnoreReturnCode = False, _bTrace = False):
+    def shell(_llsCommands, _sWorkingDirectory = None, _bRedirectStdOut = True, _bIgnoreReturnCode = False, _fTimeout = None, _fProgress = None, _fProgressInterval = None, _bTrace = False):
         """
         Execute the given shell (piped) command(s) within the given working
         directory and returns the resulting standard output
 
-        @param list _llsCommands        Command(s) path and arguments (as passed to Popen)
-        @param str  _sWorkingDirectory  Directory to switch to before executing the command
-        @param bool _bRedirectStdOut    Redirect standard output
-        @param bool _bIgnoreReturnCode  Do not raise error in case of non-zero return code
-        @param bool _bTrace             Print TRACE message to standard error
+        Commands are spawned using the low-overhead (posix_spawn) launcher, if
+        available and enabled (see KiscRuntime_spawn), or subprocess.Popen;
+        or delegated to the command backend, if set (see setBackend()).
+        When a timeout is given, commands are run in their own process group
+        (session), which is killed - SIGTERM, then SIGKILL after SHELL_KILL_GRACE
+        seconds - along all its processes once the timeout expires. Commands are
+        recorded as trace spans, if tracing is enabled (see KiscRuntime_trace).
+        Long-running commands may be sampled by a progress function, called
+        periodically while they run (not when delegated to the command backend).
+
+        @param list     _llsCommands        Command(s) path and arguments (as passed to Popen)
+        @param str      _sWorkingDirectory  Directory to switch to before executing the command
+        @param bool     _bRedirectStdOut    Redirect standard output
+        @param bool     _bIgnoreReturnCode  Do not raise error in case of non-zero return code
+        @param float    _fTimeout           Timeout (seconds) for all (piped) command(s) to complete (None for no timeout)
+        @param function _fProgress          Progress function (called without argument while commands run)
+        @param float    _fProgressInterval  Progress function calls interval (seconds)
+        @param bool     _bTrace             Print TRACE message to standard error
 
         @exception RuntimeError  On arguments error
         @exception OSError       In case a command returns a non-zero exit code, with the
                                  filename property set to the index of the erroneous command,
                                  starting from zero at the last command and increasing for
-                                 previous (piped) commands
+                                 previous (piped) commands; or KiscRuntime_timeout if the
+                                 command(s) timed out (and were killed)
 
         @return str  Resulting standard output (if redirected), None otherwise
         """
 
+        import subprocess
+
         # Check
         if not _llsCommands:
             raise RuntimeError('Missing/empty command argument')
@@ -118,32 +182,302 @@ class KiscRuntime:
         # Handle single command
         if not type(_llsCommands[0]) is list:
             _llsCommands = [_llsCommands]
-        if _bTrace: sys.stderr.write('TRACE[shell] %s\n' % ' | '.join([' '.join(lsCommand) for lsCommand in _llsCommands]))
+        if _bTrace: sys.stderr.write('TRACE[shell] %s%s\n' % (' | '.join([' '.join(lsCommand) for lsCommand in _llsCommands]), ' (timeout: %gs)' % _fTimeout if _fTimeout is not None else ''))
 
         # Execute (piped) command(s)
-        byStdOut = None
-        iIndex_last = len(_llsCommands)-1
-        for iIndex in range(0, len(_llsCommands)):
-            try:
-                oPopen = subprocess.Popen(
-                    _llsCommands[iIndex],
-                    cwd=_sWorkingDirectory,
-                    stdin=subprocess.PIPE if iIndex > 0 else None,
-                    stdout=subprocess.PIPE if iIndex < iIndex_last or _bRedirectStdOut else None,
-                    stderr=subprocess.PIPE
+        with KiscRuntime_trace.shell(_llsCommands, _fTimeout):
+            if KiscRuntime._oBackend is not None:
+                return KiscRuntime._oBackend.shell(_llsCommands, _bRedirectStdOut, _bIgnoreReturnCode, _fTimeout)
+            fDeadline = time.monotonic()+_fTimeout if _fTimeout is not None else None
+            byStdOut = None
+            iIndex_last = len(_llsCommands)-1
+            for iIndex in range(0, len(_llsCommands)):
+                try:
+                    if _sWorkingDirectory is None and KiscRuntime_spawn.isEnabled():
+                        # (posix_spawn does not support changing the working directory)
+                        oPopen = KiscRuntime_spawn(
+                            _llsCommands[iIndex],
+                            stdin=subprocess.PIPE if iIndex > 0 else None,
+                            stdout=subprocess.PIPE if iIndex < iIndex_last or _bRedirectStdOut else None,
+                            stderr=subprocess.PIPE,
+                            start_new_session=fDeadline is not None
+                        )
+                    else:
+                        oPopen = subprocess.Popen(
+                            _llsCommands[iIndex],
+                            cwd=_sWorkingDirectory,
+                            stdin=subprocess.PIPE if iIndex > 0 else None,
+                            stdout=subprocess.PIPE if iIndex < iIndex_last or _bRedirectStdOut else None,
+                            stderr=subprocess.PIPE,
+                            start_new_session=fDeadline is not None
+                        )
+                except OSError as e:
+                    raise OSError(e.errno, str(e), iIndex_last-iIndex)
+                byStdIn = byStdOut
+                while True:
+                    fWait = max(0.0, fDeadline-time.monotonic()) if fDeadline is not None else None
+                    bProgress = _fProgress is not None and _fProgressInterval and (fWait is None or fWait > _fProgressInterval)
+                    try:
+                        (byStdOut, byStdErr) = oPopen.communicate(byStdIn, timeout=_fProgressInterval if bProgress else fWait)
+                        break
+                    except subprocess.TimeoutExpired:
+                        if not bProgress:
+                            KiscRuntime.kill(oPopen, True)
+                            if _bTrace: sys.stderr.write('TRACE[shell] %s: timed out (%gs); killed\n' % (' '.join(_llsCommands[iIndex]), _fTimeout))
+                            raise KiscRuntime_timeout('Command timed out after %gs (%s)' % (_fTimeout, _llsCommands[iIndex][0]))
+                    byStdIn = None  # (already sent)
+                    try:
+                        _fProgress()
+                    except BaseException as e:
+                        KiscRuntime.kill(oPopen, fDeadline is not None)
+                        raise e
+                if not _bIgnoreReturnCode and oPopen.returncode != 0:
+                    raise OSError(oPopen.returncode, byStdErr.decode(sys.getfilesystemencoding()), iIndex_last-iIndex)
+            if _bRedirectStdOut:
+                if byStdOut:
+                    return byStdOut.decode(sys.getfilesystemencoding())
+                else:
+                    return str()
+            else:
+                return None
+
+
+    def spawn(_lsCommand, _bTrace = False):
+        """
+        Spawn the given (long-lived) command in the background, its standard
+        output being readable from the returned process 'stdout' (pipe)
+
+        Commands are spawned using the same launcher as shell() and recorded as
+        trace spans - from spawn to reap() - if tracing is enabled. They can not
+        be delegated to the command backend.
+
+        @param list _lsCommand  Command path and arguments (as passed to Popen)
+        @param bool _bTrace     Print TRACE message to standard error
+
+        @exception OSError  On spawn error (errno set to ENOTSUP if a command backend is set)
+
+        @return subprocess.Popen  Process (object); to be reaped with reap()
+        """
+
+        import subprocess
+        if _bTrace: sys.stderr.write('TRACE[shell] %s &\n' % ' '.join(_lsCommand))
+
+        # Check
+        if KiscRuntime._oBackend is not None:
+            raise OSError(errno.ENOTSUP, 'Background commands not supported by the command backend (%s)' % _lsCommand[0])
+
+        # Spawn
+        oSpan = KiscRuntime_trace.shell([_lsCommand])
+        try:
+            if KiscRuntime_spawn.isEnabled():
+                oPopen = KiscRuntime_spawn(
+                    _lsCommand,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL
                 )
-            except OSError as e:
-                raise OSError(e.errno, str(e), iIndex_last-iIndex)
-            (byStdOut, byStdErr) = oPopen.communicate(byStdOut)
-            if not _bIgnoreReturnCode and oPopen.returncode != 0:
-                raise OSError(oPopen.returncode, byStdErr.decode(sys.getfilesystemencoding()), iIndex_last-iIndex)
-        if _bRedirectStdOut:
-            if byStdOut:
-                return byStdOut.decode(sys.getfilesystemencoding())
             else:
-                return str()
-        else:
-            return None
+                oPopen = subprocess.Popen(
+                    _lsCommand,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL
+                )
+        except OSError as e:
+            oSpan.end(e.errno if e.errno is not None else -1)
+            raise e
+        KiscRuntime._doSpans[oPopen.pid] = oSpan
+        return oPopen
+
+
+    def reap(_oPopen, _bTrace = False):
+        """
+        Terminate (if still running) and reap the given background process
+        (see spawn()), ending its trace span
+
+        @param subprocess.Popen _oPopen  Process (object)
+        @param bool             _bTrace  Print TRACE message to standard error
+
+        @return int  Process return code (0 if terminated)
+        """
+
+        if _bTrace: sys.stderr.write('TRACE[shell] %s: reaping\n' % ' '.join(_oPopen.args))
+
+        # Terminate
+        iReturnCode = _oPopen.poll()
+        if iReturnCode is None:
+            KiscRuntime.kill(_oPopen)
+            iReturnCode = 0
+        elif _oPopen.stdout is not None:
+            _oPopen.stdout.close()
+
+        # ... span
+        oSpan = KiscRuntime._doSpans.pop(_oPopen.pid, None)
+        if oSpan is not None:
+            oSpan.end(iReturnCode)
+        return iReturnCode
+
+
+    def kill(_oPopen, _bGroup = False):
+        """
+        Kill the given process - or its (own) process group - and reap it
+
+        Processes are sent SIGTERM, then SIGKILL if still alive after the
+        SHELL_KILL_GRACE period. Processes stuck in uninterruptible sleep (e.g.
+        on a dead NFS server) are given up upon (after a second grace period).
+
+        @param subprocess.Popen _oPopen  Process (object)
+        @param bool             _bGroup  Kill the process group the process leads (see start_new_session)
+        """
+
+        import subprocess
+
+        # Kill
+        for iSignal in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                if _bGroup:
+                    os.killpg(_oPopen.pid, iSignal)
+                else:
+                    _oPopen.send_signal(iSignal)
+            except OSError:
+                pass
+            try:
+                _oPopen.communicate(timeout=KiscRuntime.SHELL_KILL_GRACE)
+                return
+            except subprocess.TimeoutExpired:
+                pass
+            except ValueError:
+                # I/O already closed
+                try:
+                    _oPopen.wait(timeout=KiscRuntime.SHELL_KILL_GRACE)
+                    return
+                except subprocess.TimeoutExpired:
+                    pass
+
+        # ... give up (release our end of the pipes)
+        for oPipe in (_oPopen.stdin, _oPopen.stdout, _oPopen.stderr):
+            if oPipe is not None:
+                try:
+                    oPipe.close()
+                except OSError:
+                    pass
+
+
+    def shellQuorum(_llsCommands, _iSatisfy = None, _bTrace = False):
+        """
+        Execute the given shell commands concurrently, until the given quorum of
+        successful (zero exit code) commands is reached - or can no longer be
+        reached - killing the outstanding commands
+
+        @param list _llsCommands  Commands path and arguments (as passed to Popen)
+        @param int  _iSatisfy     Quorum (default: all commands)
+        @param bool _bTrace       Print TRACE message to standard error
+
+        @exception OSError  If a command fails to execute, with the filename property
+                            set to the index of the erroneous command
+
+        @return list  (iReturnCode, fDuration, sOutput) tuple for each command, where
+                      iReturnCode is None for commands killed before completing and
+                      sOutput merges the command standard output and error
+        """
+
+        import selectors
+        import subprocess
+
+        # Check
+        if _iSatisfy is None:
+            _iSatisfy = len(_llsCommands)
+        if KiscRuntime._oBackend is not None:
+            if _bTrace: sys.stderr.write('TRACE[shell] %s &\n' % ' & '.join([' '.join(lsCommand) for lsCommand in _llsCommands]))
+            return KiscRuntime._oBackend.shellQuorum(_llsCommands, _iSatisfy)
+
+        # Execute commands
+        loPopens = list()
+        lfStarts = list()
+        ltResults = [(None, 0.0, str())]*len(_llsCommands)
+        oSelector = selectors.DefaultSelector()
+        try:
+            for iIndex in range(0, len(_llsCommands)):
+                if _bTrace: sys.stderr.write('TRACE[shell] %s &\n' % ' '.join(_llsCommands[iIndex]))
+                try:
+                    oPopen = subprocess.Popen(
+                        _llsCommands[iIndex],
+                        stdin=subprocess.DEVNULL,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.STDOUT
+                    )
+                except OSError as e:
+                    raise OSError(e.errno, str(e), iIndex)
+                loPopens.append(oPopen)
+                lfStarts.append(time.time())
+                oSelector.register(oPopen.stdout, selectors.EVENT_READ, [iIndex, bytes()])
+
+            # ... wait for quorum
+            iSucceeded = 0
+            iPending = len(_llsCommands)
+            while iPending and iSucceeded < _iSatisfy and iSucceeded+iPending >= _iSatisfy:
+                for (oKey, iEvents) in oSelector.select():
+                    byData = os.read(oKey.fd, 65536)
+                    if byData:
+                        oKey.data[1] += byData
+                        continue
+                    oSelector.unregister(oKey.fileobj)
+                    iIndex = oKey.data[0]
+                    iReturnCode = loPopens[iIndex].wait()
+                    ltResults[iIndex] = (iReturnCode, time.time()-lfStarts[iIndex], oKey.data[1].decode(sys.getfilesystemencoding(), errors='replace'))
+                    iPending -= 1
+                    if iReturnCode == 0:
+                        iSucceeded += 1
+
+        finally:
+
+            # ... kill outstanding commands
+            for oKey in list(oSelector.get_map().values()):
+                oSelector.unregister(oKey.fileobj)
+                iIndex = oKey.data[0]
+                if loPopens[iIndex].poll() is None:
+                    loPopens[iIndex].kill()
+                loPopens[iIndex].wait()
+                ltResults[iIndex] = (None, time.time()-lfStarts[iIndex], oKey.data[1].decode(sys.getfilesystemencoding(), errors='replace'))
+            for oPopen in loPopens:
+                oPopen.stdout.close()
+            oSelector.close()
+
+        # Done
+        return ltResults
+
+
+    def wait(_fCondition, _fTimeout, _fWait = None, _fIntervalMin = 0.05, _fIntervalMax = 1.0):
+        """
+        Wait for the given condition to be met, checking it with an adaptive
+        (exponential) backoff interval
+
+        The given wait function is called - instead of sleeping - with the
+        interval to wait for; it may return earlier (e.g. when an event occurs),
+        True if the condition is then known to be met (sparing its check).
+
+        @param function _fCondition    Condition (function returning True once met)
+        @param float    _fTimeout      Maximum time to wait for (seconds)
+        @param function _fWait         Wait function (default: time.sleep)
+        @param float    _fIntervalMin  Initial check interval (seconds)
+        @param float    _fIntervalMax  Maximum check interval (seconds)
+
+        @return bool  True if the condition is met, False on timeout
+        """
+
+        fDeadline = time.time()+_fTimeout
+        fInterval = _fIntervalMin
+        while True:
+            if _fCondition():
+                return True
+            fRemaining = fDeadline-time.time()
+            if fRemaining <= 0.0:
+                return False
+            if _fWait is None:
+                time.sleep(min(fInterval, fRemaining))
+            elif _fWait(min(fInterval, fRemaining)):
+                return True
+            fInterval = min(2.0*fInterval, _fIntervalMax)
 
 
     def perms(_mFile, _mUser, _mGroup, _mMode, _bTrace = False):
@@ -0,0 +1,737 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# KiSC
+from .runtime import \
+     KiscRuntime
+from .backend import \
+     KiscRuntime_backend
+
+# Standard
+import contextlib
+import errno
+import fcntl
+import json
+import os
+import re
+import socket
+import threading
+import time
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscRuntime_simulator(KiscRuntime_backend):
+    """
+    Simulated (in-memory) system command backend
+
+    Emulates - without touching the system - the commands issued by KiSC
+    resources: network links and addresses ('ip'), mounts ('mount', 'umount'),
+    libvirt domains ('virsh'), Pacemaker resources ('cibadmin', 'crm_resource',
+    'crm_mon'), services ('systemctl', 'invoke-rc.d'), health checks ('ping',
+    'ping6', 'stonith') and the status checks reading their state ('test',
+    'grep', 'awk' on /sys/class/net and /proc/mounts). Other commands fail as
+    if not installed (ENOENT).
+
+    Objects acted upon by state-changing commands - domains, Pacemaker
+    resources, services - are implicitly defined. Domains shutdown and
+    Pacemaker resources start/stop complete asynchronously, after the given
+    transition time.
+
+    The simulator is configured by a settings string:
+      "setting=value[,...]"
+    where settings are:
+     - latency (seconds): base latency of each command
+     - jitter (seconds): maximum (uniformly distributed) additional latency
+     - failure (ratio): probability of a command failing (exit code 125)
+     - hang (ratio): probability of a command hanging (until timed out)
+     - transition (seconds): asynchronous state transitions duration
+     - seed (integer): random generator seed (for reproducible runs)
+     - state (path): JSON file to persist the state in (and share it between
+       processes, e.g. successive 'kisc' commands); in-memory otherwise
+     - node (name): Pacemaker node name (default: host name)
+     - links (names): pre-existing network links ('+'-separated)
+     - unreachable (addresses): unreachable (ping) addresses ('+'-separated)
+    Latency, jitter, failure and hang may be overriden per command, by
+    prefixing them with the command name (e.g. "virsh.latency=0.5").
+    """
+
+    #--------------------------------------------------------------------------
+    # CONSTANTS
+    #--------------------------------------------------------------------------
+
+    # Settings
+    SETTINGS_FLOAT = frozenset(['latency', 'jitter', 'failure', 'hang', 'transition'])
+    SETTINGS_COMMAND = frozenset(['latency', 'jitter', 'failure', 'hang'])
+
+    # (Injected) failure exit code
+    FAILURE_CODE = 125
+
+    # (Injected) hang duration
+    HANG_DURATION = 3600.0
+
+
+    #--------------------------------------------------------------------------
+    # CONSTRUCTORS
+    #--------------------------------------------------------------------------
+
+    def __init__(self, _sSettings = None):
+        """
+        Create a new simulator
+
+        @param str _sSettings  Settings string (see class documentation)
+
+        @exception RuntimeError  On invalid settings
+        """
+
+        import random
+
+        # Settings
+        self._dmSettings = {
+            'latency': 0.0,
+            'jitter': 0.0,
+            'failure': 0.0,
+            'hang': 0.0,
+            'transition': 0.0,
+            'seed': None,
+            'state': None,
+            'node': socket.gethostname(),
+            'links': 'lo+eth0+eth1',
+            'unreachable': '',
+        }
+        for (sKey, sValue) in KiscRuntime.parseDictionary(_sSettings, _sAssignmentOperator = '=').items():
+            sSetting = sKey.split('.')[-1]
+            if sSetting not in self._dmSettings or (sKey != sSetting and sSetting not in KiscRuntime_simulator.SETTINGS_COMMAND):
+                raise RuntimeError('Invalid simulator setting (%s)' % sKey)
+            try:
+                if sSetting in KiscRuntime_simulator.SETTINGS_FLOAT:
+                    self._dmSettings[sKey] = float(sValue)
+                elif sSetting == 'seed':
+                    self._dmSettings[sKey] = int(sValue)
+                else:
+                    self._dmSettings[sKey] = sValue
+            except ValueError:
+                raise RuntimeError('Invalid simulator setting value (%s=%s)' % (sKey, sValue))
+
+        # Properties
+        self._oRandom = random.Random(self._dmSettings['seed'])
+        self._oLock = threading.Lock()
+        self._dState = None
+        self._lsUnreachable = KiscRuntime.parseList(self._dmSettings['unreachable'], _sItemSeparator = '+')
+
+
+    #--------------------------------------------------------------------------
+    # METHODS: KiscRuntime_backend (implemented/overriden)
+    #--------------------------------------------------------------------------
+
+    def latency(self, _lsCommand):
+        sCommand = os.path.basename(_lsCommand[0])
+        with self._oLock:
+            if self._oRandom.random() < self.__setting(sCommand, 'hang'):
+                return KiscRuntime_simulator.HANG_DURATION
+            return self.__setting(sCommand, 'latency')+self._oRandom.uniform(0.0, self.__setting(sCommand, 'jitter'))
+
+
+    def run(self, _lsCommand, _sStdIn = None):
+        sCommand = os.path.basename(_lsCommand[0])
+        fExecute = getattr(self, '_KiscRuntime_simulator__command_%s' % re.sub('[^a-z0-9]', '_', sCommand), None)
+        if fExecute is None:
+            raise OSError(errno.ENOENT, 'No such file or directory (simulator): \'%s\'' % _lsCommand[0])
+        with self.__locked():
+            if self._oRandom.random() < self.__setting(sCommand, 'failure'):
+                return (KiscRuntime_simulator.FAILURE_CODE, str(), '%s: simulated failure\n' % sCommand)
+            dState = self.__load()
+            tResult = fExecute(dState, _lsCommand[1:], _sStdIn)
+            self.__save(dState)
+        return tResult
+
+
+    def write(self, _sString, _sFilename, _sMode = 'w'):
+        oMatch = re.match('^/sys/class/net/([^/]+)/(bonding|bridge)/([^/]+)$', _sFilename)
+        if oMatch is None:
+            return KiscRuntime_backend.write(self, _sString, _sFilename, _sMode)
+        with self.__locked():
+            dState = self.__load()
+            dLink = dState['links'].get(oMatch.group(1), None)
+            if dLink is None:
+                raise OSError(errno.ENOENT, 'No such file or directory', _sFilename)
+            dLink['settings']['%s/%s' % (oMatch.group(2), oMatch.group(3))] = _sString.strip()
+            self.__save(dState)
+
+
+    #--------------------------------------------------------------------------
+    # METHODS: self
+    #--------------------------------------------------------------------------
+
+    def state(self):
+        """
+        Return the (current) simulated state
+
+        @return dict  State (links, mounts, domains, cib and units)
+        """
+
+        with self.__locked():
+            return self.__load()
+
+
+    #
+    # Helpers
+    #
+
+    def __setting(self, _sCommand, _sSetting):
+        """
+        Return the given setting, for the given command
+        """
+
+        return self._dmSettings.get('%s.%s' % (_sCommand, _sSetting), self._dmSettings[_sSetting])
+
+
+    @contextlib.contextmanager
+    def __locked(self):
+        """
+        Lock the state, across threads and - if persisted - processes
+        """
+
+        with self._oLock:
+            if self._dmSettings['state'] is None:
+                yield
+                return
+            iFd = os.open('%s.lock' % self._dmSettings['state'], os.O_RDWR|os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(iFd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(iFd)
+
+
+    def __load(self):
+        """
+        Load the state (from its persistence file, if any); the lock MUST be held
+        """
+
+        if self._dmSettings['state'] is None:
+            if self._dState is None:
+                self._dState = self.__initial()
+            return self._dState
+        try:
+            with open(self._dmSettings['state'], 'r') as oFile:
+                return json.load(oFile)
+        except FileNotFoundError:
+            return self.__initial()
+        except ValueError as e:
+            raise OSError(errno.EINVAL, 'Invalid simulator state (%s); %s' % (self._dmSettings['state'], str(e)))
+
+
+    def __save(self, _dState):
+        """
+        Save the state (to its persistence file, if any); the lock MUST be held
+        """
+
+        if self._dmSettings['state'] is None:
+            self._dState = _dState
+            return
+        sFile_tmp = '%s.%d.tmp' % (self._dmSettings['state'], os.getpid())
+        with open(sFile_tmp, 'w') as oFile:
+            json.dump(_dState, oFile, sort_keys=True)
+        os.rename(sFile_tmp, self._dmSettings['state'])
+
+
+    def __initial(self):
+        """
+        Return the initial state
+        """
+
+        dState = {
+            'links': dict(),
+            'mounts': dict(),
+            'domains': dict(),
+            'cib': {'epoch': 1, 'resources': dict()},
+            'units': dict(),
+        }
+        for sLink in KiscRuntime.parseList(self._dmSettings['links'], _sItemSeparator = '+'):
+            dState['links'][sLink] = {'type': 'device', 'up': True, 'master': None, 'addresses': list(), 'settings': dict()}
+        return dState
+
+
+    def __transition(self, _dObject, _sState):
+        """
+        Schedule the given object (asynchronous) transition to the given state
+        """
+
+        if self._dmSettings['transition'] > 0.0:
+            _dObject['target'] = _sState
+            _dObject['at'] = time.time()+self._dmSettings['transition']
+        else:
+            _dObject['state'] = _sState
+            _dObject.pop('target', None)
+
+
+    def __settle(self, _dObject):
+        """
+        Complete the given object (asynchronous) transition, if due; return its state
+        """
+
+        if 'target' in _dObject and time.time() >= _dObject['at']:
+            _dObject['state'] = _dObject.pop('target')
+            del _dObject['at']
+        return _dObject['state']
+
+
+    def __file(self, _dState, _sFile):
+        """
+        Return the given (virtual) file content, None if it does not exist
+        """
+
+        if _sFile == '/proc/mounts':
+            return ''.join(['%s %s %s %s 0 0\n' % (dMount['device'], sMountpoint, dMount['fstype'], dMount['options']) for (sMountpoint, dMount) in _dState['mounts'].items()])
+        oMatch = re.match('^/sys/class/net/([^/]+)(/.*)?$', _sFile)
+        if oMatch is not None:
+            dLink = _dState['links'].get(oMatch.group(1), None)
+            if dLink is None:
+                return None
+            if oMatch.group(2) is None:
+                return str()
+            if oMatch.group(2) == '/operstate':
+                return 'up\n' if dLink['up'] else 'down\n'
+            sSetting = dLink['settings'].get(oMatch.group(2)[1:], None)
+            return '%s\n' % sSetting if sSetting is not None else None
+        try:
+            with open(_sFile, 'r') as oFile:
+                return oFile.read()
+        except OSError:
+            return None
+
+
+    def __address(self, _sAddress):
+        """
+        Return the given address/mask in canonical form (as displayed by 'ip')
+        """
+
+        import ipaddress
+        lsAddress = _sAddress.split('/')
+        try:
+            lsAddress[0] = ipaddress.ip_address(lsAddress[0]).compressed
+        except ValueError:
+            pass
+        return '/'.join(lsAddress)
+
+
+    #
+    # Commands
+    #
+    # (each returning the (iReturnCode, sStdOut, sStdErr) tuple)
+
+    def __command_true(self, _dState, _lsArguments, _sStdIn):
+        return (0, str(), str())
+
+
+    def __command_false(self, _dState, _lsArguments, _sStdIn):
+        return (1, str(), str())
+
+
+    def __command_modprobe(self, _dState, _lsArguments, _sStdIn):
+        return (0, str(), str())
+
+
+    def __command_stonith(self, _dState, _lsArguments, _sStdIn):
+        return (0, str(), str())
+
+
+    def __command_test(self, _dState, _lsArguments, _sStdIn):
+        if len(_lsArguments) != 2 or _lsArguments[0] not in ('-e', '-f', '-d'):
+            return (2, str(), 'test: unsupported expression (simulator)\n')
+        sFile = _lsArguments[1]
+        if sFile.startswith('/sys/class/net/') or sFile == '/proc/mounts':
+            bTrue = self.__file(_dState, sFile) is not None
+        elif _lsArguments[0] == '-f':
+            bTrue = os.path.isfile(sFile)
+        elif _lsArguments[0] == '-d':
+            bTrue = os.path.isdir(sFile)
+        else:
+            bTrue = os.path.exists(sFile)
+        return (0 if bTrue else 1, str(), str())
+
+
+    def __command_grep(self, _dState, _lsArguments, _sStdIn):
+        bQuiet = False
+        bIgnoreCase = False
+        lsOperands = list()
+        for sArgument in _lsArguments:
+            if sArgument.startswith('-') and not lsOperands:
+                bQuiet = bQuiet or 'q' in sArgument
+                bIgnoreCase = bIgnoreCase or 'i' in sArgument
+            else:
+                lsOperands.append(sArgument)
+        if not lsOperands:
+            return (2, str(), 'grep: missing pattern\n')
+        sInput = _sStdIn or str()
+        if len(lsOperands) > 1:
+            sInput = self.__file(_dState, lsOperands[1])
+            if sInput is None:
+                return (2, str(), 'grep: %s: No such file or directory\n' % lsOperands[1])
+        sPattern = lsOperands[0].lower() if bIgnoreCase else lsOperands[0]
+        lsLines = [sLine for sLine in sInput.splitlines(True) if sPattern in (sLine.lower() if bIgnoreCase else sLine)]
+        return (0 if lsLines else 1, str() if bQuiet else ''.join(lsLines), str())
+
+
+    def __command_awk(self, _dState, _lsArguments, _sStdIn):
+        # (storage_mount status check only)
+        oMatch = re.match('^BEGIN\\{e=(\\d+)\\}; \\{if\\(\\$2=="(.*)"\\) \\{e=0; exit\\}\\}; END \\{exit e\\}$', _lsArguments[0]) if len(_lsArguments) == 2 else None
+        if oMatch is None or _lsArguments[1] != '/proc/mounts':
+            return (2, str(), 'awk: unsupported program (simulator)\n')
+        return (0 if oMatch.group(2) in _dState['mounts'] else int(oMatch.group(1)), str(), str())
+
+
+    def __command_ip(self, _dState, _lsArguments, _sStdIn):
+        lsFamilies = ['inet', 'inet6']
+        lsArguments = list(_lsArguments)
+        while lsArguments and lsArguments[0] in ('-4', '-6'):
+            lsFamilies = ['inet' if lsArguments.pop(0) == '-4' else 'inet6']
+        if len(lsArguments) < 2:
+            return (255, str(), 'Command line is not complete. Try option "help"\n')
+        (sObject, sAction) = lsArguments[0:2]
+        lsArguments = lsArguments[2:]
+        dLinks = _dState['links']
+
+        def value(sKeyword):
+            if sKeyword in lsArguments and lsArguments.index(sKeyword) < len(lsArguments)-1:
+                return lsArguments[lsArguments.index(sKeyword)+1]
+            return None
+
+        # Links
+        if sObject == 'link':
+            if sAction == 'add':
+                sName = value('name')
+                if sName is None:
+                    return (255, str(), 'Not enough information: "dev" argument is required.\n')
+                if sName in dLinks:
+                    return (2, str(), 'RTNETLINK answers: File exists\n')
+                dLinks[sName] = {'type': value('type') or 'device', 'up': False, 'master': None, 'addresses': list(), 'settings': dict()}
+                return (0, str(), str())
+            sName = lsArguments[1] if lsArguments and lsArguments[0] == 'dev' and len(lsArguments) > 1 else (lsArguments[0] if lsArguments else None)
+            if sName not in dLinks:
+                return (1, str(), 'Cannot find device "%s"\n' % sName)
+            if sAction == 'set':
+                sMaster = value('master')
+                if sMaster is not None:
+                    if sMaster not in dLinks:
+                        return (1, str(), 'Cannot find device "%s"\n' % sMaster)
+                    dLinks[sName]['master'] = sMaster
+                if 'nomaster' in lsArguments:
+                    dLinks[sName]['master'] = None
+                if 'up' in lsArguments:
+                    dLinks[sName]['up'] = True
+                elif 'down' in lsArguments:
+                    dLinks[sName]['up'] = False
+                return (0, str(), str())
+            if sAction in ('delete', 'del'):
+                del dLinks[sName]
+                for dLink in dLinks.values():
+                    if dLink['master'] == sName:
+                        dLink['master'] = None
+                return (0, str(), str())
+
+        # Tun/tap devices
+        elif sObject == 'tuntap':
+            sName = value('dev')
+            if sAction == 'add':
+                if sName in dLinks:
+                    return (1, str(), 'ioctl(TUNSETIFF): Device or resource busy\n')
+                dLinks[sName] = {'type': value('mode') or 'tap', 'up': False, 'master': None, 'addresses': list(), 'settings': dict()}
+                return (0, str(), str())
+            if sAction in ('delete', 'del'):
+                if sName not in dLinks:
+                    return (1, str(), 'ioctl(TUNSETIFF): No such device\n')
+                del dLinks[sName]
+                return (0, str(), str())
+
+        # Addresses
+        elif sObject in ('address', 'addr'):
+            if sAction == 'show':
+                lsOutput = list()
+                iIndex = 0
+                for (sName, dLink) in sorted(dLinks.items()):
+                    iIndex += 1
+                    lsAddresses = [sAddress for sAddress in dLink['addresses'] if sAddress.split(' ')[0] in lsFamilies]
+                    if not lsAddresses:
+                        continue
+                    lsOutput.append('%d: %s: <%s> mtu 1500 state %s\n' % (iIndex, sName, 'UP' if dLink['up'] else 'DOWN', 'UP' if dLink['up'] else 'DOWN'))
+                    lsOutput.extend(['    %s scope global %s\n' % (sAddress, sName) for sAddress in lsAddresses])
+                return (0, ''.join(lsOutput), str())
+            sName = value('dev')
+            if sName not in dLinks:
+                return (1, str(), 'Cannot find device "%s"\n' % sName)
+            if not lsArguments or len(lsFamilies) != 1:
+                return (255, str(), 'Not enough information\n')
+            sAddress = '%s %s' % (lsFamilies[0], self.__address(lsArguments[0]))
+            lsAddresses = dLinks[sName]['addresses']
+            if sAction == 'add':
+                if sAddress in lsAddresses:
+                    return (2, str(), 'RTNETLINK answers: File exists\n')
+                lsAddresses.append(sAddress)
+                return (0, str(), str())
+            if sAction in ('delete', 'del'):
+                if sAddress not in lsAddresses:
+                    return (2, str(), 'RTNETLINK answers: Cannot assign requested address\n')
+                lsAddresses.remove(sAddress)
+                return (0, str(), str())
+
+        return (255, str(), 'Command "%s %s" is unknown (simulator)\n' % (sObject, sAction))
+
+
+    def __command_mount(self, _dState, _lsArguments, _sStdIn):
+        lsArguments = list(_lsArguments)
+        sFsType = 'auto'
+        sOptions = 'rw'
+        while lsArguments and lsArguments[0] in ('-t', '-o') and len(lsArguments) > 1:
+            if lsArguments.pop(0) == '-t':
+                sFsType = lsArguments.pop(0)
+            else:
+                sOptions = lsArguments.pop(0)
+        if len(lsArguments) != 2:
+            return (1, str(), 'mount: bad usage\n')
+        (sDevice, sMountpoint) = lsArguments
+        if sMountpoint in _dState['mounts']:
+            return (32, str(), 'mount: %s: %s already mounted on %s.\n' % (sMountpoint, sDevice, sMountpoint))
+        _dState['mounts'][sMountpoint] = {'device': sDevice, 'fstype': sFsType, 'options': sOptions}
+        return (0, str(), str())
+
+
+    def __command_umount(self, _dState, _lsArguments, _sStdIn):
+        if not _lsArguments or _lsArguments[-1] not in _dState['mounts']:
+            return (32, str(), 'umount: %s: not mounted.\n' % (_lsArguments[-1] if _lsArguments else str()))
+        del _dState['mounts'][_lsArguments[-1]]
+        return (0, str(), str())
+
+
+    def __command_systemctl(self, _dState, _lsArguments, _sStdIn):
+        lsArguments = [sArgument for sArgument in _lsArguments if not sArgument.startswith('-')]
+        if len(lsArguments) != 2:
+            return (1, str(), 'systemctl: unsupported arguments (simulator)\n')
+        (sAction, sUnit) = lsArguments
+        if sAction in ('start', 'restart'):
+            _dState['units'][sUnit] = True
+        elif sAction == 'stop':
+            _dState['units'][sUnit] = False
+        elif sAction == 'is-active':
+            return (0 if _dState['units'].get(sUnit, False) else 3, str(), str())
+        else:
+            return (1, str(), 'Unknown command verb %s.\n' % sAction)
+        return (0, str(), str())
+
+
+    def __command_invoke_rc_d(self, _dState, _lsArguments, _sStdIn):
+        lsArguments = [sArgument for sArgument in _lsArguments if not sArgument.startswith('-')]
+        if len(lsArguments) != 2:
+            return (1, str(), 'invoke-rc.d: unsupported arguments (simulator)\n')
+        (sUnit, sAction) = lsArguments
+        if sAction == 'status':
+            return (0 if _dState['units'].get(sUnit, False) else 3, str(), str())
+        return self.__command_systemctl(_dState, [sAction, sUnit], _sStdIn)
+
+
+    def __command_ping(self, _dState, _lsArguments, _sStdIn):
+        if not _lsArguments:
+            return (2, str(), 'ping: usage error: Destination address required\n')
+        if _lsArguments[-1] in self._lsUnreachable:
+            return (1, '1 packets transmitted, 0 received, 100% packet loss\n', str())
+        fRtt = 1000.0*self.__setting('ping', 'latency')
+        return (0, '1 packets transmitted, 1 received, 0%% packet loss\nrtt min/avg/max/mdev = %.3f/%.3f/%.3f/0.000 ms\n' % (fRtt, fRtt, fRtt), str())
+
+
+    def __command_ping6(self, _dState, _lsArguments, _sStdIn):
+        return self.__command_ping(_dState, _lsArguments, _sStdIn)
+
+
+    def __command_virsh(self, _dState, _lsArguments, _sStdIn):
+        lsArguments = list(_lsArguments)
+        while lsArguments and lsArguments[0].startswith('-'):
+            if lsArguments.pop(0) in ('-c', '--connect') and lsArguments:
+                lsArguments.pop(0)
+        if not lsArguments:
+            return (1, str(), 'error: missing command (simulator)\n')
+        sAction = lsArguments.pop(0)
+        lsOperands = list()
+        bValue = False
+        for sArgument in lsArguments:
+            if bValue:
+                bValue = False  # (skip) option value
+            elif sArgument in ('--timeout', '--bandwidth', '--comp-methods', '--parallel-connections', '--event'):
+                bValue = True
+            elif not sArgument.startswith('-'):
+                lsOperands.append(sArgument)
+        dDomains = _dState['domains']
+        for (sName, dDomain) in list(dDomains.items()):
+            if self.__settle(dDomain) == 'shut off' and not dDomain['persistent']:
+                del dDomains[sName]
+
+        # List
+        if sAction == 'list':
+            lsOutput = list()
+            iId = 0
+            for (sName, dDomain) in sorted(dDomains.items()):
+                iId += 1
+                lsOutput.append(' %-5s %-30s %s\n' % (str(iId) if dDomain['state'] != 'shut off' else '-', sName, dDomain['state']))
+            return (0, ''.join(lsOutput), str())
+
+        # Create (transient domain)
+        if sAction == 'create':
+            try:
+                with open(lsOperands[0], 'r') as oFile:
+                    oMatch = re.search('<name>\\s*(.*?)\\s*</name>', oFile.read())
+            except (IndexError, OSError) as e:
+                return (1, str(), 'error: Failed to open file; %s\n' % str(e))
+            if oMatch is None:
+                return (1, str(), 'error: missing domain name\n')
+            sName = oMatch.group(1)
+            if sName in dDomains and dDomains[sName]['state'] != 'shut off':
+                return (1, str(), 'error: Failed to create domain from %s\nerror: domain \'%s\' already exists\n' % (lsOperands[0], sName))
+            dDomains[sName] = {'state': 'running', 'persistent': sName in dDomains}
+            return (0, 'Domain \'%s\' created from %s\n' % (sName, lsOperands[0]), str())
+
+        # Domain commands
+        if not lsOperands:
+            return (1, str(), 'error: command \'%s\' requires <domain> option\n' % sAction)
+        sName = lsOperands[0]
+        if sAction == 'start' and sName not in dDomains:
+            dDomains[sName] = {'state': 'shut off', 'persistent': True}
+        dDomain = dDomains.get(sName, None)
+        if dDomain is None:
+            return (1, str(), 'error: failed to get domain \'%s\'\n' % sName)
+        sState = dDomain['state']
+        if sAction == 'domstate':
+            return (0, '%s\n\n' % sState, str())
+        if sAction == 'domjobinfo':
+            if '--completed' in lsArguments and 'migrated' in dDomain:
+                return (0, 'Job type:         Completed\nTime elapsed:     %d ms\n' % dDomain['migrated'], str())
+            return (0, 'Job type:         None\n', str())
+        if sAction == 'start':
+            if sState != 'shut off':
+                return (1, str(), 'error: Failed to start domain \'%s\'\nerror: Requested operation is not valid: domain is already running\n' % sName)
+            dDomain['state'] = 'running'
+            return (0, 'Domain \'%s\' started\n' % sName, str())
+        if sState == 'shut off':
+            return (1, str(), 'error: Failed to %s domain \'%s\'\nerror: Requested operation is not valid: domain is not running\n' % (sAction, sName))
+        if sAction == 'destroy':
+            dDomain.pop('target', None)
+            dDomain['state'] = 'shut off'
+            if not dDomain['persistent']:
+                del dDomains[sName]
+            return (0, 'Domain \'%s\' destroyed\n' % sName, str())
+        if sAction == 'shutdown':
+            self.__transition(dDomain, 'shut off')
+            if not dDomain['persistent'] and 'target' not in dDomain:
+                del dDomains[sName]
+            return (0, 'Domain \'%s\' is being shutdown\n' % sName, str())
+        if sAction == 'suspend':
+            dDomain['state'] = 'paused'
+            return (0, 'Domain \'%s\' suspended\n' % sName, str())
+        if sAction == 'resume':
+            dDomain['state'] = 'running'
+            return (0, 'Domain \'%s\' resumed\n' % sName, str())
+        if sAction == 'migrate':
+            dDomain['state'] = 'shut off'
+            dDomain['migrated'] = int(1000.0*self.__setting('virsh', 'latency'))
+            if not dDomain['persistent']:
+                del dDomains[sName]
+            return (0, str(), str())
+        return (1, str(), 'error: unknown command: \'%s\' (simulator)\n' % sAction)
+
+
+    def __command_cibadmin(self, _dState, _lsArguments, _sStdIn):
+        dCib = _dState['cib']
+
+        # Query (epoch)
+        if '-Q' in _lsArguments:
+            return (0, '<cib admin_epoch="0" epoch="%d" num_updates="0"/>\n' % dCib['epoch'], str())
+
+        # Modify (create resources)
+        if '-M' in _lsArguments and '-X' in _lsArguments:
+            import xml.etree.ElementTree as ET
+            try:
+                oConfiguration = ET.fromstring(_lsArguments[_lsArguments.index('-X')+1])
+            except (IndexError, ET.ParseError) as e:
+                return (1, str(), 'Call cib_modify failed (-47): Update does not conform to the configured schema\n')
+            for oResources in oConfiguration.iter('resources'):
+                for oResource in oResources:
+                    sName = oResource.get('id', None)
+                    if sName is None or sName in dCib['resources']:
+                        continue
+                    oRole = oResource.find('meta_attributes/nvpair[@name=\'target-role\']')
+                    dCib['resources'][sName] = {'state': 'Stopped'}
+                    self.__transition(dCib['resources'][sName], oRole.get('value') if oRole is not None else 'Started')
+            dCib['epoch'] += 1
+            return (0, str(), str())
+
+        # Delete (resources)
+        if '-d' in _lsArguments and '-A' in _lsArguments:
+            sXPath = _lsArguments[_lsArguments.index('-A')+1] if _lsArguments.index('-A') < len(_lsArguments)-1 else str()
+            for sName in re.findall('@(?:id|rsc)=\'([^\']+)\'', sXPath):
+                dCib['resources'].pop(sName, None)
+            dCib['epoch'] += 1
+            return (0, str(), str())
+
+        return (1, str(), 'cibadmin: unsupported arguments (simulator)\n')
+
+
+    def __command_crm_resource(self, _dState, _lsArguments, _sStdIn):
+        dResources = _dState['cib']['resources']
+        if '-r' not in _lsArguments or _lsArguments.index('-r') == len(_lsArguments)-1:
+            return (64, str(), 'crm_resource: missing resource (simulator)\n')
+        sName = _lsArguments[_lsArguments.index('-r')+1]
+
+        # Locate
+        if '-W' in _lsArguments:
+            if sName not in dResources:
+                return (6, str(), 'resource %s is NOT running\n' % sName)
+            return (0, '%s\n' % self._dmSettings['node'] if self.__settle(dResources[sName]) == 'Started' else str(), str())
+
+        # Target role
+        if '-p' in _lsArguments and '-v' in _lsArguments:
+            sRole = _lsArguments[_lsArguments.index('-v')+1]
+            dResource = dResources.setdefault(sName, {'state': 'Stopped'})
+            self.__settle(dResource)
+            self.__transition(dResource, sRole)
+            _dState['cib']['epoch'] += 1
+            return (0, str(), str())
+
+        return (64, str(), 'crm_resource: unsupported arguments (simulator)\n')
+
+
+    def __command_crm_mon(self, _dState, _lsArguments, _sStdIn):
+        lsOutput = ['<crm_mon version="2.0.3">\n', '  <resources>\n']
+        for (sName, dResource) in sorted(_dState['cib']['resources'].items()):
+            sState = self.__settle(dResource)
+            if sState == 'Started':
+                lsOutput.append('    <resource id="%s" role="Started" active="true" nodes_running_on="1">\n      <node name="%s"/>\n    </resource>\n' % (sName, self._dmSettings['node']))
+            else:
+                lsOutput.append('    <resource id="%s" role="Stopped" active="false" nodes_running_on="0"/>\n' % sName)
+        lsOutput.extend(['  </resources>\n', '</crm_mon>\n'])
+        return (0, ''.join(lsOutput), str())
@@ -0,0 +1,383 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# Standard
+import os
+import signal
+import time
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscRuntime_spawn:
+    """
+    Low-overhead process launcher
+
+    Processes are spawned using os.posix_spawnp() - vfork-based in the C library
+    - rather than fork-ing the parent process (and sweeping its file descriptors
+    in the child), sparing the per-call overhead that grows with the parent
+    process size (memory and file descriptors).
+
+    File descriptors are closed on exec unless inheritable, Python's default
+    being non-inheritable (PEP 446); optionally, inheritable descriptors that
+    are not explicitly allowed are also closed (at the cost of enumerating the
+    parent's descriptors on each spawn). The child environment is built once
+    and re-used (see environment()).
+
+    Objects provide the subset of the subprocess.Popen interface used by
+    KiscRuntime.shell(), KiscRuntime.spawn() and KiscRuntime.kill(); they are
+    NOT thread-safe.
+    """
+
+    #--------------------------------------------------------------------------
+    # CONSTANTS
+    #--------------------------------------------------------------------------
+
+    # Availability
+    AVAILABLE = hasattr(os, 'posix_spawnp')
+
+    # Signals to restore the default action of (see subprocess.Popen(restore_signals=True))
+    SIGNALS_DEFAULT = tuple([getattr(signal, sSignal) for sSignal in ('SIGPIPE', 'SIGXFZ', 'SIGXFSZ') if hasattr(signal, sSignal)])
+
+
+    #--------------------------------------------------------------------------
+    # CLASS PROPERTIES
+    #--------------------------------------------------------------------------
+
+    # Backend
+    _bEnabled = AVAILABLE and os.environ.get('KISC_SPAWN', 'posix_spawn') != 'popen'
+    _bCloseFds = False
+
+    # Environment
+    _dsEnvironment = None
+
+
+    #--------------------------------------------------------------------------
+    # CONSTRUCTORS
+    #--------------------------------------------------------------------------
+
+    def __init__(self, args, stdin = None, stdout = None, stderr = None, start_new_session = False, close_fds = None, pass_fds = ()):
+        """
+        Spawn the given command (arguments as subprocess.Popen)
+
+        @param list  args               Command path and arguments
+        @param mixed stdin              Standard input (None, PIPE, DEVNULL or file descriptor)
+        @param mixed stdout             Standard output (None, PIPE, DEVNULL or file descriptor)
+        @param mixed stderr             Standard error (None, PIPE, DEVNULL, STDOUT or file descriptor)
+        @param bool  start_new_session  Start the command in a new session (and process group)
+        @param bool  close_fds          Close inheritable file descriptors but the allowed ones (default: see enable())
+        @param list  pass_fds           Allowed (inheritable) file descriptors to pass to the child
+
+        @exception OSError  On spawn error
+        """
+
+        import subprocess
+
+        # Properties
+        self.args = args
+        self.pid = None
+        self.returncode = None
+        self.stdin = None
+        self.stdout = None
+        self.stderr = None
+        self._oSelector = None
+        self._dlbyOutputs = dict()
+        self._byInput = None
+
+        # File actions
+        ltFileActions = list()
+        liFds_child = list()
+        liFds_parent = list()
+        iFd_null = None
+        try:
+            for (iFd_std, mStd) in ((0, stdin), (1, stdout), (2, stderr)):
+                if mStd is None:
+                    continue
+                elif mStd == subprocess.PIPE:
+                    (iFd_read, iFd_write) = os.pipe()
+                    if iFd_std == 0:
+                        (iFd_child, iFd_parent) = (iFd_read, iFd_write)
+                    else:
+                        (iFd_child, iFd_parent) = (iFd_write, iFd_read)
+                    liFds_child.append(iFd_child)
+                    liFds_parent.append(iFd_parent)
+                    ltFileActions.append((os.POSIX_SPAWN_DUP2, iFd_child, iFd_std))
+                    if iFd_std == 0:
+                        self.stdin = open(iFd_parent, 'wb', buffering=0)
+                    elif iFd_std == 1:
+                        self.stdout = open(iFd_parent, 'rb', buffering=0)
+                    else:
+                        self.stderr = open(iFd_parent, 'rb', buffering=0)
+                elif mStd == subprocess.DEVNULL:
+                    if iFd_null is None:
+                        iFd_null = os.open(os.devnull, os.O_RDWR)
+                    ltFileActions.append((os.POSIX_SPAWN_DUP2, iFd_null, iFd_std))
+                elif mStd == subprocess.STDOUT and iFd_std == 2:
+                    ltFileActions.append((os.POSIX_SPAWN_DUP2, 1, 2))
+                else:
+                    ltFileActions.append((os.POSIX_SPAWN_DUP2, int(mStd), iFd_std))
+
+            # ... close inheritable (not allowed) file descriptors
+            if close_fds is None:
+                close_fds = KiscRuntime_spawn._bCloseFds
+            liFds_allowed = frozenset([0, 1, 2]+list(pass_fds))
+            lsFds = list()
+            if close_fds:
+                try:
+                    lsFds = os.listdir('/proc/self/fd')
+                except OSError:
+                    pass
+            for sFd in lsFds:
+                iFd = int(sFd)
+                if iFd in liFds_allowed:
+                    continue
+                try:
+                    if os.get_inheritable(iFd):
+                        ltFileActions.append((os.POSIX_SPAWN_CLOSE, iFd))
+                except OSError:
+                    # (closed since listed; e.g. the listing descriptor itself)
+                    pass
+
+            # Spawn
+            self.pid = os.posix_spawnp(
+                args[0], args, KiscRuntime_spawn.environment(),
+                file_actions=ltFileActions,
+                setsid=start_new_session,
+                setsigdef=KiscRuntime_spawn.SIGNALS_DEFAULT
+            )
+
+        except BaseException:
+            for oFile in (self.stdin, self.stdout, self.stderr):
+                if oFile is not None:
+                    oFile.close()
+            raise
+
+        finally:
+            for iFd in liFds_child:
+                os.close(iFd)
+            if iFd_null is not None:
+                os.close(iFd_null)
+
+
+    #--------------------------------------------------------------------------
+    # METHODS: self
+    #--------------------------------------------------------------------------
+
+    def poll(self):
+        """
+        Check whether the process has terminated (as subprocess.Popen)
+
+        @return int  Return code (negative signal number if killed), None if still running
+        """
+
+        if self.returncode is None:
+            try:
+                (iPid, iStatus) = os.waitpid(self.pid, os.WNOHANG)
+            except ChildProcessError:
+                # (reaped elsewhere)
+                self.returncode = 255
+                return self.returncode
+            if iPid == self.pid:
+                self.returncode = -os.WTERMSIG(iStatus) if os.WIFSIGNALED(iStatus) else os.WEXITSTATUS(iStatus)
+        return self.returncode
+
+
+    def wait(self, timeout = None):
+        """
+        Wait for the process to terminate (as subprocess.Popen)
+
+        @param float timeout  Timeout (seconds; None for no timeout)
+
+        @exception subprocess.TimeoutExpired  On timeout
+
+        @return int  Return code (negative signal number if killed)
+        """
+
+        import subprocess
+        if self.returncode is not None:
+            return self.returncode
+        if timeout is None:
+            try:
+                (iPid, iStatus) = os.waitpid(self.pid, 0)
+                self.returncode = -os.WTERMSIG(iStatus) if os.WIFSIGNALED(iStatus) else os.WEXITSTATUS(iStatus)
+            except ChildProcessError:
+                self.returncode = 255
+            return self.returncode
+
+        # ... poll, with an adaptive (exponential) backoff interval
+        fDeadline = time.monotonic()+timeout
+        fInterval = 0.0005
+        while self.poll() is None:
+            fRemaining = fDeadline-time.monotonic()
+            if fRemaining <= 0.0:
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            time.sleep(min(fInterval, fRemaining))
+            fInterval = min(2.0*fInterval, 0.05)
+        return self.returncode
+
+
+    def communicate(self, input = None, timeout = None):
+        """
+        Send data to standard input, read data from standard output and error
+        until end-of-file, and wait for the process to terminate (as
+        subprocess.Popen); may be called again after a timeout, without data
+        loss
+
+        @param bytes input    Data to send to standard input
+        @param float timeout  Timeout (seconds; None for no timeout)
+
+        @exception subprocess.TimeoutExpired  On timeout
+
+        @return (bytes, bytes)  Standard output and error data (None if not redirected)
+        """
+
+        import selectors
+        import subprocess
+        fDeadline = time.monotonic()+timeout if timeout is not None else None
+
+        # I/O
+        if self._oSelector is None:
+            self._oSelector = selectors.DefaultSelector()
+            if self.stdin is not None:
+                if input:
+                    self._byInput = memoryview(input)
+                    self._oSelector.register(self.stdin, selectors.EVENT_WRITE)
+                else:
+                    self.stdin.close()
+            for oFile in (self.stdout, self.stderr):
+                if oFile is not None:
+                    self._dlbyOutputs[oFile] = list()
+                    self._oSelector.register(oFile, selectors.EVENT_READ)
+        while self._oSelector.get_map():
+            fRemaining = fDeadline-time.monotonic() if fDeadline is not None else None
+            if fRemaining is not None and fRemaining <= 0.0:
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            for (oKey, iEvents) in self._oSelector.select(fRemaining):
+                oFile = oKey.fileobj
+                if oFile is self.stdin:
+                    try:
+                        iWritten = os.write(oFile.fileno(), self._byInput[:65536])
+                        self._byInput = self._byInput[iWritten:]
+                    except BrokenPipeError:
+                        self._byInput = self._byInput[0:0]
+                    if not len(self._byInput):
+                        self._oSelector.unregister(oFile)
+                        oFile.close()
+                else:
+                    byData = os.read(oFile.fileno(), 65536)
+                    if byData:
+                        self._dlbyOutputs[oFile].append(byData)
+                    else:
+                        self._oSelector.unregister(oFile)
+                        oFile.close()
+
+        # Wait
+        self.wait(max(0.0, fDeadline-time.monotonic()) if fDeadline is not None else None)
+        self._oSelector.close()
+        return (
+            b''.join(self._dlbyOutputs[self.stdout]) if self.stdout is not None else None,
+            b''.join(self._dlbyOutputs[self.stderr]) if self.stderr is not None else None,
+        )
+
+
+    def send_signal(self, sig):
+        """
+        Send the given signal to the process (as subprocess.Popen)
+
+        @param int sig  Signal
+        """
+
+        if self.poll() is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+
+    def terminate(self):
+        """
+        Terminate the process (as subprocess.Popen)
+        """
+
+        self.send_signal(signal.SIGTERM)
+
+
+    def kill(self):
+        """
+        Kill the process (as subprocess.Popen)
+        """
+
+        self.send_signal(signal.SIGKILL)
+
+
+    #--------------------------------------------------------------------------
+    # HELPERS
+    #--------------------------------------------------------------------------
+
+    def isEnabled():
+        """
+        Return whether the (posix_spawn) launcher is available and enabled
+
+        The launcher may be disabled by setting the KISC_SPAWN environment variable
+        to 'popen' (or by calling enable(False)).
+
+        @return bool  True if enabled, False otherwise
+        """
+
+        return KiscRuntime_spawn._bEnabled
+
+
+    def enable(_bEnabled = True, _bCloseFds = False):
+        """
+        Enable (or disable) the (posix_spawn) launcher
+
+        @param bool _bEnabled   Enable (or disable)
+        @param bool _bCloseFds  Close inheritable (not allowed) file descriptors by default
+        """
+
+        KiscRuntime_spawn._bEnabled = KiscRuntime_spawn.AVAILABLE and _bEnabled
+        KiscRuntime_spawn._bCloseFds = _bCloseFds
+
+
+    def environment(_bRebuild = False):
+        """
+        Return the (pre-built) child environment
+
+        The environment is built once, from os.environ, and re-used for all
+        subsequent spawns; it must be rebuilt when os.environ is modified.
+
+        @param bool _bRebuild  Rebuild the environment
+
+        @return dict  Environment
+        """
+
+        if KiscRuntime_spawn._dsEnvironment is None or _bRebuild:
+            KiscRuntime_spawn._dsEnvironment = dict(os.environ)
+        return KiscRuntime_spawn._dsEnvironment
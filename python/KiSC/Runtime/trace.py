@@ -0,0 +1,505 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# Standard
+import json
+import os
+import os.path
+import re
+import sys
+import threading
+import time
+try:
+    import contextvars  # python >= 3.7
+except ImportError:
+    contextvars = None
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class _KiscRuntime_trace_null:
+    """
+    No-op span (tracing disabled)
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _oType, _oValue, _oTraceback):
+        return False
+
+    def end(self, _iCode = 0, _dAttributes = None):
+        pass
+
+
+class KiscRuntime_trace:
+    """
+    Structured (JSONL) tracing
+
+    When enabled - see open() - shell commands, file echoes, runtime files
+    accesses, configuration loading/resolving and resources/hosts operations
+    (phases) are recorded as spans, one JSON object per line:
+      {"time": <start (epoch)>, "duration": <seconds>, "pid": <process ID>,
+       "kind": <span kind>, "name": <span name>, "code": <exit code>,
+       "phase": <enclosing phase>, "resource": "<type>:<id>@<host>", ...}
+
+    Phases (and their originating resource) are propagated to nested spans
+    - including across (asyncio) tasks and worker threads (see bind()).
+    Spans are appended atomically (O_APPEND), such as several processes may
+    share the same trace file.
+    """
+
+    #--------------------------------------------------------------------------
+    # CONSTANTS
+    #--------------------------------------------------------------------------
+
+    # Environment variable (trace file path)
+    ENVIRONMENT = 'KISC_TRACE'
+
+    # Span kinds
+    KIND_COMMAND = 'command'
+    KIND_PHASE = 'phase'
+    KIND_SHELL = 'shell'
+    KIND_ECHO = 'echo'
+    KIND_RUNTIME = 'runtime'
+    KIND_CONFIG = 'config'
+
+
+    #--------------------------------------------------------------------------
+    # CLASS PROPERTIES
+    #--------------------------------------------------------------------------
+
+    # Trace file (descriptor)
+    _iFd = None
+
+    # Observers (see observe())
+    _lfObservers = list()
+    _bEnabled = False
+
+    # No-op span
+    _oNull = _KiscRuntime_trace_null()
+
+    # Shell commands' sub-command (word)
+    _oSubcommand = re.compile('^[a-z][-a-z0-9_]*$')
+
+    # Context: (<phase>, <resource>)
+    if contextvars is not None:
+        _oContext = contextvars.ContextVar('KiscRuntime_trace', default=(None, None))
+    else:
+        _oContext = threading.local()
+
+
+    #--------------------------------------------------------------------------
+    # CONSTRUCTORS
+    #--------------------------------------------------------------------------
+
+    def __init__(self, _sKind, _sName, _sResource = None, _dAttributes = None, _bPhase = False):
+        """
+        Start a span (use KiscRuntime_trace.span() rather than this constructor)
+
+        @param str  _sKind        Span kind (see KIND_* constants)
+        @param str  _sName        Span name
+        @param str  _sResource    Originating resource (see resource(); default: enclosing phase's)
+        @param dict _dAttributes  Additional attributes
+        @param bool _bPhase       Whether the span is a phase (propagated to nested spans)
+        """
+
+        # Properties
+        (sPhase, sResource) = KiscRuntime_trace.__context()
+        if _sResource is None:
+            _sResource = sResource
+        if _bPhase:
+            sPhase = _sName
+        self._dRecord = {
+            'time': None,
+            'duration': None,
+            'pid': os.getpid(),
+            'kind': _sKind,
+            'name': _sName,
+            'code': None,
+            'phase': sPhase,
+            'resource': _sResource,
+        }
+        if _dAttributes:
+            self._dRecord.update(_dAttributes)
+
+        # ... context
+        self._mToken = None
+        if _bPhase:
+            self._mToken = KiscRuntime_trace.__push((sPhase, _sResource))
+
+        # ... start
+        self._dRecord['time'] = round(time.time(), 6)
+        self._fStart = time.monotonic()
+
+
+    #--------------------------------------------------------------------------
+    # METHODS: self
+    #--------------------------------------------------------------------------
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, _oType, _oValue, _oTraceback):
+        if _oValue is None:
+            self.end(0)
+        elif isinstance(_oValue, OSError) and _oValue.errno is not None:
+            self.end(_oValue.errno)
+        else:
+            self.end(-1)
+        return False
+
+
+    def end(self, _iCode = 0, _dAttributes = None):
+        """
+        End (and record) the span
+
+        @param int  _iCode        Exit code (0 on success)
+        @param dict _dAttributes  Additional attributes
+        """
+
+        # End
+        if self._fStart is None:
+            return
+        self._dRecord['duration'] = round(time.monotonic()-self._fStart, 6)
+        self._fStart = None
+        self._dRecord['code'] = _iCode
+        if _dAttributes:
+            self._dRecord.update(_dAttributes)
+
+        # ... context
+        if self._mToken is not None:
+            KiscRuntime_trace.__pop(self._mToken)
+            self._mToken = None
+
+        # ... record
+        KiscRuntime_trace.write(self._dRecord)
+        for fObserver in KiscRuntime_trace._lfObservers:
+            fObserver(self._dRecord)
+
+
+    #--------------------------------------------------------------------------
+    # HELPERS
+    #--------------------------------------------------------------------------
+
+    #
+    # Setup
+    #
+
+    def open(_sFile = None):
+        """
+        Enable tracing to the given file (appended to)
+
+        @param str _sFile  Trace file path (default: KISC_TRACE environment variable)
+
+        @exception OSError  On file I/O error
+
+        @return bool  True if tracing is enabled, False otherwise
+        """
+
+        if _sFile is None:
+            _sFile = os.environ.get(KiscRuntime_trace.ENVIRONMENT)
+        if not _sFile:
+            return False
+        KiscRuntime_trace.close()
+        sDirectory = os.path.dirname(_sFile)
+        if sDirectory:
+            os.makedirs(sDirectory, exist_ok=True)
+        KiscRuntime_trace._iFd = os.open(_sFile, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC, 0o600)
+        KiscRuntime_trace._bEnabled = True
+        return True
+
+
+    def close():
+        """
+        Disable tracing (closing the trace file)
+        """
+
+        iFd = KiscRuntime_trace._iFd
+        KiscRuntime_trace._iFd = None
+        KiscRuntime_trace._bEnabled = bool(KiscRuntime_trace._lfObservers)
+        if iFd is not None:
+            try:
+                os.close(iFd)
+            except OSError:
+                pass
+
+
+    def isEnabled():
+        """
+        Return whether tracing is enabled (to file)
+
+        @return bool  True if enabled, False otherwise
+        """
+
+        return KiscRuntime_trace._iFd is not None
+
+
+    def observe(_fObserver, _bObserve = True):
+        """
+        Register (or unregister) the given observer, called with each (ended)
+        span record - whether tracing to file is enabled or not (see
+        KiscRuntime_metrics)
+
+        Observers are called synchronously - from the thread ending the span -
+        and must not raise exceptions.
+
+        @param function _fObserver  Observer (called with the record dictionary)
+        @param bool     _bObserve   Register (or unregister)
+        """
+
+        if _bObserve:
+            if _fObserver not in KiscRuntime_trace._lfObservers:
+                KiscRuntime_trace._lfObservers.append(_fObserver)
+        elif _fObserver in KiscRuntime_trace._lfObservers:
+            KiscRuntime_trace._lfObservers.remove(_fObserver)
+        KiscRuntime_trace._bEnabled = KiscRuntime_trace._iFd is not None or bool(KiscRuntime_trace._lfObservers)
+
+
+    #
+    # Spans
+    #
+
+    def span(_sKind, _sName, _sResource = None, _dAttributes = None):
+        """
+        Start a span (usable as context manager; see end() otherwise)
+
+        @param str  _sKind        Span kind (see KIND_* constants)
+        @param str  _sName        Span name
+        @param str  _sResource    Originating resource (see resource(); default: enclosing phase's)
+        @param dict _dAttributes  Additional attributes
+
+        @return KiscRuntime_trace  Span (no-op if tracing is disabled)
+        """
+
+        if not KiscRuntime_trace._bEnabled:
+            return KiscRuntime_trace._oNull
+        return KiscRuntime_trace(_sKind, _sName, _sResource, _dAttributes)
+
+
+    def phase(_sName, _sResource = None):
+        """
+        Start a phase span, propagated - along its originating resource - to
+        nested spans (usable as context manager; see end() otherwise)
+
+        @param str _sName      Phase name (e.g. 'resource start')
+        @param str _sResource  Originating resource (see resource(); default: enclosing phase's)
+
+        @return KiscRuntime_trace  Span (no-op if tracing is disabled)
+        """
+
+        if not KiscRuntime_trace._bEnabled:
+            return KiscRuntime_trace._oNull
+        return KiscRuntime_trace(KiscRuntime_trace.KIND_PHASE, _sName, _sResource, None, True)
+
+
+    def shell(_llsCommands, _fTimeout = None):
+        """
+        Start a shell command span (see KiscRuntime.shell())
+
+        The span name is made of the commands' base names (and sub-command -
+        first non-option, word-like argument - if any); e.g. 'ip link | grep'.
+
+        @param list  _llsCommands  Command(s) path and arguments
+        @param float _fTimeout     Timeout (seconds)
+
+        @return KiscRuntime_trace  Span (no-op if tracing is disabled)
+        """
+
+        if not KiscRuntime_trace._bEnabled:
+            return KiscRuntime_trace._oNull
+        lsNames = list()
+        for lsCommand in _llsCommands:
+            sName = os.path.basename(lsCommand[0])
+            for sArgument in lsCommand[1:]:
+                if sArgument[:1] != '-':
+                    if KiscRuntime_trace._oSubcommand.match(sArgument):
+                        sName += ' '+sArgument
+                    break
+            lsNames.append(sName)
+        dAttributes = {'command': ' | '.join([' '.join(lsCommand) for lsCommand in _llsCommands])}
+        if _fTimeout is not None:
+            dAttributes['timeout'] = _fTimeout
+        return KiscRuntime_trace(KiscRuntime_trace.KIND_SHELL, ' | '.join(lsNames), None, dAttributes)
+
+
+    def resource(_sType, _sId, _sHost_id = None):
+        """
+        Return the given resource (trace) identifier
+
+        @param str _sType     Resource type
+        @param str _sId       Resource ID
+        @param str _sHost_id  Host ID
+
+        @return str  Resource identifier ('<type>:<id>@<host>')
+        """
+
+        if _sHost_id is None:
+            return '%s:%s' % (_sType, _sId)
+        return '%s:%s@%s' % (_sType, _sId, _sHost_id)
+
+
+    def bind(_fFunction):
+        """
+        Bind the given function to the current (phase) context, such as spans
+        it records in another thread are attributed to the current phase
+
+        @param callable _fFunction  Function
+
+        @return callable  Bound function
+        """
+
+        if not KiscRuntime_trace._bEnabled:
+            return _fFunction
+        if contextvars is not None:
+            oContext = contextvars.copy_context()
+            return lambda *lArguments, **dArguments: oContext.copy().run(_fFunction, *lArguments, **dArguments)
+        tContext = KiscRuntime_trace.__context()
+        def fBound(*lArguments, **dArguments):
+            mToken = KiscRuntime_trace.__push(tContext)
+            try:
+                return _fFunction(*lArguments, **dArguments)
+            finally:
+                KiscRuntime_trace.__pop(mToken)
+        return fBound
+
+
+    def write(_dRecord):
+        """
+        Write the given record to the trace file
+
+        Write errors are ignored (tracing must never break operations).
+
+        @param dict _dRecord  Record
+        """
+
+        iFd = KiscRuntime_trace._iFd
+        if iFd is None:
+            return
+        try:
+            os.write(iFd, (json.dumps(_dRecord, sort_keys=True)+'\n').encode('utf-8'))
+        except (OSError, TypeError, ValueError):
+            pass
+
+
+    #
+    # Analysis
+    #
+
+    def read(_sFile):
+        """
+        Read the records from the given trace file (skipping corrupted lines)
+
+        @param str _sFile  Trace file path ('-' for standard input)
+
+        @exception OSError  On file I/O error
+
+        @return list  Records (dictionaries)
+        """
+
+        if _sFile == '-':
+            lsLines = sys.stdin.readlines()
+        else:
+            with open(_sFile, 'r') as oFile:
+                lsLines = oFile.readlines()
+        ldRecords = list()
+        for sLine in lsLines:
+            try:
+                dRecord = json.loads(sLine)
+            except ValueError:
+                continue
+            if isinstance(dRecord, dict) and isinstance(dRecord.get('duration'), (int, float)):
+                ldRecords.append(dRecord)
+        return ldRecords
+
+
+    def summarize(_ldRecords, _lsKeys = ('kind', 'phase', 'type', 'name')):
+        """
+        Aggregate the given records durations by the given keys
+
+        Keys may be any record property, along the 'type' pseudo-key (the
+        originating resource type).
+
+        @param list _ldRecords  Records (dictionaries; see read())
+        @param list _lsKeys     Aggregation keys
+
+        @return list  (tKeys, iCount, fTotal, fP50, fP95, fMax) tuples, sorted by decreasing total duration
+        """
+
+        # Aggregate
+        dlfDurations = dict()
+        for dRecord in _ldRecords:
+            lmKeys = list()
+            for sKey in _lsKeys:
+                if sKey == 'type':
+                    sResource = dRecord.get('resource')
+                    lmKeys.append(sResource.split(':', 1)[0] if sResource else None)
+                else:
+                    lmKeys.append(dRecord.get(sKey))
+            dlfDurations.setdefault(tuple(lmKeys), list()).append(dRecord['duration'])
+
+        # Statistics
+        def percentile(lfValues, fPercent):
+            # (nearest-rank, on sorted values)
+            return lfValues[max(0, min(len(lfValues)-1, int(-(-len(lfValues)*fPercent//100))-1))]
+        ltSummary = list()
+        for (tKeys, lfDurations) in dlfDurations.items():
+            lfDurations.sort()
+            ltSummary.append((tKeys, len(lfDurations), sum(lfDurations), percentile(lfDurations, 50), percentile(lfDurations, 95), lfDurations[-1]))
+        ltSummary.sort(key=lambda tSummary: -tSummary[2])
+        return ltSummary
+
+
+    #
+    # Context
+    #
+
+    def __context():
+        if contextvars is not None:
+            return KiscRuntime_trace._oContext.get()
+        lContexts = getattr(KiscRuntime_trace._oContext, 'stack', None)
+        return lContexts[-1] if lContexts else (None, None)
+
+
+    def __push(_tContext):
+        if contextvars is not None:
+            return KiscRuntime_trace._oContext.set(_tContext)
+        if not hasattr(KiscRuntime_trace._oContext, 'stack'):
+            KiscRuntime_trace._oContext.stack = list()
+        KiscRuntime_trace._oContext.stack.append(_tContext)
+        return len(KiscRuntime_trace._oContext.stack)
+
+
+    def __pop(_mToken):
+        if contextvars is not None:
+            KiscRuntime_trace._oContext.reset(_mToken)
+            return
+        del KiscRuntime_trace._oContext.stack[_mToken-1:]
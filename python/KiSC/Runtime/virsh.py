@@ -0,0 +1,543 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# KiSC
+from .runtime import \
+     KiscRuntime
+from .timeout import \
+     KiscRuntime_timeout
+
+# Standard
+import errno
+import os
+import sys
+import threading
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class KiscRuntime_virsh:
+    """
+    Persistent (interactive) virsh session
+
+    Rather than spawning a new 'virsh' process - and libvirt connection - for
+    each and every command, commands are written to a long-lived interactive
+    'virsh' process, shared by all resources within the (KiSC) process runtime
+    (one session per libvirt URI). Each command is followed by an 'echo'-ed
+    marker, which frames its output; error messages ('error: ...') - standard
+    error being merged into standard output - flag the command as failed.
+
+    Should the session be unavailable (e.g. failing to start), commands are
+    executed using KiscRuntime.shell(), with the same (OSError) semantics.
+    Should a command time out, the session is killed - and lazily re-started
+    by the next command - and only that command fails; read-only commands
+    are then retried using KiscRuntime.shell().
+
+    Domains states are answered from a snapshot of all domains ('virsh list
+    --all'), shared by all resources (per URI) and refreshed when older than
+    SNAPSHOT_TTL; domains acted upon by state-changing commands are
+    invalidated in the snapshot (and queried individually until refreshed).
+    """
+
+    #--------------------------------------------------------------------------
+    # CONSTANTS
+    #--------------------------------------------------------------------------
+
+    # Domains snapshot
+    SNAPSHOT_TTL = 5.0
+
+    # Read-only (non state-changing) commands
+    COMMANDS_READONLY = frozenset([
+        'domblklist', 'domid', 'domiflist', 'dominfo', 'domjobinfo', 'domname',
+        'domstate', 'domstats', 'domuuid', 'dumpxml', 'echo', 'list', 'uri',
+        'version',
+    ])
+
+
+    #--------------------------------------------------------------------------
+    # CLASS PROPERTIES
+    #--------------------------------------------------------------------------
+
+    # Sessions (per URI)
+    _doSessions = dict()
+    _oLock = threading.Lock()
+    _bUnavailable = False
+
+    # Domains snapshots (per URI)
+    _dtSnapshots = dict()
+    _oLock_snapshots = threading.Lock()
+
+
+    #--------------------------------------------------------------------------
+    # CONSTRUCTORS
+    #--------------------------------------------------------------------------
+
+    def __init__(self, _sUri = None):
+        """
+        Start a new virsh session
+
+        @param str _sUri  Libvirt URI (None for default)
+
+        @exception OSError  On session (process) start error
+        """
+
+        import subprocess
+
+        # Properties
+        self._sUri = _sUri
+        self._oLock = threading.Lock()
+        self._iCommands = 0
+        self._byBuffer = bytes()
+
+        # ... process
+        #     NOTE: virsh standard output is not flushed between (interactive) commands
+        #           unless connected to a terminal; force line-buffering
+        lsCommand = ['stdbuf', '-oL', '-eL', 'virsh', '-q']
+        if _sUri is not None:
+            lsCommand.extend(['-c', _sUri])
+        dsEnvironment = dict(os.environ)
+        dsEnvironment['TERM'] = 'dumb'
+        self._oPopen = subprocess.Popen(
+            lsCommand,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=dsEnvironment
+        )
+
+        # ... check (first command)
+        self.execute(['echo'], 10.0)
+
+
+    #--------------------------------------------------------------------------
+    # METHODS: self
+    #--------------------------------------------------------------------------
+
+    def isAlive(self):
+        """
+        Return whether the session (process) is alive
+
+        @return bool  True if alive, False otherwise
+        """
+
+        return self._oPopen is not None and self._oPopen.poll() is None
+
+
+    def execute(self, _lsArguments, _fTimeout = None, _bTrace = False):
+        """
+        Execute the given virsh command and return its output
+
+        @param list  _lsArguments  Command (virsh) arguments
+        @param float _fTimeout     Maximum time to wait for the command output (seconds; None for no timeout)
+        @param bool  _bTrace       Print TRACE message to standard error
+
+        @exception OSError  In case the command fails, with the filename property set
+                            to zero (see KiscRuntime.shell()); KiscRuntime_timeout in case
+                            of session timeout; errno set to ECONNRESET or EPIPE (command
+                            not sent) in case of session (process) failure
+
+        @return str  Resulting output
+        """
+
+        import select
+        import time
+        if _bTrace: sys.stderr.write('TRACE[virsh] %s\n' % ' '.join(_lsArguments))
+
+        with self._oLock:
+            if not self.isAlive():
+                raise OSError(errno.EPIPE, 'virsh session terminated')
+
+            # Command (and marker)
+            self._iCommands += 1
+            sMarker = 'KISC:%d:%d' % (os.getpid(), self._iCommands)
+            sCommand = ' '.join([self.__quote(sArgument) for sArgument in _lsArguments])
+            try:
+                self._oPopen.stdin.write(('%s\necho %s\n' % (sCommand, sMarker)).encode(sys.getfilesystemencoding()))
+                self._oPopen.stdin.flush()
+            except OSError as e:
+                self.close()
+                raise OSError(errno.EPIPE, 'virsh session terminated; %s' % str(e))
+
+            # Output (until marker)
+            lsOutput = list()
+            lsErrors = list()
+            iFileno = self._oPopen.stdout.fileno()
+            fDeadline = time.time()+_fTimeout if _fTimeout is not None else None
+            while True:
+                if b'\n' not in self._byBuffer:
+                    fRemaining = fDeadline-time.time() if fDeadline is not None else None
+                    if fRemaining is not None and fRemaining <= 0.0 or not select.select([iFileno], [], [], fRemaining)[0]:
+                        self.close(True)
+                        raise KiscRuntime_timeout('virsh session timeout (%s)' % sCommand)
+                    byData = os.read(iFileno, 65536)
+                    if not byData:
+                        self.close()
+                        raise OSError(errno.ECONNRESET, 'virsh session terminated (%s)' % sCommand)
+                    self._byBuffer += byData
+                    continue
+                (byLine, self._byBuffer) = self._byBuffer.split(b'\n', 1)
+                sLine = byLine.decode(sys.getfilesystemencoding(), errors='replace')
+
+                # ... strip (interactive) prompt and input echo
+                while sLine.startswith('virsh'):
+                    iPrompt = sLine.find('# ')
+                    if iPrompt < 0:
+                        break
+                    sLine = sLine[iPrompt+2:]
+                if sLine == sMarker:
+                    break
+                if sLine in (sCommand, 'echo '+sMarker):
+                    continue
+                if sLine.startswith('error: '):
+                    lsErrors.append(sLine)
+                else:
+                    lsOutput.append(sLine)
+
+        # Done
+        if lsErrors:
+            raise OSError(1, '\n'.join(lsErrors), 0)
+        return '\n'.join(lsOutput)+'\n' if lsOutput else str()
+
+
+    def close(self, _bKill = False):
+        """
+        Close the session (terminating its process)
+
+        @param bool _bKill  Kill the session process (rather than quitting it gracefully)
+        """
+
+        import subprocess
+        if self._oPopen is None:
+            return
+        if _bKill:
+            if self._oPopen.poll() is None:
+                self._oPopen.kill()
+            self._oPopen.wait()
+            self._oPopen.stdin.close()
+        elif self._oPopen.poll() is None:
+            try:
+                self._oPopen.stdin.write(b'quit\n')
+                self._oPopen.stdin.close()
+                self._oPopen.wait(1.0)
+            except (OSError, subprocess.SubprocessError):
+                self._oPopen.kill()
+                self._oPopen.wait()
+        self._oPopen.stdout.close()
+        self._oPopen = None
+
+
+    #
+    # Helpers
+    #
+
+    def __quote(self, _sArgument):
+        """
+        Quote the given argument, as parsed by virsh (interactive) command parser
+
+        @param str _sArgument  Command argument
+
+        @exception OSError  On invalid argument (containing a new-line)
+
+        @return str  Quoted argument
+        """
+
+        if '\n' in _sArgument:
+            raise OSError(errno.EINVAL, 'Invalid virsh argument (new-line)', 0)
+        if _sArgument and not [c for c in _sArgument if c in ' \t"\'\\#;']:
+            return _sArgument
+        return '"%s"' % _sArgument.replace('\\', '\\\\').replace('"', '\\"')
+
+
+    #--------------------------------------------------------------------------
+    # HELPERS
+    #--------------------------------------------------------------------------
+
+    def session(_sUri = None):
+        """
+        Return the (pooled) virsh session for the given URI, starting it if need be
+
+        @param str _sUri  Libvirt URI (None for default)
+
+        @return KiscRuntime_virsh  Virsh session, None if unavailable (or a command backend is set)
+        """
+
+        if KiscRuntime.getBackend() is not None:
+            return None
+        with KiscRuntime_virsh._oLock:
+            if KiscRuntime_virsh._bUnavailable:
+                return None
+            oSession = KiscRuntime_virsh._doSessions.get(_sUri, None)
+            if oSession is None or not oSession.isAlive():
+                try:
+                    oSession = KiscRuntime_virsh(_sUri)
+                except OSError:
+                    KiscRuntime_virsh._bUnavailable = True
+                    return None
+                if not KiscRuntime_virsh._doSessions:
+                    import atexit
+                    atexit.register(KiscRuntime_virsh.closeAll)
+                KiscRuntime_virsh._doSessions[_sUri] = oSession
+            return oSession
+
+
+    def shell(_lsArguments, _sUri = None, _fTimeout = None, _bTrace = False):
+        """
+        Execute the given virsh command (using the pooled session, if available)
+        and return its output
+
+        Commands are executed using KiscRuntime.shell() if the session is
+        unavailable or terminated, or - for read-only commands - timed out.
+
+        @param list  _lsArguments  Command (virsh) arguments
+        @param str   _sUri         Libvirt URI (None for default)
+        @param float _fTimeout     Maximum time to wait for the command output (seconds; None for no timeout)
+        @param bool  _bTrace       Print TRACE message to standard error
+
+        @exception OSError  In case the command fails (see KiscRuntime.shell())
+
+        @return str  Resulting output
+        """
+
+        # Execute
+        try:
+            oSession = KiscRuntime_virsh.session(_sUri)
+            if oSession is not None:
+                try:
+                    return oSession.execute(_lsArguments, _fTimeout, _bTrace)
+                except OSError as e:
+                    if isinstance(e, KiscRuntime_timeout):
+                        # (state-changing commands may have been executed; do not repeat them)
+                        if not _lsArguments or _lsArguments[0] not in KiscRuntime_virsh.COMMANDS_READONLY:
+                            raise e
+                    elif e.errno != errno.EPIPE:
+                        raise e
+
+            # ... fallback
+            return KiscRuntime.shell(KiscRuntime_virsh.__command(_lsArguments, _sUri), _fTimeout = _fTimeout, _bTrace = _bTrace)
+
+        finally:
+
+            # ... invalidate domains snapshot (after state-changing commands)
+            if _lsArguments and _lsArguments[0] not in KiscRuntime_virsh.COMMANDS_READONLY:
+                KiscRuntime_virsh.invalidate(_lsArguments[1] if len(_lsArguments) > 1 and _lsArguments[0] != 'create' else None, _sUri)
+
+
+    def domains(_sUri = None, _fMaxAge = None, _bTrace = False):
+        """
+        Return the (snapshot) states of all (defined and running) domains
+
+        @param str   _sUri     Libvirt URI (None for default)
+        @param float _fMaxAge  Maximum snapshot age (seconds; default: SNAPSHOT_TTL)
+        @param bool  _bTrace   Print TRACE message to standard error
+
+        @exception OSError  On domains listing error
+
+        @return dict  Domains states (as reported by 'virsh domstate'), per name;
+                      None for domains invalidated since the snapshot
+        """
+
+        import re
+        import time
+        from .metrics import KiscRuntime_metrics
+        if _fMaxAge is None:
+            _fMaxAge = KiscRuntime_virsh.SNAPSHOT_TTL
+
+        # Snapshot
+        with KiscRuntime_virsh._oLock_snapshots:
+            tSnapshot = KiscRuntime_virsh._dtSnapshots.get(_sUri, None)
+            if tSnapshot is not None and time.time()-tSnapshot[0] <= _fMaxAge:
+                KiscRuntime_metrics.cache('virsh', True)
+                return tSnapshot[1]
+        KiscRuntime_metrics.cache('virsh', False)
+
+        # Refresh
+        fTimestamp = time.time()
+        dsDomains = KiscRuntime_virsh.parse(KiscRuntime_virsh.shell(['list', '--all'], _sUri, _bTrace = _bTrace))
+        with KiscRuntime_virsh._oLock_snapshots:
+            KiscRuntime_virsh._dtSnapshots[_sUri] = (fTimestamp, dsDomains)
+        return dsDomains
+
+
+    async def domainsAsync(_sUri = None, _fMaxAge = None, _bTrace = False):
+        """
+        Return the (snapshot) states of all (defined and running) domains (coroutine)
+
+        Same as domains(), the snapshot being refreshed using a one-off (asynchronous)
+        virsh command, once for all concurrent callers (see KiscRuntime_aio.shared()).
+
+        @param str   _sUri     Libvirt URI (None for default)
+        @param float _fMaxAge  Maximum snapshot age (seconds; default: SNAPSHOT_TTL)
+        @param bool  _bTrace   Print TRACE message to standard error
+
+        @exception OSError  On domains listing error
+
+        @return dict  See domains()
+        """
+
+        import time
+        from .aio import KiscRuntime_aio
+        from .metrics import KiscRuntime_metrics
+        if _fMaxAge is None:
+            _fMaxAge = KiscRuntime_virsh.SNAPSHOT_TTL
+
+        # Snapshot
+        with KiscRuntime_virsh._oLock_snapshots:
+            tSnapshot = KiscRuntime_virsh._dtSnapshots.get(_sUri, None)
+            if tSnapshot is not None and time.time()-tSnapshot[0] <= _fMaxAge:
+                KiscRuntime_metrics.cache('virsh', True)
+                return tSnapshot[1]
+        KiscRuntime_metrics.cache('virsh', False)
+
+        # Refresh
+        async def fRefresh():
+            fTimestamp = time.time()
+            dsDomains = KiscRuntime_virsh.parse(await KiscRuntime_aio.shell(KiscRuntime_virsh.__command(['list', '--all'], _sUri), _bTrace = _bTrace))
+            with KiscRuntime_virsh._oLock_snapshots:
+                KiscRuntime_virsh._dtSnapshots[_sUri] = (fTimestamp, dsDomains)
+            return dsDomains
+        return await KiscRuntime_aio.shared(('virsh:domains', _sUri), fRefresh)
+
+
+    def parse(_sOutput):
+        """
+        Parse the given domains list ('virsh list --all' output)
+
+        @param str _sOutput  Domains list
+
+        @return dict  Domains states, per name
+        """
+
+        import re
+        oRegexpDomain = re.compile('^\\s*\\S+\\s+(\\S+)\\s+(.*\\S)\\s*$')
+        dsDomains = dict()
+        for sLine in _sOutput.splitlines():
+            oMatch = oRegexpDomain.match(sLine)
+            if oMatch is None or oMatch.group(1) == 'Name' or oMatch.group(1).startswith('---'):
+                continue
+            dsDomains[oMatch.group(1)] = oMatch.group(2)
+        return dsDomains
+
+
+    def domstate(_sName, _sUri = None, _fMaxAge = None, _bTrace = False):
+        """
+        Return the given domain state, from the domains snapshot (see domains())
+
+        @param str   _sName    Domain name
+        @param str   _sUri     Libvirt URI (None for default)
+        @param float _fMaxAge  Maximum snapshot age (seconds; default: SNAPSHOT_TTL)
+        @param bool  _bTrace   Print TRACE message to standard error
+
+        @exception OSError  On state query error or undefined domain (with the
+                            filename property set to zero, as 'virsh domstate')
+
+        @return str  Domain state (as reported by 'virsh domstate')
+        """
+
+        dsDomains = KiscRuntime_virsh.domains(_sUri, _fMaxAge, _bTrace)
+        if _sName not in dsDomains:
+            raise OSError(1, 'error: failed to get domain \'%s\'' % _sName, 0)
+        sState = dsDomains[_sName]
+        if sState is None:
+            sState = KiscRuntime_virsh.shell(['domstate', _sName], _sUri, _bTrace = _bTrace).strip()
+            with KiscRuntime_virsh._oLock_snapshots:
+                dsDomains[_sName] = sState
+        return sState
+
+
+    async def domstateAsync(_sName, _sUri = None, _fMaxAge = None, _bTrace = False):
+        """
+        Return the given domain state, from the domains snapshot (coroutine; see domstate())
+
+        @param str   _sName    Domain name
+        @param str   _sUri     Libvirt URI (None for default)
+        @param float _fMaxAge  Maximum snapshot age (seconds; default: SNAPSHOT_TTL)
+        @param bool  _bTrace   Print TRACE message to standard error
+
+        @exception OSError  See domstate()
+
+        @return str  Domain state (as reported by 'virsh domstate')
+        """
+
+        from .aio import KiscRuntime_aio
+        dsDomains = await KiscRuntime_virsh.domainsAsync(_sUri, _fMaxAge, _bTrace)
+        if _sName not in dsDomains:
+            raise OSError(1, 'error: failed to get domain \'%s\'' % _sName, 0)
+        sState = dsDomains[_sName]
+        if sState is None:
+            sState = (await KiscRuntime_aio.shell(KiscRuntime_virsh.__command(['domstate', _sName], _sUri), _bTrace = _bTrace)).strip()
+            with KiscRuntime_virsh._oLock_snapshots:
+                dsDomains[_sName] = sState
+        return sState
+
+
+    def invalidate(_sName = None, _sUri = None):
+        """
+        Invalidate the given domain - or all domains - in the domains snapshot
+
+        @param str _sName  Domain name (None for all domains)
+        @param str _sUri   Libvirt URI (None for default)
+        """
+
+        with KiscRuntime_virsh._oLock_snapshots:
+            tSnapshot = KiscRuntime_virsh._dtSnapshots.get(_sUri, None)
+            if tSnapshot is None:
+                return
+            if _sName is None:
+                del KiscRuntime_virsh._dtSnapshots[_sUri]
+            else:
+                tSnapshot[1][_sName] = None
+
+
+    def __command(_lsArguments, _sUri = None):
+        """
+        Return the one-off virsh command (path and arguments) for the given virsh arguments
+
+        @param list _lsArguments  Command (virsh) arguments
+        @param str  _sUri         Libvirt URI (None for default)
+
+        @return list  Command path and arguments
+        """
+
+        lsCommand = ['virsh', '-q']
+        if _sUri is not None:
+            lsCommand.extend(['-c', _sUri])
+        lsCommand.extend(_lsArguments)
+        return lsCommand
+
+
+    def closeAll():
+        """
+        Close all (pooled) virsh sessions
+        """
+
+        with KiscRuntime_virsh._oLock:
+            for oSession in KiscRuntime_virsh._doSessions.values():
+                oSession.close()
+            KiscRuntime_virsh._doSessions.clear()
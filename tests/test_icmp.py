@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# Standard
+import os
+import socket
+import sys
+import time
+import unittest
+
+# KiSC
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+from KiSC.Runtime.icmp import \
+     KiscRuntime_icmp
+
+
+#------------------------------------------------------------------------------
+# TESTS
+#------------------------------------------------------------------------------
+
+class TestIcmp(unittest.TestCase):
+    """
+    ICMP echo (ping) against the loopback addresses, with the unprivileged
+    (datagram) socket
+    """
+
+    def _icmp(self, _bIPv6):
+        try:
+            oIcmp = KiscRuntime_icmp(_bIPv6)
+        except OSError as e:
+            self.skipTest('ICMP socket unavailable (%s)' % e)
+        if oIcmp.isRaw():
+            oIcmp.close()
+            self.skipTest('ICMP datagram socket unavailable (see net.ipv4.ping_group_range)')
+        self.addCleanup(oIcmp.close)
+        return oIcmp
+
+
+    def _loopback(self, _bIPv6, _sAddress):
+        oIcmp = self._icmp(_bIPv6)
+        try:
+            socket.getaddrinfo(_sAddress, None, socket.AF_INET6 if _bIPv6 else socket.AF_INET)
+        except OSError as e:
+            self.skipTest('Address unavailable (%s)' % e)
+
+        # Reachable
+        ltResults = oIcmp.ping([_sAddress], _iCount = 3, _fInterval = 0.1, _fTimeout = 1.0)
+        self.assertEqual(len(ltResults), 1)
+        self.assertTrue(ltResults[0][0])
+        self.assertIsNotNone(ltResults[0][1])
+
+
+    def test_ipv4(self):
+        self._loopback(False, '127.0.0.1')
+
+
+    def test_ipv6(self):
+        self._loopback(True, '::1')
+
+
+    def test_unreachable(self):
+        # (TEST-NET-1 address; no reply expected)
+        oIcmp = self._icmp(False)
+        fStart = time.time()
+        ltResults = oIcmp.ping(['192.0.2.1', '127.0.0.1'], _iCount = 2, _fInterval = 0.2, _fTimeout = 0.5)
+        self.assertEqual(ltResults[0], (False, None))
+        self.assertTrue(ltResults[1][0])
+        self.assertLess(time.time()-fStart, 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# Standard
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+# KiSC
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+from KiSC.Runtime import \
+     KiscRuntime, \
+     KiscRuntime_spawn, \
+     KiscRuntime_virsh
+from KiSC.Resource import \
+     kiscResource
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Stub 'virsh' (domains state kept in $KISC_STUB_DIR)
+#  - KISC_STUB_DELAY: delay (seconds) before a started/stopped domain changes state
+#  - KISC_STUB_EVENTS: 'yes' for lifecycle events, 'eof' for 'virsh event' to close
+#    its output yet keep running (listener at EOF but not reaped)
+VIRSH = '''#!/bin/bash
+D="$KISC_STUB_DIR"
+[ "$1" == "-q" ] && shift
+if [ -z "$1" ]; then
+  while printf 'virsh # '; read -r line; do
+    eval "set -- $line"
+    case "$1" in quit) exit 0;; echo) shift; echo "$*";; *) "$0" "$@" 2>&1;; esac
+  done
+  exit 0
+fi
+cmd=$1; shift
+echo "$cmd" >> "$D/calls"
+case "$cmd" in
+  event)
+    [ "$KISC_STUB_EVENTS" == eof ] && { exec >&- 2>&-; exec sleep 30; }
+    touch "$D/events"; exec tail -n0 -f "$D/events" ;;
+  domstate) [ -e "$D/state_$1" ] || { echo "error: failed to get domain '$1'" >&2; exit 1; }; cat "$D/state_$1" ;;
+  start) (sleep $KISC_STUB_DELAY; echo running > "$D/state_$1"; echo "event 'lifecycle' for domain '$1': Started Booted" >> "$D/events") >/dev/null 2>&1 & ;;
+  shutdown) (sleep $KISC_STUB_DELAY; echo 'shut off' > "$D/state_$1"; echo "event 'lifecycle' for domain '$1': Stopped Shutdown" >> "$D/events") >/dev/null 2>&1 & ;;
+  destroy) echo 'shut off' > "$D/state_$1" ;;
+esac
+'''
+
+
+#------------------------------------------------------------------------------
+# TESTS
+#------------------------------------------------------------------------------
+
+class TestLibvirt(unittest.TestCase):
+    """
+    Domain start/stop (waiting for the domain state) against a stub 'virsh'
+    """
+
+    def setUp(self):
+        self._sDirectory = tempfile.mkdtemp(prefix='kisc-test.')
+        self.addCleanup(shutil.rmtree, self._sDirectory, True)
+        sVirsh = self._sDirectory+os.sep+'virsh'
+        with open(sVirsh, 'w') as oFile:
+            oFile.write(VIRSH)
+        os.chmod(sVirsh, 0o755)
+        with open(self._sDirectory+os.sep+'state_test', 'w') as oFile:
+            oFile.write('shut off\n')
+        self._dsEnviron = dict(os.environ)
+        self.addCleanup(self._restore)
+        os.environ['PATH'] = self._sDirectory+os.pathsep+os.environ.get('PATH', '')
+        os.environ['KISC_STUB_DIR'] = self._sDirectory
+        os.environ['KISC_STUB_DELAY'] = '1.0'
+        self._oResource = kiscResource('service_libvirt', 'test', {'name': 'test', 'timeout_start': '10', 'timeout_stop': '10'})
+        self._oResource.VERBOSE(KiscRuntime.VERBOSE_NONE)
+
+
+    def _restore(self):
+        KiscRuntime_virsh.closeAll()
+        os.environ.clear()
+        os.environ.update(self._dsEnviron)
+        KiscRuntime_spawn.environment(True)
+
+
+    def _events(self, _sEvents):
+        # (the launcher and virsh session environments are built once)
+        os.environ['KISC_STUB_EVENTS'] = _sEvents
+        KiscRuntime_spawn.environment(True)
+        KiscRuntime_virsh.closeAll()
+
+
+    def _domstate(self):
+        with open(self._sDirectory+os.sep+'calls', 'r') as oFile:
+            return len([sLine for sLine in oFile if sLine.strip() == 'domstate'])
+
+
+    def _cycle(self):
+        for sOperation in ('start', 'stop'):
+            open(self._sDirectory+os.sep+'calls', 'w').close()
+            self.assertEqual(getattr(self._oResource, sOperation)(), [])
+            # (adaptive backoff polling: a handful of state queries over the delay)
+            self.assertLess(self._domstate(), 15, sOperation)
+
+
+    def test_events(self):
+        self._events('yes')
+        self._cycle()
+
+
+    def test_events_eof(self):
+        # Listener at EOF (not yet reaped) must not spin the state queries
+        self._events('eof')
+        self._cycle()
+
+
+if __name__ == '__main__':
+    unittest.main()
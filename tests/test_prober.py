@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# Standard
+import http.server
+import os
+import socket
+import socketserver
+import sys
+import threading
+import unittest
+
+# KiSC
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+from KiSC.Runtime import \
+     KiscRuntime
+from KiSC.Runtime.prober import \
+     KiscRuntime_prober
+from KiSC.Resource import \
+     kiscResource
+
+
+#------------------------------------------------------------------------------
+# LISTENERS
+#------------------------------------------------------------------------------
+
+class _HttpHandler(http.server.BaseHTTPRequestHandler):
+    """
+    HTTP handler: '/' is healthy, '/down' returns 503, '/other' an unexpected body
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        iStatus = 503 if self.path == '/down' else 200
+        byBody = b'OK healthy' if self.path == '/' else b'something else'
+        self.send_response(iStatus)
+        self.send_header('Content-Length', str(len(byBody)))
+        self.end_headers()
+        self.wfile.write(byBody)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Listeners:
+    """
+    Local listeners: TCP (banner), HTTP and a closed port
+    """
+
+    def __init__(self):
+        # ... TCP (sending a banner on connect)
+        self.oTcp = socket.socket()
+        self.oTcp.bind(('127.0.0.1', 0))
+        self.oTcp.listen(16)
+        self.sTcp = '127.0.0.1:%d' % self.oTcp.getsockname()[1]
+        threading.Thread(target=self.__banner, daemon=True).start()
+
+        # ... HTTP
+        self.oHttp = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _HttpHandler)
+        self.oHttp.daemon_threads = True
+        self.sHttp = 'http://127.0.0.1:%d' % self.oHttp.server_address[1]
+        threading.Thread(target=self.oHttp.serve_forever, daemon=True).start()
+
+        # ... closed port (connection refused)
+        oSocket = socket.socket()
+        oSocket.bind(('127.0.0.1', 0))
+        self.sClosed = '127.0.0.1:%d' % oSocket.getsockname()[1]
+        oSocket.close()
+
+    def __banner(self):
+        while True:
+            try:
+                (oConnection, _) = self.oTcp.accept()
+            except OSError:
+                return
+            try:
+                oConnection.sendall(b'220 ready\r\n')
+            except OSError:
+                pass
+            oConnection.close()
+
+    def close(self):
+        self.oHttp.shutdown()
+        self.oHttp.server_close()
+        self.oTcp.close()
+
+
+oListeners = None
+
+def setUpModule():
+    global oListeners
+    oListeners = _Listeners()
+
+def tearDownModule():
+    oListeners.close()
+
+
+#------------------------------------------------------------------------------
+# TESTS
+#------------------------------------------------------------------------------
+
+class TestProber(unittest.TestCase):
+    """
+    TCP/HTTP prober against local listeners
+    """
+
+    def test_tcp_up(self):
+        oProber = KiscRuntime_prober()
+        oProber.addTcp(oListeners.sTcp, 2.0)
+        oProber.addTcp(oListeners.sTcp, 2.0, None, '^220 ')
+        for (sResult, fLatency) in oProber.run():
+            self.assertEqual(sResult, KiscRuntime_prober.RESULT_OK)
+            self.assertIsNotNone(fLatency)
+
+
+    def test_tcp_down(self):
+        # (one probe per run; outstanding probes are cancelled once the quorum is out of reach)
+        oProber = KiscRuntime_prober()
+        oProber.addTcp(oListeners.sClosed, 2.0)
+        self.assertEqual(oProber.run(), [(KiscRuntime_prober.RESULT_REFUSED, None)])
+        oProber = KiscRuntime_prober()
+        oProber.addTcp(oListeners.sTcp, 2.0, None, '^500 ')
+        self.assertEqual(oProber.run(), [(KiscRuntime_prober.RESULT_MISMATCH, None)])
+        oProber = KiscRuntime_prober()
+        oProber.addTcp(oListeners.sClosed, 2.0)
+        oProber.addTcp(oListeners.sTcp, 2.0, None, '^500 ')
+        self.assertEqual(oProber.run()[0], (KiscRuntime_prober.RESULT_REFUSED, None))
+
+
+    def test_tcp_quorum(self):
+        oProber = KiscRuntime_prober()
+        oProber.addTcp(oListeners.sClosed, 2.0)
+        oProber.addTcp(oListeners.sTcp, 2.0)
+        ltResults = oProber.run(1)
+        self.assertEqual(ltResults[0][0], KiscRuntime_prober.RESULT_REFUSED)
+        self.assertEqual(ltResults[1][0], KiscRuntime_prober.RESULT_OK)
+
+
+    def test_http_up(self):
+        oProber = KiscRuntime_prober()
+        oProber.addHttp(oListeners.sHttp+'/', 2.0)
+        oProber.addHttp(oListeners.sHttp+'/', 2.0, '200', '^OK')
+        for (sResult, fLatency) in oProber.run():
+            self.assertEqual(sResult, KiscRuntime_prober.RESULT_OK)
+            self.assertIsNotNone(fLatency)
+
+
+    def test_http_down(self):
+        for (sUrl, sExpect, sResult) in (
+            (oListeners.sHttp+'/down', None, KiscRuntime_prober.RESULT_MISMATCH),
+            (oListeners.sHttp+'/other', '^OK', KiscRuntime_prober.RESULT_MISMATCH),
+            ('http://'+oListeners.sClosed+'/', None, KiscRuntime_prober.RESULT_REFUSED),
+        ):
+            oProber = KiscRuntime_prober()
+            oProber.addHttp(sUrl, 2.0, None, sExpect)
+            self.assertEqual(oProber.run(), [(sResult, None)], sUrl)
+
+
+class TestHealth(unittest.TestCase):
+    """
+    TCP/HTTP health check resources against local listeners (without cache)
+    """
+
+    def _resource(self, _sType, _dsConfig):
+        _dsConfig['cache_ttl'] = '0'
+        oResource = kiscResource(_sType, 'test', _dsConfig)
+        oResource.VERBOSE(KiscRuntime.VERBOSE_NONE)
+        self.assertEqual(oResource.verify(), [])
+        return oResource
+
+
+    def _check(self, _oResource, _bUp):
+        lsErrors = _oResource.start()
+        if _bUp:
+            self.assertEqual(lsErrors, [])
+            self.assertEqual(_oResource.status(), KiscRuntime.STATUS_STARTED)
+        else:
+            self.assertNotEqual(lsErrors, [])
+            self.assertEqual(_oResource.status(), KiscRuntime.STATUS_ERROR)
+        self.assertEqual(_oResource.stop(), [])
+
+
+    def test_tcp(self):
+        self._check(self._resource('health_tcp', {'address': oListeners.sTcp, 'expect': '^220 '}), True)
+        self._check(self._resource('health_tcp', {'address': oListeners.sClosed}), False)
+        self._check(self._resource('health_tcp', {'address': oListeners.sTcp+','+oListeners.sClosed, 'satisfy': '1'}), True)
+
+
+    def test_http(self):
+        self._check(self._resource('health_http', {'address': oListeners.sHttp+'/', 'expect': '^OK'}), True)
+        self._check(self._resource('health_http', {'address': oListeners.sHttp+'/down'}), False)
+        self._check(self._resource('health_http', {'address': oListeners.sHttp+'/,http://'+oListeners.sClosed+'/', 'satisfy': '1'}), True)
+
+
+if __name__ == '__main__':
+    unittest.main()
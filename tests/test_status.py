@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+# K.I.S.S. Cluster (KiSC)
+# COPYRIGHT 2017-2018 Idiap Research Institute <http://www.idiap.ch>
+#
+# K.I.S.S. Cluster (KiSC) is free software:
+# you can redistribute it and/or modify it under the terms of the GNU General
+# Public License as published by the Free Software Foundation, Version 3.
+#
+# K.I.S.S. Cluster (KiSC) is distributed in the hope
+# that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+# SPDX-License-Identifier: GPL-3.0
+# License-Filename: LICENSE/GPL-3.0.txt
+#
+# AUTHORS:
+# - Cédric Dufour <cedric.dufour@idiap.ch>
+
+
+
+#------------------------------------------------------------------------------
+# MODULES
+#------------------------------------------------------------------------------
+
+# Standard
+import os
+import sys
+import unittest
+
+# KiSC
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+from KiSC.Runtime import \
+     KiscRuntime
+from KiSC.Runtime.aio import \
+     KiscRuntime_aio
+from KiSC.Resource import \
+     kiscResource
+
+
+#------------------------------------------------------------------------------
+# TESTS
+#------------------------------------------------------------------------------
+
+class TestStatus(unittest.TestCase):
+    """
+    Resources status queries, synchronous and asynchronous (sharing the same
+    status query generator), against the loopback interface
+    """
+
+    def _status(self, _sType, _dsConfig, _iIntent, _iStatus):
+        oResource = kiscResource(_sType, 'test', _dsConfig)
+        oResource.VERBOSE(KiscRuntime.VERBOSE_NONE)
+        self.assertEqual(oResource.status(True, _iIntent), _iStatus)
+        oResource = kiscResource(_sType, 'test', _dsConfig)
+        oResource.VERBOSE(KiscRuntime.VERBOSE_NONE)
+        self.assertEqual(KiscRuntime_aio.run(oResource.statusAsync(True, _iIntent)), _iStatus)
+
+        # ... cached (stateless) status
+        self.assertEqual(oResource.status(False), _iStatus)
+        self.assertEqual(KiscRuntime_aio.run(oResource.statusAsync(False)), _iStatus)
+
+
+    def test_network_tuntap(self):
+        self._status('network_tuntap', {'name': 'lo'}, None, KiscRuntime.STATUS_STARTED)
+        self._status('network_tuntap', {'name': 'kisc-none'}, None, KiscRuntime.STATUS_STOPPED)
+
+
+    def test_network_bond(self):
+        # (loopback operational state is 'unknown', i.e. not 'up')
+        self._status('network_bond', {'name': 'lo'}, None, KiscRuntime.STATUS_STARTED)
+        self._status('network_bond', {'name': 'lo'}, KiscRuntime.STATUS_STARTED, KiscRuntime.STATUS_ERROR)
+        self._status('network_bond', {'name': 'kisc-none'}, KiscRuntime.STATUS_STARTED, KiscRuntime.STATUS_STOPPED)
+
+
+    def test_network_ipv4(self):
+        self._status('network_ipv4', {'address': '127.0.0.1'}, None, KiscRuntime.STATUS_STARTED)
+        self._status('network_ipv4', {'address': '192.0.2.1'}, None, KiscRuntime.STATUS_STOPPED)
+
+
+if __name__ == '__main__':
+    unittest.main()